@@ -13,12 +13,21 @@
 # limitations under the License.
 
 import logging
+from typing import Callable
 
 from chromestatus_openapi.models import AddAttachmentResponse
 
 from framework import basehandlers
 from framework import permissions
 from internals import attachments
+from internals import blob_storage
+
+# An attachment can be deleted, so caches must revalidate it after a while.
+# Revalidation is cheap because the strong ETag usually gives a 304.
+ATTACHMENT_CACHE_CONTROL = 'public, max-age=3600'
+# Until its thumbnails are generated, an image is served in full at its
+# thumbnail URL, but only for a short time.
+PENDING_THUMB_CACHE_CONTROL = 'public, max-age=300'
 
 
 class AttachmentsAPI(basehandlers.EntitiesAPIHandler):
@@ -59,19 +68,25 @@ class AttachmentServing(basehandlers.FlaskHandler):
     thumb_url = attach_url + '/thumbnail'
     logging.info('attach_url is: %r ', attach_url)
 
-    if self.request.url in (attach_url, thumb_url):
+    if self.request.base_url in (attach_url, thumb_url):
       return None
 
-    if is_thumb:
-      return self.redirect(thumb_url)
-    else:
-      return self.redirect(attach_url)
+    location = thumb_url if is_thumb else attach_url
+    if self.request.query_string:
+      location += '?' + self.request.query_string.decode()
+    return self.redirect(location)
 
   def get_template_data(self, **kwargs):
     """Serve the attachment data, or redirect to a cookieless domain."""
     feature_id = kwargs.get('feature_id')
     is_thumb = 'thumbnail' in kwargs
     attachment_id = kwargs.get('attachment_id')
+    size_name = self.request.args.get('size', attachments.DEFAULT_THUMB_SIZE)
+    not_modified_response = self.maybe_not_modified(
+        feature_id, attachment_id, size_name if is_thumb else None)
+    if not_modified_response:
+      return not_modified_response
+
     attachment = attachments.get_attachment(feature_id, attachment_id)
     if not attachment:
       self.abort(404, msg='Attachment not found')
@@ -81,11 +96,96 @@ class AttachmentServing(basehandlers.FlaskHandler):
       return redirect_response
 
     headers = self.get_headers()
-    if is_thumb:
-      thumbnail = attachments.get_thumbnail(attachment_id)
-      if thumbnail:
+    cache_control = ATTACHMENT_CACHE_CONTROL
+    if not is_thumb:
+      attachments.cache_etags(attachment, False)
+    else:
+      thumbnail = attachments.get_thumbnail(attachment)
+      attachments.cache_etags(attachment, True, thumbnail)
+      if thumbnail and thumbnail.variants:
+        accepted_mime_types = [
+            mime_type for mime_type, _ in self.request.accept_mimetypes]
+        selected = attachments.select_thumbnail_variant(
+            thumbnail, size_name, accepted_mime_types)
+        if not selected:
+          self.abort(404, msg='Thumbnail size not found')
+        mime_type, variant = selected
+        storage = blob_storage.get_blob_storage()
+        headers['Content-Type'] = mime_type
+        headers['Vary'] = 'Accept'
+        return self.serve_content(
+            variant['hash'], variant['size'],
+            lambda start, stop: storage.read_range(
+                variant['hash'], start,
+                variant['size'] if stop is None else stop),
+            headers)
+
+      if thumbnail and thumbnail.thumb_content:
+        thumb_content = thumbnail.thumb_content
         headers['Content-Type'] = 'image/png'
-        return thumbnail.thumb_content, headers
+        return self.serve_content(
+            blob_storage.compute_digest(thumb_content), len(thumb_content),
+            lambda start, stop: thumb_content[start:stop], headers)
+
+      cache_control = PENDING_THUMB_CACHE_CONTROL
 
     headers['Content-Type'] = attachment.mime_type
-    return attachment.content, headers
+    return self.serve_content(
+        attachments.get_attachment_hash(attachment),
+        attachments.get_attachment_size(attachment),
+        lambda start, stop: attachments.get_attachment_content(
+            attachment, start, stop),
+        headers, cache_control=cache_control)
+
+  def maybe_not_modified(
+      self, feature_id: int, attachment_id: int, thumb_size_name: str|None):
+    """Respond 304 to a conditional request without loading the attachment.
+
+    This only happens if the ETag that the client has is one that this URL
+    was recently served with.  Deleting the attachment clears those.
+    """
+    if not self.request.if_none_match:
+      return None
+    for content_hash in attachments.get_cached_etags(
+        feature_id, attachment_id, thumb_size_name):
+      if self.request.if_none_match.contains_weak(content_hash):
+        headers = self.get_headers()
+        headers['ETag'] = '"%s"' % content_hash
+        headers['Cache-Control'] = ATTACHMENT_CACHE_CONTROL
+        if thumb_size_name is not None:
+          headers['Vary'] = 'Accept'
+        return b'', 304, headers
+    return None
+
+  def serve_content(
+      self, content_hash: str, length: int,
+      get_content: Callable[[int, int|None], bytes|None],
+      headers: dict[str, str], cache_control=ATTACHMENT_CACHE_CONTROL):
+    """Respond with validators, honoring If-None-Match and Range headers."""
+    etag = '"%s"' % content_hash
+    headers['ETag'] = etag
+    headers['Cache-Control'] = cache_control
+    headers['Accept-Ranges'] = 'bytes'
+    if self.request.if_none_match.contains_weak(content_hash):
+      return b'', 304, headers
+
+    # A stale If-Range means the client must get the whole thing again.
+    byte_range = self.request.range
+    if_range = self.request.headers.get('If-Range')
+    if (byte_range and byte_range.units == 'bytes' and
+        len(byte_range.ranges) == 1 and (not if_range or if_range == etag)):
+      bounds = byte_range.range_for_length(length)
+      if bounds is None:
+        headers['Content-Range'] = 'bytes */%d' % length
+        return b'', 416, headers
+      start, stop = bounds
+      content = get_content(start, stop)
+      if content is None:
+        self.abort(404, msg='Attachment content not found')
+      headers['Content-Range'] = 'bytes %d-%d/%d' % (start, stop - 1, length)
+      return content, 206, headers
+
+    content = get_content(0, None)
+    if content is None:
+      self.abort(404, msg='Attachment content not found')
+    return content, headers
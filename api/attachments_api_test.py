@@ -23,9 +23,11 @@ import werkzeug.exceptions
 
 import settings
 from api import attachments_api
+from framework import rediscache
 from internals.core_enums import *
 from internals.core_models import FeatureEntry
 from internals import attachments
+from internals import blob_storage
 
 test_app = flask.Flask(__name__)
 test_app.secret_key ='test'
@@ -47,7 +49,9 @@ class AttachmentsAPITest(testing_config.CustomTestCase):
 
   def tearDown(self):
     testing_config.sign_out()
-    kinds: list[ndb.Model] = [FeatureEntry, attachments.Attachment]
+    kinds: list[ndb.Model] = [
+        FeatureEntry, attachments.Attachment, attachments.Thumbnail,
+        blob_storage.StoredBlob]
     for kind in kinds:
       for entity in kind.query():
         entity.key.delete()
@@ -126,10 +130,13 @@ class AttachmentServingTest(testing_config.CustomTestCase):
 
   def tearDown(self):
     testing_config.sign_out()
-    kinds: list[ndb.Model] = [FeatureEntry, attachments.Attachment]
+    kinds: list[ndb.Model] = [
+        FeatureEntry, attachments.Attachment, attachments.Thumbnail,
+        blob_storage.StoredBlob]
     for kind in kinds:
       for entity in kind.query():
         entity.key.delete()
+    rediscache.flushall()
 
   def test_maybe_redirect__expected_url(self):
     """Requesting an attachment from the canonical URL returns None."""
@@ -172,6 +179,156 @@ class AttachmentServingTest(testing_config.CustomTestCase):
 
     self.assertEqual(content, self.content)
     self.assertEqual(headers['Content-Type'], 'text/plain')
+    self.assertEqual(
+        headers['ETag'], '"%s"' % blob_storage.compute_digest(self.content))
+    self.assertEqual(
+        headers['Cache-Control'], attachments_api.ATTACHMENT_CACHE_CONTROL)
+    self.assertEqual(headers['Accept-Ranges'], 'bytes')
+
+  def test_get_template_data__not_modified(self):
+    """A matching If-None-Match gives a 304 with no content."""
+    base = settings.SITE_URL
+    etag = '"%s"' % blob_storage.compute_digest(self.content)
+    with test_app.test_request_context(
+        self.request_path, base_url=base, headers={'If-None-Match': etag}):
+      content, status, headers = self.handler.get_template_data(
+          feature_id=self.feature_id, attachment_id=self.attachment_id)
+
+    self.assertEqual(status, 304)
+    self.assertEqual(content, b'')
+    self.assertEqual(headers['ETag'], etag)
+
+  def test_get_template_data__not_modified_cached(self):
+    """A recently served ETag gives a 304 without loading the attachment."""
+    base = settings.SITE_URL
+    with test_app.test_request_context(self.request_path, base_url=base):
+      _, headers = self.handler.get_template_data(
+          feature_id=self.feature_id, attachment_id=self.attachment_id)
+
+    with mock.patch('internals.attachments.get_attachment') as mock_get:
+      with test_app.test_request_context(
+          self.request_path, base_url=base,
+          headers={'If-None-Match': headers['ETag']}):
+        content, status, not_modified_headers = (
+            self.handler.get_template_data(
+                feature_id=self.feature_id,
+                attachment_id=self.attachment_id))
+      mock_get.assert_not_called()
+
+    self.assertEqual(status, 304)
+    self.assertEqual(content, b'')
+    self.assertEqual(not_modified_headers['ETag'], headers['ETag'])
+
+    # The cached ETag is only used for the feature that owns the attachment.
+    with test_app.test_request_context(
+        self.request_path, base_url=base,
+        headers={'If-None-Match': headers['ETag']}):
+      with self.assertRaises(werkzeug.exceptions.NotFound):
+        self.handler.get_template_data(
+            feature_id=self.feature_id + 1, attachment_id=self.attachment_id)
+
+  def test_get_template_data__not_modified_deleted(self):
+    """Once an attachment is deleted, revalidating it gives a 404."""
+    base = settings.SITE_URL
+    with test_app.test_request_context(self.request_path, base_url=base):
+      _, headers = self.handler.get_template_data(
+          feature_id=self.feature_id, attachment_id=self.attachment_id)
+
+    attachments.mark_attachment_deleted(self.attachment)
+    with test_app.test_request_context(
+        self.request_path, base_url=base,
+        headers={'If-None-Match': headers['ETag']}):
+      with self.assertRaises(werkzeug.exceptions.NotFound):
+        self.handler.get_template_data(
+            feature_id=self.feature_id, attachment_id=self.attachment_id)
+
+  def test_get_template_data__range(self):
+    """A Range request gives part of the content."""
+    base = settings.SITE_URL
+    with test_app.test_request_context(
+        self.request_path, base_url=base, headers={'Range': 'bytes=4-6'}):
+      content, status, headers = self.handler.get_template_data(
+          feature_id=self.feature_id, attachment_id=self.attachment_id)
+
+    self.assertEqual(status, 206)
+    self.assertEqual(content, b'you')
+    self.assertEqual(
+        headers['Content-Range'], 'bytes 4-6/%d' % len(self.content))
+
+  def test_get_template_data__range_not_satisfiable(self):
+    """A Range past the end of the content gives a 416."""
+    base = settings.SITE_URL
+    with test_app.test_request_context(
+        self.request_path, base_url=base, headers={'Range': 'bytes=500-'}):
+      content, status, headers = self.handler.get_template_data(
+          feature_id=self.feature_id, attachment_id=self.attachment_id)
+
+    self.assertEqual(status, 416)
+    self.assertEqual(headers['Content-Range'], 'bytes */%d' % len(self.content))
+
+  def test_get_template_data__stale_if_range(self):
+    """When If-Range does not match, the whole content is sent."""
+    base = settings.SITE_URL
+    with test_app.test_request_context(
+        self.request_path, base_url=base,
+        headers={'Range': 'bytes=4-6', 'If-Range': '"stale"'}):
+      content, headers = self.handler.get_template_data(
+          feature_id=self.feature_id, attachment_id=self.attachment_id)
+
+    self.assertEqual(content, self.content)
+
+  def test_get_template_data__thumbnail_pending(self):
+    """Until there is a thumbnail, the attachment is briefly cached."""
+    base = settings.SITE_URL
+    with test_app.test_request_context(
+        self.request_path + '/thumbnail', base_url=base):
+      content, headers = self.handler.get_template_data(
+          feature_id=self.feature_id, attachment_id=self.attachment_id,
+          thumbnail=True)
+
+    self.assertEqual(content, self.content)
+    self.assertEqual(
+        headers['Cache-Control'], attachments_api.PENDING_THUMB_CACHE_CONTROL)
+
+  def test_get_template_data__thumbnail_variants(self):
+    """The thumbnail format is chosen by the Accept header."""
+    storage = blob_storage.get_blob_storage()
+    variants = {'medium': {}}
+    for mime_type, data in [('image/webp', b'webp'), ('image/png', b'png')]:
+      variants['medium'][mime_type] = {
+          'hash': storage.store(data), 'size': len(data)}
+    attachments.Thumbnail(
+        id=self.attachment_id, feature_id=self.feature_id,
+        attachment_id=self.attachment_id, variants=variants).put()
+
+    base = settings.SITE_URL
+    with test_app.test_request_context(
+        self.request_path + '/thumbnail', base_url=base,
+        headers={'Accept': 'image/webp,*/*'}):
+      content, headers = self.handler.get_template_data(
+          feature_id=self.feature_id, attachment_id=self.attachment_id,
+          thumbnail=True)
+    self.assertEqual(content, b'webp')
+    self.assertEqual(headers['Content-Type'], 'image/webp')
+    self.assertEqual(headers['Vary'], 'Accept')
+    self.assertEqual(
+        headers['Cache-Control'], attachments_api.ATTACHMENT_CACHE_CONTROL)
+
+    with test_app.test_request_context(
+        self.request_path + '/thumbnail', base_url=base,
+        headers={'Accept': '*/*'}):
+      content, headers = self.handler.get_template_data(
+          feature_id=self.feature_id, attachment_id=self.attachment_id,
+          thumbnail=True)
+    self.assertEqual(content, b'png')
+    self.assertEqual(headers['Content-Type'], 'image/png')
+
+    with test_app.test_request_context(
+        self.request_path + '/thumbnail?size=huge', base_url=base):
+      with self.assertRaises(werkzeug.exceptions.NotFound):
+        self.handler.get_template_data(
+            feature_id=self.feature_id, attachment_id=self.attachment_id,
+            thumbnail=True)
 
 
 class RoundTripTest(testing_config.CustomTestCase):
@@ -191,7 +348,9 @@ class RoundTripTest(testing_config.CustomTestCase):
 
   def tearDown(self):
     testing_config.sign_out()
-    kinds: list[ndb.Model] = [FeatureEntry, attachments.Attachment]
+    kinds: list[ndb.Model] = [
+        FeatureEntry, attachments.Attachment, attachments.Thumbnail,
+        blob_storage.StoredBlob]
     for kind in kinds:
       for entity in kind.query():
         entity.key.delete()
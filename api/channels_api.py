@@ -27,42 +27,44 @@ def construct_chrome_channels_details():
   omaha_data = fetchchannels.get_omaha_data()
   channels = {}
   win_versions = omaha_data[0]['versions']
-
-  for v in win_versions:
-    channel = v['channel']
-    major_version = int(v['version'].split('.')[0])
-    channels[channel] = fetchchannels.fetch_chrome_release_info(major_version)
+  major_versions = {
+      v['channel']: int(v['version'].split('.')[0]) for v in win_versions}
+  # Look up every milestone that might be displayed in one batch.
+  release_infos = fetchchannels.fetch_chrome_release_infos(sorted(
+      set(major_versions.values()) |
+      {m + 1 for m in major_versions.values()}))
+
+  for channel, major_version in major_versions.items():
+    channels[channel] = dict(release_infos[major_version])
     channels[channel]['version'] = major_version
 
   # Adjust for the brief period after next miletone gets promted to stable/beta
   # channel and their major versions are the same.
   if channels['stable']['version'] == channels['beta']['version']:
     new_beta_version = channels['stable']['version'] + 1
-    channels['beta'] = fetchchannels.fetch_chrome_release_info(new_beta_version)
+    channels['beta'] = dict(release_infos[new_beta_version])
     channels['beta']['version'] = new_beta_version
   if channels['beta']['version'] == channels['dev']['version']:
     new_dev_version = channels['beta']['version'] + 1
-    channels['dev'] = fetchchannels.fetch_chrome_release_info(new_dev_version)
+    if new_dev_version in release_infos:
+      channels['dev'] = dict(release_infos[new_dev_version])
+    else:
+      channels['dev'] = fetchchannels.fetch_chrome_release_info(new_dev_version)
     channels['dev']['version'] = new_dev_version
 
   # In the situation where some versions are in a gap between
   # stable and beta, show one as 'stable_soon'.
   if channels['stable']['version'] + 1 < channels['beta']['version']:
     stable_soon_version = channels['stable']['version'] + 1
-    channels['stable_soon'] = fetchchannels.fetch_chrome_release_info(stable_soon_version)
+    channels['stable_soon'] = dict(release_infos[stable_soon_version])
     channels['stable_soon']['version'] = stable_soon_version
 
   return channels
 
 
 def construct_specified_milestones_details(start, end):
-  channels = {}
   win_versions = list(range(start,end+1))
-
-  for milestone in win_versions:
-    channels[milestone] = fetchchannels.fetch_chrome_release_info(milestone)
-
-  return channels
+  return fetchchannels.fetch_chrome_release_infos(win_versions)
 
 
 class ChannelsAPI(basehandlers.APIHandler):
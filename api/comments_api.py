@@ -15,6 +15,7 @@
 
 from typing import Any
 
+from google.cloud import ndb  # type: ignore
 from chromestatus_openapi.models import (
   Activity as ActivityModel,
 )
@@ -32,6 +33,9 @@ from framework import basehandlers, permissions
 from internals import approval_defs, notifier, notifier_helpers, slo
 from internals.review_models import Activity, Amendment, Gate
 
+# Largest number of comments that a client can request in one page.
+MAX_COMMENTS_PAGE_SIZE = 500
+
 
 def amendment_to_OAM(amendment: Amendment) -> AmendmentModel:
   return AmendmentModel(
@@ -66,22 +70,41 @@ class CommentsAPI(basehandlers.APIHandler):
     """Check whether a comment should be visible to the user."""
     return comment.deleted_by is None or email == comment.deleted_by or is_admin
 
-  def do_get(self, **kwargs) -> dict[str, list[dict[str, Any]]]:
-    """Return a list of all review comments on the given feature."""
+  def do_get(self, **kwargs) -> dict[str, Any]:
+    """Return review comments on the given feature.
+
+    If the request has a limit or cursor query parameter, only one page
+    is returned, along with a next_cursor when there are more pages.
+    """
     feature_id = kwargs['feature_id']
     gate_id = kwargs.get('gate_id', None)
+    limit = self.get_int_arg('limit')
+    cursor = self.request.args.get('cursor')
+    if limit is not None and not 0 < limit <= MAX_COMMENTS_PAGE_SIZE:
+      self.abort(400, msg='Request parameter limit out of range: %r' % limit)
+
     # Note: We assume that anyone may view approval comments.
-    comments = Activity.get_activities(feature_id, gate_id)
+    next_cursor = None
+    if limit is None and not cursor:
+      comments = Activity.iter_activities(feature_id, gate_id)
+    else:
+      try:
+        comments, next_cursor = Activity.get_activities_page(
+            feature_id, gate_id, limit=limit or MAX_COMMENTS_PAGE_SIZE,
+            cursor=cursor)
+      except (ValueError, ndb.exceptions.BadValueError):
+        self.abort(400, msg='Invalid cursor')
     user = self.get_current_user()
     is_admin = permissions.can_admin_site(user)
 
     # Filter deleted comments the user can't see.
     user_email = user.email() if user else None
-    comments = list(filter(
-      lambda c: self._should_show_comment(c, user_email, is_admin), comments))
-
-    dicts = [activity_to_OAM(c) for c in comments]
-    return GetCommentsResponse(comments=dicts).to_dict()
+    dicts = [activity_to_OAM(c) for c in comments
+             if self._should_show_comment(c, user_email, is_admin)]
+    result = GetCommentsResponse(comments=dicts).to_dict()
+    if next_cursor:
+      result['next_cursor'] = next_cursor
+    return result
 
   def do_post(self, **kwargs) -> dict[str, str]:
     """Add a review comment and possibly set a approval value."""
@@ -17,6 +17,7 @@ from unittest import mock
 
 import flask
 import werkzeug.exceptions  # Flask HTTP stuff.
+from google.cloud import ndb  # type: ignore
 from chromestatus_openapi.models import (
   Amendment as AmendmentModel,
   Activity as ActivityModel,
@@ -191,6 +192,49 @@ class CommentsAPITest(testing_config.CustomTestCase):
     comment = resp['comments'][0]
     self.assertNotEqual(comment['content'], '[Deleted]')
 
+  def test_get__paginated(self):
+    """Clients can request comments one page at a time."""
+    testing_config.sign_in('user7@example.com', 123567890)
+    for i in range(3):
+      Activity(
+          feature_id=self.feature_id, gate_id=self.gate_1_id,
+          author='owner1@example.com',
+          created=NOW + datetime.timedelta(minutes=i),
+          content=f'comment {i}').put()
+
+    with test_app.test_request_context(self.request_path + '?limit=2'):
+      page_1 = self.handler.do_get(
+          feature_id=self.feature_id, gate_id=self.gate_1_id)
+    self.assertEqual(
+        ['comment 0', 'comment 1'],
+        [c['content'] for c in page_1['comments']])
+
+    next_path = '%s?limit=2&cursor=%s' % (
+        self.request_path, page_1['next_cursor'])
+    with test_app.test_request_context(next_path):
+      page_2 = self.handler.do_get(
+          feature_id=self.feature_id, gate_id=self.gate_1_id)
+    testing_config.sign_out()
+    self.assertEqual(['comment 2'], [c['content'] for c in page_2['comments']])
+    self.assertNotIn('next_cursor', page_2)
+
+  def test_get__bad_limit(self):
+    """Page sizes must be in range."""
+    with test_app.test_request_context(self.request_path + '?limit=0'):
+      with self.assertRaises(werkzeug.exceptions.BadRequest):
+        self.handler.do_get(feature_id=self.feature_id, gate_id=self.gate_1_id)
+    with test_app.test_request_context(self.request_path + '?limit=100000'):
+      with self.assertRaises(werkzeug.exceptions.BadRequest):
+        self.handler.do_get(feature_id=self.feature_id, gate_id=self.gate_1_id)
+
+  @mock.patch('internals.review_models.Activity.get_activities_page')
+  def test_get__bad_cursor(self, mock_get_page):
+    """A cursor that cannot be decoded is rejected."""
+    mock_get_page.side_effect = ndb.exceptions.BadValueError('bad cursor')
+    with test_app.test_request_context(self.request_path + '?cursor=bad'):
+      with self.assertRaises(werkzeug.exceptions.BadRequest):
+        self.handler.do_get(feature_id=self.feature_id, gate_id=self.gate_1_id)
+
   def test_post__feature_not_found(self):
     """Handler rejects requests that don't match an existing feature."""
     bad_path = '/api/v0/features/12345/approvals/1/comments'
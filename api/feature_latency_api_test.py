@@ -22,6 +22,8 @@ import werkzeug.exceptions  # Flask HTTP stuff.
 from google.cloud import ndb  # type: ignore
 
 from api import feature_latency_api
+from internals import fetchchannels
+from internals import stage_helpers
 from internals.core_enums import *
 from internals.core_models import FeatureEntry, Stage, MilestoneSet
 from internals import user_models
@@ -40,9 +42,19 @@ def make_feature(name, created_tuple, status, shipped):
         feature_id=fe.key.integer_id(), stage_type=STAGE_BLINK_SHIPPING,
         milestones=MilestoneSet(desktop_first=shipped))
     s.put()
+    stage_helpers.update_first_ship_milestone(fe, [s])
+    fe.put()
   return fe, fe.key.integer_id()
 
 
+def make_milestone_schedule(milestone, branch_tuple):
+  branch_point = datetime(*branch_tuple)
+  fetchchannels.MilestoneSchedule(
+      id=milestone, branch_point=branch_point,
+      details={'mstone': milestone,
+               'branch_point': branch_point.isoformat()}).put()
+
+
 class FeatureLatencyAPITest(testing_config.CustomTestCase):
 
   def setUp(self):
@@ -67,11 +79,15 @@ class FeatureLatencyAPITest(testing_config.CustomTestCase):
     self.fe_4.put()
     self.fe_5, self.fe_5_id = make_feature(
         'launched after end', (2023, 9, 29), ENABLED_BY_DEFAULT, 125)
+    make_milestone_schedule(108, (2022, 10, 24))
+    make_milestone_schedule(119, (2023, 10, 2))
+    make_milestone_schedule(125, (2024, 4, 15))
 
   def tearDown(self):
     testing_config.sign_out()
     self.app_admin.key.delete()
-    kinds: list[ndb.Model] = [FeatureEntry, Stage]
+    kinds: list[ndb.Model] = [
+        FeatureEntry, Stage, fetchchannels.MilestoneSchedule]
     for kind in kinds:
       for entity in kind.query():
         entity.key.delete()
@@ -131,3 +147,14 @@ class FeatureLatencyAPITest(testing_config.CustomTestCase):
       actual = self.handler.do_get()
 
     self.assertEqual(0, len(actual))
+
+  def test_do_get__no_schedule_fetches(self):
+    """Release schedules are read from NDB rather than fetched."""
+    testing_config.sign_in('admin@example.com', 123567890)
+    path = self.request_path + '?startAt=2023-01-01&endAt=2024-01-01'
+    with mock.patch('framework.http_client.get') as mock_get:
+      with test_app.test_request_context(path):
+        actual = self.handler.do_get()
+
+    mock_get.assert_not_called()
+    self.assertEqual([self.fe_3_id], [r['feature']['id'] for r in actual])
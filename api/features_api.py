@@ -32,7 +32,6 @@ from internals.core_models import FeatureEntry, MilestoneSet, Stage
 from internals.data_types import CHANGED_FIELDS_LIST_TYPE
 from internals import feature_links
 from internals import notifier_helpers
-from internals.review_models import Gate
 from internals.data_types import VerboseFeatureDict
 from internals import feature_helpers
 from internals import search
@@ -146,42 +145,19 @@ class FeaturesAPI(basehandlers.EntitiesAPIHandler):
     elif needs_default_first_notification_milestone(new_fields=body):
       fields_dict['first_enterprise_notification_milestone'] = get_default_first_notice_milestone_for_feature()
 
-    # Try to create the feature using the provided data.
+    # Try to create the feature, its stages and its gates using the
+    # provided data.
     try:
       feature = FeatureEntry(**fields_dict,
                              creator_email=self.get_current_user().email())
-      feature.put()
+      stage_helpers.write_new_feature(feature)
     except Exception as e:
       self.abort(400, msg=str(e))
     id = feature.key.integer_id()
 
-    self._write_stages_and_gates_for_feature(id, feature.feature_type)
     return {'message': f'Feature {id} created.',
             'feature_id': id}
 
-  def _write_stages_and_gates_for_feature(
-      self, feature_id: int, feature_type: int) -> None:
-    """Write each Stage and Gate entity for newly created feature."""
-    # Obtain a list of stages and gates for the given feature type.
-    stages_gates = STAGES_AND_GATES_BY_FEATURE_TYPE[feature_type]
-
-    for stage_type, gate_types in stages_gates:
-      # Don't create a trial extension stage pre-emptively.
-      if stage_type == STAGE_TYPES_EXTEND_ORIGIN_TRIAL[feature_type]:
-        continue
-
-      stage = Stage(feature_id=feature_id, stage_type=stage_type)
-      stage.put()
-      new_gates: list[Gate] = []
-      # Stages can have zero or more gates.
-      for gate_type in gate_types:
-        gate = Gate(feature_id=feature_id, stage_id=stage.key.integer_id(),
-                    gate_type=gate_type, state=Gate.PREPARING)
-        new_gates.append(gate)
-
-      if new_gates:
-        ndb.put_multi(new_gates)
-
   def _patch_update_stages(
       self,
       stage_changes_list: list[dict[str, Any]],
@@ -189,13 +165,19 @@ class FeaturesAPI(basehandlers.EntitiesAPIHandler):
     ) -> list[Stage]:
     """Update stage fields with changes provided in the PATCH request."""
     stages_to_store: list[Stage] = []
+    # Check that valid IDs are provided and fetch all the stages at once.
     for change_info in stage_changes_list:
-      stage_was_updated = False
-      # Check if valid ID is provided and fetch stage if it exists.
       if 'id' not in change_info:
         self.abort(400, msg='Missing stage ID in stage updates')
+    stage_ids = list(dict.fromkeys(
+        change_info['id'] for change_info in stage_changes_list))
+    stages_by_id: dict[Any, Stage | None] = dict(zip(
+        stage_ids, ndb.get_multi([ndb.Key(Stage, id) for id in stage_ids])))
+
+    for change_info in stage_changes_list:
+      stage_was_updated = False
       id = change_info['id']
-      stage = Stage.get_by_id(id)
+      stage = stages_by_id[id]
       if not stage:
         self.abort(400, msg=f'Stage not found for ID {id}')
 
@@ -295,6 +277,12 @@ class FeaturesAPI(basehandlers.EntitiesAPIHandler):
             feature.shipping_year = year
             has_updated = True
 
+    # Keep the first ship milestone used by feature latency reports current.
+    if any(us.stage_type in stage_helpers.FIRST_SHIP_STAGE_TYPES
+           for us in updated_stages):
+      if stage_helpers.update_first_ship_milestone(feature, updated_stages):
+        has_updated = True
+
     # If any stages were mentioned, update active_stage_id.
     if stage_ids:
       stage_type_to_stage_ids = stage_helpers.get_feature_stage_ids(feature_id)
@@ -17,6 +17,7 @@ import testing_config  # Must be imported before the module under test.
 
 import flask
 from unittest import mock
+from google.cloud import ndb  # type: ignore
 import werkzeug.exceptions  # Flask HTTP stuff.
 
 from api import features_api
@@ -24,6 +25,7 @@ from internals import core_enums
 from internals.core_models import FeatureEntry, MilestoneSet, Stage
 from internals.review_models import Gate
 from internals import user_models
+from framework import datastore_profiler
 from framework import rediscache
 
 test_app = flask.Flask(__name__)
@@ -34,6 +36,7 @@ CHANNEL_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
 def _datetime_to_str(dt):
   return datetime.strftime(dt, CHANNEL_DATETIME_FORMAT)
 
+
 class FeaturesAPITestDelete(testing_config.CustomTestCase):
 
   def setUp(self):
@@ -577,6 +580,53 @@ class FeaturesAPITest(testing_config.CustomTestCase):
     self.assertIsNotNone(self.feature_1.updated)
     self.assertEqual(self.feature_1.updater_email, 'admin@example.com')
 
+  def test_patch__stage_changes_fetched_together(self):
+    """All stages in a PATCH are fetched with one datastore lookup."""
+    testing_config.sign_in('admin@example.com', 123567890)
+    ot_stage = Stage(feature_id=self.feature_1_id, stage_type=150)
+    ot_stage.put()
+    ot_stage_id = ot_stage.key.integer_id()
+    new_intent_url = 'https://example.com/intent'
+    valid_request_body = {
+      'feature_changes': {
+        'id': self.feature_1_id,
+      },
+      'stages': [
+        {
+          'id': self.ship_stage_1_id,
+          'intent_thread_url': {
+            'form_field_name': 'shipped_milestone',
+            'value': new_intent_url,
+          },
+        },
+        {
+          'id': ot_stage_id,
+          'intent_thread_url': {
+            'form_field_name': 'ot_milestone_desktop_start',
+            'value': new_intent_url,
+          },
+        },
+      ],
+    }
+    ndb.get_context().clear_cache()
+
+    request_path = f'{self.request_path}/update'
+    # Updating a feature must not make RPCs per changed stage or field.
+    with datastore_profiler.assert_max_rpcs(30) as prof:
+      with test_app.test_request_context(
+          request_path, json=valid_request_body):
+        self.handler.do_patch()
+
+    stage_lookups = [
+        rpc.request for rpc in prof.rpcs
+        if rpc.name == 'lookup' and 'Stage' in rpc.kinds]
+    self.assertEqual(1, len(stage_lookups))
+    self.assertCountEqual(
+        [self.ship_stage_1_id, ot_stage_id],
+        [key.path[-1].id for key in stage_lookups[0].keys])
+    self.assertEqual(
+        new_intent_url, Stage.get_by_id(ot_stage_id).intent_thread_url)
+
   def test_patch__milestone_changes(self):
     """Valid PATCH updates milestone fields on stage entities."""
     # Signed-in user with permissions.
@@ -1032,6 +1082,38 @@ class FeaturesAPITest(testing_config.CustomTestCase):
     self.assertEqual(len(stages), 6)
     self.assertEqual(len(gates), 11)
 
+  def test_post__single_commit(self):
+    """The feature, stages, and gates are written in one commit."""
+    testing_config.sign_in('admin@example.com', 123567890)
+    valid_request_body = {
+      'name': 'A name',
+      'summary': 'A summary',
+      'owner_emails': 'user@example.com',
+      'category': 2,
+      'feature_type': 0,
+      'impl_status_chrome': 3,
+      'standard_maturity': 2,
+      'ff_views': 1,
+      'safari_views': 1,
+      'web_dev_views': 1,
+    }
+
+    request_path = f'{self.request_path}/create'
+    # Creating a feature must not make RPCs per stage or gate.
+    with datastore_profiler.assert_max_rpcs(15) as prof:
+      with test_app.test_request_context(
+          request_path, json=valid_request_body):
+        response = self.handler.do_post()
+
+    # One ID reservation each for the feature, its stages, and its gates.
+    self.assertEqual(3, prof.count('allocateids'))
+    self.assertEqual(1, prof.count('commit'))
+    feature_id = response['feature_id']
+    self.assertEqual(
+        6, Stage.query(Stage.feature_id == feature_id).count())
+    self.assertEqual(
+        11, Gate.query(Gate.feature_id == feature_id).count())
+
   def test_post__no_permissions(self):
     """403 Forbidden if the user does not have feature create access."""
     testing_config.sign_in('someuser@example.com', 123567890)
@@ -13,7 +13,6 @@
 # limitations under the License.
 
 import collections
-import logging
 from datetime import datetime, timedelta
 from typing import Iterable, Any
 from google.cloud import ndb  # type: ignore
@@ -27,19 +26,42 @@ from framework import permissions
 from internals import slo
 from internals.core_enums import *
 from internals.core_models import FeatureEntry
-from internals.review_models import Gate
+from internals.review_models import FeatureGateLatencies, GateLatencyRecord
 
 
 DEFAULT_RECENT_DAYS = 90
 # This means that the feature team has not yet requested this review.
-NOT_STARTED_LATENCY = -1
+NOT_STARTED_LATENCY = slo.NOT_STARTED_LATENCY
 # This means that the feature team is still waiting for an initial response.
-PENDING_LATENCY = -2
+PENDING_LATENCY = slo.PENDING_LATENCY
 
 
 class ReviewLatencyAPI(basehandlers.APIHandler):
   """Implements the OpenAPI /spec_mentors path."""
 
+  def get_date_range(
+      self, request_args: dict[str, str], today: datetime | None = None
+  ) -> tuple[datetime, datetime | None]:
+    """Parse optional start and end dates from query-string params."""
+    today = today or datetime.today()
+    start_date = today - timedelta(days=DEFAULT_RECENT_DAYS)
+    start_param: str | None = request_args.get('startAt')
+    if start_param:
+      try:
+        start_date = datetime.fromisoformat(start_param)
+      except ValueError:
+        self.abort(400, f'invalid ?startAt parameter {start_param}')
+
+    end_date = None
+    end_param: str | None = request_args.get('endAt')
+    if end_param:
+      try:
+        end_date = datetime.fromisoformat(end_param)
+      except ValueError:
+        self.abort(400, f'invalid ?endAt parameter {end_param}')
+
+    return start_date, end_date
+
   @permissions.require_create_feature
   def do_get(self, **kwargs):
     """Get a list of matching spec mentors.
@@ -48,83 +70,69 @@ class ReviewLatencyAPI(basehandlers.APIHandler):
       A list of data on all public origin trials.
     """
     today = kwargs.get('today')
-    gates = self.get_recently_reviewed_gates(DEFAULT_RECENT_DAYS, today=today)
-    gates_by_fid = self.organize_gates_by_feature_id(gates)
-    for fid, feature_gates in gates_by_fid.items():
-      logging.info('feautre %r:', fid)
-      for fg in feature_gates:
-        logging.info('  %r', fg)
-    features = self.get_features_by_id(gates_by_fid.keys())
-    features = self.sort_features_by_request(features, gates_by_fid)
+    start_date, end_date = self.get_date_range(self.request.args, today=today)
+    records = self.get_recently_reviewed_records(start_date, end_date)
+    records_by_fid = self.organize_records_by_feature_id(records)
+    features = self.get_features_by_id(records_by_fid.keys())
+    features = self.sort_features_by_request(features, records_by_fid)
     latencies_by_fid = {
-        fid: self.latencies_for_feature(feature_gates)
-        for fid, feature_gates in gates_by_fid.items()}
+        fid: self.latencies_for_feature(feature_records)
+        for fid, feature_records in records_by_fid.items()}
     result = self.convert_to_result_format(
         latencies_by_fid, features)
     return result
 
-  def get_recently_reviewed_gates(
-      self, days:int, today:datetime|None = None
-  ) -> list[Gate]:
-    """Retrieve a list of Gates responded to in recent days."""
-    today = today or datetime.today()
-    start_date = today - timedelta(days=90)
-    gates_in_range = Gate.query(
-        Gate.requested_on >= start_date).fetch()
-    feature_ids = {g.feature_id for g in gates_in_range}
-    if not feature_ids:
-      return []
-    gates_on_those_features = Gate.query(
-        Gate.feature_id.IN(feature_ids)).fetch()
-    return gates_on_those_features
-
-  def organize_gates_by_feature_id(
-      self, gates: list[Gate]
-  ) -> dict[int, list[Gate]]:
-    """Return a dict of feature IDs and a list of gates for each feature."""
-    gates_by_fid: dict[int, list[Gate]] = collections.defaultdict(list)
-    for g in gates:
-      gates_by_fid[g.feature_id].append(g)
-    return gates_by_fid
+  def get_recently_reviewed_records(
+      self, start_date: datetime, end_date: datetime | None = None
+  ) -> list[GateLatencyRecord]:
+    """Retrieve latency records of all gates on features that had a review
+       requested in the given date range."""
+    records_in_range = GateLatencyRecord.get_requested_in_range(
+        start_date, end_date)
+    feature_ids = sorted({r.feature_id for r in records_in_range})
+    return FeatureGateLatencies.get_records(feature_ids)
+
+  def organize_records_by_feature_id(
+      self, records: list[GateLatencyRecord]
+  ) -> dict[int, list[GateLatencyRecord]]:
+    """Return a dict of feature IDs and a list of records for each feature."""
+    records_by_fid: dict[int, list[GateLatencyRecord]] = (
+        collections.defaultdict(list))
+    for r in records:
+      records_by_fid[r.feature_id].append(r)
+    return records_by_fid
 
   def get_features_by_id(
-      self, feature_ids: Iterable[int]) -> dict[int, FeatureEntry]:
-    """Retrieve features by ID and return them in a dict."""
-    if not feature_ids:
-      return {}  # We cannot pass an empty list to IN().
-    query = FeatureEntry.query(FeatureEntry.key.IN(
-        [ndb.Key('FeatureEntry', id) for id in feature_ids]))
-    features = query.fetch()
-    return features
-
-  def earliest_request(self, feature_gates: list[Gate]) -> datetime:
+      self, feature_ids: Iterable[int]) -> list[FeatureEntry]:
+    """Retrieve the existing features with the given IDs."""
+    keys = [ndb.Key('FeatureEntry', id) for id in feature_ids]
+    if not keys:
+      return []
+    features = ndb.get_multi(keys)
+    return [fe for fe in features if fe is not None]
+
+  def earliest_request(
+      self, feature_records: list[GateLatencyRecord]) -> datetime:
     """Return the time of the earliest reivew request among the given gates."""
-    if not feature_gates:
+    if not feature_records:
       raise ValueError('There should be some gates for every feature')
     request_dates = [
-        g.requested_on for g in feature_gates
-        if g.requested_on]
+        r.requested_on for r in feature_records
+        if r.requested_on]
     return min(request_dates, default=datetime(2000, 1, 1))
 
-  def sort_features_by_request(self, features, gates_by_fid):
+  def sort_features_by_request(self, features, records_by_fid):
     """Return the same features sorted by the earliest review request of each."""
     sorted_features = sorted(
         features,
-        key=lambda fe: self.earliest_request(gates_by_fid[fe.key.integer_id()]))
+        key=lambda fe: self.earliest_request(
+            records_by_fid[fe.key.integer_id()]))
     return sorted_features
 
-  def latency(self, gate: Gate) -> int:
-    """Return the number of weekdays that the review was pending."""
-    if not gate.requested_on:
-      return NOT_STARTED_LATENCY
-    if not gate.responded_on:
-      return PENDING_LATENCY
-    return slo.weekdays_between(gate.requested_on, gate.responded_on)
-
   def latencies_for_feature(
-      self, feature_gates: list[Gate]) -> list[tuple[int, int]]:
-    """Compute the review latency for each gate on a feature."""
-    pairs = [(g.gate_type, self.latency(g)) for g in feature_gates]
+      self, feature_records: list[GateLatencyRecord]) -> list[tuple[int, int]]:
+    """Return the precomputed review latency for each gate on a feature."""
+    pairs = [(r.gate_type, r.latency_days) for r in feature_records]
     pairs = sorted(pairs)  # Sort by gate_type for non-flaky testing.
     return pairs
 
@@ -23,7 +23,9 @@ from google.cloud import ndb  # type: ignore
 from api import review_latency_api
 from internals.core_enums import *
 from internals.core_models import FeatureEntry
-from internals.review_models import Gate
+from internals.review_models import (
+    DailyReviewLatency, FeatureGateLatencies, Gate, GateLatencyRecord)
+from internals import slo
 from internals import user_models
 
 
@@ -64,14 +66,23 @@ class ReviewLatencyAPITest(testing_config.CustomTestCase):
   def tearDown(self):
     testing_config.sign_out()
     self.app_admin.key.delete()
-    kinds: list[ndb.Model] = [FeatureEntry, Gate]
+    kinds: list[ndb.Model] = [
+        FeatureEntry, Gate, GateLatencyRecord, FeatureGateLatencies,
+        DailyReviewLatency]
     for kind in kinds:
       for entity in kind.query():
         entity.key.delete()
 
+  def write_latency_records(self):
+    """Precompute latency records as gate creation and votes would."""
+    for gate in [self.g_1_1, self.g_1_2, self.g_1_3,
+                 self.g_2_1, self.g_2_2, self.g_2_3]:
+      slo.update_latency_record(gate)
+
   def test_do_get__nothing_requested(self):
     """When no reviews have been started, the result is empty."""
     testing_config.sign_in('admin@example.com', 123567890)
+    self.write_latency_records()
     with test_app.test_request_context(self.request_path):
       actual = self.handler.do_get(today=self.today)
     self.assertEqual([], actual)
@@ -98,6 +109,7 @@ class ReviewLatencyAPITest(testing_config.CustomTestCase):
     self.g_1_1.put()
     self.g_1_2.requested_on = self.last_week
     self.g_1_2.put()
+    self.write_latency_records()
 
     with test_app.test_request_context(self.request_path):
       actual = self.handler.do_get(today=self.today)
@@ -128,6 +140,7 @@ class ReviewLatencyAPITest(testing_config.CustomTestCase):
     self.g_2_1.requested_on = self.last_week
     self.g_2_1.responded_on = self.yesterday
     self.g_2_1.put()
+    self.write_latency_records()
 
     with test_app.test_request_context(self.request_path):
       actual = self.handler.do_get(today=self.today)
@@ -155,3 +168,28 @@ class ReviewLatencyAPITest(testing_config.CustomTestCase):
          },
     ]
     self.assertEqual(expected, actual)
+
+  def test_do_get__date_range(self):
+    """Only features with a review requested in the given range are listed."""
+    testing_config.sign_in('admin@example.com', 123567890)
+    self.g_1_1.requested_on = self.yesterday
+    self.g_1_1.responded_on = self.today
+    self.g_1_1.put()
+    self.g_2_1.requested_on = self.last_week
+    self.g_2_1.put()
+    self.write_latency_records()
+
+    path = self.request_path + '?startAt=2024-03-14&endAt=2024-03-16'
+    with test_app.test_request_context(path):
+      actual = self.handler.do_get(today=self.today)
+
+    self.assertEqual(
+        [self.fe_2_id], [r['feature']['id'] for r in actual])
+
+  def test_do_get__bad_date(self):
+    """An unparsable date range is rejected."""
+    testing_config.sign_in('admin@example.com', 123567890)
+    path = self.request_path + '?startAt=someday'
+    with test_app.test_request_context(path):
+      with self.assertRaises(werkzeug.exceptions.BadRequest):
+        self.handler.do_get(today=self.today)
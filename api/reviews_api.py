@@ -19,15 +19,16 @@ from typing import Any, Tuple
 
 from chromestatus_openapi.models import (GetVotesResponse, GetGateResponse, PatchGateRequest, SuccessMessage)
 from google.cloud import ndb
-from google.cloud.ndb.tasklets import Future  # for type checking only
 
 from api import converters
 from framework import basehandlers, permissions
 from framework.users import User
-from internals import approval_defs, notifier_helpers, self_certify
+from internals import (
+    approval_defs, notifier_helpers, pending_gates, self_certify)
 from internals.core_enums import *
 from internals.core_models import FeatureEntry, Stage
-from internals.review_models import Gate, Vote, Amendment, Activity
+from internals.review_models import (
+    Gate, GateLatencyRecord, Vote, Amendment, Activity)
 
 
 def get_user_feature_and_gate(handler, kwargs) -> Tuple[
@@ -66,9 +67,8 @@ class VotesAPI(basehandlers.APIHandler):
         self, kwargs)
     new_state = self.get_int_param('state', validator=Vote.is_valid_state)
 
-    old_votes = Vote.get_votes(
-        feature_id=feature_id, gate_id=gate_id, set_by=user.email())
-    old_state = old_votes[0].state if old_votes else Vote.NO_RESPONSE
+    old_vote = Vote.make_key(gate_id, user.email()).get()
+    old_state = old_vote.state if old_vote else Vote.NO_RESPONSE
     self.require_permissions(user, fe, gate, new_state)
     self.check_voting_rules(gate, new_state)
 
@@ -171,6 +171,7 @@ class GatesAPI(basehandlers.APIHandler):
         self, kwargs)
     request = PatchGateRequest.from_dict(self.request.json)
     changes: list[str] = []
+    changed_fields: list[str] = []
     new_assignees = request.assignees
     new_answers = request.survey_answers
 
@@ -183,14 +184,18 @@ class GatesAPI(basehandlers.APIHandler):
       notifier_helpers.notify_assignees(
           fe, gate, user.email(), old_assignees, new_assignees)
       changes.append('assignees')
+      changed_fields.append('assignee_emails')
 
     if new_answers is not None:
       self_certify.update_survey_answers(gate, new_answers)
       # Note: these changes don't generate notifications or activities.
       changes.append('answers')
+      changed_fields.append('survey_answers')
 
-    if changes:
-      gate.put()
+    if changed_fields:
+      approval_defs.put_gate_fields(gate, changed_fields)
+    if new_assignees is not None:
+      pending_gates.update_gate(gate)
 
     # Callers don't use the JSON response for this API call.
     message = 'Changed: %s' % (', '.join(changes) or None)
@@ -217,44 +222,26 @@ class GatesAPI(basehandlers.APIHandler):
 
 class PendingGatesAPI(basehandlers.APIHandler):
 
-  def get_stage_ids_of_gates_pending_my_approval(self) -> list[int] | Future:
-    """Return a list of stage_id needing approval by current user."""
+  def do_get(self, **kwargs):
+    """Return a list of gates on features that have some active gates."""
     user = self.get_current_user()
     if not user:
-      return []
-
+      return GetGateResponse.from_dict({'gates': []}).to_dict()
     approvable_gate_types = approval_defs.fields_approvable_by(user)
     if not approvable_gate_types:
       logging.info('User has no approvable_gate_types')
-      return []
-    query = Gate.query(
-        Gate.state.IN(Gate.PENDING_STATES),
-        Gate.gate_type.IN(approvable_gate_types))
-    future_stage_ids = query.fetch_async(projection=['stage_id'])
-    return future_stage_ids
-
-  def do_get(self, **kwargs):
-    """Return a list of gates on features that have some active gates."""
-    # 1. Get the feature IDs of any active gates.  Also, prefetch approvers.
-    future_projections = self.get_stage_ids_of_gates_pending_my_approval()
-    prefetched_approvers = {
-        gate_type: approval_defs.get_approvers(gate_type)
-        for gate_type in approval_defs.APPROVAL_FIELDS_BY_ID}
-    if type(future_projections) == list:
-      stage_ids = set(future_projections)
-    else:
-      projections = future_projections.get_result()
-      stage_ids = set(proj.stage_id for proj in projections)
-    if not stage_ids:
       return GetGateResponse.from_dict({'gates': []}).to_dict()
 
-    # 2. Fetch all the gates on those stages.
-    gates: list[Gate] = Gate.query(Gate.stage_id.IN(stage_ids)).fetch()
+    # 1. Look up the gates on stages with pending gates in the index.
+    gates = pending_gates.get_gates_on_pending_stages(approvable_gate_types)
 
-    # 3. Convert to dicts and add possible assignees.
+    # 2. Convert to dicts and add possible assignees.
+    approvers_by_type = {
+        gate_type: approval_defs.get_approvers(gate_type)
+        for gate_type in {g.gate_type for g in gates}}
     dicts = [converters.gate_value_to_json_dict(g) for g in gates]
     for g in dicts:
-      g['possible_assignee_emails'] = prefetched_approvers.get(g['gate_type'], [])
+      g['possible_assignee_emails'] = approvers_by_type.get(g['gate_type'], [])
 
     return GetGateResponse.from_dict({'gates': dicts}).to_dict()
 
@@ -311,6 +298,12 @@ class XfnGatesAPI(basehandlers.APIHandler):
         new_gates.append(gate)
 
     ndb.put_multi(new_gates)
+    if new_gates:
+      # The review latency report lists gates that have not been started.
+      GateLatencyRecord.put_records(
+          [GateLatencyRecord.make_not_started(g) for g in new_gates])
+      # Reviewers of pending gates on this stage should see the new gates.
+      pending_gates.update_stage(stage_id)
     num_new = len(new_gates)
     logging.info(f'Created {num_new} gates')
     return num_new
@@ -21,10 +21,15 @@ import werkzeug.exceptions  # Flask HTTP stuff.
 from google.cloud import ndb  # type: ignore
 
 from api import reviews_api
+from framework import datastore_profiler
+from framework import rediscache
 from internals import approval_defs
+from internals import pending_gates
 from internals.core_enums import *
 from internals import core_models
-from internals.review_models import Gate, Vote, SurveyAnswers
+from internals.review_models import (
+    FeatureGateLatencies, Gate, GateLatencyRecord, PendingGateIndex, Vote,
+    SurveyAnswers)
 
 test_app = flask.Flask(__name__)
 
@@ -226,9 +231,11 @@ class VotesAPITest(testing_config.CustomTestCase):
     mock_get_approvers.return_value = ['reviewer1@example.com']
     testing_config.sign_in('reviewer1@example.com', 123567890)
     params = {'state': Vote.NEEDS_WORK}
-    with test_app.test_request_context(self.request_path, json=params):
-      actual = self.handler.do_post(
-          feature_id=self.feature_id, gate_id=self.gate_1_id)
+    ndb.get_context().clear_cache()
+    with datastore_profiler.assert_max_rpcs(30):
+      with test_app.test_request_context(self.request_path, json=params):
+        actual = self.handler.do_post(
+            feature_id=self.feature_id, gate_id=self.gate_1_id)
 
     self.assertEqual(actual, {'message': 'Done'})
     updated_votes = Vote.get_votes(feature_id=self.feature_id)
@@ -452,6 +459,63 @@ class GatesAPITest(testing_config.CustomTestCase):
     self.assertEqual(1, len(actual['gates']))
 
 
+class PendingGatesAPITest(testing_config.CustomTestCase):
+
+  def setUp(self):
+    self.features = []
+    for n in range(3):
+      fe = core_models.FeatureEntry(
+          name=f'feature {n}', summary='sum', category=1,
+          owner_emails=['owner1@example.com'])
+      fe.put()
+      self.features.append(fe)
+      stage_id = 100 + n
+      Gate(feature_id=fe.key.integer_id(), stage_id=stage_id, gate_type=1,
+           state=Vote.REVIEW_REQUESTED).put()
+      Gate(feature_id=fe.key.integer_id(), stage_id=stage_id, gate_type=2,
+           state=Vote.NA).put()
+    pending_gates.rebuild_all([1, 2])
+
+    self.handler = reviews_api.PendingGatesAPI()
+    self.request_path = '/api/v0/gates/pending'
+
+  def tearDown(self):
+    testing_config.sign_out()
+    kinds: list[ndb.Model] = [
+        core_models.FeatureEntry, Gate, PendingGateIndex]
+    for kind in kinds:
+      for entity in kind.query():
+        entity.key.delete()
+    rediscache.flushall()
+
+  def test_do_get__anon(self):
+    """Anon users have no pending gates to review."""
+    testing_config.sign_out()
+    with test_app.test_request_context(self.request_path):
+      actual = self.handler.do_get()
+    self.assertEqual({'gates': []}, actual)
+
+  @mock.patch('internals.approval_defs.get_approvers')
+  @mock.patch('internals.approval_defs.fields_approvable_by')
+  def test_do_get__rpc_budget(self, mock_approvable, mock_get_approvers):
+    """Gates on all pending stages are loaded in a fixed number of RPCs."""
+    mock_approvable.return_value = {1, 2}
+    mock_get_approvers.return_value = ['reviewer1@example.com']
+    testing_config.sign_in('reviewer1@example.com', 123567890)
+    ndb.get_context().clear_cache()
+
+    # At most one lookup of the index and one of the gates, however many
+    # gates there are.
+    with datastore_profiler.assert_max_rpcs(3):
+      with test_app.test_request_context(self.request_path):
+        actual = self.handler.do_get()
+
+    self.assertEqual(6, len(actual['gates']))
+    self.assertEqual(
+        ['reviewer1@example.com'],
+        actual['gates'][0]['possible_assignee_emails'])
+
+
 class XfnGatesAPITest(testing_config.CustomTestCase):
 
   def setUp(self):
@@ -477,7 +541,8 @@ class XfnGatesAPITest(testing_config.CustomTestCase):
 
   def tearDown(self):
     self.feature_1.key.delete()
-    kinds: list[ndb.Model] = [Gate, Vote]
+    kinds: list[ndb.Model] = [
+        Gate, GateLatencyRecord, FeatureGateLatencies, Vote]
     for kind in kinds:
       for entity in kind.query():
         entity.key.delete()
@@ -551,3 +616,7 @@ class XfnGatesAPITest(testing_config.CustomTestCase):
     actual_gates_dict = Gate.get_feature_gates(self.feature_id)
     self.assertCountEqual(
         actual_gates_dict.keys(), ALL_SHIPPING_GATE_TYPES)
+    records = FeatureGateLatencies.get_records([self.feature_id])
+    self.assertEqual(5, len(records))
+    self.assertTrue(all(
+        r.latency_days == GateLatencyRecord.NOT_STARTED for r in records))
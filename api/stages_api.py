@@ -24,28 +24,23 @@ from internals import notifier_helpers
 from internals import stage_helpers
 from internals.core_models import FeatureEntry, Stage
 from internals.data_types import CHANGED_FIELDS_LIST_TYPE
-from internals.review_models import Gate
 
 
 class StagesAPI(basehandlers.EntitiesAPIHandler):
 
-  def _create_gate_for_stage(
-      self, feature_id: int, stage_id: int, gate_type: int) -> None:
-    """Create a Gate entity for the given stage type."""
-    gate = Gate(feature_id=feature_id, stage_id=stage_id, gate_type=gate_type,
-        state=Gate.PREPARING)
-    gate.put()
-
   def _create_stage(self, feature_id: int, feature_type: int, stage_type: int):
-    """Create a new Stage entity."""
-    stage = Stage(feature_id=feature_id, stage_type=stage_type)
-    stage.put()
-    gate_type: int | None = stage_helpers.get_gate_for_stage(
-        feature_type, stage.stage_type)
-    if gate_type is not None:
-        self._create_gate_for_stage(
-        stage.feature_id, stage.key.integer_id(), gate_type)
-    return stage
+    """Create a new Stage entity, and a Gate entity if the stage needs one."""
+    return stage_helpers.create_feature_stage(
+        feature_id, feature_type, stage_type)
+
+  def _update_first_ship_milestone(
+      self, feature: FeatureEntry | None, stage: Stage) -> None:
+    """Keep the feature's first ship milestone consistent with the stage."""
+    if (feature is None or
+        stage.stage_type not in stage_helpers.FIRST_SHIP_STAGE_TYPES):
+      return
+    if stage_helpers.update_first_ship_milestone(feature, [stage]):
+      feature.put()
 
   def do_get(self, **kwargs):
     """Return a specified stage based on the given ID."""
@@ -93,6 +88,7 @@ class StagesAPI(basehandlers.EntitiesAPIHandler):
     # Add the specified field values to the stage. Create a gate if needed.
     stage = self._create_stage(feature_id, feature.feature_type, stage_type)
     self.update_stage(stage, body, [])
+    self._update_first_ship_milestone(feature, stage)
 
     # Changing stage values means the cached feature should be invalidated.
     lookup_key = FeatureEntry.feature_cache_key(
@@ -118,6 +114,7 @@ class StagesAPI(basehandlers.EntitiesAPIHandler):
     changed_fields: CHANGED_FIELDS_LIST_TYPE = []
     # Update specified fields.
     self.update_stage(stage, body, changed_fields)
+    self._update_first_ship_milestone(feature, stage)
 
     notifier_helpers.notify_subscribers_and_save_amendments(
         feature, changed_fields, notify=True)
@@ -141,5 +138,8 @@ class StagesAPI(basehandlers.EntitiesAPIHandler):
 
     stage.archived = True
     stage.put()
+    if stage.stage_type in stage_helpers.FIRST_SHIP_STAGE_TYPES:
+      self._update_first_ship_milestone(
+          FeatureEntry.get_by_id(stage.feature_id), stage)
 
     return {'message': 'Stage archived.'}
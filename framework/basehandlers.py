@@ -30,6 +30,7 @@ from google.cloud import ndb  # type: ignore
 import settings
 from api import api_specs
 from framework import csp
+from framework import datastore_profiler
 from framework import permissions
 from framework import secrets
 from framework import users
@@ -743,7 +744,12 @@ def ndb_wsgi_middleware(wsgi_app):
 
   def middleware(environ, start_response):
     with client.context():
-      return wsgi_app(environ, start_response)
+      if not settings.PROFILE_DATASTORE_RPCS:
+        return wsgi_app(environ, start_response)
+      with datastore_profiler.profile() as prof:
+        response = wsgi_app(environ, start_response)
+      prof.log_summary(environ.get('PATH_INFO', ''))
+      return response
 
   return middleware
 
@@ -0,0 +1,236 @@
+# Copyright 2025 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License")
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Record the datastore RPCs made while handling a request or running a test.
+
+Every ndb operation ends up calling _datastore_api.make_call(), so that
+function is wrapped to record each RPC with its kinds, query filter,
+latency, result count, and the line of our code that caused it.  When
+settings.PROFILE_DATASTORE_RPCS is on, as in development, the request
+middleware logs a summary of each request's RPCs, including any identical
+lookups or queries that were repeated and could have been cached.
+Tests can use assert_max_rpcs() to keep a handler within a budget of RPCs.
+"""
+
+import collections
+import contextlib
+import contextvars
+import functools
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Iterator
+
+from google.cloud.ndb import _datastore_api  # type: ignore
+
+
+# RPCs that read data, which are the ones that could have been cached.
+READ_RPC_NAMES = ('lookup', 'runquery')
+# The maximum number of repeated RPCs that are logged for one request.
+MAX_LOGGED_REPEATS = 10
+
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+_THIS_FILE = os.path.realpath(__file__)
+
+
+@dataclass
+class DatastoreRPC:
+  """One call to the datastore API."""
+  name: str
+  kinds: list[str]
+  filters: str
+  caller: str
+  request: Any
+  signature: bytes
+  start: float
+  latency_ms: float | None = None
+  result_count: int | None = None
+
+  def on_done(self, future) -> None:
+    self.latency_ms = (time.perf_counter() - self.start) * 1000
+    if future.exception() is None:
+      self.result_count = _count_results(self.name, future.result())
+
+  def __str__(self) -> str:
+    text = f'{self.name} {",".join(self.kinds)}'
+    if self.filters:
+      text += f' [{self.filters}]'
+    if self.result_count is not None:
+      text += f' -> {self.result_count}'
+    if self.latency_ms is not None:
+      text += f' in {self.latency_ms:.1f} ms'
+    return f'{text} from {self.caller}'
+
+
+class Profile:
+  """The RPCs recorded while a profile() block is active."""
+
+  def __init__(self):
+    self.rpcs: list[DatastoreRPC] = []
+
+  @property
+  def names(self) -> list[str]:
+    return [rpc.name for rpc in self.rpcs]
+
+  def count(self, name: str | None = None) -> int:
+    """Return the number of RPCs, or of RPCs with the given name."""
+    return len([rpc for rpc in self.rpcs if name in (None, rpc.name)])
+
+  def get_repeats(self) -> list[tuple[DatastoreRPC, int]]:
+    """Return the first of each identical read RPC and its repeat count."""
+    counts: collections.Counter = collections.Counter()
+    first_rpcs: dict[tuple[str, bytes], DatastoreRPC] = {}
+    for rpc in self.rpcs:
+      if rpc.name in READ_RPC_NAMES:
+        signature = (rpc.name, rpc.signature)
+        counts[signature] += 1
+        first_rpcs.setdefault(signature, rpc)
+    return [(first_rpcs[sig], count) for sig, count in counts.items()
+            if count > 1]
+
+  def summarize(self) -> str:
+    counts = collections.Counter(self.names)
+    total_ms = sum(rpc.latency_ms or 0.0 for rpc in self.rpcs)
+    by_name = ', '.join(
+        f'{count} {name}' for name, count in sorted(counts.items()))
+    return f'{len(self.rpcs)} datastore RPCs ({by_name}) in {total_ms:.1f} ms'
+
+  def format_rpcs(self) -> str:
+    return '\n'.join(str(rpc) for rpc in self.rpcs)
+
+  def log_summary(self, label: str) -> None:
+    """Log the RPC counts and flag repeated reads that could be cached."""
+    if not self.rpcs:
+      return
+    logging.info('%s: %s', label, self.summarize())
+    repeats = self.get_repeats()
+    for rpc, count in repeats[:MAX_LOGGED_REPEATS]:
+      logging.warning(
+          '%s: identical RPC made %d times, first: %s', label, count, rpc)
+
+
+_active_profiles: contextvars.ContextVar[tuple[Profile, ...]] = (
+    contextvars.ContextVar('datastore_profiles', default=()))
+_real_make_call = None
+
+
+def _count_results(name: str, response: Any) -> int | None:
+  if name == 'runquery':
+    return len(response.batch.entity_results)
+  if name == 'lookup':
+    return len(response.found)
+  if name == 'commit':
+    return len(response.mutation_results)
+  if name == 'allocateids':
+    return len(response.keys)
+  return None
+
+
+def _get_kinds(name: str, request: Any) -> list[str]:
+  if name == 'runquery':
+    return [kind.name for kind in request.query.kind]
+  keys = []
+  if name in ('lookup', 'allocateids', 'reserveids'):
+    keys = list(request.keys)
+  elif name == 'commit':
+    for mutation in request.mutations:
+      operation = mutation.WhichOneof('operation')
+      target = getattr(mutation, operation)
+      keys.append(target if operation == 'delete' else target.key)
+  return sorted({key.path[-1].kind for key in keys if key.path})
+
+
+def _get_filters(name: str, request: Any) -> str:
+  if name != 'runquery':
+    return ''
+  return ' '.join(str(request.query.filter).split())
+
+
+@functools.lru_cache(maxsize=None)
+def _get_own_path(co_filename: str) -> str | None:
+  """Return the repo-relative path of a file of our own code, or None."""
+  filename = os.path.realpath(co_filename)
+  if (filename.startswith(_REPO_ROOT) and filename != _THIS_FILE and
+      'site-packages' not in filename):
+    return os.path.relpath(filename, _REPO_ROOT)
+  return None
+
+
+def _find_caller() -> str:
+  """Return the innermost frame of our own code on the stack."""
+  frame = sys._getframe(1)
+  while frame:
+    path = _get_own_path(frame.f_code.co_filename)
+    if path:
+      return '%s:%d %s' % (path, frame.f_lineno, frame.f_code.co_name)
+    frame = frame.f_back  # type: ignore
+  return 'unknown'
+
+
+def _make_rpc(rpc_name: str, request: Any) -> DatastoreRPC:
+  # RPC names are spelled differently in different ndb versions, and newer
+  # versions wrap the protobuf messages.
+  name = rpc_name.replace('_', '').lower()
+  pb = getattr(request, '_pb', request)
+  # Only reads are compared for repeats, so only they need a signature.
+  signature = pb.SerializeToString() if name in READ_RPC_NAMES else b''
+  return DatastoreRPC(
+      name=name, kinds=_get_kinds(name, pb), filters=_get_filters(name, pb),
+      caller=_find_caller(), request=request,
+      signature=signature, start=time.perf_counter())
+
+
+def _profiled_make_call(rpc_name, request, *args, **kwargs):
+  profiles = _active_profiles.get()
+  if not profiles:
+    return _real_make_call(rpc_name, request, *args, **kwargs)
+
+  rpc = _make_rpc(rpc_name, request)
+  for prof in profiles:
+    prof.rpcs.append(rpc)
+  future = _real_make_call(rpc_name, request, *args, **kwargs)
+  future.add_done_callback(rpc.on_done)
+  return future
+
+
+def _install() -> None:
+  global _real_make_call
+  if _real_make_call is None:
+    _real_make_call = _datastore_api.make_call
+    _datastore_api.make_call = _profiled_make_call
+
+
+@contextlib.contextmanager
+def profile() -> Iterator[Profile]:
+  """Yield a Profile that records the datastore RPCs made in the block."""
+  _install()
+  prof = Profile()
+  token = _active_profiles.set(_active_profiles.get() + (prof,))
+  try:
+    yield prof
+  finally:
+    _active_profiles.reset(token)
+
+
+@contextlib.contextmanager
+def assert_max_rpcs(max_rpcs: int) -> Iterator[Profile]:
+  """Fail if the block makes more than max_rpcs datastore RPCs."""
+  with profile() as prof:
+    yield prof
+  if len(prof.rpcs) > max_rpcs:
+    raise AssertionError(
+        f'{prof.summarize()}, more than the budget of {max_rpcs}:\n' +
+        prof.format_rpcs())
@@ -0,0 +1,108 @@
+# Copyright 2025 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License")
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import testing_config  # Must be imported before the module under test.
+
+from google.cloud import ndb  # type: ignore
+
+from framework import datastore_profiler
+
+
+class ProfiledThing(ndb.Model):
+  number = ndb.IntegerProperty()
+
+
+class DatastoreProfilerTest(testing_config.CustomTestCase):
+
+  def setUp(self):
+    self.thing = ProfiledThing(number=1)
+    self.thing.put()
+    ndb.get_context().clear_cache()
+
+  def tearDown(self):
+    for thing in ProfiledThing.query():
+      thing.key.delete()
+
+  def test_profile__records_rpcs(self):
+    """Each RPC is recorded with its kind, results, and caller."""
+    with datastore_profiler.profile() as prof:
+      ProfiledThing(number=2).put()
+      self.thing.key.get()
+      ProfiledThing.query(ProfiledThing.number == 1).fetch()
+
+    self.assertEqual(['commit', 'lookup', 'runquery'], prof.names)
+    for rpc in prof.rpcs:
+      self.assertEqual(['ProfiledThing'], rpc.kinds)
+      self.assertEqual(1, rpc.result_count)
+      self.assertIsNotNone(rpc.latency_ms)
+      self.assertTrue(
+          rpc.caller.startswith('framework/datastore_profiler_test.py:'))
+    self.assertIn('number', prof.rpcs[2].filters)
+    self.assertEqual(1, prof.count('lookup'))
+    self.assertEqual(3, prof.count())
+    # Only reads are compared for repeats, so writes are not serialized.
+    self.assertEqual(b'', prof.rpcs[0].signature)
+    self.assertNotEqual(b'', prof.rpcs[1].signature)
+
+  def test_profile__only_inside_block(self):
+    """RPCs are recorded by every active profile and only while active."""
+    with datastore_profiler.profile() as outer:
+      self.thing.key.get()
+      with datastore_profiler.profile() as inner:
+        ProfiledThing.query().fetch()
+    ProfiledThing.query().fetch()
+
+    self.assertEqual(['lookup', 'runquery'], outer.names)
+    self.assertEqual(['runquery'], inner.names)
+
+  def test_get_repeats(self):
+    """Identical reads are flagged, but different ones are not."""
+    with datastore_profiler.profile() as prof:
+      ProfiledThing.query(ProfiledThing.number == 1).fetch()
+      ProfiledThing.query(ProfiledThing.number == 2).fetch()
+      ProfiledThing.query(ProfiledThing.number == 1).fetch()
+
+    repeats = prof.get_repeats()
+    self.assertEqual(1, len(repeats))
+    rpc, count = repeats[0]
+    self.assertEqual(2, count)
+    self.assertIs(prof.rpcs[0], rpc)
+
+  def test_log_summary(self):
+    """The summary counts RPCs by name and warns about repeats."""
+    with datastore_profiler.profile() as prof:
+      ProfiledThing.query().fetch()
+      ProfiledThing.query().fetch()
+
+    with self.assertLogs(level='INFO') as logs:
+      prof.log_summary('/some/path')
+
+    self.assertIn('/some/path: 2 datastore RPCs (2 runquery)', logs.output[0])
+    self.assertIn('identical RPC made 2 times', logs.output[1])
+
+  def test_assert_max_rpcs__within_budget(self):
+    """A block that stays within its budget passes."""
+    with datastore_profiler.assert_max_rpcs(1):
+      self.thing.key.get()
+
+  def test_assert_max_rpcs__over_budget(self):
+    """A block that makes too many RPCs fails and lists them."""
+    with self.assertRaises(AssertionError) as cm:
+      with datastore_profiler.assert_max_rpcs(1):
+        self.thing.key.get()
+        ProfiledThing.query().fetch()
+
+    message = str(cm.exception)
+    self.assertIn('more than the budget of 1', message)
+    self.assertIn('runquery ProfiledThing', message)
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+# Copyright 2025 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License")
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Shared client for all outbound HTTP requests made by the app.
+
+Every request goes through one requests.Session so that TCP and TLS
+connections to each upstream host are pooled and kept alive across
+requests and threads.  The client also applies a default timeout, retries
+idempotent requests on transient failures, caps the number of concurrent
+requests to any one host, and keeps simple per-host metrics for the most
+recently used hosts.
+"""
+
+import collections
+import contextlib
+import email.utils
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+import requests
+from requests import adapters
+
+
+# (connect timeout, read timeout) used when a caller does not give one.
+DEFAULT_TIMEOUT = (3.05, 30)
+# Number of distinct hosts to keep connection pools for.
+POOL_CONNECTIONS = 16
+# Maximum number of keep-alive connections to keep for each host.
+POOL_MAXSIZE = 10
+# Maximum number of requests in flight to any one host.
+MAX_CONCURRENT_PER_HOST = 10
+# Number of hosts to keep concurrency limits and metrics for.  Idle hosts
+# that were least recently used are forgotten first.
+MAX_TRACKED_HOSTS = 100
+
+# Retries are only automatic for methods that are safe to repeat.
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+DEFAULT_RETRIES = 2
+RETRY_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+BACKOFF_BASE = 0.5  # seconds
+BACKOFF_CAP = 8.0  # seconds
+# Servers can say how long to wait with a Retry-After header.  If they ask
+# for longer than this, the response is returned instead of retrying.
+RETRY_AFTER_STATUS_CODES = frozenset([429, 503])
+MAX_RETRY_AFTER = 30.0  # seconds
+
+
+@dataclass
+class HostMetrics:
+  """Counters for the requests made to one host."""
+  requests: int = 0
+  errors: int = 0
+  retries: int = 0
+  total_latency: float = 0.0
+
+  def to_dict(self) -> dict:
+    avg_latency = (
+        self.total_latency / self.requests if self.requests else 0.0)
+    return {
+        'requests': self.requests,
+        'errors': self.errors,
+        'retries': self.retries,
+        'avg_latency': avg_latency,
+        }
+
+
+@dataclass
+class _HostState:
+  """The concurrency limit and metrics of one host."""
+  semaphore: threading.BoundedSemaphore = field(
+      default_factory=lambda: threading.BoundedSemaphore(
+          MAX_CONCURRENT_PER_HOST))
+  metrics: HostMetrics = field(default_factory=HostMetrics)
+  in_flight: int = 0
+
+
+def _make_session() -> requests.Session:
+  session = requests.Session()
+  adapter = adapters.HTTPAdapter(
+      pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+  session.mount('https://', adapter)
+  session.mount('http://', adapter)
+  return session
+
+
+_session = _make_session()
+_lock = threading.Lock()
+# Ordered from least to most recently used.
+_hosts: collections.OrderedDict[str, _HostState] = collections.OrderedDict()
+
+
+def _get_host_state(host: str) -> _HostState:
+  """Return the state of a host.  The caller must hold _lock."""
+  state = _hosts.get(host)
+  if state is not None:
+    _hosts.move_to_end(host)
+    return state
+
+  state = _hosts[host] = _HostState()
+  # Hosts with requests in flight are kept so that their limit holds.
+  for old_host in list(_hosts):
+    if len(_hosts) <= MAX_TRACKED_HOSTS:
+      break
+    if old_host != host and _hosts[old_host].in_flight == 0:
+      del _hosts[old_host]
+  return state
+
+
+@contextlib.contextmanager
+def _host_slot(host: str):
+  """Wait until fewer than MAX_CONCURRENT_PER_HOST requests are in flight."""
+  with _lock:
+    state = _get_host_state(host)
+    state.in_flight += 1
+  try:
+    with state.semaphore:
+      yield
+  finally:
+    with _lock:
+      state.in_flight -= 1
+
+
+def _record(
+    host: str, latency: float, is_error: bool, is_retry: bool) -> None:
+  with _lock:
+    metrics = _get_host_state(host).metrics
+    metrics.requests += 1
+    metrics.total_latency += latency
+    if is_error:
+      metrics.errors += 1
+    if is_retry:
+      metrics.retries += 1
+
+
+def backoff_delay(attempt: int) -> float:
+  """Return how long to wait before retry number attempt + 1."""
+  ceiling = min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt))
+  # Full jitter avoids synchronized retries from many instances.
+  return random.uniform(0, ceiling)
+
+
+def parse_retry_after(value: str | None) -> float | None:
+  """Return the seconds to wait that a Retry-After header asks for."""
+  if not value:
+    return None
+  value = value.strip()
+  if value.isdigit():
+    return float(value)
+  try:
+    retry_time = email.utils.parsedate_to_datetime(value)
+  except (TypeError, ValueError):
+    return None
+  if retry_time.tzinfo is None:
+    retry_time = retry_time.replace(tzinfo=timezone.utc)
+  return max(0.0, (retry_time - datetime.now(timezone.utc)).total_seconds())
+
+
+def request(
+    method: str, url: str, timeout=DEFAULT_TIMEOUT,
+    retries: int | None = None, **kwargs) -> requests.Response:
+  """Send an HTTP request using the shared session.
+
+  Other keyword arguments are passed through to requests.Session.request().
+  If retries is not given, idempotent methods are retried DEFAULT_RETRIES
+  times on connection errors and retryable status codes, and other methods
+  are not retried.  A Retry-After header on a 429 or 503 is honored, unless
+  it asks for more than MAX_RETRY_AFTER seconds.  The final response is
+  returned even if its status code is an error, and the final exception is
+  re-raised.
+  """
+  method = method.upper()
+  if retries is None:
+    retries = DEFAULT_RETRIES if method in IDEMPOTENT_METHODS else 0
+  host = urlparse(url).netloc
+  attempt = 0
+  while True:
+    start = time.monotonic()
+    delay = backoff_delay(attempt)
+    try:
+      with _host_slot(host):
+        response = _session.request(method, url, timeout=timeout, **kwargs)
+    except requests.RequestException as e:
+      _record(host, time.monotonic() - start, True, attempt > 0)
+      if attempt >= retries:
+        raise
+      logging.info('Retrying %s %s after %r', method, url, e)
+    else:
+      is_retryable = response.status_code in RETRY_STATUS_CODES
+      _record(host, time.monotonic() - start, is_retryable, attempt > 0)
+      if not is_retryable or attempt >= retries:
+        return response
+      if response.status_code in RETRY_AFTER_STATUS_CODES:
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        if retry_after is not None and retry_after > MAX_RETRY_AFTER:
+          logging.info(
+              'Not retrying %s %s, server asked to wait %.0f sec',
+              method, url, retry_after)
+          return response
+        if retry_after is not None:
+          delay = max(delay, retry_after)
+      logging.info(
+          'Retrying %s %s after status %d', method, url, response.status_code)
+    time.sleep(delay)
+    attempt += 1
+
+
+def get(url: str, **kwargs) -> requests.Response:
+  """Send a GET request, see request()."""
+  return request('GET', url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+  """Send a POST request, see request()."""
+  return request('POST', url, **kwargs)
+
+
+def _get_pool_stats() -> dict[str, tuple[int, int]]:
+  """Return (connections opened, requests sent) for each pooled host."""
+  stats: dict[str, tuple[int, int]] = {}
+  for adapter in set(_session.adapters.values()):
+    pools = adapter.poolmanager.pools
+    for pool_key in pools.keys():
+      pool = pools.get(pool_key)
+      if pool is None:
+        continue
+      host = pool.host if pool.port in (None, 80, 443) else (
+          '%s:%s' % (pool.host, pool.port))
+      opened, sent = stats.get(host, (0, 0))
+      stats[host] = (opened + pool.num_connections, sent + pool.num_requests)
+  return stats
+
+
+def get_metrics() -> dict[str, dict]:
+  """Return a dict of request metrics for each host that was contacted.
+
+  The reuse_ratio is the fraction of requests that were sent over an
+  already open connection rather than a new one.
+  """
+  with _lock:
+    result = {host: state.metrics.to_dict()
+              for host, state in _hosts.items()}
+  for host, (opened, sent) in _get_pool_stats().items():
+    if host in result and sent:
+      result[host]['reuse_ratio'] = max(0.0, 1.0 - opened / sent)
+  return result
+
+
+def reset_metrics() -> None:
+  """Clear all metrics.  Used by tests."""
+  with _lock:
+    _hosts.clear()
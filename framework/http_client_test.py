@@ -0,0 +1,194 @@
+# Copyright 2025 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License")
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import testing_config  # Must be imported before the module under test.
+
+from unittest import mock
+
+import requests
+
+from framework import http_client
+
+
+class HttpClientTest(testing_config.CustomTestCase):
+
+  def setUp(self):
+    http_client.reset_metrics()
+    self.url = 'https://example.com/path'
+
+  def tearDown(self):
+    http_client.reset_metrics()
+
+  @mock.patch('framework.http_client._session.request')
+  def test_get__default_timeout(self, mock_request):
+    """GET requests use the shared session and the default timeout."""
+    mock_request.return_value = testing_config.Blank(status_code=200)
+
+    actual = http_client.get(self.url, params={'a': 1})
+
+    self.assertEqual(200, actual.status_code)
+    mock_request.assert_called_once_with(
+        'GET', self.url, timeout=http_client.DEFAULT_TIMEOUT,
+        params={'a': 1})
+
+  @mock.patch('framework.http_client._session.request')
+  def test_get__explicit_timeout(self, mock_request):
+    """Callers can give their own timeout."""
+    mock_request.return_value = testing_config.Blank(status_code=200)
+
+    http_client.get(self.url, timeout=5)
+
+    mock_request.assert_called_once_with('GET', self.url, timeout=5)
+
+  @mock.patch('time.sleep')
+  @mock.patch('framework.http_client._session.request')
+  def test_get__retries_server_errors(self, mock_request, mock_sleep):
+    """Idempotent requests are retried when the server has a hiccup."""
+    mock_request.side_effect = [
+        testing_config.Blank(status_code=503, headers={}),
+        testing_config.Blank(status_code=200),
+        ]
+
+    actual = http_client.get(self.url)
+
+    self.assertEqual(200, actual.status_code)
+    self.assertEqual(2, mock_request.call_count)
+    mock_sleep.assert_called_once()
+    metrics = http_client.get_metrics()['example.com']
+    self.assertEqual(2, metrics['requests'])
+    self.assertEqual(1, metrics['errors'])
+    self.assertEqual(1, metrics['retries'])
+
+  @mock.patch('time.sleep')
+  @mock.patch('framework.http_client._session.request')
+  def test_get__gives_up(self, mock_request, mock_sleep):
+    """After the retries are used up, the last response is returned."""
+    mock_request.return_value = testing_config.Blank(status_code=500)
+
+    actual = http_client.get(self.url)
+
+    self.assertEqual(500, actual.status_code)
+    self.assertEqual(
+        http_client.DEFAULT_RETRIES + 1, mock_request.call_count)
+    self.assertEqual(http_client.DEFAULT_RETRIES, mock_sleep.call_count)
+
+  @mock.patch('time.sleep')
+  @mock.patch('framework.http_client._session.request')
+  def test_get__connection_error(self, mock_request, mock_sleep):
+    """Connection errors are retried and then re-raised."""
+    mock_request.side_effect = requests.exceptions.ConnectionError('down')
+
+    with self.assertRaises(requests.exceptions.ConnectionError):
+      http_client.get(self.url)
+
+    self.assertEqual(
+        http_client.DEFAULT_RETRIES + 1, mock_request.call_count)
+
+  @mock.patch('time.sleep')
+  @mock.patch('framework.http_client._session.request')
+  def test_post__not_retried(self, mock_request, mock_sleep):
+    """POST requests are not retried unless the caller asks."""
+    mock_request.return_value = testing_config.Blank(
+        status_code=503, headers={})
+
+    actual = http_client.post(self.url, json={'a': 1})
+
+    self.assertEqual(503, actual.status_code)
+    mock_request.assert_called_once_with(
+        'POST', self.url, timeout=http_client.DEFAULT_TIMEOUT, json={'a': 1})
+    mock_sleep.assert_not_called()
+
+  @mock.patch('time.sleep')
+  @mock.patch('framework.http_client._session.request')
+  def test_post__retries_requested(self, mock_request, mock_sleep):
+    """A caller can opt in to retrying a POST."""
+    mock_request.side_effect = [
+        testing_config.Blank(status_code=429, headers={}),
+        testing_config.Blank(status_code=200),
+        ]
+
+    actual = http_client.post(self.url, retries=1)
+
+    self.assertEqual(200, actual.status_code)
+    self.assertEqual(2, mock_request.call_count)
+
+  @mock.patch('time.sleep')
+  @mock.patch('framework.http_client._session.request')
+  def test_get__retry_after(self, mock_request, mock_sleep):
+    """A 429 is retried after the time that the server asks for."""
+    mock_request.side_effect = [
+        testing_config.Blank(status_code=429, headers={'Retry-After': '12'}),
+        testing_config.Blank(status_code=200),
+        ]
+
+    actual = http_client.get(self.url)
+
+    self.assertEqual(200, actual.status_code)
+    mock_sleep.assert_called_once_with(12.0)
+
+  @mock.patch('time.sleep')
+  @mock.patch('framework.http_client._session.request')
+  def test_get__retry_after_too_long(self, mock_request, mock_sleep):
+    """If the server asks to wait too long, the 429 is returned."""
+    mock_request.return_value = testing_config.Blank(
+        status_code=429, headers={'Retry-After': '3600'})
+
+    actual = http_client.get(self.url)
+
+    self.assertEqual(429, actual.status_code)
+    mock_request.assert_called_once()
+    mock_sleep.assert_not_called()
+
+  def test_parse_retry_after(self):
+    """Retry-After can be a number of seconds or an HTTP date."""
+    self.assertIsNone(http_client.parse_retry_after(None))
+    self.assertIsNone(http_client.parse_retry_after('soon'))
+    self.assertEqual(120.0, http_client.parse_retry_after(' 120 '))
+    self.assertEqual(
+        0.0, http_client.parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'))
+
+  @mock.patch('framework.http_client.MAX_TRACKED_HOSTS', 2)
+  @mock.patch('framework.http_client._session.request')
+  def test_get__tracked_hosts_bounded(self, mock_request):
+    """Only the most recently used hosts are tracked."""
+    mock_request.return_value = testing_config.Blank(status_code=200)
+
+    http_client.get('https://a.example.com/')
+    http_client.get('https://b.example.com/')
+    http_client.get('https://a.example.com/')
+    http_client.get('https://c.example.com/')
+
+    self.assertEqual(
+        ['a.example.com', 'c.example.com'],
+        sorted(http_client.get_metrics()))
+
+  @mock.patch('framework.http_client._session.request')
+  def test_get__client_error_not_retried(self, mock_request):
+    """A 404 is not a transient failure, so it is returned right away."""
+    mock_request.return_value = testing_config.Blank(status_code=404)
+
+    actual = http_client.get(self.url)
+
+    self.assertEqual(404, actual.status_code)
+    mock_request.assert_called_once()
+    self.assertEqual(0, http_client.get_metrics()['example.com']['errors'])
+
+  def test_backoff_delay(self):
+    """Delays grow exponentially but never exceed the cap."""
+    for attempt in range(10):
+      delay = http_client.backoff_delay(attempt)
+      self.assertGreaterEqual(delay, 0)
+      self.assertLessEqual(
+          delay,
+          min(http_client.BACKOFF_CAP, http_client.BACKOFF_BASE * 2 ** attempt))
@@ -18,9 +18,11 @@ from google.auth.transport.requests import Request
 from dataclasses import asdict
 from datetime import datetime, timezone
 import logging
+import threading
 from typing import Any, NotRequired, TypedDict
 import requests
 
+from framework import http_client
 from framework import secrets
 from framework import utils
 from internals.core_enums import BlinkHistogramID
@@ -29,6 +31,18 @@ from internals.data_types import OriginTrialInfo
 import settings
 
 
+# Deadline for each request to the origin trials API, (connect, read).
+OT_API_TIMEOUT = (10, 60)
+# Requests that are safe to repeat are retried with exponential backoff
+# on connection errors and 429/5xx responses.  Creating and setting up a
+# trial are not safe to repeat, because a request that timed out may have
+# succeeded, so those are never retried.
+OT_API_RETRIES = 3
+
+_credentials_lock = threading.Lock()
+_credentials: Any = None
+
+
 class UseCounterConfig(TypedDict):
   bucket_number: int
   histogram_id: str
@@ -94,7 +108,7 @@ def get_trials_list() -> list[dict[str, Any]]:
     return []
 
   try:
-    response = requests.get(
+    response = http_client.get(
         f'{settings.OT_API_URL}/v1/trials',
         params={'prettyPrint': 'false', 'key': key})
     response.raise_for_status()
@@ -140,15 +154,35 @@ def _get_ot_access_token() -> str:
   """Obtain the service account credentials to be used in the request
   using the origin trials auth scope
 
+  The credentials are kept for the life of the instance and the token is
+  only refreshed when it is missing or about to expire.
+
   Returns:
     The access token to be used for origin trials requests.
   """
-  credentials, _ = google.auth.default(scopes=[
-      'https://www.googleapis.com/auth/chromeorigintrials'])
-  credentials.refresh(Request())
-  if credentials.token is None:
-    return ''
-  return credentials.token
+  global _credentials
+  with _credentials_lock:
+    if _credentials is None:
+      _credentials, _ = google.auth.default(scopes=[
+          'https://www.googleapis.com/auth/chromeorigintrials'])
+    if not _credentials.valid:
+      _credentials.refresh(Request())
+    if _credentials.token is None:
+      return ''
+    return _credentials.token
+
+
+def _clear_credentials() -> None:
+  """Forget the cached credentials.  Used by tests."""
+  global _credentials
+  with _credentials_lock:
+    _credentials = None
+
+
+def _get_error_text(e: requests.exceptions.RequestException) -> str:
+  if e.response is not None:
+    return e.response.text
+  return str(e)
 
 
 def _send_create_trial_request(
@@ -206,16 +240,18 @@ def _send_create_trial_request(
   headers = {'Authorization': f'Bearer {access_token}'}
   url = f'{settings.OT_API_URL}/v1/trials:initialize'
 
-  # Retry the request a number of times if any issues arise.
   try:
-    response = requests.post(
-        url, headers=headers, params={'key': api_key}, json=json)
+    # Not retried, because a retry could create a second trial.
+    response = http_client.post(
+        url, headers=headers, params={'key': api_key}, json=json,
+        timeout=OT_API_TIMEOUT, retries=0)
     logging.info(f'CreateTrial response text: {response.text}')
     response.raise_for_status()
-  except requests.exceptions.RequestException:
+  except requests.exceptions.RequestException as e:
+    error_text = _get_error_text(e)
     logging.exception(
-        f'Failed to get response from origin trials API. {response.text}')
-    return None, response.text
+        f'Failed to get response from origin trials API. {error_text}')
+    return None, error_text
   response_json = response.json()
   return response_json['trial']['id'], None
 
@@ -245,18 +281,20 @@ def _send_set_up_trial_request(
   headers = {'Authorization': f'Bearer {access_token}'}
   url = f'{settings.OT_API_URL}/v1/trials/{trial_id}:setup'
   try:
-    response = requests.post(
+    response = http_client.post(
         url,
         headers=headers,
         params={'key': api_key},
         json=json,
-        timeout=(10, 60))
+        timeout=OT_API_TIMEOUT,
+        retries=0)
     logging.info(f'SetUpTrial response text: {response.text}')
     response.raise_for_status()
-  except requests.exceptions.RequestException:
+  except requests.exceptions.RequestException as e:
+    error_text = _get_error_text(e)
     logging.exception(
-        f'Failed to get response from origin trials API. {response.text}')
-    return response.text
+        f'Failed to get response from origin trials API. {error_text}')
+    return error_text
   return None
 
 
@@ -330,13 +368,15 @@ def activate_origin_trial(origin_trial_id: str) -> None:
   headers = {'Authorization': f'Bearer {access_token}'}
   url = (f'{settings.OT_API_URL}/v1/trials/{origin_trial_id}:start')
   try:
-    response = requests.post(
-        url, headers=headers, params={'key': key}, json=json)
+    # Starting a trial is safe to repeat.
+    response = http_client.post(
+        url, headers=headers, params={'key': key}, json=json,
+        timeout=OT_API_TIMEOUT, retries=OT_API_RETRIES)
     logging.info(response.text)
     response.raise_for_status()
   except requests.exceptions.RequestException as e:
     logging.exception(
-        f'Failed to get response from origin trials API. {response.text}')
+        f'Failed to get response from origin trials API. {_get_error_text(e)}')
     raise e
 
 
@@ -370,7 +410,7 @@ def extend_origin_trial(trial_id: str, end_milestone: int, intent_url: str):
   }
 
   try:
-    response = requests.post(
+    response = http_client.post(
         url, headers=headers, params={'key': key}, json=json)
     logging.info(response.text)
     response.raise_for_status()
@@ -425,7 +465,7 @@ def create_launch_issue(
     payload['continuity_id'] = security_continuity_id
 
   try:
-    response = requests.post(
+    response = http_client.post(
         url,
         headers=headers,
         params={'key': key},
@@ -474,7 +514,7 @@ def verify_continuity_issue(continuity_id: int) -> VerificationResult:
       f'{settings.OT_API_URL}/v1/security-review-issues/{continuity_id}:verify')
   headers = {'Authorization': f'Bearer {access_token}'}
   try:
-    response = requests.get(
+    response = http_client.get(
         url, headers=headers, params={'key': key})
     logging.info(response.text)
     response.raise_for_status()
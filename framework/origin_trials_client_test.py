@@ -15,7 +15,10 @@
 import testing_config  # Must be imported before the module under test.
 
 import flask
+import json
 import requests
+import threading
+from http import server
 from unittest import mock
 
 from framework import origin_trials_client
@@ -25,6 +28,53 @@ import settings
 test_app = flask.Flask(__name__)
 
 
+class FakeOriginTrialsAPI(server.ThreadingHTTPServer):
+  """A local stand-in for the origin trials API.
+
+  Each initialize request creates a new trial.  Paths listed in fail_once
+  respond with a 503 the first time they are requested, after doing their
+  work, like a response that was lost on the way back.
+  """
+
+  def __init__(self):
+    super().__init__(('localhost', 0), FakeOriginTrialsHandler)
+    self.num_trials = 0
+    self.requests: list[tuple[str, dict]] = []
+    self.fail_once: set[str] = set()
+    self.lock = threading.Lock()
+
+  @property
+  def url(self) -> str:
+    return f'http://localhost:{self.server_address[1]}'
+
+
+class FakeOriginTrialsHandler(server.BaseHTTPRequestHandler):
+
+  def do_POST(self):
+    fake_api: FakeOriginTrialsAPI = self.server  # type: ignore
+    path = self.path.split('?')[0]
+    body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+    with fake_api.lock:
+      fake_api.requests.append((path, body))
+      response = {}
+      if path == '/v1/trials:initialize':
+        response = {'trial': {'id': 1000 + fake_api.num_trials}}
+        fake_api.num_trials += 1
+      status = 200
+      if path in fake_api.fail_once:
+        fake_api.fail_once.remove(path)
+        status = 503
+    data = json.dumps(response).encode()
+    self.send_response(status)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', str(len(data)))
+    self.end_headers()
+    self.wfile.write(data)
+
+  def log_message(self, *args):
+    pass
+
+
 class OriginTrialsClientTest(testing_config.CustomTestCase):
 
   def setUp(self):
@@ -88,7 +138,7 @@ class OriginTrialsClientTest(testing_config.CustomTestCase):
       entity.key.delete()
 
   @mock.patch('framework.secrets.get_ot_api_key')
-  @mock.patch('requests.get')
+  @mock.patch('framework.http_client.get')
   def test_get_trials_list__no_api_key(
       self, mock_requests_get, mock_api_key_get):
     """If no API key is available, return an empty list of trials."""
@@ -101,7 +151,7 @@ class OriginTrialsClientTest(testing_config.CustomTestCase):
     mock_requests_get.assert_not_called()
 
   @mock.patch('framework.secrets.get_ot_api_key')
-  @mock.patch('requests.get')
+  @mock.patch('framework.http_client.get')
   def test_get_trials_list__with_api_key(
       self, mock_requests_get, mock_api_key_get):
     """If an API key is available, GET should return a list of trials."""
@@ -137,7 +187,7 @@ class OriginTrialsClientTest(testing_config.CustomTestCase):
     mock_requests_get.assert_called_once()
 
   @mock.patch('framework.secrets.get_ot_api_key')
-  @mock.patch('requests.post')
+  @mock.patch('framework.http_client.post')
   def test_extend_origin_trial__no_api_key(
       self, mock_requests_post, mock_api_key_get):
     """If no API key is available, do not send extension request."""
@@ -152,7 +202,7 @@ class OriginTrialsClientTest(testing_config.CustomTestCase):
   @mock.patch('framework.secrets.get_ot_api_key')
   @mock.patch('framework.origin_trials_client._get_ot_access_token')
   @mock.patch('framework.origin_trials_client._get_trial_end_time')
-  @mock.patch('requests.post')
+  @mock.patch('framework.http_client.post')
   def test_extend_origin_trial__with_api_key(
       self, mock_requests_post, mock_get_trial_end_time,
       mock_get_ot_access_token, mock_api_key_get):
@@ -170,7 +220,7 @@ class OriginTrialsClientTest(testing_config.CustomTestCase):
     mock_get_ot_access_token.assert_called_once()
     mock_requests_post.assert_called_once()
 
-  @mock.patch('requests.get')
+  @mock.patch('framework.http_client.get')
   def test_get_trial_end_time(self, mock_requests_get):
     """Should return an int value based on the date from the request."""
     mock_requests_get.return_value = mock.MagicMock(
@@ -186,7 +236,7 @@ class OriginTrialsClientTest(testing_config.CustomTestCase):
     mock_requests_get.assert_called_once()
 
   @mock.patch('framework.secrets.get_ot_api_key')
-  @mock.patch('requests.post')
+  @mock.patch('framework.http_client.post')
   def test_create_origin_trial__no_api_key(
       self, mock_requests_post, mock_api_key_get):
     """If no API key is available, do not send creation request."""
@@ -203,7 +253,7 @@ class OriginTrialsClientTest(testing_config.CustomTestCase):
   @mock.patch('framework.secrets.get_ot_api_key')
   @mock.patch('framework.origin_trials_client._get_ot_access_token')
   @mock.patch('framework.origin_trials_client._get_trial_end_time')
-  @mock.patch('requests.post')
+  @mock.patch('framework.http_client.post')
   def test_create_origin_trial__with_api_key(
       self, mock_requests_post, mock_get_trial_end_time,
       mock_get_ot_access_token, mock_api_key_get, mock_get_admin_group):
@@ -265,7 +315,7 @@ class OriginTrialsClientTest(testing_config.CustomTestCase):
   @mock.patch('framework.secrets.get_ot_api_key')
   @mock.patch('framework.origin_trials_client._get_ot_access_token')
   @mock.patch('framework.origin_trials_client._get_trial_end_time')
-  @mock.patch('requests.post')
+  @mock.patch('framework.http_client.post')
   def test_create_origin_trial__webdx_feature(
       self, mock_requests_post, mock_get_trial_end_time,
       mock_get_ot_access_token, mock_api_key_get, mock_get_admin_group):
@@ -297,7 +347,7 @@ class OriginTrialsClientTest(testing_config.CustomTestCase):
   @mock.patch('framework.secrets.get_ot_api_key')
   @mock.patch('framework.origin_trials_client._get_ot_access_token')
   @mock.patch('framework.origin_trials_client._get_trial_end_time')
-  @mock.patch('requests.post')
+  @mock.patch('framework.http_client.post')
   def test_create_origin_trial__css_property_id(
       self, mock_requests_post, mock_get_trial_end_time,
       mock_get_ot_access_token, mock_api_key_get, mock_get_admin_group):
@@ -326,7 +376,7 @@ class OriginTrialsClientTest(testing_config.CustomTestCase):
                      create_trial_json['trial']['blink_use_counter_config'])
 
   @mock.patch('framework.secrets.get_ot_api_key')
-  @mock.patch('requests.post')
+  @mock.patch('framework.http_client.post')
   def test_activate_origin_trial__no_api_key(
       self, mock_requests_post, mock_api_key_get):
     """If no API key is available, do not send activation request."""
@@ -340,7 +390,7 @@ class OriginTrialsClientTest(testing_config.CustomTestCase):
   @mock.patch('framework.secrets.get_ot_api_key')
   @mock.patch('framework.origin_trials_client._get_ot_access_token')
   @mock.patch('framework.origin_trials_client._get_trial_end_time')
-  @mock.patch('requests.post')
+  @mock.patch('framework.http_client.post')
   def test_activate_origin_trial__with_api_key(
       self, mock_requests_post, mock_get_trial_end_time,
       mock_get_ot_access_token, mock_api_key_get):
@@ -359,7 +409,9 @@ class OriginTrialsClientTest(testing_config.CustomTestCase):
       f'{settings.OT_API_URL}/v1/trials/-1234567890:start',
       headers={'Authorization': 'Bearer access_token'},
       params={'key': 'api_key_value'},
-      json={'trial_id': '-1234567890'}
+      json={'trial_id': '-1234567890'},
+      timeout=origin_trials_client.OT_API_TIMEOUT,
+      retries=origin_trials_client.OT_API_RETRIES,
     )
 
   @mock.patch('framework.secrets.get_ot_api_key')
@@ -375,7 +427,7 @@ class OriginTrialsClientTest(testing_config.CustomTestCase):
 
   @mock.patch('framework.secrets.get_ot_api_key', return_value='api_key')
   @mock.patch('framework.origin_trials_client._get_ot_access_token', return_value='token')
-  @mock.patch('requests.post')
+  @mock.patch('framework.http_client.post')
   def test_create_launch_issue__success_with_continuity_id(
       self, mock_requests_post, mock_get_token, mock_get_key):
     """On success with a continuity ID, the correct API call is made and ID is returned."""
@@ -401,7 +453,7 @@ class OriginTrialsClientTest(testing_config.CustomTestCase):
 
   @mock.patch('framework.secrets.get_ot_api_key', return_value='api_key')
   @mock.patch('framework.origin_trials_client._get_ot_access_token', return_value='token')
-  @mock.patch('requests.post')
+  @mock.patch('framework.http_client.post')
   def test_create_launch_issue__success_without_continuity_id(
       self, mock_requests_post, mock_get_token, mock_get_key):
     """When continuity ID is None, it is correctly omitted from the payload."""
@@ -420,7 +472,7 @@ class OriginTrialsClientTest(testing_config.CustomTestCase):
   @mock.patch('logging.exception')
   @mock.patch('framework.secrets.get_ot_api_key', return_value='api_key')
   @mock.patch('framework.origin_trials_client._get_ot_access_token', return_value='token')
-  @mock.patch('requests.post')
+  @mock.patch('framework.http_client.post')
   def test_create_launch_issue__api_http_error(
       self, mock_requests_post, mock_get_token, mock_get_key, mock_log):
     """RequestException is raised if the API returns a non-200 status code."""
@@ -433,7 +485,7 @@ class OriginTrialsClientTest(testing_config.CustomTestCase):
 
   @mock.patch('framework.secrets.get_ot_api_key', return_value='api_key')
   @mock.patch('framework.origin_trials_client._get_ot_access_token', return_value='token')
-  @mock.patch('requests.post')
+  @mock.patch('framework.http_client.post')
   def test_create_launch_issue__api_returns_failure_reason(
       self, mock_requests_post, mock_get_token, mock_get_key):
     """Function returns failure reason if provided by the API."""
@@ -447,7 +499,7 @@ class OriginTrialsClientTest(testing_config.CustomTestCase):
     self.assertIsNone(issue_id)
     self.assertEqual(failure_reason, 'Invalid feature ID.')
 
-  @mock.patch('requests.get')
+  @mock.patch('framework.http_client.get')
   @mock.patch('framework.secrets.get_ot_api_key')
   @mock.patch('settings.DEV_MODE', True)
   def test_verify_continuity_issue__dev_mode(
@@ -475,7 +527,7 @@ class OriginTrialsClientTest(testing_config.CustomTestCase):
 
     mock_api_key_get.assert_called_once()
 
-  @mock.patch('requests.get')
+  @mock.patch('framework.http_client.get')
   @mock.patch('framework.origin_trials_client._get_ot_access_token')
   @mock.patch('framework.secrets.get_ot_api_key')
   def test_verify_continuity_issue__success(
@@ -513,7 +565,7 @@ class OriginTrialsClientTest(testing_config.CustomTestCase):
     mock_requests_get.return_value.raise_for_status.assert_called_once()
 
   @mock.patch('logging.exception')
-  @mock.patch('requests.get')
+  @mock.patch('framework.http_client.get')
   @mock.patch('framework.origin_trials_client._get_ot_access_token')
   @mock.patch('framework.secrets.get_ot_api_key')
   def test_verify_continuity_issue__api_http_error(
@@ -532,3 +584,96 @@ class OriginTrialsClientTest(testing_config.CustomTestCase):
 
     mock_requests_get.assert_called_once()
     mock_requests_get.return_value.raise_for_status.assert_called_once()
+
+
+class AccessTokenTest(testing_config.CustomTestCase):
+
+  def tearDown(self):
+    origin_trials_client._clear_credentials()
+
+  @mock.patch('google.auth.default')
+  def test_get_ot_access_token__cached(self, mock_auth_default):
+    """Credentials are loaded once and only refreshed when expired."""
+    credentials = mock.MagicMock(valid=False, token=None)
+    def refresh(request):
+      credentials.valid = True
+      credentials.token = 'token-1'
+    credentials.refresh.side_effect = refresh
+    mock_auth_default.return_value = (credentials, 'project')
+
+    self.assertEqual('token-1', origin_trials_client._get_ot_access_token())
+    self.assertEqual('token-1', origin_trials_client._get_ot_access_token())
+    mock_auth_default.assert_called_once()
+    credentials.refresh.assert_called_once()
+
+    # The token expired.
+    credentials.valid = False
+    self.assertEqual('token-1', origin_trials_client._get_ot_access_token())
+    self.assertEqual(2, credentials.refresh.call_count)
+
+
+@mock.patch('framework.http_client.backoff_delay', return_value=0)
+@mock.patch('framework.secrets.get_ot_data_access_admin_group',
+            return_value='test-group-123')
+@mock.patch('framework.secrets.get_ot_api_key', return_value='api_key')
+@mock.patch('framework.origin_trials_client._get_ot_access_token',
+            return_value='access_token')
+@mock.patch('framework.origin_trials_client._get_trial_end_time',
+            return_value=111222333)
+class FakeOriginTrialsAPITest(testing_config.CustomTestCase):
+
+  def setUp(self):
+    self.fake_api = FakeOriginTrialsAPI()
+    self.server_thread = threading.Thread(target=self.fake_api.serve_forever)
+    self.server_thread.start()
+    self.ot_stage = Stage(
+        feature_id=1, stage_type=150, ot_display_name='Example Trial',
+        milestones=MilestoneSet(desktop_first=100, desktop_last=106),
+        ot_owner_email='someuser@google.com',
+        ot_description='OT description', ot_has_third_party_support=True)
+    self.ot_stage.put()
+    self.url_patch = mock.patch('settings.OT_API_URL', self.fake_api.url)
+    self.url_patch.start()
+
+  def tearDown(self):
+    self.url_patch.stop()
+    self.fake_api.shutdown()
+    self.fake_api.server_close()
+    self.server_thread.join()
+    for entity in Stage.query():
+      entity.key.delete()
+
+  def test_create_origin_trial__creation_not_retried(self, *mocks):
+    """A failed creation request is not repeated, so no second trial."""
+    self.fake_api.fail_once = {'/v1/trials:initialize'}
+
+    ot_id, error_text = origin_trials_client.create_origin_trial(self.ot_stage)
+
+    self.assertIsNone(ot_id)
+    self.assertIsNotNone(error_text)
+    self.assertEqual(1, self.fake_api.num_trials)
+    self.assertEqual(
+        ['/v1/trials:initialize'],
+        [path for path, _ in self.fake_api.requests])
+
+  def test_create_origin_trial__setup_not_retried(self, *mocks):
+    """A failed setup request is reported rather than repeated."""
+    self.fake_api.fail_once = {'/v1/trials/1000:setup'}
+
+    ot_id, error_text = origin_trials_client.create_origin_trial(self.ot_stage)
+
+    self.assertEqual('1000', ot_id)
+    self.assertIsNotNone(error_text)
+    self.assertEqual(
+        ['/v1/trials:initialize', '/v1/trials/1000:setup'],
+        [path for path, _ in self.fake_api.requests])
+
+  def test_activate_origin_trial__retried(self, *mocks):
+    """Activation is retried after a server error."""
+    self.fake_api.fail_once = {'/v1/trials/1000:start'}
+
+    origin_trials_client.activate_origin_trial('1000')
+
+    self.assertEqual(
+        [('/v1/trials/1000:start', {'trial_id': '1000'})] * 2,
+        self.fake_api.requests)
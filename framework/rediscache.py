@@ -114,6 +114,36 @@ def set_multi(entries, time=86400):
   redis_client.mset(data_entries)
 
 
+def set_if_newer(key, value, version, time=86400):
+  """
+  Set ``key`` to ``value`` unless it holds the same or a newer ``version``.
+
+  The pair is stored as a (version, value) tuple, which get() returns.
+  Redis WATCH makes the check and the set atomic, so a slow writer cannot
+  replace a newer value.  Return True if the value was set.
+  """
+  if redis_client is None:
+    return False
+
+  cache_key = add_gae_prefix(key)
+  with redis_client.pipeline() as pipe:
+    try:
+      pipe.watch(cache_key)
+      raw_value = pipe.get(cache_key)
+      if raw_value is not None and pickle.loads(raw_value)[0] >= version:
+        return False
+      pipe.multi()
+      if time:
+        pipe.set(cache_key, pickle.dumps((version, value)), ex=time)
+      else:
+        pipe.set(cache_key, pickle.dumps((version, value)))
+      pipe.execute()
+      return True
+    except redis.WatchError:
+      # Another client changed the key, and it may be newer.
+      return False
+
+
 def delete(key):
   """Redis DEL removes the value to the key, https://redis.io/commands/del/."""
   if redis_client is None:
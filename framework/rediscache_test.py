@@ -65,6 +65,18 @@ class RedisCacheFunctionTests(testing_config.CustomTestCase):
     rediscache.set_multi({KEY_5: '222'}, 3600)
     self.assertEqual({KEY_5: '222'}, rediscache.get_multi([KEY_5]))
 
+  def test_set_if_newer(self):
+    """A versioned value is only replaced by a newer version."""
+    self.assertTrue(rediscache.set_if_newer(KEY_7, 'v2', 2))
+    self.assertEqual((2, 'v2'), rediscache.get(KEY_7))
+
+    self.assertFalse(rediscache.set_if_newer(KEY_7, 'v1', 1))
+    self.assertFalse(rediscache.set_if_newer(KEY_7, 'other v2', 2))
+    self.assertEqual((2, 'v2'), rediscache.get(KEY_7))
+
+    self.assertTrue(rediscache.set_if_newer(KEY_7, 'v3', 3, 3600))
+    self.assertEqual((3, 'v3'), rediscache.get(KEY_7))
+
   def test_delete(self):
     rediscache.set(KEY_6, '606')
     self.assertEqual('606', rediscache.get(KEY_6))
@@ -13,10 +13,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import datetime
 import logging
 import random
 import settings
 import string
+import threading
 import time
 
 from google.cloud import ndb  # type: ignore
@@ -28,6 +30,14 @@ RANDOM_KEY_CHARACTERS = string.ascii_letters + string.digits
 
 ot_api_key: str|None = None
 
+# Each instance keeps secrets and API credentials in memory for this long
+# rather than reading them from the datastore on every request.
+SECRETS_CACHE_TTL_SEC = 10 * 60
+CREDENTIALS_CACHE_TTL_SEC = 5 * 60
+# When a token fails to validate, the secrets might have been rotated by
+# another instance, but do not reload them more often than this.
+SECRETS_MIN_RELOAD_SEC = 10
+
 def make_random_key(length=RANDOM_KEY_LENGTH, chars=RANDOM_KEY_CHARACTERS):
   """Return a string with lots of random characters."""
   chars = [random.choice(chars) for _ in range(length)]
@@ -38,6 +48,9 @@ class Secrets(ndb.Model):
   """A server-side-only value that we use to generate security tokens."""
 
   xsrf_secret = ndb.StringProperty()
+  # After a rotation, tokens made with the old secret are still accepted.
+  previous_xsrf_secret = ndb.StringProperty()
+  xsrf_rotated_on = ndb.DateTimeProperty()
   session_secret = ndb.StringProperty()
 
   @classmethod
@@ -72,17 +85,84 @@ class Secrets(ndb.Model):
 
     return singleton
 
+  @classmethod
+  @ndb.transactional(retries=4)
+  def _rotate_xsrf_secret(cls):
+    singleton = cls._get_or_make_singleton()
+    singleton.previous_xsrf_secret = singleton.xsrf_secret
+    singleton.xsrf_secret = make_random_key()
+    singleton.xsrf_rotated_on = datetime.datetime.now()
+    logging.info('Rotated XSRF info: %r', singleton.xsrf_secret[:8])
+    singleton.put()
+    return singleton
+
+
+_cache_lock = threading.Lock()
+_cached_secrets: Secrets|None = None
+_secrets_loaded_at = 0.0
+_cached_credentials: dict[str, tuple[float, list['ApiCredential']]] = {}
+
+
+def _get_cached_secrets() -> Secrets:
+  """Return the secrets singleton, reading it at most once per TTL."""
+  global _cached_secrets, _secrets_loaded_at
+  with _cache_lock:
+    now = time.monotonic()
+    if (_cached_secrets is None or
+        now - _secrets_loaded_at > SECRETS_CACHE_TTL_SEC):
+      _cached_secrets = Secrets._get_or_make_singleton()
+      _secrets_loaded_at = now
+    return _cached_secrets
+
+
+def reload_secrets() -> bool:
+  """Reread the secrets unless that was just done.  Return True if reread."""
+  global _cached_secrets, _secrets_loaded_at
+  with _cache_lock:
+    now = time.monotonic()
+    if (_cached_secrets is not None and
+        now - _secrets_loaded_at < SECRETS_MIN_RELOAD_SEC):
+      return False
+    _cached_secrets = Secrets._get_or_make_singleton()
+    _secrets_loaded_at = now
+    return True
+
+
+def clear_cache() -> None:
+  """Forget all cached secrets and credentials.  Used by tests."""
+  global _cached_secrets, _secrets_loaded_at
+  with _cache_lock:
+    _cached_secrets = None
+    _secrets_loaded_at = 0.0
+    _cached_credentials.clear()
+
 
 def get_xsrf_secret():
   """Return the xsrf secret key."""
-  singleton = Secrets._get_or_make_singleton()
-  return singleton.xsrf_secret
+  return _get_cached_secrets().xsrf_secret
+
+
+def get_xsrf_secrets() -> list[str]:
+  """Return the xsrf secret keys that are accepted, current one first."""
+  singleton = _get_cached_secrets()
+  result = [singleton.xsrf_secret]
+  if singleton.previous_xsrf_secret:
+    result.append(singleton.previous_xsrf_secret)
+  return result
+
+
+def rotate_xsrf_secret() -> None:
+  """Start using a new xsrf secret, while still accepting the old one."""
+  global _cached_secrets, _secrets_loaded_at
+  singleton = Secrets._rotate_xsrf_secret()
+  with _cache_lock:
+    _cached_secrets = singleton
+    _secrets_loaded_at = time.monotonic()
 
 
 def get_session_secret():
   """Return the session secret key."""
-  singleton = Secrets._get_or_make_singleton()
-  return singleton.session_secret
+  return _get_cached_secrets().session_secret
 
 
 GITHUB_API_NAME = 'github'
@@ -94,14 +174,27 @@ class ApiCredential(ndb.Model):
   token = ndb.StringProperty()
   failure_timestamp = ndb.IntegerProperty(default=0)
 
+  @classmethod
+  def _get_all_for_api(cls, api_name: str) -> list['ApiCredential']:
+    """Return the credentials for an API, reading them at most once per TTL."""
+    with _cache_lock:
+      now = time.monotonic()
+      loaded_at, all_for_api = _cached_credentials.get(api_name, (0.0, []))
+      if not all_for_api or now - loaded_at > CREDENTIALS_CACHE_TTL_SEC:
+        query = ApiCredential.query(ApiCredential.api_name == api_name)
+        all_for_api = query.fetch(None)
+        _cached_credentials[api_name] = (now, all_for_api)
+      return all_for_api
+
   @classmethod
   def select_token_for_api(cls, api_name: str) -> 'ApiCredential':
     """Return one of our credientials for the requested API or make a blank."""
-    query = ApiCredential.query(ApiCredential.api_name == api_name)
-    all_for_api = query.fetch(None)
+    all_for_api = cls._get_all_for_api(api_name)
     if not all_for_api:
       blank_entry = ApiCredential(api_name=api_name)
       blank_entry.put()
+      with _cache_lock:
+        _cached_credentials[api_name] = (time.monotonic(), [blank_entry])
       logging.info('Created an ApiCredential for %r', api_name)
       logging.info('Please use the Cloud Console to fill in a token')
       return blank_entry
@@ -109,8 +202,7 @@ class ApiCredential(ndb.Model):
     # If ndb has multiple tokens for the same API, choose one
     # that has not failed recently for any reason (including quota).
     logging.info('Found %r tokens for %r', len(all_for_api), api_name)
-    sorted_for_api = sorted(all_for_api, key=lambda ac: ac.failure_timestamp)
-    return sorted_for_api[0]
+    return min(all_for_api, key=lambda ac: ac.failure_timestamp)
 
   @classmethod
   def get_github_credendial(cls) -> 'ApiCredential':
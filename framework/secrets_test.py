@@ -49,6 +49,68 @@ class SecretsFunctionsTest(testing_config.CustomTestCase):
     self.assertEqual(s1, s2)
 
 
+class SecretsCacheTest(testing_config.CustomTestCase):
+  """Set of unit tests for keeping secrets in memory."""
+
+  def setUp(self):
+    secrets.clear_cache()
+
+  def tearDown(self):
+    secrets.clear_cache()
+    for old_entity in secrets.Secrets.query():
+      old_entity.key.delete()
+
+  def test_get_xsrf_secret__cached(self):
+    """Repeated calls do not read the datastore."""
+    with mock.patch.object(
+        secrets.Secrets, '_get_or_make_singleton',
+        wraps=secrets.Secrets._get_or_make_singleton) as mock_get:
+      s1 = secrets.get_xsrf_secret()
+      s2 = secrets.get_xsrf_secret()
+      secrets.get_session_secret()
+
+    self.assertEqual(s1, s2)
+    mock_get.assert_called_once_with()
+
+  @mock.patch('time.monotonic')
+  def test_get_xsrf_secret__expires(self, mock_monotonic):
+    """The secrets are reread after the cache TTL."""
+    mock_monotonic.return_value = 1000.0
+    with mock.patch.object(
+        secrets.Secrets, '_get_or_make_singleton',
+        wraps=secrets.Secrets._get_or_make_singleton) as mock_get:
+      secrets.get_xsrf_secret()
+      mock_monotonic.return_value += secrets.SECRETS_CACHE_TTL_SEC - 1
+      secrets.get_xsrf_secret()
+      self.assertEqual(1, mock_get.call_count)
+      mock_monotonic.return_value += 2
+      secrets.get_xsrf_secret()
+      self.assertEqual(2, mock_get.call_count)
+
+  @mock.patch('time.monotonic')
+  def test_reload_secrets__rate_limited(self, mock_monotonic):
+    """Forced reloads happen at most once per SECRETS_MIN_RELOAD_SEC."""
+    mock_monotonic.return_value = 1000.0
+    secrets.get_xsrf_secret()
+    self.assertFalse(secrets.reload_secrets())
+    mock_monotonic.return_value += secrets.SECRETS_MIN_RELOAD_SEC
+    self.assertTrue(secrets.reload_secrets())
+
+  def test_rotate_xsrf_secret(self):
+    """After rotation, the old secret is still accepted."""
+    old_secret = secrets.get_xsrf_secret()
+
+    secrets.rotate_xsrf_secret()
+
+    new_secret = secrets.get_xsrf_secret()
+    self.assertNotEqual(old_secret, new_secret)
+    self.assertEqual([new_secret, old_secret], secrets.get_xsrf_secrets())
+    stored = secrets.Secrets.query().fetch()
+    self.assertEqual(1, len(stored))
+    self.assertEqual(new_secret, stored[0].xsrf_secret)
+    self.assertEqual(old_secret, stored[0].previous_xsrf_secret)
+
+
 class SecretsTest(testing_config.CustomTestCase):
   """Set of unit tests for generating and storing server-side secret values."""
 
@@ -57,9 +119,11 @@ class SecretsTest(testing_config.CustomTestCase):
       old_entity.key.delete()
 
   def setUp(self):
+    secrets.clear_cache()
     self.delete_all()
 
   def tearDown(self):
+    secrets.clear_cache()
     self.delete_all()
 
   def test_create_and_persist(self):
@@ -86,7 +150,11 @@ class SecretsTest(testing_config.CustomTestCase):
 
 class ApiCredentialTest(testing_config.CustomTestCase):
 
+  def setUp(self):
+    secrets.clear_cache()
+
   def tearDown(self):
+    secrets.clear_cache()
     for old_entity in secrets.ApiCredential.query():
       old_entity.key.delete()
 
@@ -162,3 +230,22 @@ class ApiCredentialTest(testing_config.CustomTestCase):
     self.assertEqual(NOW, updated_cred.failure_timestamp)
     self.assertEqual(
         1, len(list(secrets.ApiCredential.query())))
+
+  def test_select_token_for_api__cached(self):
+    """Credentials are read once, and failures change the choice."""
+    cred_1 = secrets.ApiCredential(api_name='foo', token='token 1')
+    cred_1.put()
+    cred_2 = secrets.ApiCredential(
+        api_name='foo', token='token 2', failure_timestamp=2)
+    cred_2.put()
+
+    with mock.patch.object(
+        secrets.ApiCredential, 'query',
+        wraps=secrets.ApiCredential.query) as mock_query:
+      first = secrets.ApiCredential.select_token_for_api('foo')
+      first.record_failure(now=5)
+      second = secrets.ApiCredential.select_token_for_api('foo')
+
+    self.assertEqual('token 1', first.token)
+    self.assertEqual('token 2', second.token)
+    mock_query.assert_called_once()
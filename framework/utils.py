@@ -20,6 +20,7 @@ import requests
 import time
 import traceback
 
+from framework import http_client
 import settings
 
 CHROMIUM_SCHEDULE_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
@@ -122,7 +123,7 @@ def dedupe(list_with_duplicates):
 
 def get_chromium_milestone_info(milestone: int) -> dict:
   try:
-    response = requests.get(
+    response = http_client.get(
       'https://chromiumdash.appspot.com/fetch_milestone_schedule'
       f'?mstone={milestone}')
     response.raise_for_status()
@@ -51,9 +51,11 @@ CLOCK_SKEW_SEC = 5
 
 DELIMITER = ':'.encode()
 
-# Validating the token content takes a surprisingly long 50ms.
+# Checking the token digest takes a surprisingly long 50ms.
 # And, that computation is not dependent on any other inputs,
-# so we can use a LRU cache on the function.
+# so we can use a LRU cache on the function.  The accepted secrets are
+# part of the cache key, so rotating a secret out also stops its tokens
+# from being accepted.
 TOKEN_TIME_CACHE_MAX_SIZE = 1000
 
 
@@ -71,9 +73,13 @@ def generate_token(user_email, token_time=None):
     ValueError: if the XSRF secret was not configured.
   """
   token_time = token_time or int(time.time())
+  return _make_token(secrets.get_xsrf_secret(), user_email, token_time)
+
+
+def _make_token(secret, user_email, token_time):
+  """Return the token for the given user and time made with secret."""
   token_time = str(token_time).encode()
-  digester = hmac.new(secrets.get_xsrf_secret().encode(),
-                      digestmod=hashlib.sha256)
+  digester = hmac.new(secret.encode(), digestmod=hashlib.sha256)
   digester.update(user_email.encode() if user_email else b'')
   digester.update(DELIMITER)
   digester.update(token_time)
@@ -83,7 +89,26 @@ def generate_token(user_email, token_time=None):
   return token
 
 
+def _tokens_match(token, expected_token):
+  """Compare tokens in constant time to avoid timing attacks."""
+  if len(token) != len(expected_token):
+    return False
+  different = 0
+  for res in zip(str(token), str(expected_token)):
+    different |= ord(res[0]) ^ ord(res[1])
+  return not different
+
+
 @functools.lru_cache(maxsize=TOKEN_TIME_CACHE_MAX_SIZE)
+def _matches_any_secret(
+    token, user_email, token_time, accepted_secrets: tuple[str, ...]):
+  """Return True if the token was made with one of the accepted secrets."""
+  for secret in accepted_secrets:
+    if _tokens_match(token, _make_token(secret, user_email, token_time)):
+      return True
+  return False
+
+
 def _validate_and_get_token_time(token, user_email):
   """If token content is valid, return token_time.  Otherwise, raise."""
   if not token:
@@ -94,21 +119,16 @@ def _validate_and_get_token_time(token, user_email):
   except (TypeError, ValueError):
     raise TokenIncorrect('could not decode token')
 
-  # The given token should match the generated one with the same time.
-  expected_token = generate_token(user_email, token_time=token_time)
-  if len(token) != len(expected_token):
-    raise TokenIncorrect('presented token is wrong size')
-
-  # Perform constant time comparison to avoid timing attacks
-  different = 0
-  for res in zip(str(token), str(expected_token)):
-    different |= ord(res[0]) ^ ord(res[1])
-  if different:
-    raise TokenIncorrect(
-        'presented token does not match expected token: %r != %r' % (
-            token, expected_token))
-
-  return token_time
+  # The given token should match one generated with the same time using
+  # the current or previous secret.  If it does not, another instance may
+  # have rotated the secret since we last read it.
+  if _matches_any_secret(
+      token, user_email, token_time, tuple(secrets.get_xsrf_secrets())):
+    return token_time
+  if secrets.reload_secrets() and _matches_any_secret(
+      token, user_email, token_time, tuple(secrets.get_xsrf_secrets())):
+    return token_time
+  raise TokenIncorrect('presented token does not match expected token')
 
 
 def validate_token(
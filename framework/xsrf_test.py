@@ -16,12 +16,21 @@ import testing_config  # Must be imported before the module under test.
 
 from unittest import mock
 
+from framework import secrets
 from framework import xsrf
 
 
 class XsrfTest(testing_config.CustomTestCase):
   """Set of unit tests for blocking XSRF attacks."""
 
+  def setUp(self):
+    secrets.clear_cache()
+    xsrf._matches_any_secret.cache_clear()
+
+  def tearDown(self):
+    secrets.clear_cache()
+    xsrf._matches_any_secret.cache_clear()
+
   def test_generate_token__anon(self):
     """Anon users get a real token."""
     self.assertNotEqual('', xsrf.generate_token(None))
@@ -98,3 +107,34 @@ class XsrfTest(testing_config.CustomTestCase):
     mock_time.return_value = test_time - xsrf.CLOCK_SKEW_SEC - 1
     with self.assertRaises(xsrf.TokenIncorrect):
       xsrf.validate_token(token, 'user1@example.com')
+
+  def test_validate_token__rotated_secret(self):
+    """Tokens made before a secret rotation are still accepted."""
+    token = xsrf.generate_token('user1@example.com', token_time=1526671379)
+    secrets.rotate_xsrf_secret()
+    new_token = xsrf.generate_token('user1@example.com', token_time=1526671379)
+    self.assertNotEqual(token, new_token)
+
+    xsrf._validate_and_get_token_time(token, 'user1@example.com')
+    xsrf._validate_and_get_token_time(new_token, 'user1@example.com')
+
+  def test_validate_token__rotated_out_secret(self):
+    """Once a secret is rotated out, its tokens are rejected, even if cached."""
+    token = xsrf.generate_token('user1@example.com', token_time=1526671379)
+    xsrf._validate_and_get_token_time(token, 'user1@example.com')
+    secrets.rotate_xsrf_secret()
+    xsrf._validate_and_get_token_time(token, 'user1@example.com')
+
+    secrets.rotate_xsrf_secret()
+    with self.assertRaises(xsrf.TokenIncorrect):
+      xsrf._validate_and_get_token_time(token, 'user1@example.com')
+
+  @mock.patch('framework.secrets.reload_secrets')
+  def test_validate_token__rotated_elsewhere(self, mock_reload):
+    """When a token does not match, the secrets are reread once."""
+    mock_reload.return_value = True
+    with self.assertRaises(xsrf.TokenIncorrect):
+      xsrf.validate_token(
+          xsrf._make_token('other secret', 'user1@example.com', 1526671379),
+          'user1@example.com')
+    mock_reload.assert_called_once_with()
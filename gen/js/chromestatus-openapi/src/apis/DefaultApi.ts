@@ -16,7 +16,6 @@
 import * as runtime from '../runtime';
 import type {
   AccountResponse,
-  Activity,
   AddAttachmentResponse,
   CommentsRequest,
   ComponentUsersRequest,
@@ -57,8 +56,6 @@ import type {
 import {
     AccountResponseFromJSON,
     AccountResponseToJSON,
-    ActivityFromJSON,
-    ActivityToJSON,
     AddAttachmentResponseFromJSON,
     AddAttachmentResponseToJSON,
     CommentsRequestFromJSON,
@@ -189,6 +186,8 @@ export interface ExtendOriginTrialRequest {
 
 export interface GetFeatureCommentsRequest {
     featureId: number;
+    limit?: number;
+    cursor?: string;
 }
 
 export interface GetFeatureLinksRequest {
@@ -205,6 +204,8 @@ export interface GetFeatureLinksSamplesRequest {
 export interface GetGateCommentsRequest {
     featureId: number;
     gateId: number;
+    limit?: number;
+    cursor?: string;
 }
 
 export interface GetGatesForFeatureRequest {
@@ -489,6 +490,8 @@ export interface DefaultApiInterface {
      * 
      * @summary Get all comments for a given feature
      * @param {number} featureId 
+     * @param {number} [limit] Return at most this many comments, followed by a next_cursor if there are more.
+     * @param {string} [cursor] The next_cursor of the previous page.
      * @param {*} [options] Override http request option.
      * @throws {RequiredError}
      * @memberof DefaultApiInterface
@@ -552,16 +555,18 @@ export interface DefaultApiInterface {
      * @summary Get all comments for a given gate
      * @param {number} featureId 
      * @param {number} gateId 
+     * @param {number} [limit] Return at most this many comments, followed by a next_cursor if there are more.
+     * @param {string} [cursor] The next_cursor of the previous page.
      * @param {*} [options] Override http request option.
      * @throws {RequiredError}
      * @memberof DefaultApiInterface
      */
-    getGateCommentsRaw(requestParameters: GetGateCommentsRequest, initOverrides?: RequestInit | runtime.InitOverrideFunction): Promise<runtime.ApiResponse<Array<Activity>>>;
+    getGateCommentsRaw(requestParameters: GetGateCommentsRequest, initOverrides?: RequestInit | runtime.InitOverrideFunction): Promise<runtime.ApiResponse<GetCommentsResponse>>;
 
     /**
      * Get all comments for a given gate
      */
-    getGateComments(requestParameters: GetGateCommentsRequest, initOverrides?: RequestInit | runtime.InitOverrideFunction): Promise<Array<Activity>>;
+    getGateComments(requestParameters: GetGateCommentsRequest, initOverrides?: RequestInit | runtime.InitOverrideFunction): Promise<GetCommentsResponse>;
 
     /**
      * 
@@ -1468,6 +1473,14 @@ export class DefaultApi extends runtime.BaseAPI implements DefaultApiInterface {
 
         const queryParameters: any = {};
 
+        if (requestParameters['limit'] != null) {
+            queryParameters['limit'] = requestParameters['limit'];
+        }
+
+        if (requestParameters['cursor'] != null) {
+            queryParameters['cursor'] = requestParameters['cursor'];
+        }
+
         const headerParameters: runtime.HTTPHeaders = {};
 
         const response = await this.request({
@@ -1589,7 +1602,7 @@ export class DefaultApi extends runtime.BaseAPI implements DefaultApiInterface {
     /**
      * Get all comments for a given gate
      */
-    async getGateCommentsRaw(requestParameters: GetGateCommentsRequest, initOverrides?: RequestInit | runtime.InitOverrideFunction): Promise<runtime.ApiResponse<Array<Activity>>> {
+    async getGateCommentsRaw(requestParameters: GetGateCommentsRequest, initOverrides?: RequestInit | runtime.InitOverrideFunction): Promise<runtime.ApiResponse<GetCommentsResponse>> {
         if (requestParameters['featureId'] == null) {
             throw new runtime.RequiredError(
                 'featureId',
@@ -1606,6 +1619,14 @@ export class DefaultApi extends runtime.BaseAPI implements DefaultApiInterface {
 
         const queryParameters: any = {};
 
+        if (requestParameters['limit'] != null) {
+            queryParameters['limit'] = requestParameters['limit'];
+        }
+
+        if (requestParameters['cursor'] != null) {
+            queryParameters['cursor'] = requestParameters['cursor'];
+        }
+
         const headerParameters: runtime.HTTPHeaders = {};
 
         const response = await this.request({
@@ -1615,13 +1636,13 @@ export class DefaultApi extends runtime.BaseAPI implements DefaultApiInterface {
             query: queryParameters,
         }, initOverrides);
 
-        return new runtime.JSONApiResponse(response, (jsonValue) => jsonValue.map(ActivityFromJSON));
+        return new runtime.JSONApiResponse(response, (jsonValue) => GetCommentsResponseFromJSON(jsonValue));
     }
 
     /**
      * Get all comments for a given gate
      */
-    async getGateComments(requestParameters: GetGateCommentsRequest, initOverrides?: RequestInit | runtime.InitOverrideFunction): Promise<Array<Activity>> {
+    async getGateComments(requestParameters: GetGateCommentsRequest, initOverrides?: RequestInit | runtime.InitOverrideFunction): Promise<GetCommentsResponse> {
         const response = await this.getGateCommentsRaw(requestParameters, initOverrides);
         return await response.value();
     }
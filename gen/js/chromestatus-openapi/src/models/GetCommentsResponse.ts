@@ -32,6 +32,12 @@ export interface GetCommentsResponse {
      * @memberof GetCommentsResponse
      */
     comments?: Array<Activity>;
+    /**
+     * Pass this as the cursor to get the next page.  It is only present when a limit or cursor was given and there are more comments.
+     * @type {string}
+     * @memberof GetCommentsResponse
+     */
+    next_cursor?: string;
 }
 
 /**
@@ -52,6 +58,7 @@ export function GetCommentsResponseFromJSONTyped(json: any, ignoreDiscriminator:
     return {
         
         'comments': json['comments'] == null ? undefined : ((json['comments'] as Array<any>).map(ActivityFromJSON)),
+        'next_cursor': json['next_cursor'] == null ? undefined : json['next_cursor'],
     };
 }
 
@@ -62,6 +69,7 @@ export function GetCommentsResponseToJSON(value?: GetCommentsResponse | null): a
     return {
         
         'comments': value['comments'] == null ? undefined : ((value['comments'] as Array<any>).map(ActivityToJSON)),
+        'next_cursor': value['next_cursor'],
     };
 }
 
@@ -4,7 +4,6 @@ from typing import Tuple
 from typing import Union
 
 from chromestatus_openapi.models.account_response import AccountResponse  # noqa: E501
-from chromestatus_openapi.models.activity import Activity  # noqa: E501
 from chromestatus_openapi.models.add_attachment_response import AddAttachmentResponse  # noqa: E501
 from chromestatus_openapi.models.comments_request import CommentsRequest  # noqa: E501
 from chromestatus_openapi.models.component_users_request import ComponentUsersRequest  # noqa: E501
@@ -232,13 +231,17 @@ def get_dismissed_cues():  # noqa: E501
     return 'do some magic!'
 
 
-def get_feature_comments(feature_id):  # noqa: E501
+def get_feature_comments(feature_id, limit=None, cursor=None):  # noqa: E501
     """Get all comments for a given feature
 
      # noqa: E501
 
     :param feature_id: 
     :type feature_id: int
+    :param limit: Return at most this many comments, followed by a next_cursor if there are more.
+    :type limit: int
+    :param cursor: The next_cursor of the previous page.
+    :type cursor: str
 
     :rtype: Union[GetCommentsResponse, Tuple[GetCommentsResponse, int], Tuple[GetCommentsResponse, int, Dict[str, str]]
     """
@@ -288,7 +291,7 @@ def get_feature_links_summary():  # noqa: E501
     return 'do some magic!'
 
 
-def get_gate_comments(feature_id, gate_id):  # noqa: E501
+def get_gate_comments(feature_id, gate_id, limit=None, cursor=None):  # noqa: E501
     """Get all comments for a given gate
 
      # noqa: E501
@@ -297,8 +300,12 @@ def get_gate_comments(feature_id, gate_id):  # noqa: E501
     :type feature_id: int
     :param gate_id: 
     :type gate_id: int
+    :param limit: Return at most this many comments, followed by a next_cursor if there are more.
+    :type limit: int
+    :param cursor: The next_cursor of the previous page.
+    :type cursor: str
 
-    :rtype: Union[List[Activity], Tuple[List[Activity], int], Tuple[List[Activity], int, Dict[str, str]]
+    :rtype: Union[GetCommentsResponse, Tuple[GetCommentsResponse, int], Tuple[GetCommentsResponse, int, Dict[str, str]]
     """
     return 'do some magic!'
 
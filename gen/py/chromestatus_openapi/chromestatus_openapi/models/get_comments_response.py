@@ -14,21 +14,26 @@ class GetCommentsResponse(Model):
     Do not edit the class manually.
     """
 
-    def __init__(self, comments=None):  # noqa: E501
+    def __init__(self, comments=None, next_cursor=None):  # noqa: E501
         """GetCommentsResponse - a model defined in OpenAPI
 
         :param comments: The comments of this GetCommentsResponse.  # noqa: E501
         :type comments: List[Activity]
+        :param next_cursor: The next_cursor of this GetCommentsResponse.  # noqa: E501
+        :type next_cursor: str
         """
         self.openapi_types = {
-            'comments': List[Activity]
+            'comments': List[Activity],
+            'next_cursor': str
         }
 
         self.attribute_map = {
-            'comments': 'comments'
+            'comments': 'comments',
+            'next_cursor': 'next_cursor'
         }
 
         self._comments = comments
+        self._next_cursor = next_cursor
 
     @classmethod
     def from_dict(cls, dikt) -> 'GetCommentsResponse':
@@ -61,3 +66,26 @@ class GetCommentsResponse(Model):
         """
 
         self._comments = comments
+
+    @property
+    def next_cursor(self) -> str:
+        """Gets the next_cursor of this GetCommentsResponse.
+
+        Pass this as the cursor to get the next page.  It is only present when a limit or cursor was given and there are more comments.  # noqa: E501
+
+        :return: The next_cursor of this GetCommentsResponse.
+        :rtype: str
+        """
+        return self._next_cursor
+
+    @next_cursor.setter
+    def next_cursor(self, next_cursor: str):
+        """Sets the next_cursor of this GetCommentsResponse.
+
+        Pass this as the cursor to get the next page.  It is only present when a limit or cursor was given and there are more comments.  # noqa: E501
+
+        :param next_cursor: The next_cursor of this GetCommentsResponse.
+        :type next_cursor: str
+        """
+
+        self._next_cursor = next_cursor
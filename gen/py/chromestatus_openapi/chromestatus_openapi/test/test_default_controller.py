@@ -3,7 +3,6 @@ import unittest
 from flask import json
 
 from chromestatus_openapi.models.account_response import AccountResponse  # noqa: E501
-from chromestatus_openapi.models.activity import Activity  # noqa: E501
 from chromestatus_openapi.models.add_attachment_response import AddAttachmentResponse  # noqa: E501
 from chromestatus_openapi.models.comments_request import CommentsRequest  # noqa: E501
 from chromestatus_openapi.models.component_users_request import ComponentUsersRequest  # noqa: E501
@@ -264,13 +263,16 @@ class TestDefaultController(BaseTestCase):
 
         Get all comments for a given feature
         """
+        query_string = [('limit', 56),
+                        ('cursor', 'cursor_example')]
         headers = { 
             'Accept': 'application/json',
         }
         response = self.client.open(
             '/api/v0/features/<int:feature_id>/approvals/comments'.format(feature_id=56),
             method='GET',
-            headers=headers)
+            headers=headers,
+            query_string=query_string)
         self.assert200(response,
                        'Response body is : ' + response.data.decode('utf-8'))
 
@@ -331,13 +333,16 @@ class TestDefaultController(BaseTestCase):
 
         Get all comments for a given gate
         """
+        query_string = [('limit', 56),
+                        ('cursor', 'cursor_example')]
         headers = { 
             'Accept': 'application/json',
         }
         response = self.client.open(
             '/api/v0/features/<int:feature_id>/approvals/<int:gate_id>/comments'.format(feature_id=56, gate_id=56),
             method='GET',
-            headers=headers)
+            headers=headers,
+            query_string=query_string)
         self.assert200(response,
                        'Response body is : ' + response.data.decode('utf-8'))
 
@@ -20,13 +20,17 @@ import datetime
 import json
 import logging
 from typing import Optional
-import requests
 
+from google.cloud import ndb  # type: ignore
+
+from framework import http_client
 from framework import permissions
 from framework import rediscache
 from internals import core_enums
+from internals import pending_gates
 from internals import slo
-from internals.review_models import Gate, GateDef, OwnersFile, Vote
+from internals.review_models import (
+    Gate, GateDef, GateVoteSummary, OwnersFile, Vote)
 import settings
 
 APPROVERS_CACHE_KEY = 'approvers'
@@ -213,7 +217,7 @@ def fetch_owners(url) -> list[str]:
     logging.info('Using fresh owners_file')
     return decode_raw_owner_content(owners_file.raw_content)
 
-  response = requests.get(url)
+  response = http_client.get(url)
   if response.status_code == 200:
     content = response.content
   else:
@@ -256,7 +260,8 @@ def auto_assign_reviewer(gate):
         other_afd.rule == afd.rule and
         other_gate.assignee_emails):
       gate.assignee_emails = other_gate.assignee_emails
-      gate.put()
+      put_gate_fields(gate, ['assignee_emails'])
+      pending_gates.update_gate(gate)
       return
 
   if afd.approvers != IN_NDB:
@@ -266,7 +271,7 @@ def auto_assign_reviewer(gate):
   if not gate_def.rotation_url:
     return
 
-  response = requests.get(gate_def.rotation_url)
+  response = http_client.get(gate_def.rotation_url)
   if response.status_code != 200:
     logging.error('Could not fetch %r', gate_def.rotation_url)
     logging.error('Got response %s', repr(response)[:settings.MAX_LOG_LINE])
@@ -281,7 +286,9 @@ def auto_assign_reviewer(gate):
 
   if 'emails' in response_json:
     gate.assignee_emails = response_json['emails']
-    gate.put()
+    # The gate was read before the rotation was fetched.
+    put_gate_fields(gate, ['assignee_emails'])
+    pending_gates.update_gate(gate)
 
 
 def get_approvers(gate_type) -> list[str]:
@@ -328,6 +335,17 @@ def is_valid_gate_type(gate_type):
   return gate_type in APPROVAL_FIELDS_BY_ID
 
 
+# Votes in these states determine the gate state when there are not enough
+# approvals.  The most recent one wins.
+STATE_CHANGING_VOTE_STATES = (
+    Vote.NEEDS_WORK, Vote.REVIEW_STARTED, Vote.REVIEW_REQUESTED,
+    Vote.DENIED, Vote.INTERNAL_REVIEW, Vote.NA_REQUESTED)
+# Gate fields that are updated in the same transaction as a vote.
+VOTE_UPDATED_GATE_FIELDS = (
+    'state', 'requested_on', 'responded_on', 'resolved_on',
+    'needs_work_started_on', 'needs_work_elapsed')
+
+
 def set_vote(feature_id: int,  gate_type: int | None, new_state: int,
     set_by_email: str, gate_id: int | None=None) -> int | None:
   """Add or update an approval value and return new approval state if
@@ -349,38 +367,180 @@ def set_vote(feature_id: int,  gate_type: int | None, new_state: int,
   if not Vote.is_valid_state(new_state):
     raise ValueError('Invalid approval state')
 
-  new_vote = None
+  if gate and GateVoteSummary.make_key(gate_id).get() is None:
+    # Rekeying is idempotent, so it can happen before the transaction,
+    # which then computes the vote summary.
+    rekey_gate_votes(gate_id)
+
+  vote, updated_gate, old_gate_state, slo_changes = _upsert_vote(
+      feature_id, gate_id, gate_type, new_state, set_by_email)
+  if not gate or not updated_gate:
+    return None
+
+  # Callers may hold the same Gate instance, so keep it up to date.
+  for field in VOTE_UPDATED_GATE_FIELDS:
+    setattr(gate, field, getattr(updated_gate, field))
+  slo.record_vote_changes(gate, slo_changes)
+  state_was_updated = gate.state != old_gate_state
+  if state_was_updated:
+    pending_gates.update_gate(gate)
+  if state_was_updated or slo_changes.changed:
+    return gate.state
+  return None
+
+
+@ndb.transactional()
+def _upsert_vote(
+    feature_id: int, gate_id: int | None, gate_type: int | None,
+    new_state: int, set_by_email: str
+    ) -> tuple[Vote, Gate | None, int | None, slo.SLOChanges]:
+  """Write the vote along with the gate's vote summary, state, and SLO dates.
+
+  Each user has at most one vote per gate, so the vote is keyed by gate and
+  voter, and replacing it needs no query.  Return the vote, the updated
+  gate if the gate exists, the gate's previous state, and the SLO changes.
+  """
   now = datetime.datetime.now()
-  existing_list: list[Vote] = Vote.get_votes(feature_id=feature_id,
-      gate_id=gate_id, set_by=set_by_email)
-  if existing_list:
-    existing = existing_list[0]
-    existing.set_on = now
-    existing.state = new_state
-    existing.put()
+  vote_key = Vote.make_key(gate_id, set_by_email)
+  gate, summary, vote = ndb.get_multi(
+      [ndb.Key(Gate, gate_id), GateVoteSummary.make_key(gate_id), vote_key])
+  old_vote_state = vote.state if vote else None
+  if not vote:
+    vote = Vote(key=vote_key, feature_id=feature_id, gate_id=gate_id,
+        gate_type=gate_type, set_by=set_by_email)
+  vote.state = new_state
+  vote.set_on = now
+  if not gate:
+    vote.put()
+    return vote, None, None, slo.SLOChanges()
+
+  old_gate_state = gate.state
+  if summary is None:
+    # Either set_vote() rekeyed the legacy votes or the gate is new.
+    summary = _make_vote_summary(
+        gate_id, _get_latest_votes(Vote.get_votes(gate_id=gate_id)))
+  if old_vote_state is not None:
+    _remove_from_vote_summary(summary, old_vote_state, set_by_email)
+  _add_to_vote_summary(summary, vote)
+  update_gate_approval_state(gate, summary=summary)
+  slo_changes = slo.apply_vote(gate, [vote], old_gate_state)
+  ndb.put_multi([vote, summary, gate])
+  return vote, gate, old_gate_state, slo_changes
+
+
+def _add_to_vote_summary(summary: GateVoteSummary, vote: Vote) -> None:
+  state_key = str(vote.state)
+  summary.vote_counts[state_key] = summary.vote_counts.get(state_key, 0) + 1
+  if vote.state in STATE_CHANGING_VOTE_STATES:
+    summary.state_changing_votes[vote.set_by] = [
+        vote.state, vote.set_on.isoformat()]
+
+
+def _remove_from_vote_summary(
+    summary: GateVoteSummary, old_state: int, set_by_email: str) -> None:
+  state_key = str(old_state)
+  remaining = summary.vote_counts.get(state_key, 0) - 1
+  if remaining > 0:
+    summary.vote_counts[state_key] = remaining
   else:
-    new_vote = Vote(feature_id=feature_id, gate_id=gate_id,
-        gate_type=gate_type, state=new_state, set_on=now, set_by=set_by_email)
-    new_vote.put()
+    summary.vote_counts.pop(state_key, None)
+  summary.state_changing_votes.pop(set_by_email, None)
+
+
+def _get_latest_votes(votes: list[Vote]) -> dict[str, Vote]:
+  """Return the latest vote of each voter."""
+  latest_votes: dict[str, Vote] = {}
+  for vote in votes:  # Oldest first.
+    latest_votes[vote.set_by] = vote
+  return latest_votes
+
+
+def _make_vote_summary(
+    gate_id: int, latest_votes: dict[str, Vote]) -> GateVoteSummary:
+  summary = GateVoteSummary(
+      key=GateVoteSummary.make_key(gate_id), vote_counts={},
+      state_changing_votes={})
+  for vote in sorted(latest_votes.values(), key=lambda v: v.set_on):
+    _add_to_vote_summary(summary, vote)
+  return summary
+
 
+def rekey_gate_votes(gate_id: int) -> dict[str, Vote]:
+  """Key the gate's votes by voter and return the latest vote of each.
 
+  Votes written before votes were keyed by voter have generated IDs, and
+  a lost race could leave more than one of them for the same voter.  Only
+  the latest vote of each voter is kept.
+  """
+  votes = Vote.get_votes(gate_id=gate_id)
+  latest_votes = _get_latest_votes(votes)
+  rekeyed_votes: list[Vote] = []
+  for vote in latest_votes.values():
+    vote_key = Vote.make_key(gate_id, vote.set_by)
+    if vote.key != vote_key:
+      rekeyed_votes.append(Vote(
+          key=vote_key, feature_id=vote.feature_id, gate_id=gate_id,
+          gate_type=vote.gate_type, state=vote.state, set_on=vote.set_on,
+          set_by=vote.set_by))
+  old_keys = [v.key for v in votes
+              if v.key != Vote.make_key(gate_id, v.set_by)]
+  if rekeyed_votes:
+    ndb.put_multi(rekeyed_votes)
+  if old_keys:
+    ndb.delete_multi(old_keys)
+    logging.info(f'Rekeyed {len(old_keys)} votes on gate {gate_id}')
+  return latest_votes
+
+
+@ndb.transactional()
+def reevaluate_gate(gate_id: int) -> Gate | None:
+  """Recompute the gate's vote summary and state from its Vote entities.
+
+  This repairs a summary or state that no longer matches the votes, for
+  example because a vote was written without set_vote().  The caller
+  should rekey legacy votes first.  Return the gate if its state changed.
+  """
+  gate, summary = ndb.get_multi(
+      [ndb.Key(Gate, gate_id), GateVoteSummary.make_key(gate_id)])
+  if not gate:
+    return None
+  new_summary = _make_vote_summary(
+      gate_id, _get_latest_votes(Vote.get_votes(gate_id=gate_id)))
+  state_was_updated = update_gate_approval_state(gate, summary=new_summary)
+  to_put: list[ndb.Model] = []
+  if (summary is None or
+      summary.vote_counts != new_summary.vote_counts or
+      summary.state_changing_votes != new_summary.state_changing_votes):
+    to_put.append(new_summary)
+  if state_was_updated:
+    to_put.append(gate)
+  if to_put:
+    ndb.put_multi(to_put)
+  return gate if state_was_updated else None
+
+
+@ndb.transactional()
+def _put_gate_fields(gate_id: int, fields: dict) -> Gate | None:
+  gate = Gate.get_by_id(gate_id)
   if gate:
-    votes = Vote.get_votes(gate_id=gate.key.integer_id())
-    # Check for double votes that could arise from a race condition.
-    double_votes = [v for v in votes
-                    if v.set_by == set_by_email and v.set_on < now]
-    if new_vote and double_votes:
-      # This handler lost the race condition, back out and bail.
-      new_vote.key.delete()
-      return None
+    gate.populate(**fields)
+    gate.put()
+  return gate
+
+
+def put_gate_fields(gate: Gate, field_names: list[str]) -> None:
+  """Write only the given fields of the gate.
+
+  The rest of the stored gate, such as the state and SLO dates written by
+  set_vote(), may be newer than this copy, so it is reread in a
+  transaction rather than overwritten.
+  """
+  fields = {name: getattr(gate, name) for name in field_names}
+  stored_gate = _put_gate_fields(gate.key.integer_id(), fields)
+  if stored_gate:
+    for field in VOTE_UPDATED_GATE_FIELDS:
+      setattr(gate, field, getattr(stored_gate, field))
 
-    old_gate_state = gate.state
-    state_was_updated = update_gate_approval_state(gate, votes)
-    slo_was_updated = slo.record_vote(gate, votes, old_gate_state)
-    if state_was_updated or slo_was_updated:
-      gate.put()
-      return gate.state
-  return None
 
 def get_gate_by_type(feature_id: int, gate_type: int):
   """Return a single gate based on the feature and gate type."""
@@ -396,13 +556,40 @@ def get_gate_by_type(feature_id: int, gate_type: int):
 
 def _calc_gate_state(votes: list[Vote], rule: str) -> int:
   """Returns the state that a gate should have based on its votes."""
-  # NO_RESPONSE votes never affect the vote calculation.
-  votes = [v for v in votes if v.state != Vote.NO_RESPONSE]
   counts = collections.Counter(v.state for v in votes)
+  latest_state = None
+  for vote in sorted(votes, reverse=True, key=lambda v: v.set_on):
+    if vote.state in STATE_CHANGING_VOTE_STATES:
+      latest_state = vote.state
+      break
+  return _calc_state_from_counts(counts, latest_state, rule)
+
+
+def _calc_gate_state_from_summary(
+    summary: GateVoteSummary, rule: str) -> int:
+  """Returns the state that a gate should have based on its vote summary."""
+  counts = collections.Counter(
+      {int(state): n for state, n in (summary.vote_counts or {}).items()})
+  latest_state = None
+  if summary.state_changing_votes:
+    latest_state, _ = max(
+        summary.state_changing_votes.values(),
+        key=lambda state_and_set_on: datetime.datetime.fromisoformat(
+            state_and_set_on[1]))
+  return _calc_state_from_counts(counts, latest_state, rule)
+
+
+def _calc_state_from_counts(
+    counts: collections.Counter, latest_state: int | None, rule: str) -> int:
+  """Returns the gate state for the given vote counts and the state of the
+  most recent vote in STATE_CHANGING_VOTE_STATES."""
+  # NO_RESPONSE votes never affect the vote calculation.
+  del counts[Vote.NO_RESPONSE]
+  num_votes = sum(counts.values())
 
   if counts[Vote.NA_SELF] == 1 and rule == ONE_LGTM:
     # A self-certified NA makes the gate NA_SELF iff it is the only vote.
-    if len(votes) == 1:
+    if num_votes == 1:
       return Vote.NA_SELF
     # Any added NA_VERIFIED votes make the gate NA_VERIFIED.
     if counts[Vote.NA_VERIFIED] >= 1:
@@ -421,11 +608,8 @@ def _calc_gate_state(votes: list[Vote], rule: str) -> int:
   # REVIEW_STARTED, INTERNAL_REVIEW, or DENIED.  This allows a
   # feature owner to re-request a review after addressing feedback and
   # have the gate show up as REVIEW_STARTED again.
-  for vote in sorted(votes, reverse=True, key=lambda v: v.set_on):
-    if vote.state in (
-        Vote.NEEDS_WORK, Vote.REVIEW_STARTED, Vote.REVIEW_REQUESTED,
-        Vote.DENIED, Vote.INTERNAL_REVIEW, Vote.NA_REQUESTED):
-      return vote.state
+  if latest_state is not None:
+    return latest_state
 
   # An API Owner can kick off review of an I2S thread that was not detected
   # by voting Approve for their "LGTM1".
@@ -437,12 +621,20 @@ def _calc_gate_state(votes: list[Vote], rule: str) -> int:
   return Gate.PREPARING
 
 
-def update_gate_approval_state(gate: Gate, votes: list[Vote]) -> bool:
-  """Change the Gate state in RAM based on its votes. Return True if changed."""
+def update_gate_approval_state(
+    gate: Gate, votes: list[Vote] | None = None,
+    summary: GateVoteSummary | None = None) -> bool:
+  """Change the Gate state in RAM based on its votes. Return True if changed.
+
+  Either the votes or the gate's vote summary should be given.
+  """
   afd = APPROVAL_FIELDS_BY_ID.get(gate.gate_type)
   # Assume any gate of a type that is not currently supported is ONE_LGTM.
   rule = afd.rule if afd else ONE_LGTM
-  new_state = _calc_gate_state(votes, rule)
+  if summary is not None:
+    new_state = _calc_gate_state_from_summary(summary, rule)
+  else:
+    new_state = _calc_gate_state(votes or [], rule)
   if new_state == gate.state:
     return False
   gate.state = new_state
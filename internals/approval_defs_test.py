@@ -18,10 +18,14 @@ import testing_config  # Must be imported before the module under test.
 
 from unittest import mock
 
+from google.cloud import ndb  # type: ignore
+
 from framework import rediscache
 from internals import approval_defs
 from internals import core_enums
-from internals.review_models import Gate, GateDef, Vote, OwnersFile
+from internals.review_models import (
+    DailyReviewLatency, FeatureGateLatencies, Gate, GateDef, GateLatencyRecord,
+    GateVoteSummary, Vote, OwnersFile)
 
 
 class FetchOwnersTest(testing_config.CustomTestCase):
@@ -39,7 +43,7 @@ class FetchOwnersTest(testing_config.CustomTestCase):
     for owners_file in OwnersFile.query():
       owners_file.key.delete()
 
-  @mock.patch('requests.get')
+  @mock.patch('framework.http_client.get')
   def test__normal(self, mock_get):
     """We can fetch and parse an OWNERS file.  And reuse cached value."""
     encoded = base64.b64encode(self.FILE_CONTENTS.encode())
@@ -58,7 +62,7 @@ class FetchOwnersTest(testing_config.CustomTestCase):
     self.assertEqual(again, actual)
 
   @mock.patch('logging.error')
-  @mock.patch('requests.get')
+  @mock.patch('framework.http_client.get')
   def test__error__use_ndb(self, mock_get, mock_err):
     """If NDB is old and we can't read the OWNERS file, use old value anyway."""
     encoded = base64.b64encode(self.FILE_CONTENTS.encode())
@@ -75,7 +79,7 @@ class FetchOwnersTest(testing_config.CustomTestCase):
         ['owner1@example.com', 'owner2@example.com', 'owner3@example.com'])
 
   @mock.patch('logging.error')
-  @mock.patch('requests.get')
+  @mock.patch('framework.http_client.get')
   def test__error__use_empty_list(self, mock_get, mock_err):
     """If NDB is missing and we can't read the OWNERS file, use []."""
     # Don't create any test existing OwnersFile in NDB.
@@ -247,6 +251,144 @@ class IsApprovedTest(testing_config.CustomTestCase):
         set_on=datetime.datetime.now(),
         set_by='three@example.com')
 
+
+class SetVoteTest(testing_config.CustomTestCase):
+
+  def setUp(self):
+    self.gate = Gate(
+        id=2001, feature_id=1, stage_id=1,
+        gate_type=core_enums.GATE_API_SHIP, state=Gate.PREPARING)
+    self.gate.put()
+    self.gate_id = self.gate.key.integer_id()
+
+  def tearDown(self):
+    for kind in [Gate, GateLatencyRecord, FeatureGateLatencies,
+                 GateVoteSummary, DailyReviewLatency, Vote]:
+      for entity in kind.query():
+        entity.key.delete()
+
+  def test_set_vote__new(self):
+    """A new vote is keyed by gate and voter and counted on the gate."""
+    actual = approval_defs.set_vote(
+        1, None, Vote.REVIEW_REQUESTED, 'owner@example.com', self.gate_id)
+
+    self.assertEqual(Vote.REVIEW_REQUESTED, actual)
+    vote = Vote.make_key(self.gate_id, 'owner@example.com').get()
+    self.assertEqual(Vote.REVIEW_REQUESTED, vote.state)
+    gate = Gate.get_by_id(self.gate_id)
+    self.assertEqual(Vote.REVIEW_REQUESTED, gate.state)
+    summary = GateVoteSummary.make_key(self.gate_id).get()
+    self.assertEqual({str(Vote.REVIEW_REQUESTED): 1}, summary.vote_counts)
+    self.assertEqual(
+        ['owner@example.com'], list(summary.state_changing_votes.keys()))
+
+  def test_set_vote__update(self):
+    """Voting again replaces the voter's previous vote."""
+    approval_defs.set_vote(
+        1, None, Vote.REVIEW_STARTED, 'reviewer@example.com', self.gate_id)
+    approval_defs.set_vote(
+        1, None, Vote.APPROVED, 'reviewer@example.com', self.gate_id)
+
+    votes = Vote.get_votes(gate_id=self.gate_id)
+    self.assertEqual([Vote.APPROVED], [v.state for v in votes])
+    summary = GateVoteSummary.make_key(self.gate_id).get()
+    self.assertEqual({str(Vote.APPROVED): 1}, summary.vote_counts)
+    self.assertEqual({}, summary.state_changing_votes)
+
+  def test_set_vote__earlier_state_applies_again(self):
+    """When the latest review vote changes, an earlier one applies."""
+    approval_defs.set_vote(
+        1, None, Vote.REVIEW_REQUESTED, 'owner@example.com', self.gate_id)
+    approval_defs.set_vote(
+        1, None, Vote.REVIEW_STARTED, 'reviewer@example.com', self.gate_id)
+    self.assertEqual(Vote.REVIEW_STARTED, Gate.get_by_id(self.gate_id).state)
+
+    approval_defs.set_vote(
+        1, None, Vote.APPROVED, 'reviewer@example.com', self.gate_id)
+
+    gate = Gate.get_by_id(self.gate_id)
+    votes = Vote.get_votes(gate_id=self.gate_id)
+    self.assertEqual(
+        approval_defs._calc_gate_state(votes, approval_defs.THREE_LGTM),
+        gate.state)
+    self.assertEqual(Vote.REVIEW_REQUESTED, gate.state)
+
+  def test_set_vote__migrates_legacy_votes(self):
+    """Votes with generated IDs are rekeyed the first time a gate is used."""
+    for state, day in [(Vote.REVIEW_REQUESTED, 1), (Vote.NEEDS_WORK, 2)]:
+      Vote(feature_id=1, gate_id=self.gate_id, state=state,
+           set_on=datetime.datetime(2020, 1, day),
+           set_by='reviewer@example.com').put()
+
+    approval_defs.set_vote(
+        1, None, Vote.REVIEW_REQUESTED, 'owner@example.com', self.gate_id)
+
+    votes = Vote.get_votes(gate_id=self.gate_id)
+    self.assertCountEqual(
+        [Vote.make_key(self.gate_id, 'reviewer@example.com'),
+         Vote.make_key(self.gate_id, 'owner@example.com')],
+        [v.key for v in votes])
+    summary = GateVoteSummary.make_key(self.gate_id).get()
+    self.assertEqual(
+        {str(Vote.NEEDS_WORK): 1, str(Vote.REVIEW_REQUESTED): 1},
+        summary.vote_counts)
+    self.assertEqual(Vote.REVIEW_REQUESTED, Gate.get_by_id(self.gate_id).state)
+
+  def test_set_vote__stale_gate_put(self):
+    """Putting a gate that was read before a vote keeps the vote counted."""
+    stale_gate = Gate.get_by_id(self.gate_id)
+    ndb.get_context().clear_cache()
+    approval_defs.set_vote(
+        1, None, Vote.REVIEW_REQUESTED, 'owner@example.com', self.gate_id)
+    stale_gate.put()
+    ndb.get_context().clear_cache()
+
+    approval_defs.set_vote(
+        1, None, Vote.APPROVED, 'reviewer@example.com', self.gate_id)
+
+    summary = GateVoteSummary.make_key(self.gate_id).get()
+    self.assertEqual(
+        {str(Vote.REVIEW_REQUESTED): 1, str(Vote.APPROVED): 1},
+        summary.vote_counts)
+
+  def test_put_gate_fields(self):
+    """Only the given fields are written over the stored gate."""
+    stale_gate = Gate.get_by_id(self.gate_id)
+    ndb.get_context().clear_cache()
+    approval_defs.set_vote(
+        1, None, Vote.REVIEW_REQUESTED, 'owner@example.com', self.gate_id)
+    ndb.get_context().clear_cache()
+
+    stale_gate.assignee_emails = ['reviewer@example.com']
+    approval_defs.put_gate_fields(stale_gate, ['assignee_emails'])
+
+    ndb.get_context().clear_cache()
+    gate = Gate.get_by_id(self.gate_id)
+    self.assertEqual(['reviewer@example.com'], gate.assignee_emails)
+    self.assertEqual(Vote.REVIEW_REQUESTED, gate.state)
+    self.assertEqual(Vote.REVIEW_REQUESTED, stale_gate.state)
+
+  def test_set_vote__slo_dates(self):
+    """SLO dates are stored in the same write as the vote summary."""
+    approval_defs.set_vote(
+        1, None, Vote.REVIEW_REQUESTED, 'owner@example.com', self.gate_id)
+    requested = Vote.make_key(self.gate_id, 'owner@example.com').get()
+    approval_defs.set_vote(
+        1, None, Vote.REVIEW_STARTED, 'reviewer@example.com', self.gate_id)
+    responded = Vote.make_key(self.gate_id, 'reviewer@example.com').get()
+
+    ndb.get_context().clear_cache()
+    gate = Gate.get_by_id(self.gate_id)
+    self.assertEqual(requested.set_on, gate.requested_on)
+    self.assertEqual(responded.set_on, gate.responded_on)
+    summary = GateVoteSummary.make_key(self.gate_id).get()
+    self.assertEqual(
+        {str(Vote.REVIEW_REQUESTED): 1, str(Vote.REVIEW_STARTED): 1},
+        summary.vote_counts)
+    record = GateLatencyRecord.get_by_id(self.gate_id)
+    self.assertEqual(gate.responded_on, record.responded_on)
+
+
 NR = Vote.NO_RESPONSE
 RR = Vote.REVIEW_REQUESTED
 AP = Vote.APPROVED
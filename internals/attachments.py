@@ -12,12 +12,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import datetime
 import io
 import logging
+import warnings
 from PIL import Image
 from google.cloud import ndb  # type: ignore
 from typing import Tuple
 
+from framework import basehandlers
+from framework import cloud_tasks_helpers
+from framework import rediscache
+from internals import blob_storage
 import settings
 
 
@@ -26,22 +32,50 @@ RESIZABLE_MIME_TYPES = [
     ]
 THUMB_WIDTH = 450
 THUMB_HEIGHT = 300
-
+THUMB_SIZES = {
+    'small': (THUMB_WIDTH // 3, THUMB_HEIGHT // 3),
+    'medium': (THUMB_WIDTH, THUMB_HEIGHT),
+    'large': (THUMB_WIDTH * 2, THUMB_HEIGHT * 2),
+    }
+DEFAULT_THUMB_SIZE = 'medium'
+# Thumbnail encodings in order of preference.  Formats that this build of
+# PIL cannot write are skipped, and PNG is always available as a fallback.
+THUMB_FORMATS = [
+    ('AVIF', 'image/avif'),
+    ('WEBP', 'image/webp'),
+    ('PNG', 'image/png'),
+    ]
+# Refuse to decode images with more pixels than this, because a small
+# compressed file can expand to gigabytes of memory.
+MAX_THUMB_SOURCE_PIXELS = 40 * 1000 * 1000
+# How long the digests that an attachment is served as are kept in redis,
+# so that conditional requests can be answered without a datastore read.
+ETAGS_CACHE_TIME = 60 * 60  # seconds
+# Blobs younger than this are never garbage collected, because their
+# attachment or thumbnail entity might not have been saved yet.
+BLOB_GC_GRACE_PERIOD = datetime.timedelta(days=1)
 
 
 class Attachment(ndb.Model):
   """Attaches files, such as screenshots, to a feature entry."""
   feature_id = ndb.IntegerProperty(required=True)
   created_on = ndb.DateTimeProperty(auto_now_add=True)
-  content = ndb.BlobProperty(required=True)
+  # Older attachments keep their content inline.  Newer ones only store
+  # the SHA-256 digest of the content, which is kept in blob storage.
+  content = ndb.BlobProperty()
+  content_hash = ndb.StringProperty()
+  size = ndb.IntegerProperty()
   mime_type = ndb.StringProperty(required=True)
   is_deleted = ndb.BooleanProperty(default=False)
 
 class Thumbnail(ndb.Model):
-  """Attaches files, such as screenshots, to a feature entry."""
+  """Smaller versions of an image attachment, keyed by attachment ID."""
   feature_id = ndb.IntegerProperty(required=True)
   attachment_id = ndb.IntegerProperty(required=True)
+  # Older thumbnails have a single PNG inline and an auto-assigned ID.
   thumb_content = ndb.BlobProperty()
+  # Maps size name to {mime_type: {'hash': blob digest, 'size': bytes}}.
+  variants = ndb.JsonProperty()
 
 
 class UnsupportedMimeType(Exception):
@@ -50,6 +84,9 @@ class UnsupportedMimeType(Exception):
 class AttachmentTooLarge(Exception):
   pass
 
+class ImageTooLarge(Exception):
+  pass
+
 
 SUPPORTED_MIME_TYPES = RESIZABLE_MIME_TYPES + ['text/plain']
 
@@ -61,33 +98,115 @@ def store_attachment(
   check_attachment_type(mime_type)
   logging.info('Storing attachment with %r bytes', len(content))
 
+  # Identical content uploaded to any feature is only stored once.
+  content_hash = blob_storage.get_blob_storage().store(content)
   attachment = Attachment(
       feature_id=feature_id,
-      content=content,
+      content_hash=content_hash,
+      size=len(content),
       mime_type=mime_type)
   attachment.put()
 
   if mime_type in RESIZABLE_MIME_TYPES:
-    # Create and save a thumbnail too.
-    thumb_content = None
+    # Decoding and resizing is slow for big images, so do it later.
+    cloud_tasks_helpers.enqueue_task(
+        '/tasks/generate-thumbnails',
+        {'attachment_id': attachment.key.integer_id()})
+
+  return attachment
+
+
+def get_thumb_formats() -> list[Tuple[str, str]]:
+  """Return the (PIL format, mime type) pairs that thumbnails are saved as."""
+  Image.init()
+  return [(image_format, mime_type)
+          for image_format, mime_type in THUMB_FORMATS
+          if image_format in Image.SAVE]
+
+
+def open_image(content: bytes) -> Image.Image:
+  """Decode an image, refusing ones that would use too much memory."""
+  with warnings.catch_warnings():
+    warnings.simplefilter('error', Image.DecompressionBombWarning)
     try:
       im = Image.open(io.BytesIO(content))
-      im.thumbnail((THUMB_WIDTH, THUMB_HEIGHT))
+    except (Image.DecompressionBombWarning, Image.DecompressionBombError) as e:
+      raise ImageTooLarge(str(e))
+    width, height = im.size
+    if width * height > MAX_THUMB_SOURCE_PIXELS:
+      raise ImageTooLarge('Image is %d x %d pixels' % (width, height))
+    # JPEGs can be decoded at a reduced scale, which is much faster.
+    largest = max(THUMB_SIZES.values())
+    if im.format == 'JPEG':
+      im.draft('RGB', largest)
+    im.load()
+  if im.mode not in ('RGB', 'RGBA'):
+    im = im.convert('RGBA')
+  return im
+
+
+def make_thumbnails(content: bytes) -> dict[str, dict[str, bytes]]:
+  """Return encoded thumbnails of an image by size name and mime type."""
+  im = open_image(content)
+  thumb_formats = get_thumb_formats()
+  result: dict[str, dict[str, bytes]] = {}
+  for size_name, dimensions in THUMB_SIZES.items():
+    thumb = im.copy()
+    thumb.thumbnail(dimensions)
+    result[size_name] = {}
+    for image_format, mime_type in thumb_formats:
       thumb_buffer = io.BytesIO()
-      im.save(thumb_buffer, 'PNG')
-      thumb_content = thumb_buffer.getvalue()
-    except Exception as e:
-      # Do not raise exception for incorrectly formed images.
-      logging.exception(e)
-    if thumb_content:
-      thumbnail = Thumbnail(
-          feature_id=feature_id,
-          attachment_id=attachment.key.integer_id(),
-          thumb_content=thumb_content)
-      thumbnail.put()
-      logging.info('Thumbnail is %r bytes', len(thumb_content))
+      thumb.save(thumb_buffer, image_format)
+      result[size_name][mime_type] = thumb_buffer.getvalue()
+  return result
 
-  return attachment
+
+def generate_thumbnails(attachment_id: int) -> Thumbnail|None:
+  """Create and save thumbnails for an image attachment."""
+  attachment = Attachment.get_by_id(attachment_id)
+  if (not attachment or attachment.is_deleted or
+      attachment.mime_type not in RESIZABLE_MIME_TYPES):
+    return None
+
+  content = get_attachment_content(attachment)
+  if not content:
+    return None
+  try:
+    encoded = make_thumbnails(content)
+  except Exception as e:
+    # Do not raise exception for incorrectly formed images.
+    logging.exception(e)
+    return None
+
+  storage = blob_storage.get_blob_storage()
+  variants = {
+      size_name: {mime_type: {'hash': storage.store(data), 'size': len(data)}
+                  for mime_type, data in by_mime_type.items()}
+      for size_name, by_mime_type in encoded.items()}
+  thumbnail = Thumbnail(
+      id=attachment_id,
+      feature_id=attachment.feature_id,
+      attachment_id=attachment_id,
+      variants=variants)
+  thumbnail.put()
+  clear_cached_etags(attachment_id)
+  logging.info(
+      'Thumbnails are %r bytes',
+      sum(len(data) for by_mime_type in encoded.values()
+          for data in by_mime_type.values()))
+  return thumbnail
+
+
+class GenerateThumbnailsHandler(basehandlers.FlaskHandler):
+  """Task to create the thumbnails for a newly uploaded image."""
+
+  IS_INTERNAL_HANDLER = True
+
+  def process_post_data(self, **kwargs):
+    self.require_task_header()
+    attachment_id = self.get_int_param('attachment_id')
+    generate_thumbnails(attachment_id)
+    return {'message': 'Done'}
 
 
 def check_attachment_size(content: bytes):
@@ -115,6 +234,34 @@ def get_attachment(feature_id: int, attachment_id: int) -> Attachment|None:
   return None
 
 
+def get_attachment_hash(attachment: Attachment) -> str:
+  """Return the SHA-256 digest of the attachment content."""
+  if attachment.content_hash:
+    return attachment.content_hash
+  return blob_storage.compute_digest(attachment.content or b'')
+
+
+def get_attachment_size(attachment: Attachment) -> int:
+  """Return the number of bytes in the attachment content."""
+  if attachment.size is not None:
+    return attachment.size
+  return len(attachment.content or b'')
+
+
+def get_attachment_content(
+    attachment: Attachment, start: int = 0,
+    stop: int|None = None) -> bytes|None:
+  """Return the attachment content, or bytes [start, stop) of it."""
+  if not attachment.content_hash:
+    return (attachment.content or b'')[start:stop]
+  storage = blob_storage.get_blob_storage()
+  if start == 0 and stop is None:
+    return storage.read(attachment.content_hash)
+  if stop is None:
+    stop = get_attachment_size(attachment)
+  return storage.read_range(attachment.content_hash, start, stop)
+
+
 def get_attachment_url(attachment: Attachment) -> str:
   """Return the URL path that will serve this attachment."""
   if settings.DEV_MODE or settings.UNIT_TEST_MODE:
@@ -135,6 +282,7 @@ def mark_attachment_deleted(attachment: Attachment) -> None:
   """Mark an attachment as deleted so that it will no longer be served."""
   attachment.is_deleted = True
   attachment.put()
+  clear_cached_etags(attachment.key.integer_id())
 
 
 def delete_orphan_attachments(feature_id: int, new_value: str) -> None:
@@ -147,8 +295,128 @@ def delete_orphan_attachments(feature_id: int, new_value: str) -> None:
       mark_attachment_deleted(a)
 
 
-def get_thumbnail(attachment_id: int) -> Thumbnail|None:
+def get_thumbnail(attachment: Attachment) -> Thumbnail|None:
   """Return a Thumbnail, if it exsits."""
-  thumbnail = Thumbnail.query(
-      Thumbnail.attachment_id == attachment_id).get()
+  attachment_id = attachment.key.integer_id()
+  thumbnail = Thumbnail.get_by_id(attachment_id)
+  if thumbnail is None and not attachment.content_hash:
+    # Attachments stored inline may have a thumbnail with an auto ID.
+    thumbnail = Thumbnail.query(
+        Thumbnail.attachment_id == attachment_id).get()
   return thumbnail
+
+
+def select_thumbnail_variant(
+    thumbnail: Thumbnail, size_name: str,
+    accepted_mime_types: list[str]) -> Tuple[str, dict]|None:
+  """Return the mime type and blob info of the best variant for the client.
+
+  The client gets the first format in THUMB_FORMATS that it accepts.
+  PNG is always acceptable because every browser can show it.
+  """
+  by_mime_type = (thumbnail.variants or {}).get(size_name)
+  if not by_mime_type:
+    return None
+  for _, mime_type in THUMB_FORMATS:
+    if mime_type in by_mime_type and (
+        mime_type == 'image/png' or mime_type in accepted_mime_types):
+      return mime_type, by_mime_type[mime_type]
+  return None
+
+
+def get_etags_cache_key(attachment_id: int, is_thumb: bool) -> str:
+  url_kind = 'thumbnail' if is_thumb else 'attachment'
+  return 'attachment_etags|%d|%s' % (attachment_id, url_kind)
+
+
+def clear_cached_etags(attachment_id: int) -> None:
+  """Forget the digests that the attachment and its thumbnail were served as."""
+  rediscache.delete(get_etags_cache_key(attachment_id, False))
+  rediscache.delete(get_etags_cache_key(attachment_id, True))
+
+
+def cache_etags(
+    attachment: Attachment, is_thumb: bool,
+    thumbnail: Thumbnail|None = None) -> None:
+  """Remember the digests that the attachment or thumbnail URL serves."""
+  hashes: list[str]|dict[str, list[str]]
+  if not is_thumb:
+    hashes = [get_attachment_hash(attachment)]
+  elif thumbnail and thumbnail.variants:
+    hashes = {
+        size_name: [variant['hash'] for variant in by_mime_type.values()]
+        for size_name, by_mime_type in thumbnail.variants.items()}
+  elif thumbnail and thumbnail.thumb_content:
+    legacy_hash = blob_storage.compute_digest(thumbnail.thumb_content)
+    hashes = {size_name: [legacy_hash] for size_name in THUMB_SIZES}
+  else:
+    # Pending thumbnails are served by the normal path until they exist.
+    hashes = {}
+  cached = {'feature_id': attachment.feature_id, 'hashes': hashes}
+  rediscache.set(
+      get_etags_cache_key(attachment.key.integer_id(), is_thumb), cached,
+      time=ETAGS_CACHE_TIME)
+
+
+def get_cached_etags(
+    feature_id: int, attachment_id: int,
+    thumb_size_name: str|None = None) -> list[str]:
+  """Return the digests that an attachment URL was recently served as.
+
+  Pass thumb_size_name for a thumbnail URL.  The result is empty if the
+  attachment is not cached, has been deleted, or has no such thumbnail.
+  """
+  is_thumb = thumb_size_name is not None
+  cached = rediscache.get(get_etags_cache_key(attachment_id, is_thumb))
+  if not cached or cached['feature_id'] != feature_id:
+    return []
+  if thumb_size_name is None:
+    return cached['hashes']
+  return cached['hashes'].get(thumb_size_name, [])
+
+
+def get_used_blob_hashes() -> set[str]:
+  """Return the digests of all blobs used by undeleted attachments."""
+  used_hashes: set[str] = set()
+  live_ids: set[int] = set()
+  for attachment in Attachment.query():
+    if not attachment.is_deleted:
+      live_ids.add(attachment.key.integer_id())
+      if attachment.content_hash:
+        used_hashes.add(attachment.content_hash)
+  for thumbnail in Thumbnail.query():
+    if thumbnail.attachment_id in live_ids:
+      for by_mime_type in (thumbnail.variants or {}).values():
+        used_hashes.update(
+            variant['hash'] for variant in by_mime_type.values())
+  return used_hashes
+
+
+def delete_unused_blobs(now: datetime.datetime|None = None) -> int:
+  """Delete blobs that are not used by any undeleted attachment.
+
+  Attachments are only soft deleted, so their content stays in blob
+  storage until this runs.  Return the number of blobs deleted.
+  """
+  now = now or datetime.datetime.now()
+  storage = blob_storage.get_blob_storage()
+  # List old blobs before finding used ones, so that any attachment that
+  # reuses one of them in the meantime is seen as using it.
+  old_hashes = list(storage.list_created_before(now - BLOB_GC_GRACE_PERIOD))
+  used_hashes = get_used_blob_hashes()
+  count = 0
+  for digest in old_hashes:
+    if digest not in used_hashes:
+      storage.delete(digest)
+      count += 1
+  logging.info('Deleted %r unused blobs', count)
+  return count
+
+
+class DeleteUnusedBlobsHandler(basehandlers.FlaskHandler):
+  """Cron job to garbage collect the blobs of deleted attachments."""
+
+  def get_template_data(self, **kwargs) -> str:
+    self.require_cron_header()
+    count = delete_unused_blobs()
+    return f'{count} unused blobs deleted.'
@@ -14,9 +14,15 @@
 
 import testing_config  # Must be imported before the module under test.
 
+import datetime
+import io
 from unittest import mock
 
+from PIL import Image
+
+from framework import rediscache
 from internals import attachments
+from internals import blob_storage
 
 
 class AttachmentsTests(testing_config.CustomTestCase):
@@ -25,9 +31,11 @@ class AttachmentsTests(testing_config.CustomTestCase):
     self.feature_id = 12345678
 
   def tearDown(self):
-    for kind in [attachments.Attachment, attachments.Thumbnail]:
+    for kind in [attachments.Attachment, attachments.Thumbnail,
+                 blob_storage.StoredBlob]:
       for model in kind.query().fetch(None):
         model.key.delete()
+    rediscache.flushall()
 
   def test_store_attachment(self):
     """We can store attachment content."""
@@ -36,9 +44,52 @@ class AttachmentsTests(testing_config.CustomTestCase):
     attach_id = actual.key.integer_id()
     retrieved = attachments.Attachment.get_by_id(attach_id)
     self.assertEqual(retrieved.feature_id, self.feature_id)
-    self.assertEqual(retrieved.content, b'test content')
+    self.assertIsNone(retrieved.content)
+    self.assertEqual(
+        retrieved.content_hash,
+        blob_storage.compute_digest(b'test content'))
+    self.assertEqual(retrieved.size, len(b'test content'))
+    self.assertEqual(
+        attachments.get_attachment_content(retrieved), b'test content')
     self.assertEqual(retrieved.mime_type, 'text/plain')
 
+  def test_store_attachment__deduplicated(self):
+    """Uploading the same content twice only stores one blob."""
+    first = attachments.store_attachment(
+        self.feature_id, b'same content', 'text/plain')
+    second = attachments.store_attachment(
+        self.feature_id + 1, b'same content', 'text/plain')
+
+    self.assertNotEqual(first.key, second.key)
+    self.assertEqual(first.content_hash, second.content_hash)
+    self.assertEqual(1, len(blob_storage.StoredBlob.query().fetch()))
+
+  def test_get_attachment_content__legacy(self):
+    """Attachments stored before content hashing still work."""
+    legacy = attachments.Attachment(
+        feature_id=self.feature_id, content=b'old content',
+        mime_type='text/plain')
+    legacy.put()
+
+    self.assertEqual(
+        b'old content', attachments.get_attachment_content(legacy))
+    self.assertEqual(
+        b'd co', attachments.get_attachment_content(legacy, 2, 6))
+    self.assertEqual(11, attachments.get_attachment_size(legacy))
+    self.assertEqual(
+        blob_storage.compute_digest(b'old content'),
+        attachments.get_attachment_hash(legacy))
+
+  def test_get_attachment_content__range(self):
+    """We can read part of an attachment from blob storage."""
+    stored = attachments.store_attachment(
+        self.feature_id, b'0123456789', 'text/plain')
+
+    self.assertEqual(
+        b'2345', attachments.get_attachment_content(stored, 2, 6))
+    self.assertEqual(
+        b'789', attachments.get_attachment_content(stored, 7))
+
   def test_check_attachment_size(self):
     """We can check the size of the attachment content."""
     attachments.check_attachment_size(b'small content')
@@ -69,7 +120,8 @@ class AttachmentsTests(testing_config.CustomTestCase):
     actual = attachments.get_attachment(self.feature_id, attach_id)
 
     self.assertEqual(actual.feature_id, self.feature_id)
-    self.assertEqual(actual.content, b'test content')
+    self.assertEqual(
+        attachments.get_attachment_content(actual), b'test content')
     self.assertEqual(actual.mime_type, 'text/plain')
 
   def test_get_attachment__not_found(self):
@@ -161,3 +213,176 @@ class AttachmentsTests(testing_config.CustomTestCase):
     all_attach = attachments.Attachment.query().fetch()
     self.assertEqual(len(all_attach), 1)
     self.assertTrue(all_attach[0].is_deleted)
+
+  def make_image(self, width=1200, height=900, image_format='PNG') -> bytes:
+    im = Image.new('RGB', (width, height), color=(200, 100, 50))
+    image_buffer = io.BytesIO()
+    im.save(image_buffer, image_format)
+    return image_buffer.getvalue()
+
+  @mock.patch('framework.cloud_tasks_helpers.enqueue_task')
+  def test_store_attachment__image_deferred(self, mock_enqueue):
+    """Image thumbnails are generated later in a task."""
+    actual = attachments.store_attachment(
+        self.feature_id, self.make_image(), 'image/png')
+
+    mock_enqueue.assert_called_once_with(
+        '/tasks/generate-thumbnails',
+        {'attachment_id': actual.key.integer_id()})
+    self.assertEqual([], attachments.Thumbnail.query().fetch())
+
+  @mock.patch('framework.cloud_tasks_helpers.enqueue_task')
+  def test_store_attachment__text_not_deferred(self, mock_enqueue):
+    """Non-image attachments do not get thumbnails."""
+    attachments.store_attachment(
+        self.feature_id, b'test content', 'text/plain')
+    mock_enqueue.assert_not_called()
+
+  def test_make_thumbnails(self):
+    """Each size is encoded in each available format."""
+    actual = attachments.make_thumbnails(self.make_image())
+
+    self.assertEqual(set(attachments.THUMB_SIZES), set(actual))
+    for size_name, (width, height) in attachments.THUMB_SIZES.items():
+      self.assertIn('image/png', actual[size_name])
+      im = Image.open(io.BytesIO(actual[size_name]['image/png']))
+      self.assertLessEqual(im.size[0], width)
+      self.assertLessEqual(im.size[1], height)
+
+  @mock.patch('internals.attachments.MAX_THUMB_SOURCE_PIXELS', 100)
+  def test_make_thumbnails__too_many_pixels(self):
+    """Images that would take too much memory to decode are refused."""
+    with self.assertRaises(attachments.ImageTooLarge):
+      attachments.make_thumbnails(self.make_image(width=20, height=20))
+
+  def test_generate_thumbnails(self):
+    """Thumbnails are stored under the ID of the attachment."""
+    with mock.patch('framework.cloud_tasks_helpers.enqueue_task'):
+      stored = attachments.store_attachment(
+          self.feature_id, self.make_image(), 'image/png')
+    attach_id = stored.key.integer_id()
+
+    attachments.generate_thumbnails(attach_id)
+
+    thumbnail = attachments.get_thumbnail(stored)
+    self.assertEqual(attach_id, thumbnail.key.id())
+    variant = thumbnail.variants['medium']['image/png']
+    content = blob_storage.get_blob_storage().read(variant['hash'])
+    self.assertEqual(variant['size'], len(content))
+
+  def test_generate_thumbnails__bad_image(self):
+    """Incorrectly formed images simply get no thumbnails."""
+    with mock.patch('framework.cloud_tasks_helpers.enqueue_task'):
+      stored = attachments.store_attachment(
+          self.feature_id, b'not really a png', 'image/png')
+
+    actual = attachments.generate_thumbnails(stored.key.integer_id())
+
+    self.assertIsNone(actual)
+    self.assertIsNone(attachments.get_thumbnail(stored))
+
+  def test_get_thumbnail__legacy(self):
+    """Thumbnails of older attachments are found by attachment_id."""
+    legacy = attachments.Attachment(
+        feature_id=self.feature_id, content=b'old content',
+        mime_type='image/png')
+    legacy.put()
+    attachments.Thumbnail(
+        feature_id=self.feature_id, attachment_id=legacy.key.integer_id(),
+        thumb_content=b'old thumb').put()
+
+    actual = attachments.get_thumbnail(legacy)
+
+    self.assertEqual(b'old thumb', actual.thumb_content)
+
+  def test_select_thumbnail_variant(self):
+    """Clients get the best format that they accept."""
+    thumbnail = attachments.Thumbnail(
+        feature_id=self.feature_id, attachment_id=1,
+        variants={'medium': {
+            'image/avif': {'hash': 'a', 'size': 1},
+            'image/webp': {'hash': 'w', 'size': 2},
+            'image/png': {'hash': 'p', 'size': 3},
+            }})
+
+    self.assertEqual(
+        ('image/avif', {'hash': 'a', 'size': 1}),
+        attachments.select_thumbnail_variant(
+            thumbnail, 'medium', ['image/avif', 'image/webp']))
+    self.assertEqual(
+        ('image/webp', {'hash': 'w', 'size': 2}),
+        attachments.select_thumbnail_variant(
+            thumbnail, 'medium', ['image/webp', '*/*']))
+    self.assertEqual(
+        ('image/png', {'hash': 'p', 'size': 3}),
+        attachments.select_thumbnail_variant(thumbnail, 'medium', []))
+    self.assertIsNone(
+        attachments.select_thumbnail_variant(thumbnail, 'huge', []))
+
+  def test_get_cached_etags(self):
+    """Served digests are cached until the attachment is deleted."""
+    attachment = attachments.store_attachment(
+        self.feature_id, b'test content', 'text/plain')
+    attach_id = attachment.key.integer_id()
+    thumbnail = attachments.Thumbnail(
+        feature_id=self.feature_id, attachment_id=attach_id,
+        variants={'medium': {
+            'image/webp': {'hash': 'w', 'size': 2},
+            'image/png': {'hash': 'p', 'size': 3},
+            }})
+    self.assertEqual(
+        [], attachments.get_cached_etags(self.feature_id, attach_id))
+
+    attachments.cache_etags(attachment, False)
+    self.assertEqual(
+        [], attachments.get_cached_etags(self.feature_id, attach_id, 'medium'))
+    attachments.cache_etags(attachment, True, thumbnail)
+
+    self.assertEqual(
+        [attachment.content_hash],
+        attachments.get_cached_etags(self.feature_id, attach_id))
+    self.assertEqual(
+        ['w', 'p'],
+        attachments.get_cached_etags(self.feature_id, attach_id, 'medium'))
+    self.assertEqual(
+        [], attachments.get_cached_etags(self.feature_id, attach_id, 'small'))
+    self.assertEqual(
+        [], attachments.get_cached_etags(self.feature_id + 1, attach_id))
+
+    attachments.mark_attachment_deleted(attachment)
+    self.assertEqual(
+        [], attachments.get_cached_etags(self.feature_id, attach_id))
+    self.assertEqual(
+        [], attachments.get_cached_etags(self.feature_id, attach_id, 'medium'))
+
+  def test_delete_unused_blobs(self):
+    """Only old blobs that no undeleted attachment uses are deleted."""
+    storage = blob_storage.get_blob_storage()
+    live = attachments.store_attachment(
+        self.feature_id, b'live content', 'text/plain')
+    deleted = attachments.store_attachment(
+        self.feature_id, b'deleted content', 'text/plain')
+    attachments.mark_attachment_deleted(deleted)
+    thumb_hash = storage.store(b'live thumb')
+    attachments.Thumbnail(
+        id=live.key.integer_id(), feature_id=self.feature_id,
+        attachment_id=live.key.integer_id(),
+        variants={'medium': {'image/png': {'hash': thumb_hash, 'size': 10}}},
+        ).put()
+    deleted_thumb_hash = storage.store(b'deleted thumb')
+    attachments.Thumbnail(
+        id=deleted.key.integer_id(), feature_id=self.feature_id,
+        attachment_id=deleted.key.integer_id(),
+        variants={'medium': {
+            'image/png': {'hash': deleted_thumb_hash, 'size': 13}}},
+        ).put()
+
+    # Blobs that were just written are kept, in case they are in use soon.
+    self.assertEqual(0, attachments.delete_unused_blobs())
+
+    later = datetime.datetime.now() + datetime.timedelta(days=2)
+    self.assertEqual(2, attachments.delete_unused_blobs(now=later))
+    self.assertTrue(storage.exists(live.content_hash))
+    self.assertTrue(storage.exists(thumb_hash))
+    self.assertFalse(storage.exists(deleted.content_hash))
+    self.assertFalse(storage.exists(deleted_thumb_hash))
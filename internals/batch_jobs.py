@@ -0,0 +1,348 @@
+# Copyright 2025 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License")
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Maintenance jobs that work through a query in resumable chunks.
+
+A BatchJob pages through the results of a query with a datastore cursor.
+After each chunk it writes the chunk's changes with put_multi and
+delete_multi and then saves the cursor in a BatchJobCheckpoint.  When a
+request has used up its time budget, the job enqueues a task that
+continues from the checkpoint.  If a continuation task fails, Cloud Tasks
+retries it from the last checkpoint, and a failed first request can be
+continued by requesting the job again with resume=1.
+
+Only one request works on a run at a time.  A request claims the
+checkpoint in a transaction by taking a lease on it, and each task carries
+a sequence number that must match the checkpoint.  If Cloud Tasks delivers
+a task twice, the second delivery is retried later while the first holds
+the lease, and then does nothing once the run has moved on to the next
+task.  So chunks are never processed by two requests at once and the chain
+of tasks does not fork.
+
+A chunk can be processed a second time if a request fails after writing
+it but before saving the checkpoint, so processing must be idempotent.
+"""
+
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any
+
+import flask
+from google.cloud import ndb  # type: ignore
+
+from framework import cloud_tasks_helpers
+from framework.basehandlers import FlaskHandler
+
+
+class BatchJobCheckpoint(ndb.Model):
+  """The progress and metrics of the latest run of one batch job.
+
+  Keyed by job name, with a '|dry_run' suffix for dry runs so that a dry
+  run does not replace the progress of a real run.
+  """
+  run_id = ndb.StringProperty(required=True)
+  dry_run = ndb.BooleanProperty(default=False)
+  # Urlsafe cursor after the last completed chunk, or None at the start.
+  cursor = ndb.StringProperty(indexed=False)
+  started = ndb.DateTimeProperty(required=True)
+  updated = ndb.DateTimeProperty(auto_now=True)
+  finished = ndb.DateTimeProperty()
+  # Number of the continuation task that may run next.
+  sequence = ndb.IntegerProperty(default=0)
+  # The request that is working on the run, and until when it may do so.
+  lease_id = ndb.StringProperty()
+  lease_expires = ndb.DateTimeProperty()
+
+  num_requests = ndb.IntegerProperty(default=0)
+  num_chunks = ndb.IntegerProperty(default=0)
+  num_read = ndb.IntegerProperty(default=0)
+  num_written = ndb.IntegerProperty(default=0)
+  num_deleted = ndb.IntegerProperty(default=0)
+  elapsed_sec = ndb.FloatProperty(default=0.0)
+  # Job-specific counts and notes that are used to make the result.
+  counters = ndb.JsonProperty()
+  notes = ndb.JsonProperty()
+
+
+class BatchJob(FlaskHandler):
+  """Base class for maintenance jobs that process a query in chunks.
+
+  Subclasses implement make_query(), process_entity() or process_chunk(),
+  and make_result().  Processing should call put() and delete() rather
+  than writing entities itself, so that writes are batched and skipped in
+  a dry run.  GET starts a new run and POST is used by continuation tasks.
+  """
+
+  IS_INTERNAL_HANDLER = True
+  JOB_PATH = ''  # The route of the job, which continuation tasks POST to.
+  CHUNK_SIZE = 100
+  TIME_BUDGET_SEC = 5 * 60
+  # If a request dies, another can take over the run after this long.
+  LEASE_SEC = 2 * TIME_BUDGET_SEC
+
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    self.kwargs: dict[str, Any] = {}
+    self.checkpoint: BatchJobCheckpoint | None = None
+    self.lease_id = uuid.uuid4().hex
+    self.to_put: list[ndb.Model] = []
+    self.to_delete: list[ndb.Key] = []
+
+  def make_query(self) -> ndb.Query:
+    """Return the query to page through.  It must support cursors."""
+    raise NotImplementedError()
+
+  def prepare(self) -> None:
+    """Load anything needed by every chunk.  Called once per request."""
+    pass
+
+  def process_chunk(self, entities: list[Any]) -> None:
+    """Process one page of query results."""
+    for entity in entities:
+      self.process_entity(entity)
+
+  def process_entity(self, entity: Any) -> None:
+    raise NotImplementedError()
+
+  def make_result(self) -> str:
+    """Return a summary of the finished run."""
+    raise NotImplementedError()
+
+  @property
+  def dry_run(self) -> bool:
+    return bool(self.checkpoint and self.checkpoint.dry_run)
+
+  def put(self, entity: ndb.Model) -> None:
+    """Write the entity after the current chunk, unless this is a dry run."""
+    self.to_put.append(entity)
+
+  def delete(self, key: ndb.Key) -> None:
+    """Delete the entity after the current chunk, unless this is a dry run."""
+    self.to_delete.append(key)
+
+  def count(self, name: str, n: int = 1) -> None:
+    """Add n to a counter that is kept for the whole run."""
+    assert self.checkpoint
+    self.checkpoint.counters[name] = self.checkpoint.counters.get(name, 0) + n
+
+  def get_count(self, name: str) -> int:
+    assert self.checkpoint
+    return self.checkpoint.counters.get(name, 0)
+
+  def note(self, text: str) -> None:
+    """Remember a line of text to include in the result of the run."""
+    assert self.checkpoint
+    self.checkpoint.notes.append(text)
+
+  def get_notes(self) -> list[str]:
+    assert self.checkpoint
+    return self.checkpoint.notes
+
+  def write_chunk(self) -> None:
+    """Write the changes made while processing the current chunk."""
+    assert self.checkpoint
+    if not self.dry_run:
+      if self.to_put:
+        ndb.put_multi(self.to_put)
+      if self.to_delete:
+        ndb.delete_multi(self.to_delete)
+    self.checkpoint.num_written += len(self.to_put)
+    self.checkpoint.num_deleted += len(self.to_delete)
+    self.to_put = []
+    self.to_delete = []
+
+  def get_job_name(self) -> str:
+    return self.__class__.__name__
+
+  def _get_flag(self, name: str) -> bool:
+    """Return a boolean option given as a keyword or query string arg."""
+    if name in self.kwargs:
+      return bool(self.kwargs[name])
+    if flask.has_request_context():
+      return self.get_bool_arg(name)
+    return False
+
+  def get_template_data(self, **kwargs) -> str:
+    """Start a new run of the job, or resume the latest unfinished run."""
+    self.require_cron_header()
+    self.kwargs = kwargs
+    dry_run = self._get_flag('dry_run')
+    checkpoint_id = self.get_job_name()
+    if dry_run:
+      checkpoint_id += '|dry_run'
+
+    if self._get_flag('resume'):
+      checkpoint = self._claim_checkpoint(checkpoint_id)
+      if checkpoint:
+        logging.info('Resuming %s run %s', checkpoint_id, checkpoint.run_id)
+        return self._run(checkpoint)
+
+    # Any continuation tasks of a previous run will see the new run_id
+    # and stop.
+    checkpoint = BatchJobCheckpoint(
+        id=checkpoint_id, run_id=uuid.uuid4().hex, dry_run=dry_run,
+        started=datetime.now(), counters={}, notes=[],
+        lease_id=self.lease_id, lease_expires=self._get_lease_expiry())
+    checkpoint.put()
+    return self._run(checkpoint)
+
+  def process_post_data(self, **kwargs) -> dict[str, str]:
+    """Continue a run from its checkpoint."""
+    self.require_task_header()
+    self.kwargs = kwargs
+    checkpoint_id = self.get_param('checkpoint_id')
+    run_id = self.get_param('run_id')
+    sequence = self.get_int_param('sequence')
+    return {'message': self.continue_run(checkpoint_id, run_id, sequence)}
+
+  def continue_run(
+      self, checkpoint_id: str, run_id: str, sequence: int) -> str:
+    """Continue the given run, unless it has finished or was replaced."""
+    checkpoint = BatchJobCheckpoint.get_by_id(checkpoint_id)
+    if not checkpoint or checkpoint.run_id != run_id:
+      logging.info('Run %s of %s was replaced', run_id, checkpoint_id)
+      return 'Run was replaced.'
+    if checkpoint.finished:
+      logging.info('Run %s of %s already finished', run_id, checkpoint_id)
+      return 'Run already finished.'
+    checkpoint = self._claim_checkpoint(checkpoint_id, run_id, sequence)
+    if not checkpoint:
+      logging.info(
+          'Task %d of %s run %s already ran', sequence, checkpoint_id, run_id)
+      return 'Task already ran.'
+    return self._run(checkpoint)
+
+  def _get_lease_expiry(self) -> datetime:
+    return datetime.now() + timedelta(seconds=self.LEASE_SEC)
+
+  @ndb.transactional()
+  def _claim_checkpoint(
+      self, checkpoint_id: str, run_id: str | None = None,
+      sequence: int | None = None) -> BatchJobCheckpoint | None:
+    """Take the lease on an unfinished run, if the task may still run.
+
+    Without a sequence number, as when resuming, any pending task of the
+    run becomes stale.  While another request holds the lease, abort so
+    that Cloud Tasks retries the task later.
+    """
+    checkpoint = BatchJobCheckpoint.get_by_id(checkpoint_id)
+    if (not checkpoint or checkpoint.finished or
+        (run_id is not None and checkpoint.run_id != run_id) or
+        (sequence is not None and checkpoint.sequence != sequence)):
+      return None
+    if (checkpoint.lease_expires and
+        checkpoint.lease_expires > datetime.now()):
+      self.abort(409, msg='Another request is working on this run')
+    if sequence is None:
+      checkpoint.sequence += 1
+    checkpoint.lease_id = self.lease_id
+    checkpoint.lease_expires = self._get_lease_expiry()
+    checkpoint.put()
+    return checkpoint
+
+  @ndb.transactional()
+  def _save_checkpoint(
+      self, checkpoint: BatchJobCheckpoint, release: bool = False) -> bool:
+    """Save progress, unless another request has taken over the run."""
+    stored = checkpoint.key.get()
+    if not stored or stored.lease_id != self.lease_id:
+      logging.warning(
+          'Lease on %s run %s was lost', checkpoint.key.id(),
+          checkpoint.run_id)
+      return False
+    if release:
+      checkpoint.lease_id = None
+      checkpoint.lease_expires = None
+    else:
+      checkpoint.lease_expires = self._get_lease_expiry()
+    checkpoint.put()
+    return True
+
+  @ndb.transactional()
+  def _release_lease(self, checkpoint_id: str) -> None:
+    """Let a retry take over the run right away."""
+    stored = BatchJobCheckpoint.get_by_id(checkpoint_id)
+    if stored and stored.lease_id == self.lease_id:
+      stored.lease_id = None
+      stored.lease_expires = None
+      stored.put()
+
+  def _run(self, checkpoint: BatchJobCheckpoint) -> str:
+    """Process chunks until the query is done or the time budget is used."""
+    try:
+      return self._run_chunks(checkpoint)
+    except Exception:
+      self._release_lease(checkpoint.key.id())
+      raise
+
+  def _run_chunks(self, checkpoint: BatchJobCheckpoint) -> str:
+    self.checkpoint = checkpoint
+    start_time = time.monotonic()
+    checkpoint.num_requests += 1
+    self.prepare()
+    query = self.make_query()
+    cursor = (ndb.Cursor(urlsafe=checkpoint.cursor)
+              if checkpoint.cursor else None)
+
+    while True:
+      chunk_start_time = time.monotonic()
+      entities, next_cursor, more = query.fetch_page(
+          self.CHUNK_SIZE, start_cursor=cursor)
+      self.process_chunk(entities)
+      self.write_chunk()
+      checkpoint.num_chunks += 1
+      checkpoint.num_read += len(entities)
+      checkpoint.elapsed_sec += time.monotonic() - chunk_start_time
+      cursor = next_cursor if more else None
+      checkpoint.cursor = cursor.urlsafe().decode() if cursor else None
+      if not cursor:
+        checkpoint.finished = datetime.now()
+      out_of_time = bool(
+          cursor and time.monotonic() - start_time >= self.TIME_BUDGET_SEC)
+      if out_of_time:
+        # Only the task enqueued below may continue the run.
+        checkpoint.sequence += 1
+      if not self._save_checkpoint(
+          checkpoint, release=not cursor or out_of_time):
+        return 'Run was taken over by another request.'
+      if not cursor:
+        break
+
+      if out_of_time:
+        cloud_tasks_helpers.enqueue_task(
+            self.JOB_PATH,
+            {'checkpoint_id': checkpoint.key.id(),
+             'run_id': checkpoint.run_id,
+             'sequence': checkpoint.sequence})
+        self.log_metrics('continuing')
+        return (f'Processed {checkpoint.num_read} entities so far, '
+                'continuing in a task.')
+
+    self.log_metrics('finished')
+    result = self.make_result()
+    if self.dry_run:
+      result = 'Dry run: ' + result
+    return result
+
+  def log_metrics(self, status: str) -> None:
+    cp = self.checkpoint
+    assert cp
+    logging.info(
+        '%s run %s %s: %d requests, %d chunks, %d read, %d written, '
+        '%d deleted, %.1f sec, counters %r',
+        cp.key.id(), cp.run_id, status, cp.num_requests, cp.num_chunks,
+        cp.num_read, cp.num_written, cp.num_deleted, cp.elapsed_sec,
+        cp.counters)
@@ -0,0 +1,208 @@
+# Copyright 2025 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License")
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import testing_config  # Must be imported before the module under test.
+
+from unittest import mock
+
+from google.cloud import ndb  # type: ignore
+import werkzeug.exceptions
+
+from internals import batch_jobs
+from internals.batch_jobs import BatchJobCheckpoint
+
+
+class Widget(ndb.Model):
+  number = ndb.IntegerProperty()
+  doubled = ndb.IntegerProperty()
+
+
+class DoubleNumbers(batch_jobs.BatchJob):
+  JOB_PATH = '/test/double_numbers'
+  CHUNK_SIZE = 3
+
+  def __init__(self, fail_on=None):
+    super().__init__()
+    self.fail_on = fail_on
+    self.processed: list[int] = []
+
+  def make_query(self):
+    return Widget.query().order(Widget.number)
+
+  def process_entity(self, widget):
+    if widget.number == self.fail_on:
+      raise ValueError('Simulated failure')
+    self.processed.append(widget.number)
+    if widget.doubled is None:
+      widget.doubled = widget.number * 2
+      self.put(widget)
+      self.count('doubled')
+
+  def make_result(self):
+    return f'{self.get_count("doubled")} widgets doubled.'
+
+
+class BatchJobTest(testing_config.CustomTestCase):
+
+  def setUp(self):
+    ndb.put_multi([Widget(number=n) for n in range(10)])
+
+  def tearDown(self):
+    for kind in [Widget, BatchJobCheckpoint]:
+      for entity in kind.query():
+        entity.key.delete()
+
+  def get_doubled(self):
+    # Jobs change entities in memory even when they do not write them.
+    ndb.get_context().clear_cache()
+    widgets = Widget.query().order(Widget.number).fetch()
+    return [w.doubled for w in widgets]
+
+  def test_get_template_data__one_request(self):
+    """A job that fits in its time budget finishes in one request."""
+    job = DoubleNumbers()
+    actual = job.get_template_data()
+
+    self.assertEqual('10 widgets doubled.', actual)
+    self.assertEqual([n * 2 for n in range(10)], self.get_doubled())
+    checkpoint = BatchJobCheckpoint.get_by_id('DoubleNumbers')
+    self.assertIsNotNone(checkpoint.finished)
+    self.assertIsNone(checkpoint.cursor)
+    self.assertEqual(1, checkpoint.num_requests)
+    self.assertEqual(10, checkpoint.num_read)
+    self.assertEqual(10, checkpoint.num_written)
+    self.assertEqual(0, checkpoint.num_deleted)
+    self.assertEqual({'doubled': 10}, checkpoint.counters)
+
+  @mock.patch.object(DoubleNumbers, 'TIME_BUDGET_SEC', 0)
+  @mock.patch('framework.cloud_tasks_helpers.enqueue_task')
+  def test_get_template_data__continues_in_tasks(self, mock_enqueue):
+    """When the time budget is used, the job continues in a task."""
+    actual = DoubleNumbers().get_template_data()
+    self.assertEqual(
+        'Processed 3 entities so far, continuing in a task.', actual)
+    self.assertEqual([0, 2, 4] + [None] * 7, self.get_doubled())
+
+    num_tasks = 0
+    while mock_enqueue.called:
+      num_tasks += 1
+      path, params = mock_enqueue.call_args.args
+      self.assertEqual('/test/double_numbers', path)
+      mock_enqueue.reset_mock()
+      actual = DoubleNumbers().continue_run(
+          params['checkpoint_id'], params['run_id'], params['sequence'])
+
+    self.assertEqual(3, num_tasks)
+    self.assertEqual('10 widgets doubled.', actual)
+    self.assertEqual([n * 2 for n in range(10)], self.get_doubled())
+    checkpoint = BatchJobCheckpoint.get_by_id('DoubleNumbers')
+    self.assertEqual(4, checkpoint.num_requests)
+    self.assertEqual(4, checkpoint.num_chunks)
+    self.assertEqual(10, checkpoint.num_written)
+
+  def test_get_template_data__resume(self):
+    """After a failure, a resumed run skips the chunks that were done."""
+    with self.assertRaises(ValueError):
+      DoubleNumbers(fail_on=3).get_template_data()
+    # Only the first chunk was written.
+    self.assertEqual([0, 2, 4] + [None] * 7, self.get_doubled())
+
+    job = DoubleNumbers()
+    actual = job.get_template_data(resume=True)
+
+    self.assertEqual('10 widgets doubled.', actual)
+    self.assertEqual(list(range(3, 10)), job.processed)
+    self.assertEqual([n * 2 for n in range(10)], self.get_doubled())
+    checkpoint = BatchJobCheckpoint.get_by_id('DoubleNumbers')
+    self.assertEqual(2, checkpoint.num_requests)
+    self.assertEqual(10, checkpoint.num_read)
+
+  def test_get_template_data__no_resume(self):
+    """Without resume, a new run starts from the beginning."""
+    with self.assertRaises(ValueError):
+      DoubleNumbers(fail_on=3).get_template_data()
+
+    job = DoubleNumbers()
+    actual = job.get_template_data()
+
+    # The first chunk was already doubled, so it needed no updates.
+    self.assertEqual('7 widgets doubled.', actual)
+    self.assertEqual(list(range(10)), job.processed)
+
+  def test_get_template_data__dry_run(self):
+    """A dry run reports what would change without writing it."""
+    actual = DoubleNumbers().get_template_data(dry_run=True)
+
+    self.assertEqual('Dry run: 10 widgets doubled.', actual)
+    self.assertEqual([None] * 10, self.get_doubled())
+    checkpoint = BatchJobCheckpoint.get_by_id('DoubleNumbers|dry_run')
+    self.assertTrue(checkpoint.dry_run)
+    self.assertEqual(10, checkpoint.num_written)
+    self.assertIsNone(BatchJobCheckpoint.get_by_id('DoubleNumbers'))
+
+  @mock.patch.object(DoubleNumbers, 'TIME_BUDGET_SEC', 0)
+  @mock.patch('framework.cloud_tasks_helpers.enqueue_task')
+  def test_continue_run__replaced(self, mock_enqueue):
+    """Tasks of a run that was replaced by a new run do nothing."""
+    DoubleNumbers().get_template_data()
+    _, old_params = mock_enqueue.call_args.args
+    DoubleNumbers().get_template_data()
+
+    job = DoubleNumbers()
+    actual = job.continue_run(
+        old_params['checkpoint_id'], old_params['run_id'],
+        old_params['sequence'])
+
+    self.assertEqual('Run was replaced.', actual)
+    self.assertEqual([], job.processed)
+
+  @mock.patch.object(DoubleNumbers, 'TIME_BUDGET_SEC', 0)
+  @mock.patch('framework.cloud_tasks_helpers.enqueue_task')
+  def test_continue_run__duplicate_task(self, mock_enqueue):
+    """A task that is delivered twice only runs once."""
+    DoubleNumbers().get_template_data()
+    _, params = mock_enqueue.call_args.args
+    args = params['checkpoint_id'], params['run_id'], params['sequence']
+    mock_enqueue.reset_mock()
+
+    DoubleNumbers().continue_run(*args)
+    self.assertEqual(1, mock_enqueue.call_count)
+    job = DoubleNumbers()
+    actual = job.continue_run(*args)
+
+    self.assertEqual('Task already ran.', actual)
+    self.assertEqual([], job.processed)
+    self.assertEqual(1, mock_enqueue.call_count)
+    self.assertEqual([n * 2 for n in range(6)] + [None] * 4,
+                     self.get_doubled())
+
+  @mock.patch.object(DoubleNumbers, 'TIME_BUDGET_SEC', 0)
+  @mock.patch('framework.cloud_tasks_helpers.enqueue_task')
+  def test_continue_run__leased(self, mock_enqueue):
+    """A task waits while another request is working on the run."""
+    DoubleNumbers().get_template_data()
+    _, params = mock_enqueue.call_args.args
+    args = params['checkpoint_id'], params['run_id'], params['sequence']
+    owner = DoubleNumbers()
+    owner._claim_checkpoint(*args)
+
+    with self.assertRaises(werkzeug.exceptions.Conflict):
+      DoubleNumbers().continue_run(*args)
+
+    # If the owner fails, a retry of the task can take over at once.
+    owner._release_lease(params['checkpoint_id'])
+    mock_enqueue.reset_mock()
+    actual = DoubleNumbers().continue_run(*args)
+    self.assertEqual(
+        'Processed 6 entities so far, continuing in a task.', actual)
@@ -0,0 +1,340 @@
+# Copyright 2025 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License")
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Storage for named files, and content-addressed blobs on top of it.
+
+A FileStore keeps files by name in Cloud Storage or a local directory.
+Each blob is stored under the hex SHA-256 digest of its content.  Because
+the key is derived from the content, a blob never changes once written and
+writing the same content twice is a no-op.
+"""
+
+import datetime
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from typing import Iterator
+
+from google.cloud import ndb, storage  # type: ignore
+
+import settings
+
+
+DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+def compute_digest(content: bytes) -> str:
+  """Return the hex SHA-256 digest used as the key for content."""
+  return hashlib.sha256(content).hexdigest()
+
+
+def _check_digest(digest: str) -> None:
+  if not DIGEST_RE.match(digest):
+    raise ValueError('Invalid blob digest %r' % digest)
+
+
+class FileStore:
+  """Base class for places where named files can be kept."""
+
+  def exists(self, name: str) -> bool:
+    raise NotImplementedError()
+
+  def read(self, name: str) -> bytes|None:
+    """Return the whole file, or None if it does not exist."""
+    raise NotImplementedError()
+
+  def read_range(self, name: str, start: int, stop: int) -> bytes|None:
+    """Return bytes [start, stop) of the file, or None if it does not exist."""
+    content = self.read(name)
+    if content is None:
+      return None
+    return content[start:stop]
+
+  def write(
+      self, name: str, data: bytes,
+      content_type: str = 'application/octet-stream') -> None:
+    raise NotImplementedError()
+
+  def delete(self, name: str) -> None:
+    """Delete the file, if it exists."""
+    raise NotImplementedError()
+
+  def list_files(
+      self, prefix: str = '') -> Iterator[tuple[str, datetime.datetime]]:
+    """Yield the name and UTC creation time of each file under prefix."""
+    raise NotImplementedError()
+
+
+class GCSFileStore(FileStore):
+  """Keep files as objects in a Cloud Storage bucket."""
+
+  def __init__(self, bucket_name: str):
+    self.bucket_name = bucket_name
+    self._bucket = None
+
+  def _get_blob(self, name: str):
+    if self._bucket is None:
+      self._bucket = storage.Client().bucket(self.bucket_name)
+    return self._bucket.blob(name)
+
+  def exists(self, name: str) -> bool:
+    return self._get_blob(name).exists()
+
+  def read(self, name: str) -> bytes|None:
+    blob = self._get_blob(name)
+    if not blob.exists():
+      return None
+    return blob.download_as_bytes()
+
+  def read_range(self, name: str, start: int, stop: int) -> bytes|None:
+    blob = self._get_blob(name)
+    if not blob.exists():
+      return None
+    if stop <= start:
+      return b''
+    # GCS ranges include the end byte.
+    return blob.download_as_bytes(start=start, end=stop - 1)
+
+  def write(
+      self, name: str, data: bytes,
+      content_type: str = 'application/octet-stream') -> None:
+    self._get_blob(name).upload_from_string(data, content_type=content_type)
+
+  def delete(self, name: str) -> None:
+    blob = self._get_blob(name)
+    if blob.exists():
+      blob.delete()
+
+  def list_files(
+      self, prefix: str = '') -> Iterator[tuple[str, datetime.datetime]]:
+    for blob in storage.Client().list_blobs(self.bucket_name, prefix=prefix):
+      time_created = blob.time_created.astimezone(datetime.timezone.utc)
+      yield blob.name, time_created.replace(tzinfo=None)
+
+
+class LocalFileStore(FileStore):
+  """Keep files in a local directory, for tests and development."""
+
+  def __init__(self, root_dir: str):
+    self.root_dir = root_dir
+
+  def _get_path(self, name: str) -> str:
+    return os.path.join(self.root_dir, *name.split('/'))
+
+  def exists(self, name: str) -> bool:
+    return os.path.exists(self._get_path(name))
+
+  def read(self, name: str) -> bytes|None:
+    path = self._get_path(name)
+    if not os.path.exists(path):
+      return None
+    with open(path, 'rb') as f:
+      return f.read()
+
+  def read_range(self, name: str, start: int, stop: int) -> bytes|None:
+    path = self._get_path(name)
+    if not os.path.exists(path):
+      return None
+    with open(path, 'rb') as f:
+      f.seek(start)
+      return f.read(max(0, stop - start))
+
+  def write(
+      self, name: str, data: bytes,
+      content_type: str = 'application/octet-stream') -> None:
+    path = self._get_path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write to a temp file first so that readers never see a partial file.
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'wb') as f:
+      f.write(data)
+    os.replace(temp_path, path)
+
+  def delete(self, name: str) -> None:
+    path = self._get_path(name)
+    if os.path.exists(path):
+      os.remove(path)
+
+  def list_files(
+      self, prefix: str = '') -> Iterator[tuple[str, datetime.datetime]]:
+    for dir_path, _, file_names in os.walk(self.root_dir):
+      for file_name in file_names:
+        path = os.path.join(dir_path, file_name)
+        name = os.path.relpath(path, self.root_dir).replace(os.sep, '/')
+        if name.startswith(prefix):
+          modified = datetime.datetime.fromtimestamp(
+              os.path.getmtime(path), datetime.timezone.utc)
+          yield name, modified.replace(tzinfo=None)
+
+
+class BlobStorage:
+  """Base class for places where blobs can be stored."""
+
+  def exists(self, digest: str) -> bool:
+    raise NotImplementedError()
+
+  def read(self, digest: str) -> bytes|None:
+    """Return the whole blob, or None if it does not exist."""
+    raise NotImplementedError()
+
+  def read_range(self, digest: str, start: int, stop: int) -> bytes|None:
+    """Return bytes [start, stop) of the blob, or None if it does not exist."""
+    content = self.read(digest)
+    if content is None:
+      return None
+    return content[start:stop]
+
+  def write(self, digest: str, content: bytes) -> None:
+    raise NotImplementedError()
+
+  def delete(self, digest: str) -> None:
+    """Delete the blob, if it exists."""
+    raise NotImplementedError()
+
+  def list_created_before(self, cutoff: datetime.datetime) -> Iterator[str]:
+    """Yield the digest of each blob written before the UTC cutoff."""
+    raise NotImplementedError()
+
+  def store(self, content: bytes) -> str:
+    """Store content unless an identical blob exists.  Return its digest."""
+    digest = compute_digest(content)
+    if self.exists(digest):
+      logging.info('Blob %s is already stored', digest)
+    else:
+      self.write(digest, content)
+    return digest
+
+
+class StoredBlob(ndb.Model):
+  """The content of one blob, keyed by its SHA-256 digest."""
+  content = ndb.BlobProperty(required=True)
+  created_on = ndb.DateTimeProperty(auto_now_add=True)
+
+
+class DatastoreBlobStorage(BlobStorage):
+  """Keep blobs in the datastore, which is limited to about 1MB each."""
+
+  def exists(self, digest: str) -> bool:
+    _check_digest(digest)
+    return ndb.Key(StoredBlob, digest).get() is not None
+
+  def read(self, digest: str) -> bytes|None:
+    _check_digest(digest)
+    blob = StoredBlob.get_by_id(digest)
+    return blob.content if blob else None
+
+  def write(self, digest: str, content: bytes) -> None:
+    _check_digest(digest)
+    StoredBlob(id=digest, content=content).put()
+
+  def delete(self, digest: str) -> None:
+    _check_digest(digest)
+    ndb.Key(StoredBlob, digest).delete()
+
+  def list_created_before(self, cutoff: datetime.datetime) -> Iterator[str]:
+    query = StoredBlob.query(StoredBlob.created_on < cutoff)
+    for key in query.iter(keys_only=True):
+      yield key.id()
+
+
+class FileBlobStorage(BlobStorage):
+  """Keep blobs as files in a FileStore, named by their digests."""
+
+  # All blob file names start with this.
+  prefix = ''
+
+  def __init__(self, files: FileStore):
+    self.files = files
+
+  def get_name(self, digest: str) -> str:
+    raise NotImplementedError()
+
+  def _get_name(self, digest: str) -> str:
+    _check_digest(digest)
+    return self.get_name(digest)
+
+  def exists(self, digest: str) -> bool:
+    return self.files.exists(self._get_name(digest))
+
+  def read(self, digest: str) -> bytes|None:
+    return self.files.read(self._get_name(digest))
+
+  def read_range(self, digest: str, start: int, stop: int) -> bytes|None:
+    return self.files.read_range(self._get_name(digest), start, stop)
+
+  def write(self, digest: str, content: bytes) -> None:
+    self.files.write(self._get_name(digest), content)
+
+  def delete(self, digest: str) -> None:
+    self.files.delete(self._get_name(digest))
+
+  def list_created_before(self, cutoff: datetime.datetime) -> Iterator[str]:
+    for name, created in self.files.list_files(self.prefix):
+      digest = name.rsplit('/', 1)[-1]
+      # Skip any other files that share the directory or bucket.
+      if (DIGEST_RE.match(digest) and self.get_name(digest) == name and
+          created < cutoff):
+        yield digest
+
+
+class GCSBlobStorage(FileBlobStorage):
+  """Keep blobs as objects in a Cloud Storage bucket."""
+
+  def __init__(self, bucket_name: str, prefix: str = 'blobs/'):
+    super().__init__(GCSFileStore(bucket_name))
+    self.prefix = prefix
+
+  def get_name(self, digest: str) -> str:
+    return self.prefix + digest
+
+
+class LocalBlobStorage(FileBlobStorage):
+  """Keep blobs as files in a local directory, for tests and development."""
+
+  def __init__(self, root_dir: str):
+    super().__init__(LocalFileStore(root_dir))
+    self.root_dir = root_dir
+
+  def get_name(self, digest: str) -> str:
+    return f'{digest[:2]}/{digest}'
+
+
+_blob_storage: BlobStorage|None = None
+
+
+def get_blob_storage() -> BlobStorage:
+  """Return the blob storage selected by settings.ATTACHMENT_BLOB_BACKEND."""
+  global _blob_storage
+  if _blob_storage is None:
+    backend = settings.ATTACHMENT_BLOB_BACKEND
+    if backend == 'datastore':
+      _blob_storage = DatastoreBlobStorage()
+    elif backend == 'gcs':
+      _blob_storage = GCSBlobStorage(
+          settings.ATTACHMENT_BLOB_BUCKET or settings.FILES_BUCKET)
+    elif backend == 'local':
+      _blob_storage = LocalBlobStorage(
+          settings.ATTACHMENT_BLOB_DIR or
+          os.path.join(tempfile.gettempdir(), 'chromestatus-blobs'))
+    else:
+      raise ValueError('Unknown blob backend %r' % backend)
+  return _blob_storage
+
+
+def set_blob_storage(blob_storage: BlobStorage|None) -> None:
+  """Replace the blob storage, or reset it to the default.  Used by tests."""
+  global _blob_storage
+  _blob_storage = blob_storage
@@ -0,0 +1,197 @@
+# Copyright 2025 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License")
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import testing_config  # Must be imported before the module under test.
+
+import datetime
+import os
+import tempfile
+from unittest import mock
+
+from internals import blob_storage
+
+
+CONTENT = b'hello blobs'
+DIGEST = blob_storage.compute_digest(CONTENT)
+
+
+class LocalFileStoreTest(testing_config.CustomTestCase):
+
+  def setUp(self):
+    self.temp_dir = tempfile.TemporaryDirectory()
+    self.files = blob_storage.LocalFileStore(self.temp_dir.name)
+
+  def tearDown(self):
+    self.temp_dir.cleanup()
+
+  def test_write_read_delete(self):
+    """Files are kept under their names, which can include directories."""
+    self.files.write('dir/file.txt', CONTENT, 'text/plain')
+
+    self.assertTrue(self.files.exists('dir/file.txt'))
+    self.assertEqual(CONTENT, self.files.read('dir/file.txt'))
+    self.assertEqual(b'llo', self.files.read_range('dir/file.txt', 2, 5))
+
+    self.files.delete('dir/file.txt')
+    self.files.delete('dir/file.txt')
+    self.assertIsNone(self.files.read('dir/file.txt'))
+
+
+class LocalBlobStorageTest(testing_config.CustomTestCase):
+
+  def setUp(self):
+    self.temp_dir = tempfile.TemporaryDirectory()
+    self.storage = blob_storage.LocalBlobStorage(self.temp_dir.name)
+
+  def tearDown(self):
+    self.temp_dir.cleanup()
+
+  def test_store__new(self):
+    """Storing content writes it under its digest."""
+    actual = self.storage.store(CONTENT)
+
+    self.assertEqual(DIGEST, actual)
+    self.assertTrue(self.storage.exists(DIGEST))
+    self.assertEqual(CONTENT, self.storage.read(DIGEST))
+    self.assertTrue(os.path.exists(
+        os.path.join(self.temp_dir.name, DIGEST[:2], DIGEST)))
+
+  def test_store__existing(self):
+    """Storing the same content again does not rewrite it."""
+    self.storage.store(CONTENT)
+    with mock.patch.object(self.storage, 'write') as mock_write:
+      actual = self.storage.store(CONTENT)
+
+    self.assertEqual(DIGEST, actual)
+    mock_write.assert_not_called()
+
+  def test_read__missing(self):
+    """Reading a blob that was never stored gives None."""
+    self.assertFalse(self.storage.exists(DIGEST))
+    self.assertIsNone(self.storage.read(DIGEST))
+    self.assertIsNone(self.storage.read_range(DIGEST, 0, 3))
+
+  def test_read_range(self):
+    """We can read part of a blob."""
+    self.storage.store(CONTENT)
+    self.assertEqual(b'llo', self.storage.read_range(DIGEST, 2, 5))
+    self.assertEqual(b'', self.storage.read_range(DIGEST, 5, 5))
+
+  def test_delete_and_list(self):
+    """Old blobs are listed, and can be deleted."""
+    self.storage.store(CONTENT)
+    # Files that are not named like blobs are never listed.
+    self.storage.files.write('notes.txt', b'not a blob')
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    one_hour = datetime.timedelta(hours=1)
+
+    self.assertEqual(
+        [], list(self.storage.list_created_before(now - one_hour)))
+    self.assertEqual(
+        [DIGEST], list(self.storage.list_created_before(now + one_hour)))
+
+    self.storage.delete(DIGEST)
+    self.storage.delete(DIGEST)
+    self.assertFalse(self.storage.exists(DIGEST))
+    self.assertEqual(
+        [], list(self.storage.list_created_before(now + one_hour)))
+
+  def test_invalid_digest(self):
+    """Digests are checked so that they cannot escape the directory."""
+    with self.assertRaises(ValueError):
+      self.storage.read('../../etc/passwd')
+
+
+class DatastoreBlobStorageTest(testing_config.CustomTestCase):
+
+  def setUp(self):
+    self.storage = blob_storage.DatastoreBlobStorage()
+
+  def tearDown(self):
+    for blob in blob_storage.StoredBlob.query().fetch(None):
+      blob.key.delete()
+
+  def test_store_and_read(self):
+    """Content is stored in one entity keyed by its digest."""
+    self.assertFalse(self.storage.exists(DIGEST))
+
+    self.storage.store(CONTENT)
+    self.storage.store(CONTENT)
+
+    self.assertTrue(self.storage.exists(DIGEST))
+    self.assertEqual(CONTENT, self.storage.read(DIGEST))
+    self.assertEqual(b'hello', self.storage.read_range(DIGEST, 0, 5))
+    blobs = blob_storage.StoredBlob.query().fetch()
+    self.assertEqual([DIGEST], [b.key.id() for b in blobs])
+
+  def test_delete_and_list(self):
+    """Old blobs are listed, and can be deleted."""
+    self.storage.store(CONTENT)
+    now = datetime.datetime.now()
+    one_hour = datetime.timedelta(hours=1)
+
+    self.assertEqual(
+        [], list(self.storage.list_created_before(now - one_hour)))
+    self.assertEqual(
+        [DIGEST], list(self.storage.list_created_before(now + one_hour)))
+
+    self.storage.delete(DIGEST)
+    self.assertFalse(self.storage.exists(DIGEST))
+
+
+class GCSBlobStorageTest(testing_config.CustomTestCase):
+
+  @mock.patch('google.cloud.storage.Client')
+  def test_read_range(self, mock_client_class):
+    """Ranges are passed to GCS with an inclusive end."""
+    mock_blob = mock.MagicMock()
+    mock_blob.exists.return_value = True
+    mock_blob.download_as_bytes.return_value = b'llo'
+    mock_bucket = mock_client_class.return_value.bucket.return_value
+    mock_bucket.blob.return_value = mock_blob
+    storage = blob_storage.GCSBlobStorage('bucket')
+
+    actual = storage.read_range(DIGEST, 2, 5)
+
+    self.assertEqual(b'llo', actual)
+    mock_bucket.blob.assert_called_once_with('blobs/' + DIGEST)
+    mock_blob.download_as_bytes.assert_called_once_with(start=2, end=4)
+
+
+class GetBlobStorageTest(testing_config.CustomTestCase):
+
+  def tearDown(self):
+    blob_storage.set_blob_storage(None)
+
+  def test_get_blob_storage__default(self):
+    """The datastore is used by default."""
+    blob_storage.set_blob_storage(None)
+    self.assertIsInstance(
+        blob_storage.get_blob_storage(), blob_storage.DatastoreBlobStorage)
+
+  @mock.patch('settings.ATTACHMENT_BLOB_BACKEND', 'local')
+  @mock.patch('settings.ATTACHMENT_BLOB_DIR', '/tmp/blobs')
+  def test_get_blob_storage__local(self):
+    """The backend can be selected in settings."""
+    blob_storage.set_blob_storage(None)
+    actual = blob_storage.get_blob_storage()
+    self.assertIsInstance(actual, blob_storage.LocalBlobStorage)
+    self.assertEqual('/tmp/blobs', actual.root_dir)
+
+  @mock.patch('settings.ATTACHMENT_BLOB_BACKEND', 'floppy')
+  def test_get_blob_storage__unknown(self):
+    """A typo in settings is reported."""
+    blob_storage.set_blob_storage(None)
+    with self.assertRaises(ValueError):
+      blob_storage.get_blob_storage()
@@ -109,6 +109,9 @@ class FeatureEntry(ndb.Model):  # Copy from Feature
   breaking_change = ndb.BooleanProperty(default=False)
   confidential = ndb.BooleanProperty(default=False)
   shipping_year = ndb.IntegerProperty()
+  # Earliest desktop or android milestone of any active shipping stage.
+  # Maintained when stages are written so reports can query by milestone.
+  first_ship_milestone = ndb.IntegerProperty()
 
   # Implementation in Chrome
   impl_status_chrome = ndb.IntegerProperty(required=True, default=PROPOSED)
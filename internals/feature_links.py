@@ -14,8 +14,10 @@
 # limitations under the License.
 
 import datetime
+import hashlib
 import logging
-from collections import Counter
+from collections import Counter, defaultdict
+from collections.abc import Iterable
 from typing import Any, Optional
 from urllib.parse import urlparse
 
@@ -23,10 +25,12 @@ from google.cloud import ndb  # type: ignore
 
 from framework import cloud_tasks_helpers
 from framework.basehandlers import FlaskHandler
+from internals import link_crawler
 from internals.core_models import FeatureEntry, ReviewResultProperty
 from internals.link_helpers import (
   GECKO_REVIEW_URL_PATTERN,
   LINK_TYPE_GITHUB_ISSUE,
+  LINK_TYPE_WEB,
   TAG_REVIEW_URL_PATTERN,
   WEBKIT_REVIEW_URL_PATTERN,
   Link,
@@ -35,6 +39,13 @@ from internals.link_helpers import (
 LINK_STALE_MINUTES = 30
 CRON_JOB_LINK_STALE_DAYS = 8
 
+# Feature fields whose values are filled in from the linked review issue.
+DENORMALIZED_LINK_FIELDS = {
+    'safari_views_link': 'safari_views_link_result',
+    'ff_views_link': 'ff_views_link_result',
+    'tag_review': 'tag_review_resolution',
+}
+
 
 class FeatureLinks(ndb.Model):
   """Links that occur in the fields of the feature.
@@ -48,96 +59,331 @@ class FeatureLinks(ndb.Model):
   information = ndb.JsonProperty()
   is_error = ndb.BooleanProperty(default=False)
   http_error_code = ndb.IntegerProperty()
+  # Validators from the last successful fetch, used to revalidate cheaply.
+  etag = ndb.StringProperty(indexed=False)
+  last_modified = ndb.StringProperty(indexed=False)
+  content_hash = ndb.StringProperty(indexed=False)
+  # Scheme and host of the url, used to look up samples for a domain.
+  domain = ndb.StringProperty()
+  # The FeatureLinksSummary shard that this link is counted in.
+  summary_shard = ndb.IntegerProperty()
+
+  @classmethod
+  def make_key(cls, url: str) -> ndb.Key:
+    """Return the key for the FeatureLinks of url, so it can be fetched directly."""
+    return ndb.Key(cls, hashlib.sha256(url.encode()).hexdigest())
+
+  def _pre_put_hook(self):
+    self.domain = get_domain_with_scheme(self.url)
+    self.summary_shard = FeatureLinksSummary.get_shard(self.url)
+
+
+class FeatureLinksSummary(ndb.Model):
+  """Counters over the FeatureLinks of one shard, updated with the links.
+
+  Each link is counted in the shard picked by its url, so that concurrent
+  edits of different links seldom write the same shard.  The counts are a
+  flat dict.  Keys for per-type and per-domain counts are prefixed with
+  the name of the list they belong to, e.g., 'link_types|web'.
+  """
+  NUM_SHARDS = 20
 
+  counts = ndb.JsonProperty(default={})
+  updated = ndb.DateTimeProperty(auto_now=True)
 
-def update_feature_links(fe: FeatureEntry, changed_fields: list[tuple[str, Any, Any]]) -> None:
-  """Update the links in the given feature entry."""
-  for field, old_val, new_val in changed_fields:
-    if new_val != old_val:
-      if old_val is None and not bool(new_val):
-        continue
+  @classmethod
+  def get_shard(cls, url: str) -> int:
+    digest = hashlib.sha256(url.encode()).hexdigest()
+    return int(digest[:8], 16) % cls.NUM_SHARDS
+
+  @classmethod
+  def make_key(cls, shard: int) -> ndb.Key:
+    return ndb.Key(cls, f'shard-{shard}')
+
+
+def _get_summary_counts(feature_link: FeatureLinks) -> Counter:
+  """Return what a single link contributes to the summary counters."""
+  # Each use of a link by a feature is counted, as the samples are.
+  weight = max(1, len(feature_link.feature_ids))
+  domain = get_domain_with_scheme(feature_link.url)
+  counts: Counter = Counter()
+  counts['total_count'] = weight
+  counts['link_types|' + feature_link.type] = weight
+  if feature_link.type == LINK_TYPE_WEB:
+    counts['uncovered_count'] = weight
+    counts['uncovered_link_domains|' + domain] = weight
+  else:
+    counts['covered_count'] = weight
+  if feature_link.is_error:
+    counts['error_count'] = weight
+    counts['error_link_domains|' + domain] = weight
+  if feature_link.http_error_code:
+    counts['http_error_count'] = weight
+  return counts
 
-      # Clear the denormalized fields that get filled from feature links; they'll get updated below
-      # with their new values.
-      if field == 'safari_views_link':
-        fe.safari_views_link_result = None
-      if field == 'ff_views_link':
-        fe.ff_views_link_result = None
-      if field == 'tag_review':
-        fe.tag_review_resolution = None
-      fe.put()
-
-      old_val_urls = Link.extract_urls_from_value(old_val)
-      new_val_urls = Link.extract_urls_from_value(new_val)
-      urls_to_remove = set(old_val_urls) - set(new_val_urls)
-      urls_to_add = set(new_val_urls) - set(old_val_urls)
-      if urls_to_remove or urls_to_add:
-        fe_values = fe.to_dict(exclude=[field]).values()
-        all_urls = [
-          url for value in fe_values for url in Link.extract_urls_from_value(value)
-        ]
-        for url in urls_to_remove:
-          if url not in all_urls:
-            # if the url is not in any other field in this feature, then remove it from the index
-            link = Link(url)
-            _remove_link(link, fe)
-        for url in urls_to_add:
-          link = Link(url)
-          if link.type:
-            feature_link = _get_index_link(link, fe, should_parse_new_link=True)
-            if feature_link:
-              feature_link.put()
-              logging.info(
-                f'Indexed feature_link {feature_link.url} to {feature_link.key.integer_id()} for feature {fe.key.integer_id()}'
-              )
-
-
-def _get_index_link(link: Link, fe: FeatureEntry, should_parse_new_link: bool = False) -> FeatureLinks | None:
+
+class SummaryDelta:
+  """Accumulates changes to the summary counters while links are edited.
+
+  Call remove() before changing a link that was loaded from the datastore,
+  add() after changing it, and save() in the transaction that writes the
+  links, so that a retry cannot apply the changes twice.
   """
-  indexes a given link for a specific feature by creating or updating a `FeatureLinks` object.
-  Returns the `FeatureLinks` object or None.
+
+  def __init__(self):
+    self.deltas: dict[int, Counter] = defaultdict(Counter)
+
+  def add(self, feature_link: FeatureLinks) -> None:
+    shard = FeatureLinksSummary.get_shard(feature_link.url)
+    self.deltas[shard].update(_get_summary_counts(feature_link))
+
+  def remove(self, feature_link: FeatureLinks) -> None:
+    shard = FeatureLinksSummary.get_shard(feature_link.url)
+    self.deltas[shard].subtract(_get_summary_counts(feature_link))
+
+  def save(self) -> None:
+    assert ndb.in_transaction()
+    changes_by_shard: dict[int, dict[str, int]] = {}
+    for shard, delta in self.deltas.items():
+      changes = {key: n for key, n in delta.items() if n}
+      if changes:
+        changes_by_shard[shard] = changes
+    if not changes_by_shard:
+      return
+    summaries = ndb.get_multi([
+        FeatureLinksSummary.make_key(shard) for shard in changes_by_shard])
+    for i, (shard, changes) in enumerate(changes_by_shard.items()):
+      summary = summaries[i] or FeatureLinksSummary(
+          key=FeatureLinksSummary.make_key(shard))
+      counts = Counter(summary.counts)
+      counts.update(changes)
+      negative_keys = [key for key, n in counts.items() if n < 0]
+      if negative_keys:
+        # Keep them so that the drift shows until the summary is rebuilt.
+        logging.warning(
+            'Feature links summary %s has negative counts: %r',
+            summary.key.id(), negative_keys)
+      summary.counts = {key: n for key, n in counts.items() if n}
+      summaries[i] = summary
+    ndb.put_multi(summaries)
+    self.deltas.clear()
+
+
+def rebuild_feature_links_summary() -> int:
+  """Recompute the summary counters from every link, and fill in domains.
+
+  Returns the number of links that were counted.
   """
+  needs_fields: list[ndb.Key] = []
+  for feature_link in FeatureLinks.query():
+    if feature_link.domain is None or feature_link.summary_shard is None:
+      needs_fields.append(feature_link.key)
+    if len(needs_fields) >= 100:
+      _fill_in_link_fields(needs_fields)
+      needs_fields = []
+  _fill_in_link_fields(needs_fields)
+
+  num_links = 0
+  for shard in range(FeatureLinksSummary.NUM_SHARDS):
+    num_links += _rebuild_summary_shard(shard)
+  # The summary was a single entity before it was sharded.
+  ndb.Key(FeatureLinksSummary, 'summary').delete()
+  return num_links
+
+
+@ndb.transactional()
+def _fill_in_link_fields(keys: list[ndb.Key]) -> None:
+  """Save links again so that _pre_put_hook fills in their domain and shard."""
+  ndb.put_multi([fl for fl in ndb.get_multi(keys) if fl])
+
+
+@ndb.transactional()
+def _rebuild_summary_shard(shard: int) -> int:
+  """Recount one summary shard in a transaction with the links in it.
+
+  Links that are written meanwhile also read the shard, so either they
+  are counted or their transaction is retried after this one.
+  """
+  key = FeatureLinksSummary.make_key(shard)
+  key.get()
+  counts: Counter = Counter()
+  num_links = 0
+  for feature_link in FeatureLinks.query(FeatureLinks.summary_shard == shard):
+    counts.update(_get_summary_counts(feature_link))
+    num_links += 1
+  FeatureLinksSummary(
+      key=key, counts={name: n for name, n in counts.items() if n}).put()
+  return num_links
 
-  feature_id = fe.key.integer_id()
-  feature_links = FeatureLinks.query(FeatureLinks.url == link.url).fetch(None)
-  feature_link: FeatureLinks = feature_links[0] if feature_links else None
-  if hasattr(feature_link, 'feature_ids'):
-    if feature_id not in feature_link.feature_ids:
-      feature_link.feature_ids.append(feature_id)
-      feature_link.type = link.type
-  else:
-    if should_parse_new_link:
-      link.parse()
-      if link.is_error:
-        return None
-    feature_link = FeatureLinks(
-        feature_ids=[feature_id],
-        type=link.type,
-        url=link.url,
-        information=link.information,
-        is_error=link.is_error,
-        http_error_code=link.http_error_code
-    )
 
-  _denormalize_feature_link_into_entries(feature_link, [fe])
-  return feature_link
+def update_feature_links(fe: FeatureEntry, changed_fields: list[tuple[str, Any, Any]]) -> None:
+  """Update the index of links that appear in the given feature entry.
 
+  Links that are new to the index are saved without information and parsed
+  by a background task, so saving a feature makes no outbound requests.
+  """
+  urls_to_remove: set[str] = set()
+  urls_to_add: set[str] = set()
+  should_put_fe = False
+  for field, old_val, new_val in changed_fields:
+    if new_val == old_val or (old_val is None and not bool(new_val)):
+      continue
+    # Clear the denormalized fields that get filled from feature links; they'll get updated below
+    # with their new values.
+    if field in DENORMALIZED_LINK_FIELDS:
+      setattr(fe, DENORMALIZED_LINK_FIELDS[field], None)
+      should_put_fe = True
+    old_val_urls = set(Link.extract_urls_from_value(old_val))
+    new_val_urls = set(Link.extract_urls_from_value(new_val))
+    urls_to_remove |= old_val_urls - new_val_urls
+    urls_to_add |= new_val_urls - old_val_urls
+
+  if should_put_fe:
+    fe.put()
+  if urls_to_remove:
+    # Keep urls that are still used in any other field of this feature.
+    urls_to_remove -= set(_extract_feature_urls(fe))
+  link_types = {url: Link.get_type(url) for url in urls_to_add}
+  urls_to_add = {url for url in urls_to_add if link_types[url]}
+  if not urls_to_remove and not urls_to_add:
+    return
 
-def _remove_link(link: Link, fe: FeatureEntry) -> None:
-  """Un-index the given link."""
   feature_id = fe.key.integer_id()
-  feature_links = FeatureLinks.query(FeatureLinks.url == link.url).fetch(None)
-  feature_link: FeatureLinks = feature_links[0] if feature_links else None
-  if hasattr(feature_link, 'feature_ids'):
-    if feature_id in feature_link.feature_ids:
+  new_links = [
+      FeatureLinks(
+          key=FeatureLinks.make_key(url), feature_ids=[feature_id],
+          type=link_types[url], url=url)
+      for url in urls_to_add]
+  added_links = _update_link_feature_ids(
+      feature_id, urls_to_remove, new_links)
+  for url in urls_to_remove:
+    logging.info(f'Removed feature {feature_id} from indexed link {url}')
+
+  to_parse: list[FeatureLinks] = []
+  for new_link, feature_link in zip(new_links, added_links):
+    if feature_link is new_link:
+      to_parse.append(feature_link)
+    else:
+      _denormalize_feature_link_into_entries(feature_link, [fe])
+    logging.info(f'Indexed feature_link {feature_link.url} for feature {feature_id}')
+
+  if to_parse:
+    cloud_tasks_helpers.enqueue_task(
+        '/tasks/update-feature-links', {
+            'feature_link_ids': [fl.key.id() for fl in to_parse],
+            'should_notify_on_error': False
+        })
+
+
+@ndb.transactional()
+def _update_link_feature_ids(
+    feature_id: int, urls_to_remove: Iterable[str],
+    new_links: list[FeatureLinks]
+) -> list[FeatureLinks]:
+  """Remove feature_id from the links of some urls and add it to others.
+
+  A link in new_links is saved as given if its url is not indexed yet.
+  This is one transaction so that concurrent edits of features that use
+  the same url cannot lose each other's feature_ids.
+
+  Returns the stored link for each of new_links.
+  """
+  urls_to_remove = list(urls_to_remove)
+  stored = ndb.get_multi(
+      [FeatureLinks.make_key(url) for url in urls_to_remove] +
+      [new_link.key for new_link in new_links])
+  summary_delta = SummaryDelta()
+  to_put: list[FeatureLinks] = []
+  to_delete: list[ndb.Key] = []
+  for feature_link in stored[:len(urls_to_remove)]:
+    if feature_link and feature_id in feature_link.feature_ids:
+      summary_delta.remove(feature_link)
       feature_link.feature_ids.remove(feature_id)
       if feature_link.feature_ids:
-        feature_link.put()
-        logging.info(f'Updated indexed link {link.url}')
+        summary_delta.add(feature_link)
+        to_put.append(feature_link)
       else:
         # delete the link if it is not used by any feature
-        feature_link.key.delete()
-        logging.info(f'Delete indexed link {link.url}')
+        to_delete.append(feature_link.key)
+
+  added_links: list[FeatureLinks] = []
+  for new_link, feature_link in zip(new_links, stored[len(urls_to_remove):]):
+    if feature_link is None:
+      feature_link = new_link
+      summary_delta.add(feature_link)
+      to_put.append(feature_link)
+    elif feature_id not in feature_link.feature_ids:
+      summary_delta.remove(feature_link)
+      feature_link.feature_ids.append(feature_id)
+      feature_link.type = new_link.type
+      summary_delta.add(feature_link)
+      to_put.append(feature_link)
+    added_links.append(feature_link)
+
+  ndb.put_multi(to_put)
+  ndb.delete_multi(to_delete)
+  summary_delta.save()
+  return added_links
+
+
+@ndb.transactional()
+def rekey_feature_link(legacy_key: ndb.Key) -> None:
+  """Move a link that has a numeric id to the key derived from its url.
+
+  Links were saved with numeric ids before their keys were derived from
+  their urls.  If the url was indexed again since, the feature_ids of both
+  links are merged.
+  """
+  legacy = legacy_key.get()
+  if legacy is None:
+    return
+  summary_delta = SummaryDelta()
+  feature_link = FeatureLinks.make_key(legacy.url).get()
+  summary_delta.remove(legacy)
+  if feature_link:
+    summary_delta.remove(feature_link)
+    feature_link.feature_ids.extend(
+        fid for fid in legacy.feature_ids
+        if fid not in feature_link.feature_ids)
+  else:
+    feature_link = FeatureLinks(
+        key=FeatureLinks.make_key(legacy.url),
+        **legacy.to_dict(exclude=['updated', 'domain']))
+  summary_delta.add(feature_link)
+  feature_link.put()
+  legacy_key.delete()
+  summary_delta.save()
+
+
+def _get_index_link(
+    link: Link, fe: FeatureEntry,
+    should_parse_new_link: bool = False) -> FeatureLinks | None:
+  """
+  indexes a given link for a specific feature by creating or updating a `FeatureLinks` object.
+  Returns the saved `FeatureLinks` object or None.
+  """
+
+  feature_id = fe.key.integer_id()
+  key = FeatureLinks.make_key(link.url)
+  if should_parse_new_link and key.get() is None:
+    link.parse()
+    if link.is_error:
+      return None
+  new_link = FeatureLinks(
+      key=key,
+      feature_ids=[feature_id],
+      type=link.type,
+      url=link.url,
+      information=link.information,
+      is_error=link.is_error,
+      http_error_code=link.http_error_code,
+      etag=link.etag,
+      last_modified=link.last_modified,
+      content_hash=link.content_hash,
+  )
+  feature_link = _update_link_feature_ids(feature_id, [], [new_link])[0]
+  _denormalize_feature_link_into_entries(feature_link, [fe])
+  return feature_link
 
 
 def _get_review_result_from_feature_link(
@@ -276,33 +522,82 @@ class FeatureLinksUpdateHandler(FlaskHandler):
     return {'message': 'Done'}
 
 
+def _make_revalidation_link(feature_link: FeatureLinks) -> Link:
+  """Return a Link that only re-parses if the content has changed."""
+  if (feature_link.is_error or
+      feature_link.type != Link.get_type(feature_link.url)):
+    # The stored information needs to be replaced regardless.
+    return Link(feature_link.url)
+  return Link(
+      feature_link.url, etag=feature_link.etag,
+      last_modified=feature_link.last_modified,
+      content_hash=feature_link.content_hash)
+
+
 def _index_feature_links_by_ids(
         feature_link_ids: list[Any], should_notify_on_error: bool) -> None:
   """index the links in the given feature links ids"""
-  for feature_link_id in feature_link_ids:
-    feature_link: FeatureLinks = FeatureLinks.get_by_id(feature_link_id)
-    if feature_link:
-      logging.info(f'processing {feature_link.url}')
-      link = Link(feature_link.url)
-      link.parse()
-      if link.is_error:
-        if not feature_link.is_error and should_notify_on_error:
-          # TODO: if feature_link turns from no-error to error, notify users
-          pass
-        if link.http_error_code:
-          feature_link.http_error_code = link.http_error_code
-        feature_link.is_error = link.is_error
-        logging.info(f'Update indexed link {feature_link_id} {feature_link.url} encountered error')
-      else:
-        # update the information if it is not an error
-        feature_link.information = link.information
-        feature_link.is_error = False
-        feature_link.http_error_code = None
-        logging.info(f'Update indexed link {feature_link_id} {feature_link.url} successfully')
-        _denormalize_feature_link_into_entries(feature_link)
-
-      feature_link.type = link.type
-      feature_link.put()
+  keys = [ndb.Key('FeatureLinks', feature_link_id)
+          for feature_link_id in feature_link_ids]
+  feature_links: list[FeatureLinks] = [
+      fl for fl in ndb.get_multi(keys) if fl]
+  links = [_make_revalidation_link(fl) for fl in feature_links]
+  keys_by_link = {
+      id(link): fl.key for fl, link in zip(feature_links, links)}
+
+  def save(link: Link) -> None:
+    """Save each result as it comes in, so a long crawl loses nothing."""
+    saved_link = _save_crawl_result(
+        keys_by_link[id(link)], link, should_notify_on_error)
+    if saved_link and not link.is_error and not link.is_not_modified:
+      _denormalize_feature_link_into_entries(saved_link)
+
+  link_crawler.crawl_links(links, on_parsed=save)
+
+
+@ndb.transactional()
+def _save_crawl_result(
+    key: ndb.Key, link: Link, should_notify_on_error: bool
+) -> FeatureLinks | None:
+  """Store what was fetched for a link, and return the stored link.
+
+  The link is loaded again in a transaction, so that features that were
+  added to it while it was being fetched are kept.
+  """
+  feature_link = key.get()
+  if feature_link is None:
+    return None
+  feature_link_id = key.id()
+  summary_delta = SummaryDelta()
+  summary_delta.remove(feature_link)
+  if link.is_error:
+    if not feature_link.is_error and should_notify_on_error:
+      # TODO: if feature_link turns from no-error to error, notify users
+      pass
+    if link.http_error_code:
+      feature_link.http_error_code = link.http_error_code
+    feature_link.is_error = link.is_error
+    logging.info(f'Update indexed link {feature_link_id} {feature_link.url} encountered error')
+  elif link.is_not_modified:
+    # Keep the existing information, saving just marks it as fresh.
+    feature_link.is_error = False
+    feature_link.http_error_code = None
+    logging.info(f'Indexed link {feature_link_id} {feature_link.url} is not modified')
+  else:
+    # update the information if it is not an error
+    feature_link.information = link.information
+    feature_link.is_error = False
+    feature_link.http_error_code = None
+    logging.info(f'Update indexed link {feature_link_id} {feature_link.url} successfully')
+
+  feature_link.type = link.type
+  feature_link.etag = link.etag
+  feature_link.last_modified = link.last_modified
+  feature_link.content_hash = link.content_hash
+  summary_delta.add(feature_link)
+  feature_link.put()
+  summary_delta.save()
+  return feature_link
 
 
 def _extract_feature_urls(fe: FeatureEntry) -> list[str]:
@@ -339,7 +634,6 @@ def batch_index_feature_entries(fes: list[FeatureEntry], skip_existing: bool) ->
         if fl:
           feature_links.append(fl)
 
-    ndb.put_multi(feature_links)
     link_count += len(feature_links)
     logging.info(f'Feature {fe.key.integer_id()} indexed {len(feature_links)} urls')
 
@@ -358,42 +652,37 @@ def get_domain_with_scheme(url):
 
 def get_feature_links_summary():
   """
-  The function `get_feature_links_summary` retrieves feature links from a database, groups them by
-  type and uncovered domains, and returns a summary of the counts and types of links.
+  The function `get_feature_links_summary` reads the maintained counters of feature links and
+  returns a summary of the counts and types of links, grouped by type and by domain.
   """
   MAX_RESULTS = 100
 
-  feature_links = FeatureLinks.query().fetch(
-      projection=[
-          FeatureLinks.feature_ids,
-          FeatureLinks.url,
-          FeatureLinks.type,
-          FeatureLinks.is_error,
-          FeatureLinks.http_error_code,
-      ]
-  )
-  links = [item.to_dict() for item in feature_links]
-  uncovered_links = [link for link in links if link['type'] == 'web']
-  error_links = [link for link in links if link['is_error']]
-  http_error_links = [link for link in links if link['http_error_code']]
-
-  link_types_counter = Counter(item['type'] for item in links)
-  uncovered_link_domains_counter = Counter(get_domain_with_scheme(item['url']) for item in uncovered_links)
-  error_link_domains_counter = Counter(get_domain_with_scheme(item['url']) for item in error_links)
-
-  link_types = [{'key': k, 'count': c} for (k, c) in link_types_counter.most_common(MAX_RESULTS)]
-  uncovered_link_domains = [{'key': k, 'count': c} for (k, c) in uncovered_link_domains_counter.most_common(MAX_RESULTS)]
-  error_link_domains = [{'key': k, 'count': c} for (k, c) in error_link_domains_counter.most_common(MAX_RESULTS)]
+  counts: Counter = Counter()
+  for summary in ndb.get_multi([
+      FeatureLinksSummary.make_key(shard)
+      for shard in range(FeatureLinksSummary.NUM_SHARDS)]):
+    if summary:
+      counts.update(summary.counts)
+  groups: dict[str, Counter] = {
+      'link_types': Counter(),
+      'uncovered_link_domains': Counter(),
+      'error_link_domains': Counter(),
+  }
+  for key, count in counts.items():
+    group, sep, name = key.partition('|')
+    if sep and group in groups:
+      groups[group][name] = count
 
   return {
-      "total_count": len(links),
-      "covered_count": len(links) - len(uncovered_links),
-      "uncovered_count": len(uncovered_links),
-      "error_count": len(error_links),
-      "http_error_count": len(http_error_links),
-      "link_types": link_types,
-      "uncovered_link_domains": uncovered_link_domains,
-      "error_link_domains": error_link_domains
+      "total_count": counts['total_count'],
+      "covered_count": counts['covered_count'],
+      "uncovered_count": counts['uncovered_count'],
+      "error_count": counts['error_count'],
+      "http_error_count": counts['http_error_count'],
+      **{
+          group: [{'key': k, 'count': c} for (k, c) in counter.most_common(MAX_RESULTS)]
+          for group, counter in groups.items()
+      },
   }
 
 
@@ -402,7 +691,7 @@ def get_feature_links_samples(domain: str, type: str | None, is_error: bool | No
 
   MAX_SAMPLES = 100
   filters = [
-      FeatureLinks.url >= domain,
+      FeatureLinks.domain == domain,
   ]
   if type:
     filters.append(FeatureLinks.type == type)
@@ -412,13 +701,12 @@ def get_feature_links_samples(domain: str, type: str | None, is_error: bool | No
       *filters
   ).fetch(MAX_SAMPLES)
 
-  # filter out links that do not start with the specified domain and convert to dict
   feature_links = [
       fl.to_dict(include=['url', 'type', 'feature_ids', 'is_error', 'http_error_code'])
-      for fl in feature_links if fl.url.startswith(domain)
+      for fl in feature_links
   ]
 
-  # flatten feature links like projection in get_feature_links_summary
+  # one entry per feature that uses the link, as counted in the summary
   flattened_feature_links = []
   for feature_link in feature_links:
     for feature_id in feature_link['feature_ids']:
@@ -457,7 +745,7 @@ class UpdateAllFeatureLinksHandlers(FlaskHandler):
 
     if no_filter:
       # for backfill purposes
-      ids_to_update = [fe.key.integer_id() for fe in feature_links]
+      ids_to_update = [fe.key.id() for fe in feature_links]
     else:
       stale_time = datetime.datetime.now(
           tz=datetime.timezone.utc) - datetime.timedelta(days=CRON_JOB_LINK_STALE_DAYS)
@@ -465,13 +753,13 @@ class UpdateAllFeatureLinksHandlers(FlaskHandler):
       for fe in feature_links:
         # if stale
         if fe.updated < stale_time:
-          ids_to_update.append(fe.key.integer_id())
+          ids_to_update.append(fe.key.id())
         # if error exists
         elif fe.is_error or fe.http_error_code:
-          ids_to_update.append(fe.key.integer_id())
+          ids_to_update.append(fe.key.id())
         # if type changed since last update
         elif fe.type != Link.get_type(fe.url):
-          ids_to_update.append(fe.key.integer_id())
+          ids_to_update.append(fe.key.id())
 
     BATCH_SIZE = 100
     batch_update_ids = [ids_to_update[i:i+BATCH_SIZE] for i in range(0, len(ids_to_update), BATCH_SIZE)]
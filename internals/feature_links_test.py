@@ -22,21 +22,35 @@ import testing_config
 from internals.core_models import FeatureEntry
 from internals.feature_links import (
   FeatureLinks,
+  FeatureLinksSummary,
   FeatureLinksUpdateHandler,
   UpdateAllFeatureLinksHandlers,
+  _index_feature_links_by_ids,
   get_domain_with_scheme,
+  get_feature_links_samples,
   get_feature_links_summary,
+  rebuild_feature_links_summary,
+  rekey_feature_link,
   update_feature_links,
 )
 from internals.link_helpers import (
   LINK_TYPE_CHROMIUM_BUG,
   LINK_TYPE_GITHUB_ISSUE,
+  LINK_TYPE_SPECS,
   LINK_TYPE_WEB,
   Link,
 )
 
 test_app = flask.Flask(__name__)
 
+
+def make_response(status_code, body=b'', headers=None):
+  """Return a fake streamed response from http_client.get()."""
+  return testing_config.Blank(
+      status_code=status_code, headers=headers or {},
+      iter_content=lambda chunk_size: iter([body]), close=lambda: None)
+
+
 class LinkTest(testing_config.CustomTestCase):
 
   def setUp(self):
@@ -56,6 +70,8 @@ class LinkTest(testing_config.CustomTestCase):
   def tearDown(self):
     for feature_links in FeatureLinks.query():
       feature_links.key.delete()
+    for summary in FeatureLinksSummary.query():
+      summary.key.delete()
     self.feature.key.delete()
     self.feature2.key.delete()
     pass
@@ -67,7 +83,13 @@ class LinkTest(testing_config.CustomTestCase):
       setattr(target_feature, field_name, new_val)
     self.feature.put()
 
-    update_feature_links(target_feature, changed_fields)
+    # Run the task that parses new links right away.
+    def run_task(handler_path, params):
+      _index_feature_links_by_ids(
+          params['feature_link_ids'], params['should_notify_on_error'])
+    with mock.patch(
+        'framework.cloud_tasks_helpers.enqueue_task', side_effect=run_task):
+      update_feature_links(target_feature, changed_fields)
 
   def test_get_domain_and_scheme__valid(self):
     self.assertEqual(
@@ -109,6 +131,7 @@ class LinkTest(testing_config.CustomTestCase):
     ]
     for link in links:
       link.put()
+    self.assertEqual(4, rebuild_feature_links_summary())
     summary = get_feature_links_summary()
 
     self.assertEqual(
@@ -172,10 +195,11 @@ class LinkTest(testing_config.CustomTestCase):
         ('bug_url', None, url),
     ]
 
-    # add invalid url to feature
+    # add invalid url to feature, it is indexed as an error
     self.mock_user_change_fields(changed_fields)
     link = query.get()
-    self.assertIsNone(link)
+    self.assertTrue(link.is_error)
+    self.assertIsNone(link.information)
 
   @mock.patch.object(Link, '_parse_github_issue')
   def test_webkit_review_saves_position_in_feature(self, mockParse: mock.MagicMock):
@@ -353,3 +377,200 @@ class LinkTest(testing_config.CustomTestCase):
     expected = 'Started updating 2 Feature Links in 1 batches'
 
     self.assertEqual(result, expected)
+
+  @mock.patch('framework.http_client.get')
+  def test_index_feature_links_by_ids(self, mock_get):
+    """Each link is fetched once and all results are saved."""
+    ok_link = FeatureLinks(
+        url='https://drafts.csswg.org/css-ok/',
+        type=LINK_TYPE_WEB, feature_ids=[self.feature_id])
+    missing_link = FeatureLinks(
+        url='https://drafts.csswg.org/css-missing/',
+        type=LINK_TYPE_SPECS, feature_ids=[self.feature_id])
+    ndb.put_multi([ok_link, missing_link])
+
+    def fake_get(url, **kwargs):
+      if url == missing_link.url:
+        return make_response(404)
+      return make_response(200, b'<html><head><title>OK</title></head>')
+    mock_get.side_effect = fake_get
+
+    _index_feature_links_by_ids(
+        [ok_link.key.integer_id(), missing_link.key.integer_id(), 999999],
+        should_notify_on_error=False)
+
+    self.assertEqual(2, mock_get.call_count)
+    ok_link = ok_link.key.get()
+    self.assertEqual(LINK_TYPE_SPECS, ok_link.type)
+    self.assertFalse(ok_link.is_error)
+    self.assertEqual('OK', ok_link.information['title'])
+    missing_link = missing_link.key.get()
+    self.assertTrue(missing_link.is_error)
+    self.assertEqual(404, missing_link.http_error_code)
+
+  @mock.patch('framework.http_client.get')
+  def test_index_feature_links_by_ids__not_modified(self, mock_get):
+    """A 304 response keeps the stored information without re-parsing."""
+    feature_link = FeatureLinks(
+        url='https://drafts.csswg.org/css-same/',
+        type=LINK_TYPE_SPECS, feature_ids=[self.feature_id],
+        information={'title': 'Old title'}, etag='"abc"',
+        last_modified='Wed, 01 Jan 2025 00:00:00 GMT')
+    feature_link.put()
+    old_updated = feature_link.updated
+    mock_get.return_value = make_response(304)
+
+    _index_feature_links_by_ids(
+        [feature_link.key.integer_id()], should_notify_on_error=False)
+
+    mock_get.assert_called_once()
+    self.assertEqual(
+        {'If-None-Match': '"abc"',
+         'If-Modified-Since': 'Wed, 01 Jan 2025 00:00:00 GMT'},
+        mock_get.call_args.kwargs['headers'])
+    feature_link = feature_link.key.get()
+    self.assertEqual({'title': 'Old title'}, feature_link.information)
+    self.assertEqual('"abc"', feature_link.etag)
+    self.assertGreater(feature_link.updated, old_updated)
+
+  @mock.patch('framework.http_client.get')
+  def test_index_feature_links_by_ids__stores_validators(self, mock_get):
+    """Validators from a full fetch are saved for the next refresh."""
+    feature_link = FeatureLinks(
+        url='https://drafts.csswg.org/css-new/',
+        type=LINK_TYPE_SPECS, feature_ids=[self.feature_id])
+    feature_link.put()
+    mock_get.return_value = make_response(
+        200, b'<title>New</title>', headers={'ETag': '"v2"'})
+
+    _index_feature_links_by_ids(
+        [feature_link.key.integer_id()], should_notify_on_error=False)
+
+    self.assertEqual({}, mock_get.call_args.kwargs['headers'])
+    feature_link = feature_link.key.get()
+    self.assertEqual('New', feature_link.information['title'])
+    self.assertEqual('"v2"', feature_link.etag)
+    self.assertIsNone(feature_link.last_modified)
+    self.assertIsNotNone(feature_link.content_hash)
+
+  @mock.patch('framework.cloud_tasks_helpers.enqueue_task')
+  @mock.patch('framework.http_client.get')
+  def test_update_feature_links__defers_parsing(self, mock_get, mock_enqueue):
+    """Saving a feature only indexes new links, they are parsed later."""
+    url_1 = 'https://example.com/one'
+    url_2 = 'https://example.com/two'
+    self.feature.doc_links = [url_1, url_2]
+    self.feature.put()
+
+    update_feature_links(self.feature, [('doc_links', [], [url_1, url_2])])
+
+    mock_get.assert_not_called()
+    link_1 = FeatureLinks.make_key(url_1).get()
+    link_2 = FeatureLinks.make_key(url_2).get()
+    self.assertEqual([self.feature_id], link_1.feature_ids)
+    self.assertEqual(LINK_TYPE_WEB, link_2.type)
+    self.assertIsNone(link_2.information)
+    mock_enqueue.assert_called_once()
+    task_params = mock_enqueue.call_args[0][1]
+    self.assertCountEqual(
+        [link_1.key.id(), link_2.key.id()], task_params['feature_link_ids'])
+
+  def test_rekey_feature_link(self):
+    """A link saved with a numeric id is moved to the key of its url."""
+    url = 'https://example.com/legacy'
+    legacy = FeatureLinks(
+        url=url, type=LINK_TYPE_WEB, feature_ids=[self.feature2_id],
+        information={'title': 'Legacy'})
+    legacy.put()
+
+    rekey_feature_link(legacy.key)
+
+    self.assertIsNone(legacy.key.get())
+    feature_link = FeatureLinks.make_key(url).get()
+    self.assertEqual([self.feature2_id], feature_link.feature_ids)
+    self.assertEqual({'title': 'Legacy'}, feature_link.information)
+    self.assertEqual(1, get_feature_links_summary()['total_count'])
+
+  @mock.patch('framework.cloud_tasks_helpers.enqueue_task')
+  def test_rekey_feature_link__merges(self, mock_enqueue):
+    """If the url was indexed again, the feature_ids are merged."""
+    url = 'https://example.com/legacy'
+    legacy = FeatureLinks(
+        url=url, type=LINK_TYPE_WEB, feature_ids=[self.feature2_id])
+    legacy.put()
+    rebuild_feature_links_summary()
+    self.feature.doc_links = [url]
+    self.feature.put()
+    update_feature_links(self.feature, [('doc_links', [], [url])])
+    self.assertEqual(2, get_feature_links_summary()['total_count'])
+
+    rekey_feature_link(legacy.key)
+
+    self.assertIsNone(legacy.key.get())
+    self.assertEqual(
+        [self.feature_id, self.feature2_id],
+        FeatureLinks.make_key(url).get().feature_ids)
+    self.assertEqual(2, get_feature_links_summary()['total_count'])
+
+  def test_get_feature_links_summary__empty(self):
+    """Before any links are counted, the summary is all zeros."""
+    summary = get_feature_links_summary()
+    self.assertEqual(0, summary['total_count'])
+    self.assertEqual([], summary['link_types'])
+
+  @mock.patch('framework.cloud_tasks_helpers.enqueue_task')
+  def test_get_feature_links_summary__incremental(self, mock_enqueue):
+    """Counters kept up to date by edits match a full recount."""
+    url_1 = 'https://example.com/one'
+    url_2 = 'https://docs.example.com/two'
+    self.feature.doc_links = [url_1, url_2]
+    self.feature.put()
+    update_feature_links(self.feature, [('doc_links', [], [url_1, url_2])])
+    self.feature2.doc_links = [url_1]
+    self.feature2.put()
+    update_feature_links(self.feature2, [('doc_links', [], [url_1])])
+    self.feature.doc_links = [url_1]
+    self.feature.put()
+    update_feature_links(
+        self.feature, [('doc_links', [url_1, url_2], [url_1])])
+
+    incremental = get_feature_links_summary()
+    rebuild_feature_links_summary()
+    self.assertEqual(get_feature_links_summary(), incremental)
+    self.assertEqual(2, incremental['total_count'])
+    self.assertEqual(
+        [{'key': 'https://example.com', 'count': 2}],
+        incremental['uncovered_link_domains'])
+
+  @mock.patch('framework.cloud_tasks_helpers.enqueue_task')
+  def test_get_feature_links_summary__drift(self, mock_enqueue):
+    """Counts that drift below zero are kept until the summary is rebuilt."""
+    url = 'https://example.com/uncounted'
+    FeatureLinks(
+        key=FeatureLinks.make_key(url), url=url, type=LINK_TYPE_WEB,
+        feature_ids=[self.feature_id]).put()
+    self.feature.doc_links = []
+    self.feature.put()
+    update_feature_links(self.feature, [('doc_links', [url], [])])
+
+    self.assertEqual(-1, get_feature_links_summary()['total_count'])
+    rebuild_feature_links_summary()
+    self.assertEqual(0, get_feature_links_summary()['total_count'])
+
+  def test_get_feature_links_samples(self):
+    """Samples are looked up by domain, one per feature using the link."""
+    FeatureLinks(
+        url='https://docs.example.com/a', type=LINK_TYPE_WEB,
+        feature_ids=[self.feature_id, self.feature2_id]).put()
+    FeatureLinks(
+        url='https://docs.example.com.evil/b', type=LINK_TYPE_WEB,
+        feature_ids=[self.feature_id]).put()
+
+    samples = get_feature_links_samples('https://docs.example.com', None, None)
+
+    self.assertEqual(2, len(samples))
+    self.assertEqual(
+        {'https://docs.example.com/a'}, {s['url'] for s in samples})
+    self.assertCountEqual(
+        [self.feature_id, self.feature2_id],
+        [s['feature_ids'] for s in samples])
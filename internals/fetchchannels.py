@@ -13,11 +13,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from concurrent import futures
+from datetime import datetime
 import json
 import logging
 import requests
+from google.cloud import ndb  # type: ignore
 
+from framework import http_client
 from framework import rediscache
+from framework import utils
 # Note: this file cannot import core_models because it would be circular.
 import settings
 
@@ -39,11 +44,26 @@ OMAHA_URL_TEMPLATE = (
 # We really only need the version string.
 
 
+# Release schedule lookups are on the request path of several pages, so
+# never wait long for a slow upstream: (connect timeout, read timeout).
+FETCH_TIMEOUT = (3.05, 10)
+MAX_CONCURRENT_FETCHES = 8
+# When a range of milestones is requested, warm the cache for the next few.
+PREFETCH_MILESTONES = 4
+
+_executor = futures.ThreadPoolExecutor(
+    max_workers=MAX_CONCURRENT_FETCHES, thread_name_prefix='fetchchannels')
+
+
 def get_channel_version(channel):
   """Return the version string that is live on the given channel."""
   url = OMAHA_URL_TEMPLATE % channel
   logging.info('fetching %s' % url)
-  result = requests.get(url)
+  try:
+    result = http_client.get(url, timeout=FETCH_TIMEOUT)
+  except requests.RequestException as e:
+    logging.info('Could not fetch channel info for %s: %r', channel, e)
+    return '0.0'
   if result.status_code != 200:
     logging.info('Could not fetch channel info for %s', channel)
     return '0.0'
@@ -57,11 +77,11 @@ def get_omaha_data():
   omaha_data = rediscache.get('omaha_data')
 
   if omaha_data is None:
+    channels = ['stable', 'beta', 'dev']
+    versions = _executor.map(get_channel_version, channels)
     win_versions = [
-        {'channel': 'stable', 'version': get_channel_version('stable')},
-        {'channel': 'beta', 'version': get_channel_version('beta')},
-        {'channel': 'dev', 'version': get_channel_version('dev')},
-        ]
+        {'channel': channel, 'version': version}
+        for channel, version in zip(channels, versions)]
     omaha_info = [{'versions': win_versions}]
     omaha_data = json.dumps(omaha_info)
     rediscache.set('omaha_data', omaha_data, time=86400) # cache for 24hrs.
@@ -70,17 +90,28 @@ def get_omaha_data():
 
 
 SCHEDULE_CACHE_TIME = 60 * 60  # 1 hour
+# Milestones that are not scheduled yet, or whose schedule could not be
+# fetched, are cached briefly so that every page load does not refetch them.
+PLACEHOLDER_CACHE_TIME = 5 * 60  # 5 minutes
+
+
+def release_info_cache_key(version) -> str:
+  return 'chromerelease|%s' % version
 
 
 def fetch_chrome_release_info(version):
-  key = 'chromerelease|%s' % version
+  key = release_info_cache_key(version)
 
   data = rediscache.get(key)
   if data is None:
     url = ('https://chromiumdash.appspot.com/fetch_milestone_schedule?'
            'mstone=%s' % version)
-    result = requests.get(url, timeout=60)
-    if result.status_code == 200:
+    try:
+      result = http_client.get(url, timeout=FETCH_TIMEOUT)
+    except requests.RequestException as e:
+      logging.info('Could not fetch release info for %s: %r', version, e)
+      result = None
+    if result is not None and result.status_code == 200:
       try:
         logging.info(
             'result.content is:\n%s', result.content[:settings.MAX_LOG_LINE])
@@ -102,6 +133,96 @@ def fetch_chrome_release_info(version):
           'mstone': version,
           'version': version,
       }
-      # Note: we don't put placeholder data into redis.
+      rediscache.set(key, data, time=PLACEHOLDER_CACHE_TIME)
 
   return data
+
+
+def fetch_chrome_release_infos(versions: list[int]) -> dict[int, dict]:
+  """Return release info for many milestones with one cache round trip.
+
+  Cache misses are fetched concurrently, and uncached milestones just after
+  the requested ones are fetched in the background so that the next
+  request for a slightly later range is also served from the cache.
+  """
+  if not versions:
+    return {}
+  prefetch_versions = [
+      max(versions) + i for i in range(1, PREFETCH_MILESTONES + 1)]
+  keys = [release_info_cache_key(v) for v in versions + prefetch_versions]
+  cached = rediscache.get_multi(keys) or {}
+
+  result: dict[int, dict] = {}
+  misses: list[int] = []
+  for v in versions:
+    data = cached.get(release_info_cache_key(v))
+    if data is None:
+      misses.append(v)
+    else:
+      result[v] = data
+
+  if misses:
+    logging.info('Fetching release info for milestones %r', misses)
+    for v, data in zip(misses, _executor.map(
+        fetch_chrome_release_info, misses)):
+      result[v] = data
+
+  uncached_later_versions = [
+      v for v in prefetch_versions
+      if cached.get(release_info_cache_key(v)) is None]
+  if uncached_later_versions:
+    prefetch_chrome_release_infos(uncached_later_versions)
+
+  return result
+
+
+def prefetch_chrome_release_infos(versions: list[int]) -> None:
+  """Fetch release info into the cache without waiting for the results."""
+  for v in versions:
+    _executor.submit(fetch_chrome_release_info, v)
+
+
+class MilestoneSchedule(ndb.Model):
+  """Release schedule of one Chrome milestone, keyed by milestone number."""
+  branch_point = ndb.DateTimeProperty()
+  stable_date = ndb.DateTimeProperty()
+  details = ndb.JsonProperty()
+  updated = ndb.DateTimeProperty(auto_now=True)
+
+
+def _parse_schedule_date(date_str: str | None) -> datetime | None:
+  """Parse a date string from the chromiumdash schedule, if present."""
+  if not date_str:
+    return None
+  try:
+    return datetime.strptime(date_str, utils.CHROMIUM_SCHEDULE_DATE_FORMAT)
+  except ValueError:
+    logging.info('Could not parse schedule date %r', date_str)
+    return None
+
+
+def store_milestone_schedules(start: int, end: int) -> int:
+  """Fetch the schedules of milestones start..end and store them in NDB."""
+  schedules: list[MilestoneSchedule] = []
+  for milestone in range(start, end + 1):
+    info = fetch_chrome_release_info(milestone)
+    branch_point = _parse_schedule_date(info.get('branch_point'))
+    stable_date = _parse_schedule_date(info.get('stable_date'))
+    if branch_point is None and stable_date is None:
+      continue  # Don't store placeholder data.
+    schedules.append(MilestoneSchedule(
+        id=milestone, branch_point=branch_point, stable_date=stable_date,
+        details=info))
+
+  ndb.put_multi(schedules)
+  return len(schedules)
+
+
+def get_milestones_branched_between(
+    start_date: datetime, end_date: datetime) -> dict[int, dict]:
+  """Return stored release info of milestones that branched in the range."""
+  query: ndb.Query = MilestoneSchedule.query(
+      MilestoneSchedule.branch_point >= start_date,
+      MilestoneSchedule.branch_point <= end_date)
+  schedules: list[MilestoneSchedule] = query.fetch(None)
+  return {s.key.integer_id(): s.details for s in schedules}
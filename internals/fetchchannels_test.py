@@ -13,15 +13,24 @@
 # limitations under the License.
 
 import testing_config  # Must be imported first
+from datetime import datetime
 import json
+import requests
 from unittest import mock
 
+from framework import rediscache
 from internals import fetchchannels
 
 
 class ChannelsAPITest(testing_config.CustomTestCase):
 
-  @mock.patch('requests.get')
+  def setUp(self):
+    rediscache.delete_keys_with_prefix('chromerelease')
+
+  def tearDown(self):
+    rediscache.delete_keys_with_prefix('chromerelease')
+
+  @mock.patch('framework.http_client.get')
   def test_fetch_chrome_release_info__found(self, mock_requests_get):
     """We can get channel data from the chromiumdash app."""
     mock_requests_get.return_value = testing_config.Blank(
@@ -41,7 +50,7 @@ class ChannelsAPITest(testing_config.CustomTestCase):
         {'everything else': 'kept'},
         actual)
 
-  @mock.patch('requests.get')
+  @mock.patch('framework.http_client.get')
   def test_fetch_chrome_release_info__not_found(self, mock_requests_get):
     """If chromiumdash app does not have the data, use a placeholder."""
     mock_requests_get.return_value = testing_config.Blank(
@@ -58,7 +67,22 @@ class ChannelsAPITest(testing_config.CustomTestCase):
          },
         actual)
 
-  @mock.patch('requests.get')
+  @mock.patch('framework.http_client.get')
+  def test_fetch_chrome_release_info__placeholder_cached(
+      self, mock_requests_get):
+    """A placeholder is cached briefly, so it is not refetched every time."""
+    mock_requests_get.return_value = testing_config.Blank(
+        status_code=404, content='')
+
+    first = fetchchannels.fetch_chrome_release_info(93)
+    second = fetchchannels.fetch_chrome_release_info(93)
+
+    self.assertEqual(first, second)
+    mock_requests_get.assert_called_once()
+    self.assertEqual(
+        first, rediscache.get(fetchchannels.release_info_cache_key(93)))
+
+  @mock.patch('framework.http_client.get')
   def test_fetch_chrome_release_info__error(self, mock_requests_get):
     """We can get channel data from the chromiumdash app."""
     mock_requests_get.return_value = testing_config.Blank(
@@ -75,3 +99,96 @@ class ChannelsAPITest(testing_config.CustomTestCase):
          'version': 90,
          },
         actual)
+
+
+class FetchReleaseInfosTest(testing_config.CustomTestCase):
+
+  def setUp(self):
+    rediscache.delete_keys_with_prefix('chromerelease')
+
+  def tearDown(self):
+    rediscache.delete_keys_with_prefix('chromerelease')
+
+  @mock.patch('framework.http_client.get')
+  def test_fetch_chrome_release_info__timeout(self, mock_session_get):
+    """If chromiumdash is too slow, use a placeholder."""
+    mock_session_get.side_effect = requests.Timeout('too slow')
+
+    actual = fetchchannels.fetch_chrome_release_info(92)
+
+    self.assertEqual(92, actual['mstone'])
+    self.assertIsNone(actual['stable_date'])
+    self.assertEqual(
+        fetchchannels.FETCH_TIMEOUT, mock_session_get.call_args[1]['timeout'])
+
+  @mock.patch('internals.fetchchannels.prefetch_chrome_release_infos')
+  @mock.patch('internals.fetchchannels.fetch_chrome_release_info')
+  def test_fetch_chrome_release_infos__cached(self, mock_fetch, mock_prefetch):
+    """When every milestone is cached, nothing is fetched."""
+    for m in range(100, 103 + fetchchannels.PREFETCH_MILESTONES):
+      rediscache.set(fetchchannels.release_info_cache_key(m), {'mstone': m})
+
+    actual = fetchchannels.fetch_chrome_release_infos([100, 101, 102])
+
+    self.assertEqual(
+        {100: {'mstone': 100}, 101: {'mstone': 101}, 102: {'mstone': 102}},
+        actual)
+    mock_fetch.assert_not_called()
+    mock_prefetch.assert_not_called()
+
+  @mock.patch('internals.fetchchannels.prefetch_chrome_release_infos')
+  @mock.patch('internals.fetchchannels.fetch_chrome_release_info')
+  def test_fetch_chrome_release_infos__misses(self, mock_fetch, mock_prefetch):
+    """Cache misses are fetched and later milestones are prefetched."""
+    rediscache.set(fetchchannels.release_info_cache_key(100), {'mstone': 100})
+    mock_fetch.side_effect = lambda m: {'mstone': m, 'fetched': True}
+
+    actual = fetchchannels.fetch_chrome_release_infos([100, 101])
+
+    self.assertEqual(
+        {100: {'mstone': 100}, 101: {'mstone': 101, 'fetched': True}},
+        actual)
+    mock_fetch.assert_called_once_with(101)
+    mock_prefetch.assert_called_once_with(
+        list(range(102, 102 + fetchchannels.PREFETCH_MILESTONES)))
+
+
+class MilestoneScheduleTest(testing_config.CustomTestCase):
+
+  def tearDown(self):
+    for schedule in fetchchannels.MilestoneSchedule.query():
+      schedule.key.delete()
+
+  @mock.patch('internals.fetchchannels.fetch_chrome_release_info')
+  def test_store_milestone_schedules(self, mock_fetch):
+    """Schedules are stored, but placeholder data is skipped."""
+    def fake_fetch(milestone):
+      if milestone == 120:
+        return {'mstone': 120, 'stable_date': None}
+      return {
+          'mstone': milestone,
+          'branch_point': f'2023-{milestone - 110:02d}-02T00:00:00',
+          'stable_date': f'2023-{milestone - 109:02d}-05T00:00:00',
+      }
+    mock_fetch.side_effect = fake_fetch
+
+    actual = fetchchannels.store_milestone_schedules(118, 120)
+
+    self.assertEqual(2, actual)
+    schedule = fetchchannels.MilestoneSchedule.get_by_id(119)
+    self.assertEqual(datetime(2023, 9, 2), schedule.branch_point)
+    self.assertEqual(datetime(2023, 10, 5), schedule.stable_date)
+    self.assertIsNone(fetchchannels.MilestoneSchedule.get_by_id(120))
+
+  def test_get_milestones_branched_between(self):
+    """We can look up milestones by branch date without fetching."""
+    for milestone, month in [(118, 8), (119, 10), (120, 11)]:
+      fetchchannels.MilestoneSchedule(
+          id=milestone, branch_point=datetime(2023, month, 2),
+          details={'mstone': milestone}).put()
+
+    actual = fetchchannels.get_milestones_branched_between(
+        datetime(2023, 9, 1), datetime(2023, 12, 1))
+
+    self.assertEqual(
+        {119: {'mstone': 119}, 120: {'mstone': 120}}, actual)
@@ -15,15 +15,19 @@
 
 import base64
 import datetime
+import hashlib
+import io
 import json
 import logging
-from xml.dom import minidom
-import requests
+from typing import Iterable
+from xml.etree import ElementTree
 
 from google.auth.transport import requests as reqs
+from google.cloud import ndb  # type: ignore
 import google.oauth2.id_token
 
 from framework import basehandlers
+from framework import http_client
 from framework import rediscache
 from framework import utils
 from internals import metrics_models
@@ -36,6 +40,10 @@ UMA_QUERY_SERVER = 'https://uma-export.appspot.com/chromestatus/'
 HISTOGRAMS_URL = 'https://chromium.googlesource.com/chromium/src/+/main/' \
     'tools/metrics/histograms/metadata/blink/enums.xml?format=TEXT'
 
+# Checksum of the last enums.xml that was fully processed.
+HISTOGRAMS_CHECKSUM_CACHE_KEY = 'histograms|checksum'
+HISTOGRAMS_CHECKSUM_TTL = 7 * 24 * 60 * 60  # One week, in seconds.
+
 # After we have processed all metrics data for a given kind on a given day,
 # we create a capstone entry with this otherwise unused bucket_id.  Later
 # we check for a capstone entry to avoid retrieving metrics for that
@@ -52,8 +60,9 @@ def _FetchMetrics(url):
     logging.info('Requesting metrics from: %r', url)
     token = google.oauth2.id_token.fetch_id_token(reqs.Request(), url)
     logging.info('token is %r', token)
-    return requests.request(
-        'GET', url, timeout=120.0, allow_redirects=False,
+    # Retries are handled by the decorator above.
+    return http_client.request(
+        'GET', url, timeout=120.0, retries=0, allow_redirects=False,
         headers={'Authorization': 'Bearer {}'.format(token)})
   else:
     logging.info('Prod would get metrics from: %r', url)
@@ -227,6 +236,42 @@ class YesterdayHandler(basehandlers.FlaskHandler):
     return 'Success'
 
 
+def parse_histogram_enums(
+    content: bytes, enum_names: Iterable[str]
+    ) -> dict[str, list[tuple[int, str]]]:
+  """Return the (bucket_id, label) pairs of each of the named enums.
+
+  The enums.xml file looks like this:
+  <enum name="FeatureObserver">
+    <int value="0" label="OBSOLETE_PageDestruction"/>
+    <int value="1" label="LegacyNotifications"/>
+
+  The file is parsed as a stream, and only the <int> elements of the
+  requested enums are kept.
+  """
+  wanted = set(enum_names)
+  result: dict[str, list[tuple[int, str]]] = {}
+  current_enum = None
+  for event, el in ElementTree.iterparse(
+      io.BytesIO(content), events=('start', 'end')):
+    if el.tag == 'enum':
+      if event == 'start':
+        name = el.get('name')
+        current_enum = name if name in wanted else None
+        if current_enum:
+          result[current_enum] = []
+      else:
+        current_enum = None
+        el.clear()
+    elif event == 'end':
+      if current_enum and el.tag == 'int':
+        result[current_enum].append((int(el.get('value')), el.get('label')))
+      if el.tag != 'enums':
+        # Free everything that we have finished reading.
+        el.clear()
+  return result
+
+
 class HistogramsHandler(basehandlers.FlaskHandler):
 
   MODEL_CLASS = {
@@ -235,62 +280,60 @@ class HistogramsHandler(basehandlers.FlaskHandler):
     'WebDXFeatureObserver': metrics_models.WebDXFeatureObserver,
   }
 
-  def _SaveData(self, data, histogram_id):
-    try:
-      model_class = self.MODEL_CLASS[histogram_id]
-    except Exception:
-      logging.error('Invalid Histogram id used: %s' % histogram_id)
-      return
-
-    bucket_id = int(data['bucket_id'])
-    property_name = data['property_name']
-    key_name = '%s_%s' % (bucket_id, property_name)
-
-    # Bucket ID 1 is reserved for number of CSS Pages Visited. So don't add it.
-    if (model_class == metrics_models.CssPropertyHistogram and bucket_id == 1):
-      return
-
-    model_class.get_or_insert(key_name,
-      bucket_id=bucket_id,
-      property_name=property_name
-    )
+  def _make_new_entities(
+      self, histogram_id: str,
+      buckets: list[tuple[int, str]]) -> list[metrics_models.HistogramModel]:
+    """Return entities for buckets that are new or have a new label."""
+    model_class = self.MODEL_CLASS[histogram_id]
+    existing_names = {
+        key.string_id() for key in model_class.query().fetch(keys_only=True)}
+    new_entities = []
+    for bucket_id, property_name in buckets:
+      # Bucket ID 1 is reserved for number of CSS Pages Visited.
+      # So don't add it.
+      if (model_class == metrics_models.CssPropertyHistogram and
+          bucket_id == 1):
+        continue
+      key_name = '%s_%s' % (bucket_id, property_name)
+      if key_name in existing_names:
+        continue
+      existing_names.add(key_name)
+      new_entities.append(model_class(
+          id=key_name, bucket_id=bucket_id, property_name=property_name))
+    return new_entities
 
   def get_template_data(self, **kwargs):
     self.require_cron_header()
     # Attempt to fetch enums mapping file.
-    response = requests.get(HISTOGRAMS_URL, timeout=60)
+    response = http_client.get(HISTOGRAMS_URL, timeout=60)
 
     if (response.status_code != 200):
       logging.error('Unable to retrieve chromium histograms mapping file.')
       self.abort(500)
 
-    histograms_content = base64.b64decode(response.content).decode()
-    dom = minidom.parseString(histograms_content)
-
-    # The enums.xml file looks like this:
-    # <enum name="FeatureObserver">
-    #   <int value="0" label="OBSOLETE_PageDestruction"/>
-    #   <int value="1" label="LegacyNotifications"/>
+    histograms_content = base64.b64decode(response.content)
+    checksum = hashlib.sha256(histograms_content).hexdigest()
+    if rediscache.get(HISTOGRAMS_CHECKSUM_CACHE_KEY) == checksum:
+      logging.info('Histograms file is unchanged.')
+      return 'Success'
 
-    enum_els = dom.getElementsByTagName('enum')
+    enums = parse_histogram_enums(histograms_content, self.MODEL_CLASS)
 
     # Save bucket ids for each histogram type, FeatureObserver and
     # MappedCSSProperties.
-    for histogram_id in list(self.MODEL_CLASS.keys()):
-      matching_els = [el for el in enum_els
-                      if el.attributes['name'].value == histogram_id]
-      if matching_els:
-        enum = matching_els[0]
-      else:
+    new_entities: list[metrics_models.HistogramModel] = []
+    for histogram_id in self.MODEL_CLASS:
+      if histogram_id not in enums:
         logging.error(f'Unable to find <enum name="{histogram_id}">.')
         self.abort(500)
-
-      for child in enum.getElementsByTagName('int'):
-        self._SaveData({
-          'bucket_id': child.attributes['value'].value,
-          'property_name': child.attributes['label'].value
-        }, histogram_id)
-
+      new_entities.extend(
+          self._make_new_entities(histogram_id, enums[histogram_id]))
+
+    logging.info('Saving %d new histogram buckets', len(new_entities))
+    ndb.put_multi(new_entities)
+    rediscache.set(
+        HISTOGRAMS_CHECKSUM_CACHE_KEY, checksum,
+        time=HISTOGRAMS_CHECKSUM_TTL)
     return 'Success'
 
 
@@ -20,19 +20,24 @@ import urllib.request, urllib.parse, urllib.error
 
 from unittest import mock
 import flask
+from google.cloud import ndb  # type: ignore
 import werkzeug
 
+from framework import datastore_profiler
+from framework import rediscache
 from internals import fetchmetrics
 from internals import metrics_models
 
 test_app = flask.Flask(__name__)
 
+TESTDATA = testing_config.Testdata(__file__)
+
 
 class FetchMetricsTest(testing_config.CustomTestCase):
 
   @mock.patch('settings.PROD', True)
   @mock.patch('google.oauth2.id_token.fetch_id_token')
-  @mock.patch('requests.request')
+  @mock.patch('framework.http_client.request')
   def test__prod(self, mock_fetch, mock_fetch_id_token):
     """In prod, we actually request metrics from uma-export."""
     mock_fetch.return_value = 'mock response'
@@ -42,13 +47,13 @@ class FetchMetricsTest(testing_config.CustomTestCase):
 
     self.assertEqual('mock response', actual)
     mock_fetch.assert_called_once_with(
-        'GET', 'a url', timeout=120, allow_redirects=False,
+        'GET', 'a url', timeout=120, retries=0, allow_redirects=False,
         headers={'Authorization': 'Bearer fake-token'})
 
 
   @mock.patch('settings.STAGING', True)
   @mock.patch('google.oauth2.id_token.fetch_id_token')
-  @mock.patch('requests.request')
+  @mock.patch('framework.http_client.request')
   def test__staging(self, mock_fetch, mock_fetch_id_token):
     """In staging, we actually request metrics from uma-export."""
     mock_fetch.return_value = 'mock response'
@@ -58,10 +63,10 @@ class FetchMetricsTest(testing_config.CustomTestCase):
 
     self.assertEqual('mock response', actual)
     mock_fetch.assert_called_once_with(
-        'GET', 'a url', timeout=120, allow_redirects=False,
+        'GET', 'a url', timeout=120, retries=0, allow_redirects=False,
         headers={'Authorization': 'Bearer fake-token'})
 
-  @mock.patch('requests.request')
+  @mock.patch('framework.http_client.request')
   def test__dev(self, mock_fetch):
     """In Dev, we cannot access uma-export."""
     actual = fetchmetrics._FetchMetrics('a url')
@@ -200,62 +205,91 @@ class YesterdayHandlerTest(testing_config.CustomTestCase):
 
 class HistogramsHandlerTest(testing_config.CustomTestCase):
 
-  ENUMS_TEXT = '''
-     <histogram-configuration>
-
-     <!-- Enum types -->
-
-     <enums>
-
-     <enum name="FeatureObserver">
-       <!-- Generated from third_party/blink/public/mojom/...
-            Called by update_use_counter_feature_enum.py.-->
-
-       <int value="0" label="OBSOLETE_PageDestruction"/>
-       <int value="1" label="LegacyNotifications"/>
-       <int value="2" label="MultipartMainResource"/>
-       <int value="3" label="PrefixedIndexedDB"/>
-       <int value="4" label="WorkerStart"/>
-     </enum>
-
-     <enum name="MappedCSSProperties">
-
-       <!-- Generated from third_party/blink/public/...
-            Called by update_use_counter_css.py.-->
-
-       <int value="1" label="Total Pages Measured"/>
-       <int value="2" label="color"/>
-       <int value="3" label="direction"/>
-       <int value="4" label="display"/>
-     </enum>
-
-     <enum name="WebDXFeatureObserver">
-
-       <!-- Generated by analysis/uma/histograms/... -->
-
-       <int value="0" label="PageVisits"/>
-       <int value="1" label="CompressionStreams"/>
-       <int value="2" label="ViewTransitions"/>
-       <int value="3" label="Popover"/>
-     </enum>
-
-     </enums>
-     </histogram-configuration>
-     '''
-
   def setUp(self):
     self.request_path = '/cron/histograms'
     self.handler = fetchmetrics.HistogramsHandler()
-
-  @mock.patch('requests.get')
-  @mock.patch('internals.fetchmetrics.HistogramsHandler._SaveData')
-  def test_get_template_data__normal(self, mock_save_data, mock_requests_get):
-    """We can fetch and parse XML for metrics."""
-    mock_requests_get.return_value = testing_config.Blank(
-        status_code=200,
-        content=base64.b64encode(self.ENUMS_TEXT.encode()))
-    with test_app.test_request_context(self.request_path):
-      actual_response = self.handler.get_template_data()
-
+    self.enums_content = TESTDATA['enums.xml'].encode()
+
+  def tearDown(self):
+    for kind in fetchmetrics.HistogramsHandler.MODEL_CLASS.values():
+      for entity in kind.query():
+        entity.key.delete()
+    rediscache.delete(fetchmetrics.HISTOGRAMS_CHECKSUM_CACHE_KEY)
+
+  def run_handler(self, content):
+    """Run the handler on the given file and return the datastore RPCs."""
+    response = testing_config.Blank(
+        status_code=200, content=base64.b64encode(content))
+    with mock.patch('framework.http_client.get', return_value=response):
+      with datastore_profiler.profile() as prof:
+        with test_app.test_request_context(self.request_path):
+          actual_response = self.handler.get_template_data()
     self.assertEqual('Success', actual_response)
-    self.assertEqual(13, mock_save_data.call_count)
+    return prof.names
+
+  def test_parse_histogram_enums(self):
+    """Only the requested enums are returned."""
+    actual = fetchmetrics.parse_histogram_enums(
+        self.enums_content, ['MappedCSSProperties', 'NoSuchEnum'])
+    self.assertEqual(
+        {'MappedCSSProperties': [
+            (1, 'Total Pages Measured'), (2, 'color'), (3, 'direction'),
+            (4, 'display')]},
+        actual)
+
+  def test_get_template_data__normal(self):
+    """We can fetch and parse XML for metrics and save it in one batch."""
+    rpcs = self.run_handler(self.enums_content)
+
+    # One query for each histogram kind, and one commit for all of them.
+    self.assertEqual(['runquery'] * 3 + ['commit'], rpcs)
+    self.assertEqual(
+        {0: 'OBSOLETE_PageDestruction', 1: 'LegacyNotifications',
+         2: 'MultipartMainResource', 3: 'PrefixedIndexedDB', 4: 'WorkerStart'},
+        metrics_models.FeatureObserverHistogram.get_all())
+    # Bucket 1 is not a CSS property.
+    self.assertEqual(
+        {2: 'color', 3: 'direction', 4: 'display'},
+        metrics_models.CssPropertyHistogram.get_all())
+    self.assertEqual(
+        4, len(metrics_models.WebDXFeatureObserver.get_all()))
+
+  def test_get_template_data__unchanged(self):
+    """Nothing is read or written when the file has not changed."""
+    self.run_handler(self.enums_content)
+    rpcs = self.run_handler(self.enums_content)
+    self.assertEqual([], rpcs)
+
+  def test_get_template_data__new_and_renamed(self):
+    """Only buckets that are new or have a new label are written."""
+    self.run_handler(self.enums_content)
+    changed_content = self.enums_content.replace(
+        b'label="WorkerStart"', b'label="WorkerStarted"').replace(
+        b'<int value="3" label="Popover"/>',
+        b'<int value="3" label="Popover"/>\n'
+        b'  <int value="4" label="Anchors"/>')
+
+    with mock.patch.object(
+        ndb, 'put_multi', wraps=ndb.put_multi) as mock_put_multi:
+      self.run_handler(changed_content)
+
+    saved = mock_put_multi.call_args.args[0]
+    self.assertCountEqual(
+        ['4_WorkerStarted', '4_Anchors'], [e.key.string_id() for e in saved])
+    self.assertEqual(
+        'WorkerStarted',
+        metrics_models.FeatureObserverHistogram.get_by_id(
+            '4_WorkerStarted').property_name)
+
+  def test_get_template_data__missing_enum(self):
+    """We fail if one of the enums that we need is not in the file."""
+    content = self.enums_content.replace(
+        b'"WebDXFeatureObserver"', b'"SomethingElse"')
+    response = testing_config.Blank(
+        status_code=200, content=base64.b64encode(content))
+    with mock.patch('framework.http_client.get', return_value=response):
+      with test_app.test_request_context(self.request_path):
+        with self.assertRaises(werkzeug.exceptions.InternalServerError):
+          self.handler.get_template_data()
+    self.assertIsNone(
+        rediscache.get(fetchmetrics.HISTOGRAMS_CHECKSUM_CACHE_KEY))
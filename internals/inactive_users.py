@@ -15,40 +15,55 @@
 import logging
 from datetime import datetime, timedelta
 
-from framework.basehandlers import FlaskHandler
+from google.cloud import ndb  # type: ignore
+
+from framework import rediscache
+from internals import batch_jobs
 from internals.user_models import AppUser
 
-class RemoveInactiveUsersHandler(FlaskHandler):
+class RemoveInactiveUsersHandler(batch_jobs.BatchJob):
+  """Removes any users that have been inactive for 9 months."""
+  JOB_PATH = '/cron/remove_inactive_users'
   DEFAULT_LAST_VISIT = datetime(2022, 8, 1)  # 2022-08-01
   INACTIVE_REMOVE_DAYS = 270
 
-  def get_template_data(self, **kwargs):
-    """Removes any users that have been inactive for 9 months."""
-    self.require_cron_header()
-    now = kwargs.get('now', datetime.now())
-
-    q = AppUser.query()
-    users: list[AppUser] = q.fetch()
-    removed_users = []
-    inactive_cutoff = now - timedelta(days=self.INACTIVE_REMOVE_DAYS)
-    for user in users:
-      # Site admins and editors are not removed for inactivity.
-      if user.is_admin or user.is_site_editor:
-        continue
-
-      # If the user does not have a last visit, it is assumed the last visit
-      # is either the account's creation date or the date the last_visit
-      # field was created on the model - whatever is latest.
-      last_visit = user.last_visit or self.DEFAULT_LAST_VISIT
-      if user.created > last_visit:
-        last_visit = user.created
-      if last_visit < inactive_cutoff:
-        removed_users.append(user.email)
-        logging.info(f'User removed: {user.email}')
-        user.delete()
-
-    logging.info(f'{len(removed_users)} inactive users removed.')
-    removed_users_output = ['Success', 'Removed users:']
-    for user in removed_users:
-      removed_users_output.append(user)
-    return '\n'.join(removed_users_output)
+  def prepare(self) -> None:
+    assert self.checkpoint
+    # Every request of a run uses the time that the run started.
+    now = self.kwargs.get('now', self.checkpoint.started)
+    self.inactive_cutoff = now - timedelta(days=self.INACTIVE_REMOVE_DAYS)
+    self.removed_emails: list[str] = []
+
+  def make_query(self) -> ndb.Query:
+    return AppUser.query()
+
+  def process_entity(self, user: AppUser) -> None:
+    # Site admins and editors are not removed for inactivity.
+    if user.is_admin or user.is_site_editor:
+      return
+
+    # If the user does not have a last visit, it is assumed the last visit
+    # is either the account's creation date or the date the last_visit
+    # field was created on the model - whatever is latest.
+    last_visit = user.last_visit or self.DEFAULT_LAST_VISIT
+    if user.created > last_visit:
+      last_visit = user.created
+    if last_visit < self.inactive_cutoff:
+      self.removed_emails.append(user.email)
+      self.count('removed')
+      logging.info(f'User removed: {user.email}')
+      self.delete(user.key)
+
+  def write_chunk(self) -> None:
+    super().write_chunk()
+    # Deleting by key skips AppUser.delete(), which clears the cache.
+    if not self.dry_run:
+      for email in self.removed_emails:
+        rediscache.delete('user|%s' % email)
+    self.removed_emails = []
+
+  def make_result(self) -> str:
+    # Emails are only logged, so that checkpoints do not keep them.
+    num_removed = self.get_count('removed')
+    logging.info(f'{num_removed} inactive users removed.')
+    return f'Success\n{num_removed} inactive users removed.'
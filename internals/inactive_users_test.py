@@ -15,6 +15,7 @@
 import testing_config  # Must be imported before the module under test.
 from datetime import datetime
 
+from internals.batch_jobs import BatchJobCheckpoint
 from internals.user_models import AppUser
 from internals.inactive_users import RemoveInactiveUsersHandler
 
@@ -71,11 +72,25 @@ class RemoveInactiveUsersHandlerTest(testing_config.CustomTestCase):
     inactive_site_editor.put()
 
   def tearDown(self):
-    for user in AppUser.query():
-      user.key.delete()
+    for kind in [AppUser, BatchJobCheckpoint]:
+      for entity in kind.query():
+        entity.key.delete()
 
   def test_remove_inactive_users(self):
+    # Cache the user so that we check that the cache is cleared.
+    AppUser.get_app_user('really_inactive_user@example.com')
     inactive_remover = RemoveInactiveUsersHandler()
     result = inactive_remover.get_template_data(now=datetime(2023, 9, 1))
-    expected = 'Success\nRemoved users:\nreally_inactive_user@example.com'
+    expected = 'Success\n1 inactive users removed.'
     self.assertEqual(result, expected)
+    self.assertIsNone(AppUser.get_app_user('really_inactive_user@example.com'))
+
+  def test_remove_inactive_users__dry_run(self):
+    """A dry run lists the inactive users without removing them."""
+    inactive_remover = RemoveInactiveUsersHandler()
+    result = inactive_remover.get_template_data(
+        now=datetime(2023, 9, 1), dry_run=True)
+    expected = 'Dry run: Success\n1 inactive users removed.'
+    self.assertEqual(result, expected)
+    self.assertIsNotNone(
+        AppUser.get_app_user('really_inactive_user@example.com'))
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+# Copyright 2025 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License")
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import logging
+import queue
+import threading
+import time
+from concurrent import futures
+from typing import Callable
+from urllib.parse import urlparse
+
+from google.cloud import ndb  # type: ignore
+
+from internals.link_helpers import Link
+
+
+# Total number of links being fetched at the same time.
+MAX_CRAWL_WORKERS = 16
+# Number of links on any one domain being fetched at the same time.
+MAX_REQUESTS_PER_DOMAIN = 2
+# Minimum time between starting two requests to the same domain.
+DOMAIN_DELAY = 0.25  # seconds
+
+
+class LinkCrawler:
+  """Parse many links concurrently while being polite to each domain.
+
+  Links are grouped by domain, and each domain gets at most max_per_domain
+  lanes that take turns parsing its links.  So a worker is never stuck
+  waiting for a busy domain while links on other domains are pending.
+  """
+
+  def __init__(
+      self, max_workers: int = MAX_CRAWL_WORKERS,
+      max_per_domain: int = MAX_REQUESTS_PER_DOMAIN,
+      domain_delay: float = DOMAIN_DELAY):
+    self.max_workers = max_workers
+    self.max_per_domain = max_per_domain
+    self.domain_delay = domain_delay
+    self._lock = threading.Lock()
+    self._domain_next_start: dict[str, float] = {}
+
+  def _wait_for_turn(self, domain: str) -> None:
+    """Sleep until at least domain_delay after the last request to domain."""
+    with self._lock:
+      now = time.monotonic()
+      start = max(now, self._domain_next_start.get(domain, now))
+      self._domain_next_start[domain] = start + self.domain_delay
+    if start > now:
+      time.sleep(start - now)
+
+  def _crawl_lane(
+      self, client: ndb.Client | None, domain: str,
+      pending: collections.deque[Link], done: queue.Queue[Link]) -> None:
+    """Parse links of one domain until there are none left."""
+    # Fetching GitHub credentials uses the datastore, and each thread
+    # needs its own ndb context.
+    if client:
+      with client.context():
+        self._drain(domain, pending, done)
+    else:
+      self._drain(domain, pending, done)
+
+  def _drain(
+      self, domain: str, pending: collections.deque[Link],
+      done: queue.Queue[Link]) -> None:
+    while True:
+      try:
+        link = pending.popleft()
+      except IndexError:
+        return
+      try:
+        self._wait_for_turn(domain)
+        link.parse()
+      except Exception:
+        logging.exception('Could not crawl %s', link.url)
+      finally:
+        done.put(link)
+
+  def crawl(
+      self, links: list[Link],
+      on_parsed: Callable[[Link], None] | None = None) -> list[Link]:
+    """Parse all the given links and return them in the same order.
+
+    If on_parsed is given, it is called in the calling thread with each
+    link as soon as that link is parsed, so results can be saved as they
+    come in rather than after the whole crawl.
+    """
+    if not links:
+      return []
+    context = ndb.get_context(raise_context_error=False)
+    client = context.client if context else None
+    by_domain: dict[str, collections.deque[Link]] = {}
+    for link in links:
+      domain = urlparse(link.url).netloc
+      by_domain.setdefault(domain, collections.deque()).append(link)
+    # Start the first lane of every domain before the second of any.
+    lanes = [
+        (domain, pending)
+        for lane_num in range(self.max_per_domain)
+        for domain, pending in by_domain.items()
+        if lane_num < len(pending)]
+    num_workers = min(self.max_workers, len(lanes))
+    logging.info(
+        'Crawling %d links on %d domains with %d workers',
+        len(links), len(by_domain), num_workers)
+    done: queue.Queue[Link] = queue.Queue()
+    with futures.ThreadPoolExecutor(
+        max_workers=num_workers, thread_name_prefix='link_crawler') as executor:
+      for domain, pending in lanes:
+        executor.submit(self._crawl_lane, client, domain, pending, done)
+      for _ in links:
+        link = done.get()
+        if on_parsed:
+          on_parsed(link)
+    return links
+
+
+def crawl_links(
+    links: list[Link],
+    on_parsed: Callable[[Link], None] | None = None) -> list[Link]:
+  """Parse the given links concurrently using the default limits."""
+  return LinkCrawler().crawl(links, on_parsed=on_parsed)
@@ -0,0 +1,115 @@
+# Copyright 2025 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License")
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import testing_config  # Must be imported before the module under test.
+
+import threading
+import time
+from unittest import mock
+
+from internals import link_crawler
+from internals.link_helpers import Link
+
+
+class LinkCrawlerTest(testing_config.CustomTestCase):
+
+  def setUp(self):
+    self.lock = threading.Lock()
+    self.active: dict[str, int] = {}
+    self.max_active: dict[str, int] = {}
+
+  def fake_parse(self, link):
+    domain = link.url.split('/')[2]
+    with self.lock:
+      self.active[domain] = self.active.get(domain, 0) + 1
+      self.max_active[domain] = max(
+          self.max_active.get(domain, 0), self.active[domain])
+    time.sleep(0.01)
+    with self.lock:
+      self.active[domain] -= 1
+    link.information = {'title': link.url}
+    link.is_parsed = True
+
+  def test_crawl__empty(self):
+    """Crawling nothing does nothing."""
+    self.assertEqual([], link_crawler.LinkCrawler().crawl([]))
+
+  def test_crawl__preserves_order(self):
+    """Links are all parsed and returned in the order given."""
+    links = [Link(f'https://example{i % 3}.com/{i}') for i in range(12)]
+    crawler = link_crawler.LinkCrawler(domain_delay=0)
+    with mock.patch.object(Link, 'parse', autospec=True) as mock_parse:
+      mock_parse.side_effect = self.fake_parse
+      actual = crawler.crawl(links)
+
+    self.assertEqual(links, actual)
+    self.assertTrue(all(link.is_parsed for link in actual))
+    self.assertEqual(12, mock_parse.call_count)
+
+  def test_crawl__limits_requests_per_domain(self):
+    """No domain gets more than max_per_domain concurrent requests."""
+    links = [Link(f'https://example.com/{i}') for i in range(10)]
+    links += [Link(f'https://example.org/{i}') for i in range(10)]
+    crawler = link_crawler.LinkCrawler(
+        max_workers=8, max_per_domain=2, domain_delay=0)
+    with mock.patch.object(Link, 'parse', autospec=True) as mock_parse:
+      mock_parse.side_effect = self.fake_parse
+      crawler.crawl(links)
+
+    self.assertLessEqual(self.max_active['example.com'], 2)
+    self.assertLessEqual(self.max_active['example.org'], 2)
+
+  def test_crawl__on_parsed(self):
+    """Each link is handed to on_parsed once, as soon as it is parsed."""
+    links = [Link(f'https://example{i % 3}.com/{i}') for i in range(6)]
+    crawler = link_crawler.LinkCrawler(domain_delay=0)
+    parsed: list[Link] = []
+
+    def on_parsed(link):
+      self.assertTrue(link.is_parsed)
+      parsed.append(link)
+
+    with mock.patch.object(Link, 'parse', autospec=True) as mock_parse:
+      mock_parse.side_effect = self.fake_parse
+      crawler.crawl(links, on_parsed=on_parsed)
+
+    self.assertCountEqual(links, parsed)
+
+  def test_crawl__busy_domain_does_not_stall_others(self):
+    """Workers are not all tied up waiting on one busy domain."""
+    links = [Link(f'https://example.com/{i}') for i in range(5)]
+    other_link = Link('https://example.org/0')
+    crawler = link_crawler.LinkCrawler(
+        max_workers=2, max_per_domain=1, domain_delay=0)
+    parsed: list[Link] = []
+    with mock.patch.object(Link, 'parse', autospec=True) as mock_parse:
+      mock_parse.side_effect = self.fake_parse
+      crawler.crawl(links + [other_link], on_parsed=parsed.append)
+
+    self.assertLess(parsed.index(other_link), 5)
+    self.assertEqual(1, self.max_active['example.com'])
+
+  @mock.patch('time.sleep')
+  def test_wait_for_turn(self, mock_sleep):
+    """Requests to the same domain are spaced out by domain_delay."""
+    crawler = link_crawler.LinkCrawler(domain_delay=10)
+    crawler._wait_for_turn('example.com')
+    mock_sleep.assert_not_called()
+
+    crawler._wait_for_turn('example.org')
+    mock_sleep.assert_not_called()
+
+    crawler._wait_for_turn('example.com')
+    mock_sleep.assert_called_once()
+    self.assertGreater(mock_sleep.call_args[0][0], 9)
@@ -14,21 +14,27 @@
 # limitations under the License.
 
 import re
-import requests
+import codecs
+import functools
+import hashlib
 import json
 import logging
+import threading
+from collections.abc import Iterable
+from html.parser import HTMLParser
 from typing import Any, Optional
 from ghapi.core import GhApi
 from urllib.error import HTTPError
 from urllib.parse import urlparse
 import base64
 import validators
-import html
+from framework import http_client
 from framework import secrets
 
 
-github_crediential = None
-github_api_client = None
+# Each thread gets its own client, because a GhApi client keeps the
+# headers of its last response in client.recv_hdrs.
+_github = threading.local()
 
 LINK_TYPE_CHROMIUM_BUG = 'chromium_bug'
 LINK_TYPE_GITHUB_ISSUE = 'github_issue'
@@ -40,6 +46,9 @@ LINK_TYPE_MOZILLA_BUG = 'mozilla_bug'
 LINK_TYPE_WEBKIT_BUG = 'webkit_bug'
 LINK_TYPE_SPECS = 'specs'
 LINK_TYPE_WEB = 'web'
+# Links of these types are checked through the GitHub API rather than by
+# fetching the page itself.
+GITHUB_API_LINK_TYPES = [LINK_TYPE_GITHUB_ISSUE, LINK_TYPE_GITHUB_PULL_REQUEST]
 LINK_TYPES_REGEX = {
     # https://bugs.chromium.org/p/chromium/issues/detail?id=
     # https://crbug.com/
@@ -68,6 +77,13 @@ LINK_TYPES_REGEX = {
     LINK_TYPE_WEB: re.compile(r'https?://.*'),
 }
 
+# All the patterns above combined into one alternation with a named group per
+# link type.  Alternatives are tried in order, so the first link type that
+# matches wins, just as when trying each regex in turn.
+LINK_TYPE_CLASSIFIER = re.compile('|'.join(
+    f'(?P<{link_type}>{regex.pattern})'
+    for link_type, regex in LINK_TYPES_REGEX.items()))
+
 TAG_REVIEW_URL_PATTERN = re.compile(r'github.com/w3ctag/design-reviews/', re.IGNORECASE)
 GECKO_REVIEW_URL_PATTERN = re.compile(
   r'github.com/mozilla/standards-positions/', re.IGNORECASE
@@ -77,33 +93,117 @@ WEBKIT_REVIEW_URL_PATTERN = re.compile(
 )
 
 URL_REGEX = re.compile(r'(https?://\S+)')
+# Like string.punctuation except that it does not include "/", so that
+# urls ending with "/" keep it.
+URL_TRAILING_PUNCTUATION = r"""!"#$%&'()*+,-.:;<=>?@[\]^_`{|}~"""
 
 TIMEOUT = 30  # We wait at most 30 seconds for each web page request.
+CHUNK_SIZE = 16 * 1024
+# The title and description are in the <head>, which is rarely this long.
+MAX_HEAD_BYTES = 256 * 1024
 
 
-def valid_url(url):
+# Feature fields mostly repeat the same urls, so remember validation results.
+@functools.lru_cache(maxsize=16384)
+def valid_url(url: str) -> bool:
   try:
-    return validators.url(url, public=True)
+    return bool(validators.url(url, public=True))
   except:
     return False
 
 
 def get_github_api_client():
-  """Set up the GitHub client."""
-  global github_credential
-  global github_api_client
-  if github_api_client is None:
-    github_credential = secrets.ApiCredential.get_github_credendial()
-    github_api_client = GhApi(token=github_credential.token)
+  """Set up the GitHub client of the current thread."""
+  if getattr(_github, 'client', None) is None:
+    _github.credential = secrets.ApiCredential.get_github_credendial()
+    _github.client = GhApi(token=_github.credential.token)
 
-  return github_api_client
+  return _github.client
 
 
 def rotate_github_client():
   """Try a different github client, e.g., after quota is used up."""
-  global github_api_client
-  github_credential.record_failure()
-  github_api_client = None  # A new one will be selected on when needed.
+  _github.credential.record_failure()
+  _github.client = None  # A new one will be selected on when needed.
+
+
+class HtmlHeadParser(HTMLParser):
+  """Incrementally collect the title and description from an HTML head."""
+
+  META_KEYS = ('og:title', 'og:description', 'description')
+
+  def __init__(self):
+    super().__init__(convert_charrefs=True)
+    self.is_done = False
+    self.title: str | None = None
+    self.meta: dict[str, str] = {}
+    self._in_title = False
+    self._title_parts: list[str] = []
+
+  def handle_starttag(self, tag, attrs):
+    if tag == 'title' and self.title is None:
+      self._in_title = True
+    elif tag == 'meta':
+      attr_dict = dict(attrs)
+      key = attr_dict.get('property') or attr_dict.get('name')
+      content = attr_dict.get('content')
+      if key in self.META_KEYS and content is not None:
+        self.meta.setdefault(key, content)
+    elif tag == 'body':
+      self.is_done = True
+
+  def handle_endtag(self, tag):
+    if tag == 'title' and self._in_title:
+      self._in_title = False
+      self.title = ''.join(self._title_parts).strip()
+    elif tag == 'head':
+      self.is_done = True
+
+  def handle_data(self, data):
+    if self._in_title:
+      self._title_parts.append(data)
+
+  def get_information(self) -> dict[str, str | None]:
+    return {
+        'title': self.meta.get('og:title', self.title),
+        'description': self.meta.get(
+            'og:description', self.meta.get('description')),
+    }
+
+
+def parse_html_head(
+    chunks: Iterable[bytes], encoding: str = 'utf-8',
+    max_bytes: int = MAX_HEAD_BYTES) -> tuple[dict[str, str | None], str]:
+  """Return the title and description of an HTML page and a hash of its head.
+
+  Chunks are consumed only until the end of the <head> or max_bytes, so
+  the rest of a large page is never downloaded.
+  """
+  try:
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+  except LookupError:
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+  parser = HtmlHeadParser()
+  digest = hashlib.sha256()
+  num_bytes = 0
+  for chunk in chunks:
+    digest.update(chunk)
+    num_bytes += len(chunk)
+    parser.feed(decoder.decode(chunk))
+    if parser.is_done or num_bytes >= max_bytes:
+      break
+  parser.close()
+  return parser.get_information(), digest.hexdigest()
+
+
+def _get_charset(response) -> str:
+  """Return the charset declared in the Content-Type header, or utf-8."""
+  content_type = response.headers.get('Content-Type', '')
+  for param in content_type.split(';')[1:]:
+    name, _, value = param.strip().partition('=')
+    if name.lower() == 'charset' and value:
+      return value.strip('"\' ')
+  return 'utf-8'
 
 
 class Link():
@@ -113,12 +213,8 @@ class Link():
     """Extract the urls from the given value."""
     if isinstance(value, str):
       urls = URL_REGEX.findall(value)
-
       # remove trailing punctuation
-      # punctuation similar to string.punctuation except that it does not include "/"
-      # this keep url ending with "/"
-      punctuation = r"""!"#$%&'()*+,-.:;<=>?@[\]^_`{|}~"""
-      urls = [url.rstrip(punctuation) for url in urls]
+      urls = [url.rstrip(URL_TRAILING_PUNCTUATION) for url in urls]
     elif isinstance(value, list):
       urls = [url for url in value if isinstance(url, str) and URL_REGEX.match(url)]
     else:
@@ -128,18 +224,25 @@ class Link():
   @classmethod
   def get_type(cls, link: str) -> str | None:
     """Return Link_Type if the given link is valid. Otherwise, return None."""
-    for link_type, regex in LINK_TYPES_REGEX.items():
-      if regex.match(link):
-        return link_type
-    return None
+    match = LINK_TYPE_CLASSIFIER.match(link)
+    return match.lastgroup if match else None
 
-  def __init__(self, url: str):
+  def __init__(
+      self, url: str, etag: str | None = None,
+      last_modified: str | None = None, content_hash: str | None = None):
+    """Validators from a previous fetch, if given, make fetches conditional."""
     self.url = url
     self.type = Link.get_type(url)
     self.is_parsed = False
     self.is_error = False
     self.http_error_code: Optional[int] = None
     self.information = None
+    self.etag = etag
+    self.last_modified = last_modified
+    self.content_hash = content_hash
+    # True if the content is unchanged since the validators were recorded.
+    self.is_not_modified = False
+    self._response = None
     logging.info(f'Constructed Link for {url} with type {self.type}')
 
   def _fetch_github_file(
@@ -190,15 +293,33 @@ class Link():
 
     return information
 
+  def _conditional_headers(self) -> dict[str, str]:
+    headers = {}
+    if self.etag:
+      headers['If-None-Match'] = self.etag
+    if self.last_modified:
+      headers['If-Modified-Since'] = self.last_modified
+    return headers
+
   def _fetch_github_issue(
           self, owner: str, repo: str, issue_id: int,
-          retries=1) -> dict[str, Any]:
-    """Get an issue from GitHub."""
+          retries=1) -> dict[str, Any] | None:
+    """Get an issue from GitHub, or None if it has not been modified."""
     try:
       client = get_github_api_client()
-      resp = client.issues.get(owner=owner, repo=repo, issue_number=issue_id)
+      # Conditional requests that get a 304 do not count against the quota.
+      resp = client.issues.get(
+          owner=owner, repo=repo, issue_number=issue_id,
+          headers=self._conditional_headers())
+      # The client belongs to this thread, so recv_hdrs are the headers of
+      # the response to this request.
+      self.etag = client.recv_hdrs.get('ETag')
+      self.last_modified = client.recv_hdrs.get('Last-Modified')
       return resp
     except HTTPError as e:
+      if e.code == 304:
+        self.is_not_modified = True
+        return None
       logging.info(f'Got http response code {e.code}')
       if e.code != 404 and retries > 0:
         rotate_github_client()
@@ -207,7 +328,7 @@ class Link():
       else:
         raise e
 
-  def _parse_github_issue(self) -> dict[str, str | None]:
+  def _parse_github_issue(self) -> dict[str, str | None] | None:
     """Parse the information from the github issue tracker."""
 
     parsed_url = urlparse(self.url)
@@ -217,6 +338,8 @@ class Link():
     issue_id = path.split('/')[4]
 
     resp = self._fetch_github_issue(owner, repo, int(issue_id))
+    if resp is None:
+      return None
     information = {
         'url': resp.get('url'),
         'number': resp.get('number'),
@@ -252,7 +375,7 @@ class Link():
     # technically, we could cache the csrf token and reuse it for 2 hours
     # TODO: consider using a monorail API client with OAuth
 
-    csrf_response = requests.get(
+    csrf_response = http_client.get(
         "https://bugs.chromium.org/p/chromium/issues/wizard", timeout=TIMEOUT)
     csrf_token = re.findall("'token': '(.*?)'", csrf_response.text)
     csrf_token = csrf_token[0] if csrf_token else None
@@ -272,7 +395,7 @@ class Link():
         },
     }
 
-    bug_response = requests.post(
+    bug_response = http_client.post(
         endpoint, json=body, headers=headers, timeout=TIMEOUT)
     json_str = bug_response.text
 
@@ -284,29 +407,55 @@ class Link():
 
     return information.get('issue', None)
 
-  def _parse_html_head(self):
-    response = requests.get(self.url, timeout=TIMEOUT)
-    # unescape html, e.g. &amp; -> &
-    html_str = html.unescape(response.text)
-
-    title = re.search(r'<title>(.*?)</title>', html_str)
-    # use \s+ instead of whitespace, to match multiple whitespaces or newlines
-    title_og = re.search(r'<meta property="og:title"\s+content="(.*?)"', html_str)
-    description = re.search(r'<meta name="description"\s+content="(.*?)"', html_str)
-    description_og = re.search(r'<meta property="og:description"\s+content="(.*?)"', html_str)
+  def _fetch(self):
+    """Fetch the page at most once; validation and parsing share it."""
+    if self._response is None:
+      # The body is streamed so that only as much as needed is downloaded.
+      self._response = http_client.get(
+          self.url, allow_redirects=True, timeout=TIMEOUT, stream=True,
+          headers=self._conditional_headers())
+      self._update_validators(self._response)
+    return self._response
+
+  def _release_response(self) -> None:
+    """Return the connection of a partially read response to the pool."""
+    if self._response is not None:
+      self._response.close()
+      self._response = None
+
+  def _update_validators(self, response) -> None:
+    """Record the validators of a fetched page and detect unchanged ones."""
+    if response.status_code == 304:
+      self.is_not_modified = True
+      return
+    if response.status_code != 200:
+      return
+    self.etag = response.headers.get('ETag')
+    self.last_modified = response.headers.get('Last-Modified')
 
-    return {
-        'title': title_og.group(1) if title_og else (title.group(1) if title else None),
-        'description': description_og.group(1) if description_og else (description.group(1) if description else None),
-    }
+  def _parse_html_head(self):
+    response = self._fetch()
+    try:
+      information, content_hash = parse_html_head(
+          response.iter_content(chunk_size=CHUNK_SIZE),
+          encoding=_get_charset(response))
+    finally:
+      self._release_response()
+    # Servers that do not support conditional requests still let us skip
+    # updating a page whose head has not changed.
+    if content_hash == self.content_hash:
+      self.is_not_modified = True
+      return None
+    self.content_hash = content_hash
+    return information
 
   def _validate_url(self) -> bool:
     """The `_validate_url` method is used to validate the URL associated with the Link object. It
     sends a GET request to the URL and checks the response status code. If the status code is not
-    200 (OK), it sets the `is_error` flag to True and stores the HTTP error code. This method is
+    200 (OK) or 304 (Not Modified), it sets the `is_error` flag to True and stores the HTTP error code. This method is
     used to determine if the URL is accessible and valid."""
-    res = requests.get(self.url, allow_redirects=True, timeout=TIMEOUT)
-    if res.status_code != 200:
+    res = self._fetch()
+    if res.status_code not in (200, 304):
       self.is_error = True
       self.http_error_code = res.status_code
       return False
@@ -319,8 +468,12 @@ class Link():
     logging.getLogger().handlers[0].flush()
 
     try:
-      if not self.type or not self._validate_url():
-        # if the link is not valid, return early
+      if (not self.type or
+          (self.type not in GITHUB_API_LINK_TYPES and
+           not self._validate_url()) or
+          self.is_not_modified):
+        # if the link is not valid or has not changed, return early
+        self._release_response()
         self.is_parsed = True
         return
 
@@ -353,4 +506,5 @@ class Link():
       if isinstance(e, HTTPError):
         self.http_error_code = e.code
       self.information = None
+    self._release_response()
     self.is_parsed = True
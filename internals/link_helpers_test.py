@@ -14,6 +14,7 @@
 # limitations under the License.
 
 import testing_config
+import threading
 from unittest import mock
 from unittest import skip
 from internals.link_helpers import (
@@ -26,9 +27,27 @@ from internals.link_helpers import (
     LINK_TYPE_GOOGLE_DOCS,
     LINK_TYPE_MOZILLA_BUG,
     LINK_TYPE_SPECS,
+    LINK_TYPES_REGEX,
+    MAX_HEAD_BYTES,
+    get_github_api_client,
+    parse_html_head,
     valid_url
 )
 
+TESTDATA = testing_config.Testdata(__file__)
+
+
+def make_response(status_code, body=b'', headers=None):
+  """Return a fake streamed response from http_client.get()."""
+  return testing_config.Blank(
+      status_code=status_code, headers=headers or {},
+      iter_content=lambda chunk_size: iter([body]), close=lambda: None)
+
+
+def iter_chunks(data: bytes, chunk_size: int = 1024):
+  for i in range(0, len(data), chunk_size):
+    yield data[i:i + chunk_size]
+
 
 class LinkHelperTest(testing_config.CustomTestCase):
   def test_specs_url(self):
@@ -94,10 +113,45 @@ class LinkHelperTest(testing_config.CustomTestCase):
       with self.subTest(url=url):
         self.assertTrue(valid_url(url))
 
-  @mock.patch('requests.get')
+  def test_get_type__same_as_each_regex_in_turn(self):
+    """The combined classifier agrees with trying each regex in order."""
+    urls = [
+        'https://crbug.com/1234',
+        'https://bugs.chromium.org/p/chromium/issues/detail?id=1',
+        'https://github.com/GoogleChrome/chromium-dashboard/issues/999',
+        'https://www.github.com/w3c/csswg-drafts/pull/3044',
+        'https://github.com/w3c/reporting/blob/master/EXPLAINER.md',
+        'https://github.com/w3c/csswg-drafts/issues/1/README.md',
+        'https://developer.mozilla.org/en-US/docs/Web/API/DOMException',
+        'https://docs.google.com/document/d/1-M_o',
+        'https://docs.google.com/other/d/1-M_o',
+        'https://bugzilla.mozilla.org/show_bug.cgi?id=1314686',
+        'https://bugs.webkit.org/show_bug.cgi?id=128456',
+        'https://html.spec.whatwg.org/multipage/',
+        'https://www.w3.org/TR/css-contain-3/',
+        'https://example.com/',
+        'ftp://example.com/',
+        'not a url',
+    ]
+    for url in urls:
+      expected = next(
+          (link_type for link_type, regex in LINK_TYPES_REGEX.items()
+           if regex.match(url)),
+          None)
+      with self.subTest(url=url):
+        self.assertEqual(expected, Link.get_type(url))
+
+  def test_valid_url__cached(self):
+    """Validation results are booleans and are remembered."""
+    valid_url.cache_clear()
+    self.assertIs(True, valid_url('https://example.com/cached'))
+    self.assertIs(False, valid_url('https://invalid'))
+    self.assertIs(True, valid_url('https://example.com/cached'))
+    self.assertEqual(1, valid_url.cache_info().hits)
+
+  @mock.patch('framework.http_client.get')
   def test_mock_not_found_url(self, mock_requests_get):
-    mock_requests_get.return_value = testing_config.Blank(
-        status_code=404, content='')
+    mock_requests_get.return_value = make_response(404)
 
     link = Link("https://www.google.com/")
     link.parse()
@@ -105,6 +159,106 @@ class LinkHelperTest(testing_config.CustomTestCase):
     self.assertEqual(link.is_error, True)
     self.assertEqual(link.http_error_code, 404)
 
+  @mock.patch('framework.http_client.get')
+  def test_parse__unchanged_content_hash(self, mock_get):
+    """A page whose content hash is unchanged is not re-parsed."""
+    mock_get.return_value = make_response(200, b'<title>Same</title>')
+    link = Link('https://drafts.csswg.org/css-a/')
+    link.parse()
+    self.assertEqual('Same', link.information['title'])
+    self.assertFalse(link.is_not_modified)
+
+    link2 = Link(
+        'https://drafts.csswg.org/css-a/', content_hash=link.content_hash)
+    link2.parse()
+    self.assertTrue(link2.is_not_modified)
+    self.assertIsNone(link2.information)
+    self.assertFalse(link2.is_error)
+
+  @mock.patch.object(Link, '_fetch_github_issue')
+  @mock.patch('framework.http_client.get')
+  def test_parse__github_issue_uses_api_only(self, mock_get, mock_fetch):
+    """GitHub issues are validated by the API call, not a page fetch."""
+    mock_fetch.return_value = None
+    link = Link(
+        'https://github.com/GoogleChrome/chromium-dashboard/issues/999',
+        etag='"abc"')
+    link.parse()
+    mock_get.assert_not_called()
+    mock_fetch.assert_called_once()
+    self.assertIsNone(link.information)
+
+  @mock.patch('internals.link_helpers.GhApi')
+  @mock.patch('framework.secrets.ApiCredential.get_github_credendial')
+  def test_get_github_api_client__per_thread(self, mock_cred, mock_ghapi):
+    """Threads do not share a client, so they do not share recv_hdrs."""
+    mock_ghapi.side_effect = lambda token: mock.Mock()
+    clients = []
+    threads = [
+        threading.Thread(
+            target=lambda: clients.append(get_github_api_client()))
+        for _ in range(2)]
+    for t in threads:
+      t.start()
+      t.join()
+
+    self.assertEqual(2, len(clients))
+    self.assertIsNot(clients[0], clients[1])
+
+  def test_parse_html_head__saved_spec_page(self):
+    """We get the title and description from a real spec page."""
+    page = TESTDATA['css_spec_page.html'].encode()
+    info, content_hash = parse_html_head(iter_chunks(page))
+    self.assertEqual('CSS Containment Module Level 3', info['title'])
+    self.assertEqual(
+        'This CSS module describes the contain property, which indicates '
+        'that the element\u2019s subtree is independent of the rest of the '
+        'page & enables heavy optimizations.',
+        info['description'])
+    self.assertEqual(64, len(content_hash))
+
+  def test_parse_html_head__stops_after_head(self):
+    """The body of a large page is never read."""
+    page = TESTDATA['css_spec_page.html'].encode()
+    page += b'<p>filler</p>' * (1024 * 1024)
+    consumed = []
+    def tracking_chunks():
+      for chunk in iter_chunks(page):
+        consumed.append(chunk)
+        yield chunk
+
+    info, _ = parse_html_head(tracking_chunks())
+
+    self.assertEqual('CSS Containment Module Level 3', info['title'])
+    self.assertLess(sum(len(c) for c in consumed), 4096)
+
+  def test_parse_html_head__byte_cap(self):
+    """A page without a head end tag is read only up to the cap."""
+    page = b'<html><title>T</title>' + b'<p>filler</p>' * (1024 * 1024)
+    consumed = []
+    def tracking_chunks():
+      for chunk in iter_chunks(page):
+        consumed.append(chunk)
+        yield chunk
+
+    info, _ = parse_html_head(tracking_chunks())
+
+    self.assertEqual('T', info['title'])
+    self.assertLessEqual(sum(len(c) for c in consumed), MAX_HEAD_BYTES)
+
+  def test_parse_html_head__fallbacks(self):
+    """Plain title and description are used when there is no og: data."""
+    page = (
+        b'<head><meta content="D &amp; E" name="description">'
+        b'<title>A &lt; B</title></head>')
+    info, _ = parse_html_head(iter_chunks(page, chunk_size=7))
+    self.assertEqual({'title': 'A < B', 'description': 'D & E'}, info)
+
+  def test_parse_html_head__empty(self):
+    """A page without a head has no title or description."""
+    info, _ = parse_html_head(iter([]))
+    self.assertEqual({'title': None, 'description': None}, info)
+
   def test_extract_urls_from_value(self):
     field_value = "https://www.chromestatus.com/feature/1234"
     urls = Link.extract_urls_from_value(field_value)
@@ -13,57 +13,94 @@
 # limitations under the License.
 
 import collections
-import csv
+from concurrent import futures
 from datetime import date, datetime
-from io import StringIO
 import logging
-from typing import Any
-from google.cloud import ndb, storage  # type: ignore
+from typing import Any, Callable, TypeVar
+from google.cloud import ndb  # type: ignore
 import requests
 
 from api import converters, channels_api
 from framework.basehandlers import FlaskHandler
 from framework import cloud_tasks_helpers
+from framework import http_client
 from framework import origin_trials_client
+from framework import secrets
 from framework import utils
 from internals import approval_defs
+from internals import batch_jobs
+from internals import pending_gates
 from internals.core_models import FeatureEntry, MilestoneSet, Stage
-from internals.review_models import Gate, Vote, Activity
+from internals.review_models import (
+    Gate, GateLatencyRecord, FeatureGateLatencies, Vote, Activity,
+    DailyReviewLatency)
 from internals.core_enums import *
-from internals.feature_links import batch_index_feature_entries
+from internals.feature_links import (
+    FeatureLinks, batch_index_feature_entries, rebuild_feature_links_summary,
+    rekey_feature_link)
+from internals import fetchchannels
+from internals import review_activity_export
+from internals import slo
 from internals import stage_helpers
 from internals.webdx_feature_models import WebdxFeatures
 from webstatus_openapi import ApiClient, DefaultApi, Configuration, ApiException, Feature
 import settings
 
-class EvaluateGateStatus(FlaskHandler):
+class EvaluateGateStatus(batch_jobs.BatchJob):
 
-  def get_template_data(self, **kwargs) -> str:
-    """Evaluate all existing Gate entities and set correct state."""
-    self.require_cron_header()
+  JOB_PATH = '/scripts/evaluate_gate_status'
 
-    count = 0
-    batch = []
-    BATCH_SIZE = 100
-    votes_by_gate = collections.defaultdict(list)
-    for vote in Vote.query():
-      votes_by_gate[vote.gate_id].append(vote)
-    for gate in Gate.query():
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    # Gates in the current chunk whose state changed.
+    self.changed_gates: list[Gate] = []
+
+  def make_query(self) -> ndb.Query:
+    return Gate.query()
+
+  def process_entity(self, gate: Gate) -> None:
+    """Evaluate one Gate entity and set its correct state."""
+    gate_id = gate.key.integer_id()
+    if self.dry_run:
+      # Evaluate the votes as they are, without rekeying them.
       if approval_defs.update_gate_approval_state(
-          gate, votes_by_gate[gate.key.integer_id()]):
-        batch.append(gate)
-        count += 1
-        if len(batch) > BATCH_SIZE:
-          ndb.put_multi(batch)
-          batch = []
+          gate, votes=Vote.get_votes(gate_id=gate_id)):
+        self.count('updated')
+      return
 
-    ndb.put_multi(batch)
-    return f'{count} Gate entities updated.'
+    # The vote summary is recomputed from the Vote entities, so that any
+    # drift is repaired.  That is done in a transaction rather than with
+    # self.put() so that it cannot undo a vote that is set meanwhile.
+    approval_defs.rekey_gate_votes(gate_id)
+    updated_gate = approval_defs.reevaluate_gate(gate_id)
+    if updated_gate:
+      self.count('updated')
+      self.changed_gates.append(updated_gate)
 
+  def write_chunk(self) -> None:
+    """Write the chunk, then update the pending gate index to match."""
+    super().write_chunk()
+    for gate in self.changed_gates:
+      pending_gates.update_gate(gate)
+    self.changed_gates = []
 
-class WriteMissingGates(FlaskHandler):
+  def make_result(self) -> str:
+    return f'{self.get_count("updated")} Gate entities updated.'
 
-  GATES_TO_CREATE_PER_RUN = 5000
+
+class RebuildPendingGateIndex(FlaskHandler):
+
+  def get_template_data(self, **kwargs) -> str:
+    """Rebuild the index of pending gates from the Gate entities."""
+    self.require_cron_header()
+
+    count = pending_gates.rebuild_all(approval_defs.APPROVAL_FIELDS_BY_ID)
+    return f'{count} pending gates indexed.'
+
+
+class WriteMissingGates(batch_jobs.BatchJob):
+
+  JOB_PATH = '/scripts/write_missing_gates'
 
   GATE_RULES: dict[int, dict[int, list[int]]] = {
       fe_type: dict(stages_and_gates)
@@ -96,29 +133,42 @@ class WriteMissingGates(FlaskHandler):
         new_gates.append(gate)
     return new_gates
 
-  def get_template_data(self, **kwargs) -> str:
-    """Create a chunk of needed gates for all features."""
-    self.require_cron_header()
-
-    all_feature_entries = FeatureEntry.query().fetch()
-    fe_by_id = {fe.key.integer_id(): fe
-                for fe in all_feature_entries}
+  def make_query(self) -> ndb.Query:
+    return Stage.query()
+
+  def process_chunk(self, stages: list[Stage]) -> None:
+    """Create any needed gates for a chunk of stages."""
+    feature_ids = sorted(
+        {stage.feature_id for stage in stages if stage.feature_id})
+    features = ndb.get_multi(
+        [ndb.Key(FeatureEntry, fid) for fid in feature_ids])
+    fe_by_id = {fid: fe for fid, fe in zip(feature_ids, features)}
+    stage_ids = [stage.key.integer_id() for stage in stages]
     existing_gates_by_stage_id = collections.defaultdict(list)
-    for gate in Gate.query():
-      existing_gates_by_stage_id[gate.stage_id].append(gate)
+    if stage_ids:
+      for gate in Gate.query(Gate.stage_id.IN(stage_ids)).fetch():
+        existing_gates_by_stage_id[gate.stage_id].append(gate)
 
-    gates_to_write: list[Gate] = []
-    for stage in Stage.query():
-      new_gates = self.make_needed_gates(
+    new_gates: list[Gate] = []
+    for stage in stages:
+      new_gates.extend(self.make_needed_gates(
           fe_by_id.get(stage.feature_id), stage,
-          existing_gates_by_stage_id[stage.key.integer_id()])
-      gates_to_write.extend(new_gates)
-      if len(gates_to_write) > self.GATES_TO_CREATE_PER_RUN:
-        break  # Stop early if we risk exceeding GAE timeout.
+          existing_gates_by_stage_id[stage.key.integer_id()]))
+    if not new_gates:
+      return
 
-    ndb.put_multi(gates_to_write)
+    # Reserve the gate IDs so that each gate's latency record can refer
+    # to it and both can be written together.
+    for gate, key in zip(new_gates, Gate.allocate_ids(len(new_gates))):
+      gate.key = key
+    if not self.dry_run:
+      GateLatencyRecord.put_records(
+          [GateLatencyRecord.make_not_started(g) for g in new_gates],
+          new_gates)
+    self.count('created', len(new_gates))
 
-    return f'{len(gates_to_write)} missing gates created for stages.'
+  def make_result(self) -> str:
+    return f'{self.get_count("created")} missing gates created for stages.'
 
 
 class MigrateGeckoViews(FlaskHandler):
@@ -159,7 +209,9 @@ class MigrateGeckoViews(FlaskHandler):
     return f'{count} FeatureEntry entities updated.'
 
 
-class BackfillRespondedOn(FlaskHandler):
+class BackfillRespondedOn(batch_jobs.BatchJob):
+
+  JOB_PATH = '/scripts/backfill_responded_on'
 
   def update_responded_on(self, gate) -> bool:
     """Update gate.responded_on and return True if an update was needed."""
@@ -189,26 +241,56 @@ class BackfillRespondedOn(FlaskHandler):
     else:
       return False
 
+  def make_query(self) -> ndb.Query:
+    # Unlike != None, this inequality can be paged with a cursor.
+    return Gate.query(Gate.requested_on > datetime.min)
+
+  def process_entity(self, gate: Gate) -> None:
+    """Backfill the responded_on date of one gate."""
+    if gate.responded_on:
+      return
+    if self.update_responded_on(gate):
+      if not self.dry_run:
+        # Keep the review latency report in sync with the new date.
+        GateLatencyRecord.put_records([slo.make_latency_record(gate)], [gate])
+      self.count('updated')
+
+  def make_result(self) -> str:
+    return f'{self.get_count("updated")} Gates entities updated.'
+
+
+class BackfillGateLatencyRecords(FlaskHandler):
+
   def get_template_data(self, **kwargs) -> str:
-    """Backfill responded_on dates for existing gates."""
+    """Rebuild precomputed review latency records and daily aggregates."""
     self.require_cron_header()
-    gates: ndb.Query = Gate.query(Gate.requested_on != None)
-    count = 0
-    batch = []
-    BATCH_SIZE = 100
-    for g in gates:
-      if g.responded_on:
-        continue
-      if self.update_responded_on(g):
-        batch.append(g)
-        count += 1
-        if len(batch) > BATCH_SIZE:
-          ndb.put_multi(batch)
-          logging.info(f'Finished a batch of {BATCH_SIZE}')
-          batch = []
 
-    ndb.put_multi(batch)
-    return f'{count} Gates entities updated.'
+    records = []
+    records_by_fid: dict[int, list[GateLatencyRecord]] = (
+        collections.defaultdict(list))
+    aggregates: dict[ndb.Key, DailyReviewLatency] = {}
+    for gate in Gate.query():
+      record = slo.make_latency_record(gate)
+      records.append(record)
+      records_by_fid[gate.feature_id].append(record)
+      if gate.requested_on and gate.responded_on:
+        day = gate.responded_on.date()
+        key = DailyReviewLatency.make_key(day, gate.gate_type)
+        if key not in aggregates:
+          aggregates[key] = DailyReviewLatency(
+              key=key, day=day, gate_type=gate.gate_type)
+        aggregates[key].num_responses += 1
+        aggregates[key].total_latency_days += slo.calc_latency(gate)
+
+    ndb.put_multi(records)
+    ndb.put_multi([
+        FeatureGateLatencies(
+            key=FeatureGateLatencies.make_key(fid), records=fid_records)
+        for fid, fid_records in records_by_fid.items()])
+    ndb.put_multi(list(aggregates.values()))
+    return (f'{len(records)} GateLatencyRecord entities written.\n'
+            f'{len(aggregates)} DailyReviewLatency entities written.')
+
 
 class BackfillStageCreated(FlaskHandler):
   def get_template_data(self, **kwargs) -> str:
@@ -242,6 +324,55 @@ class BackfillFeatureLinks(FlaskHandler):
     return f'{len(all_feature_entries)} FeatureEntry entities backfilled of {count} feature links.'
 
 
+class RebuildFeatureLinksSummary(FlaskHandler):
+  def get_template_data(self, **kwargs) -> str:
+    """Recount the feature links summary and fill in link domains."""
+    self.require_cron_header()
+    count = rebuild_feature_links_summary()
+    return f'{count} FeatureLinks entities counted in the summary.'
+
+
+class RekeyFeatureLinks(batch_jobs.BatchJob):
+
+  JOB_PATH = '/scripts/rekey_feature_links'
+
+  def make_query(self) -> ndb.Query:
+    return FeatureLinks.query()
+
+  def process_entity(self, feature_link: FeatureLinks) -> None:
+    """Move a link that has a numeric id to the key derived from its url."""
+    if feature_link.key.integer_id() is None:
+      return
+    self.count('rekeyed')
+    if not self.dry_run:
+      # Done in a transaction rather than with self.put() so that features
+      # added to either link meanwhile are not lost.
+      rekey_feature_link(feature_link.key)
+
+  def make_result(self) -> str:
+    return f'{self.get_count("rekeyed")} FeatureLinks entities rekeyed.'
+
+
+class RotateXsrfSecret(FlaskHandler):
+  def get_template_data(self, **kwargs) -> str:
+    """Start signing XSRF tokens with a new secret."""
+    self.require_cron_header()
+    secrets.rotate_xsrf_secret()
+    return 'XSRF secret rotated, tokens from the old secret still accepted.'
+
+
+class LogHttpMetrics(FlaskHandler):
+  def get_template_data(self, **kwargs) -> str:
+    """Log the outbound HTTP metrics of the instance that serves this."""
+    self.require_cron_header()
+    metrics = http_client.get_metrics()
+    lines = [f'HTTP metrics for {len(metrics)} hosts logged.']
+    for host, host_metrics in sorted(metrics.items()):
+      logging.info('HTTP metrics for %s: %r', host, host_metrics)
+      lines.append(f'{host}: {host_metrics}')
+    return '\n'.join(lines)
+
+
 class AssociateOTs(FlaskHandler):
 
   def write_field(
@@ -525,16 +656,57 @@ class BackfillFeatureEnterpriseImpact(FlaskHandler):
     return f'{count} Feature entities updated of {len(features_by_id)} available features.'
 
 
+# Maximum number of stages whose origin trials are processed at once.
+OT_JOB_MAX_WORKERS = 5
+
+T = TypeVar('T')
+
+
+def _map_stages_concurrently(
+    process: Callable[[Stage], T], stages: list[Stage]) -> list[T]:
+  """Call process on each stage using a bounded pool of threads.
+
+  Stages are only modified in memory, so the caller can write them all
+  at once afterward.  Results are returned in the same order as stages.
+  """
+  if not stages:
+    return []
+  context = ndb.get_context(raise_context_error=False)
+  client = context.client if context else None
+
+  def process_in_context(stage: Stage) -> T:
+    # Each thread needs its own ndb context.
+    if client:
+      with client.context():
+        return process(stage)
+    return process(stage)
+
+  with futures.ThreadPoolExecutor(
+      max_workers=min(OT_JOB_MAX_WORKERS, len(stages)),
+      thread_name_prefix='ot_job') as executor:
+    return list(executor.map(process_in_context, stages))
+
+
 class CreateOriginTrials(FlaskHandler):
 
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    # Notifications are sent after all stages have been written.
+    self.notifications: list[tuple[str, Stage, dict]] = []
+
   def _send_creation_result_notification(
       self, task_path: str, stage: Stage, params: dict|None = None) -> None:
     if not params:
       params = {}
     print('sending email task to', task_path, 'with params', params)
-    stage_dict = converters.stage_to_json_dict(stage)
-    params['stage'] = stage_dict
-    cloud_tasks_helpers.enqueue_task(task_path, params)
+    # list.append() is atomic, so this is safe to call from worker threads.
+    self.notifications.append((task_path, stage, params))
+
+  def _enqueue_notifications(self) -> None:
+    for task_path, stage, params in self.notifications:
+      params['stage'] = converters.stage_to_json_dict(stage)
+      cloud_tasks_helpers.enqueue_task(task_path, params)
+    self.notifications = []
 
   def handle_creation(self, stage: Stage) -> bool:
     """Send a flagged creation request for processing to the Origin Trials
@@ -592,6 +764,30 @@ class CreateOriginTrials(FlaskHandler):
       self._send_creation_result_notification(
           '/tasks/email-ot-creation-processed', stage)
 
+  def process_stage(self, stage: Stage) -> None:
+    """Create, and if it is time, activate the trial for one stage."""
+    stage.ot_action_requested = False
+    try:
+      creation_success = self.handle_creation(stage)
+      if creation_success:
+        self.prepare_for_activation(stage)
+    except requests.RequestException:
+      # A network error is likely to be transient, so leave the stage to be
+      # tried again on the next run.  Any trial ID that was already
+      # assigned is kept so that setup can be resumed.
+      logging.exception(
+          f'Failed to process trial for stage {stage.key.integer_id()}')
+      stage.ot_setup_status = OT_READY_FOR_CREATION
+    except Exception as e:
+      # Anything else would fail the same way on every run, so it needs to
+      # be looked at rather than sent to the API again.
+      logging.exception(
+          f'Failed to process trial for stage {stage.key.integer_id()}')
+      stage.ot_setup_status = OT_CREATION_FAILED
+      self._send_creation_result_notification(
+          '/tasks/email-ot-creation-request-failed', stage,
+          {'error_text': f'Unexpected error: {e!r}'})
+
   def get_template_data(self, **kwargs) -> str:
     """Create any origin trials that are flagged for creation."""
     self.require_cron_header()
@@ -601,12 +797,10 @@ class CreateOriginTrials(FlaskHandler):
     # OT stages that are flagged to process a trial creation.
     ot_stages: list[Stage] = Stage.query(
         Stage.ot_setup_status == OT_READY_FOR_CREATION).fetch()
-    for stage in ot_stages:
-      stage.ot_action_requested = False
-      creation_success = self.handle_creation(stage)
-      if creation_success:
-        self.prepare_for_activation(stage)
-      stage.put()
+    self.notifications = []
+    _map_stages_concurrently(self.process_stage, ot_stages)
+    ndb.put_multi(ot_stages)
+    self._enqueue_notifications()
 
     return f'{len(ot_stages)} trial creation request(s) processed.'
 
@@ -616,6 +810,18 @@ class ActivateOriginTrials(FlaskHandler):
   def _get_today(self) -> date:
     return date.today()
 
+  def activate_stage(self, stage: Stage) -> bool:
+    """Send the activation request for one stage.  Return True on success."""
+    logging.info(f'Activating trial {stage.origin_trial_id}')
+    try:
+      origin_trials_client.activate_origin_trial(stage.origin_trial_id)
+    except requests.RequestException:
+      stage.ot_setup_status = OT_ACTIVATION_FAILED
+      return False
+    stage.ot_activation_date = None
+    stage.ot_setup_status = OT_ACTIVATED
+    return True
+
   def get_template_data(self, **kwargs) -> str:
     """Check for origin trials that are scheduled for activation and activate
     them.
@@ -624,12 +830,12 @@ class ActivateOriginTrials(FlaskHandler):
     if not settings.AUTOMATED_OT_CREATION:
       return 'Automated OT creation process is not active.'
 
-    success_count, fail_count = 0, 0
     today = self._get_today()
     # Get all OT stages.
     ot_stages: list[Stage] = Stage.query(
         Stage.stage_type.IN(ALL_ORIGIN_TRIAL_STAGE_TYPES),
         Stage.ot_setup_status == OT_CREATED).fetch()
+    due_stages: list[Stage] = []
     for stage in ot_stages:
       # Only process stages with a delayed activation date set.
       if stage.ot_activation_date is None:
@@ -641,25 +847,18 @@ class ActivateOriginTrials(FlaskHandler):
                           f'trial ID. stage={stage.key.integer_id()}')
         continue
       if today >= stage.ot_activation_date:
-        logging.info(f'Activating trial {stage.origin_trial_id}')
-        try:
-          origin_trials_client.activate_origin_trial(stage.origin_trial_id)
-        except requests.RequestException:
-          cloud_tasks_helpers.enqueue_task(
-              '/tasks/email-ot-activation-failed',
-              {'stage': converters.stage_to_json_dict(stage)})
-          stage.ot_setup_status = OT_ACTIVATION_FAILED
-          stage.put()
-          fail_count += 1
-        else:
-          cloud_tasks_helpers.enqueue_task(
-              '/tasks/email-ot-activated',
-              {'stage': converters.stage_to_json_dict(stage)})
-          stage.ot_activation_date = None
-          stage.ot_setup_status = OT_ACTIVATED
-          stage.put()
-          success_count += 1
-
+        due_stages.append(stage)
+
+    results = _map_stages_concurrently(self.activate_stage, due_stages)
+    ndb.put_multi(due_stages)
+    for stage, success in zip(due_stages, results):
+      task_path = ('/tasks/email-ot-activated' if success
+                   else '/tasks/email-ot-activation-failed')
+      cloud_tasks_helpers.enqueue_task(
+          task_path, {'stage': converters.stage_to_json_dict(stage)})
+
+    success_count = results.count(True)
+    fail_count = len(results) - success_count
     return (f'{success_count} activation(s) successfully processed and '
             f'{fail_count} activation(s) failed to process.')
 
@@ -706,7 +905,9 @@ class DeleteEmptyExtensionStages(FlaskHandler):
     return  (f'{counter} empty extension stages deleted.')
 
 
-class BackfillShippingYear(FlaskHandler):
+class BackfillShippingYear(batch_jobs.BatchJob):
+
+  JOB_PATH = '/scripts/backfill_shipping_year'
 
   def calc_all_shipping_years(self) -> dict[int, int]:
     """Load all shipping stages and record their earliest milestone."""
@@ -722,56 +923,103 @@ class BackfillShippingYear(FlaskHandler):
 
     return all_features_shipping_year
 
+  def prepare(self) -> None:
+    self.all_features_shipping_year = self.calc_all_shipping_years()
+
+  def make_query(self) -> ndb.Query:
+    return FeatureEntry.query()
+
+  def process_entity(self, fe: FeatureEntry) -> None:
+    """Fill in shipping_year if the Feature Entry has a milestone."""
+    fid = fe.key.integer_id()
+    if fid not in self.all_features_shipping_year:
+      return
+    year_based_on_milestones = self.all_features_shipping_year[fid]
+    if fe.shipping_year != year_based_on_milestones:
+      fe.shipping_year = year_based_on_milestones
+      self.put(fe)
+      self.count('updated')
+
+  def make_result(self) -> str:
+    return f'{self.get_count("updated")} Features entities updated.'
+
+
+class BackfillFirstShipMilestone(FlaskHandler):
+
   def get_template_data(self, **kwargs) -> str:
-    """Fill in shipping_year for any Feature Entry that has a milestone."""
+    """Fill in first_ship_milestone for every Feature Entry."""
     self.require_cron_header()
 
-    all_features_shipping_year = self.calc_all_shipping_years()
+    ship_stages: list[Stage] = Stage.query(
+        Stage.stage_type.IN(stage_helpers.FIRST_SHIP_STAGE_TYPES)).fetch()
+    stages_by_fid = stage_helpers.organize_all_stages_by_feature(ship_stages)
     count = 0
     batch = []
     BATCH_SIZE = 100
-    all_feature_entries = FeatureEntry.query().fetch()
-    for fe in all_feature_entries:
-      fid = fe.key.integer_id()
-      if fid not in all_features_shipping_year:
-        continue
-      year_based_on_milestones = all_features_shipping_year[fid]
-      if fe.shipping_year != year_based_on_milestones:
-        fe.shipping_year = year_based_on_milestones
+    for fe in FeatureEntry.query():
+      milestone = stage_helpers.find_first_ship_milestone(
+          stages_by_fid.get(fe.key.integer_id(), []))
+      if fe.first_ship_milestone != milestone:
+        fe.first_ship_milestone = milestone
         batch.append(fe)
         count += 1
         if len(batch) > BATCH_SIZE:
           ndb.put_multi(batch)
           batch = []
-          logging.info('Updated %r so far', count)
 
     ndb.put_multi(batch)
     return f'{count} Features entities updated.'
 
 
-class BackfillGateDates(FlaskHandler):
+class UpdateMilestoneSchedules(FlaskHandler):
+
+  # By default, refresh about two years of past milestones and the
+  # upcoming ones that already have a published schedule.
+  PAST_MILESTONES = 26
+  FUTURE_MILESTONES = 8
 
   def get_template_data(self, **kwargs) -> str:
-    """Backfill resolved_on and needs_work_started_on for all Gates."""
+    """Store the release schedules of recent and upcoming milestones."""
     self.require_cron_header()
 
-    count = 0
-    batch: list[Gate] = []
-    BATCH_SIZE = 100
+    stable_version = int(
+        fetchchannels.get_omaha_data()[0]['versions'][0]['version']
+        .split('.')[0])
+    start = self.get_int_arg(
+        'start', max(1, stable_version - self.PAST_MILESTONES))
+    end = self.get_int_arg('end', stable_version + self.FUTURE_MILESTONES)
+    count = fetchchannels.store_milestone_schedules(start, end)
+    return f'{count} MilestoneSchedule entities updated.'
+
+
+class BackfillGateDates(batch_jobs.BatchJob):
+
+  JOB_PATH = '/scripts/backfill_gate_dates'
+
+  def make_query(self) -> ndb.Query:
+    return Gate.query()
+
+  def needs_dates(self, gate: Gate) -> bool:
+    """Return True if the gate might be missing a date that we can set."""
+    return bool(
+        (gate.state in Gate.FINAL_STATES and not gate.resolved_on) or
+        (gate.state == Vote.NEEDS_WORK and not gate.needs_work_started_on))
+
+  def process_chunk(self, gates: list[Gate]) -> None:
+    """Backfill resolved_on and needs_work_started_on for a chunk of Gates."""
+    gate_ids = [g.key.integer_id() for g in gates if self.needs_dates(g)]
     votes_by_gate = collections.defaultdict(list)
-    for vote in Vote.query():
-      votes_by_gate[vote.gate_id].append(vote)
-    for gate in Gate.query():
+    if gate_ids:
+      for vote in Vote.query(Vote.gate_id.IN(gate_ids)).fetch():
+        votes_by_gate[vote.gate_id].append(vote)
+    for gate in gates:
       gate_votes = votes_by_gate.get(gate.key.integer_id()) or []
       if self.calc_dates(gate, gate_votes):
-        batch.append(gate)
-        count += 1
-        if len(batch) > BATCH_SIZE:
-          ndb.put_multi(batch)
-          batch = []
+        self.put(gate)
+        self.count('updated')
 
-    ndb.put_multi(batch)
-    return f'{count} Gate entities updated.'
+  def make_result(self) -> str:
+    return f'{self.get_count("updated")} Gate entities updated.'
 
   def calc_dates(self, gate: Gate, votes: list[Vote]) -> bool:
     """Set resolved_on and needs_work_started_on if needed."""
@@ -888,8 +1136,8 @@ class SendManualOTActivatedEmail(FlaskHandler):
 
 
 class GenerateReviewActivityFile(FlaskHandler):
-  """Generate a CSV file with all review activity in ChromeStatus."""
-  DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
+  """Export the review activity in ChromeStatus since the last run."""
+  DATE_FORMAT = review_activity_export.DATE_FORMAT
   VOTE_VALUE_MAPPING: dict[str, SkyhookDashStatus] = {
       'na': SkyhookDashStatus.FYI,
       'review_requested': SkyhookDashStatus.PENDING_REVIEW,
@@ -920,32 +1168,40 @@ class GenerateReviewActivityFile(FlaskHandler):
   ) -> list[list[str]]:
     """Generate a list of rows to add to the review activity CSV."""
     # Note: We assume that anyone may view approval comments.
-    activities: list[Activity] = Activity.query(
-      Activity.created > start_timestamp,
-      Activity.created <= end_timestamp,
-    ).order(Activity.created).fetch()
-
-    # Filter deleted activities the user can't see, and activities that have
-    # no gate ID, meaning they do not represent review activity.
-    # TODO(DanielRyanSmith): Confirm if deleted features should deleted features
-    # should have existing activity filtered and handle accordingly.
-    activities = list(filter(
-      lambda a: (a.deleted_by is None
-                 and a.gate_id is not None),
-      activities))
-    if activities is None:
-      return []
-
-    gate_ids = set(a.gate_id for a in activities)
-    gates = ndb.get_multi(ndb.Key('Gate', g_id) for g_id in gate_ids)
-    gates_dict: dict[int, Gate] = {g.key.integer_id(): g for g in gates if g}
-
+    # Activities are read a page at a time, and gates are fetched in one
+    # batch per page for the gates that were not seen on earlier pages.
+    gates_dict: dict[int, Gate|None] = {}
+    csv_rows: list[list[str]] = []
+    cursor = None
+    while True:
+      page, cursor = Activity.get_activities_page(
+          None, since=start_timestamp, until=end_timestamp, cursor=cursor)
+      # Filter deleted activities the user can't see, and activities that
+      # have no gate ID, meaning they do not represent review activity.
+      # TODO(DanielRyanSmith): Confirm if deleted features should deleted
+      # features should have existing activity filtered and handle
+      # accordingly.
+      activities = [a for a in page
+                    if a.deleted_by is None and a.gate_id is not None]
+      new_gate_ids = list(set(
+          a.gate_id for a in activities if a.gate_id not in gates_dict))
+      gates = ndb.get_multi(
+          [ndb.Key('Gate', g_id) for g_id in new_gate_ids])
+      gates_dict.update(zip(new_gate_ids, gates))
+      csv_rows.extend(self._make_csv_rows(activities, gates_dict))
+      if not cursor:
+        return csv_rows
+
+  def _make_csv_rows(
+      self, activities: list[Activity],
+      gates_dict: dict[int, Gate|None]) -> list[list[str]]:
+    """Return the review activity CSV rows for the given activities."""
     csv_rows: list[list[str]] = []
     for a in activities:
-      if a.gate_id not in gates_dict:
+      gate = gates_dict.get(a.gate_id)
+      if gate is None:
         logging.warning(f'No gate found for gate ID {a.gate_id}')
         continue
-      gate = gates_dict[a.gate_id]
       review_status = ''
       review_assignee = ''
       comment = a.content or ''
@@ -971,74 +1227,32 @@ class GenerateReviewActivityFile(FlaskHandler):
 
     return csv_rows
 
-  def _get_activities_csv(self, bucket):
-    blob = bucket.blob('chromestatus-review-activity.csv')
-    csv_io = StringIO()
-    if blob.exists():
-      with blob.open('r') as f:
-        csv_rows = csv.reader(f, lineterminator='\n')
-        row_count = 0
-        activities_csv = csv.writer(csv_io, lineterminator='\n')
-        for row in csv_rows:
-          row_count += 1
-          activities_csv.writerow(row)
-        logging.info(f'Existing csv is {row_count} lines long')
-        return activities_csv, csv_io
-
-    writer = csv.writer(csv_io, lineterminator='\n')
-    writer.writerow(
-      [
-        'launch_id',
-        'reviewer_name',
-        'event_type',
-        'date',
-        'status',
-        'assignee',
-        'author',
-        'content',
-        'source',
-       ]
-    )
-    return writer, csv_io
-
-  def _get_last_run_timestamp(self, bucket):
-    """Get the timestamp for the starting interval of querying for new
-    activities."""
-    blob = bucket.blob('review-activity-last-timestamp.txt')
-    if blob.exists():
-      with blob.open('r') as f:
-        timestamp_str = f.read()
-      return datetime.strptime(timestamp_str, self.DATE_FORMAT)
-    # If no previous timestamp exists, start from the beginning.
-    return datetime(2000, 1, 1)
-
-  def _write_csv(self, bucket, csv_io: StringIO) -> None:
-    """Append the rows to the review activity CSV, or create a new CSV if it
-    does not exist."""
-    blob = bucket.blob('chromestatus-review-activity.csv')
-    blob.upload_from_string(csv_io.getvalue())
-
-  def _write_last_run_timestamp(self, bucket, timestamp: datetime) -> None:
-    """Store the date of the last review activity run."""
-    blob = bucket.blob('review-activity-last-timestamp.txt')
-    blob.upload_from_string(timestamp.strftime(self.DATE_FORMAT))
-
   def get_template_data(self, **kwargs):
     self.require_cron_header()
 
-    storage_client = storage.Client()
-    bucket = storage_client.bucket(settings.FILES_BUCKET)
-
-    last_run_timestamp = self._get_last_run_timestamp(bucket)
+    export = review_activity_export.ReviewActivityExport(
+        review_activity_export.get_file_store())
+    manifest = export.load_manifest()
+    last_run_timestamp = export.get_last_timestamp(manifest)
     now = datetime.now()
     csv_rows = self._generate_new_activities(last_run_timestamp, now)
     logging.info(f'{len(csv_rows)} new rows to add to CSV.')
-    if csv_rows:
-      activities_csv, csv_io = self._get_activities_csv(bucket)
-      for row in csv_rows:
-        activities_csv.writerow(row)
-      self._write_csv(bucket, csv_io)
-    self._write_last_run_timestamp(bucket, now)
+    # Only the new rows are written, as one more part of the export.
+    export.append_part(manifest, csv_rows, now)
 
     return (f'{len(csv_rows)} '
-            'new rows added to chromestatus-review-activity.csv uploaded.')
+            'new rows added to the review activity export.')
+
+
+class CompactReviewActivityFiles(FlaskHandler):
+  """Merge the small daily parts of the review activity export."""
+
+  def get_template_data(self, **kwargs):
+    self.require_cron_header()
+
+    export = review_activity_export.ReviewActivityExport(
+        review_activity_export.get_file_store())
+    manifest = export.load_manifest()
+    removed = export.compact(manifest)
+    return (f'{removed} review activity parts merged, '
+            f'{len(manifest["parts"])} parts remain.')
@@ -15,14 +15,24 @@
 import testing_config  # Must be imported before the module under test.
 
 import requests
+import tempfile
 from datetime import date, datetime
 from unittest import mock
 
+from google.cloud import ndb  # type: ignore
+
 from api import converters
+from internals import approval_defs
+from internals import blob_storage
 from internals import maintenance_scripts
+from internals import review_activity_export
+from internals.batch_jobs import BatchJobCheckpoint
+from internals.feature_links import FeatureLinks, FeatureLinksSummary
 from internals import core_enums
 from internals.core_models import FeatureEntry, Stage, MilestoneSet
-from internals.review_models import Activity, Amendment, Gate, Vote
+from internals.review_models import (
+    Activity, Amendment, DailyReviewLatency, FeatureGateLatencies, Gate,
+    GateLatencyRecord, GateVoteSummary, PendingGateIndex, Vote)
 from internals import stage_helpers
 from internals.webdx_feature_models import WebdxFeatures
 from webstatus_openapi import FeaturePage, ApiException
@@ -38,7 +48,7 @@ class EvaluateGateStatusTest(testing_config.CustomTestCase):
     self.delete_gates_and_votes()
 
   def delete_gates_and_votes(self):
-    for kind in [Gate, Vote]:
+    for kind in [Gate, GateVoteSummary, Vote, PendingGateIndex]:
       for entity in kind.query():
         entity.key.delete()
 
@@ -75,6 +85,27 @@ class EvaluateGateStatusTest(testing_config.CustomTestCase):
     actual = self.handler.get_template_data()
     self.assertEqual(actual, '0 Gate entities updated.')
 
+  def test_get_template_data__repairs_summary(self):
+    """A vote summary that does not match the votes is recomputed."""
+    gate_1 = Gate(feature_id=1, state=Gate.PREPARING, gate_type=1, stage_id=11)
+    gate_1.put()
+    gate_id = gate_1.key.integer_id()
+    approval_defs.set_vote(1, None, Vote.REVIEW_REQUESTED,
+                           'one@example.com', gate_id)
+    # This vote is written without updating the summary.
+    Vote(key=Vote.make_key(gate_id, 'two@example.com'), feature_id=1,
+         gate_id=gate_id, state=Vote.APPROVED, set_by='two@example.com',
+         set_on=datetime.now()).put()
+
+    actual = self.handler.get_template_data()
+
+    self.assertEqual(actual, '1 Gate entities updated.')
+    self.assertEqual(Vote.APPROVED, Gate.get_by_id(gate_id).state)
+    summary = GateVoteSummary.make_key(gate_id).get()
+    self.assertEqual(
+        {str(Vote.REVIEW_REQUESTED): 1, str(Vote.APPROVED): 1},
+        summary.vote_counts)
+
   def test_get_template_data__still_preparing(self):
     """If a gate has no votes, it should be PREPARING."""
     gate_1 = Gate(feature_id=1, state=Vote.NA, gate_type=1, stage_id=11)
@@ -101,6 +132,57 @@ class EvaluateGateStatusTest(testing_config.CustomTestCase):
     self.assertEqual(actual, '1 Gate entities updated.')
     revised_gate_1 = Gate.get_by_id(gate_1.key.integer_id())
     self.assertEqual(revised_gate_1.state, Vote.APPROVED)
+    # The legacy vote was rekeyed and counted in the gate's vote summary.
+    summary = GateVoteSummary.make_key(gate_1.key.integer_id()).get()
+    self.assertEqual({str(Vote.APPROVED): 1}, summary.vote_counts)
+    self.assertIsNotNone(
+        Vote.make_key(gate_1.key.integer_id(), 'three@example.com').get())
+
+  def test_get_template_data__updates_pending_index(self):
+    """Gates whose state changed are added to the pending gate index."""
+    gate_1 = Gate(
+        feature_id=1, state=Gate.PREPARING,
+        gate_type=core_enums.GATE_API_SHIP, stage_id=11)
+    gate_1.put()
+    Vote(feature_id=1, gate_id=gate_1.key.integer_id(),
+         state=Vote.REVIEW_REQUESTED, set_by='one@example.com',
+         set_on=datetime.now()).put()
+
+    self.handler.get_template_data(dry_run=True)
+    self.assertIsNone(PendingGateIndex.get_by_id(core_enums.GATE_API_SHIP))
+    # The dry run changed the cached gate in memory without writing it.
+    ndb.get_context().clear_cache()
+
+    actual = self.handler.get_template_data()
+
+    self.assertEqual(actual, '1 Gate entities updated.')
+    index = PendingGateIndex.get_by_id(core_enums.GATE_API_SHIP)
+    self.assertEqual([str(gate_1.key.integer_id())], list(index.gates))
+
+
+class RebuildPendingGateIndexTest(testing_config.CustomTestCase):
+
+  def setUp(self):
+    self.handler = maintenance_scripts.RebuildPendingGateIndex()
+    self.gate = Gate(
+        feature_id=1, stage_id=11, gate_type=core_enums.GATE_API_SHIP,
+        state=Vote.REVIEW_REQUESTED)
+    self.gate.put()
+
+  def tearDown(self):
+    for kind in [Gate, PendingGateIndex]:
+      for entity in kind.query():
+        entity.key.delete()
+
+  def test_get_template_data(self):
+    """Every gate type gets an index, including ones with no pending gates."""
+    actual = self.handler.get_template_data()
+
+    self.assertEqual('1 pending gates indexed.', actual)
+    index = PendingGateIndex.get_by_id(core_enums.GATE_API_SHIP)
+    self.assertEqual([str(self.gate.key.integer_id())], list(index.gates))
+    self.assertEqual(
+        {}, PendingGateIndex.get_by_id(core_enums.GATE_PRIVACY_SHIP).gates)
 
 
 class AssociateOTsTest(testing_config.CustomTestCase):
@@ -428,10 +510,13 @@ class CreateOriginTrialsTest(testing_config.CustomTestCase):
 
     mock_today.return_value = date(2020, 6, 1)  # 2020-06-01
     mock_get_chromium_milestone_info.side_effect = mock_mstone_return_value_generator
-    # Create trial request is failing.
-    mock_create_origin_trial.side_effect = [
-        (None, '503, Unavailable'),
-        ('1112223334', '500, Problems happened after trial was created')]
+    # Create trial request is failing.  Stages are processed concurrently,
+    # so results are matched to stages by ID.
+    creation_results = {
+        100: (None, '503, Unavailable'),
+        200: ('1112223334', '500, Problems happened after trial was created')}
+    mock_create_origin_trial.side_effect = (
+        lambda stage: creation_results[stage.key.integer_id()])
 
     result = self.handler.get_template_data()
     self.assertEqual('2 trial creation request(s) processed.', result)
@@ -520,6 +605,66 @@ class CreateOriginTrialsTest(testing_config.CustomTestCase):
     # OT 3 had no action request, so it should not have changed.
     self.assertIsNone(self.ot_stage_3.origin_trial_id)
 
+  @mock.patch('logging.exception')
+  @mock.patch('framework.cloud_tasks_helpers.enqueue_task')
+  @mock.patch('internals.maintenance_scripts.CreateOriginTrials._get_today')
+  @mock.patch('framework.utils.get_chromium_milestone_info')
+  @mock.patch('framework.origin_trials_client.activate_origin_trial')
+  @mock.patch('framework.origin_trials_client.create_origin_trial')
+  def test_create_trials__unexpected_error(
+      self,
+      mock_create_origin_trial,
+      mock_activate_origin_trial,
+      mock_get_chromium_milestone_info,
+      mock_today,
+      mock_enqueue_task,
+      mock_logging):
+    """An unexpected error fails only its own stage, which is not retried."""
+    mock_today.return_value = date(2020, 6, 1)  # 2020-06-01
+    mock_create_origin_trial.side_effect = lambda stage: (
+        ('111222333', None) if stage.key.integer_id() == 100
+        else ('-444555666', None))
+    mock_get_chromium_milestone_info.side_effect = (
+        lambda mstone: mock_mstone_return_value_generator(mstone)
+        if mstone == 100 else {'mstones': []})
+
+    result = self.handler.get_template_data()
+
+    self.assertEqual('2 trial creation request(s) processed.', result)
+    stage_1 = Stage.get_by_id(100, use_cache=False)
+    self.assertEqual(core_enums.OT_ACTIVATED, stage_1.ot_setup_status)
+    # Stage 2 keeps its new trial ID, but it is not sent again.
+    stage_2 = Stage.get_by_id(200, use_cache=False)
+    self.assertEqual('-444555666', stage_2.origin_trial_id)
+    self.assertEqual(core_enums.OT_CREATION_FAILED, stage_2.ot_setup_status)
+    self.assertFalse(stage_2.ot_action_requested)
+    task_paths = [c.args[0] for c in mock_enqueue_task.call_args_list]
+    self.assertCountEqual(
+        ['/tasks/email-ot-activated',
+         '/tasks/email-ot-creation-request-failed'],
+        task_paths)
+
+  @mock.patch('logging.exception')
+  @mock.patch('framework.cloud_tasks_helpers.enqueue_task')
+  @mock.patch('framework.utils.get_chromium_milestone_info')
+  @mock.patch('framework.origin_trials_client.create_origin_trial')
+  def test_create_trials__network_error(
+      self, mock_create_origin_trial, mock_get_chromium_milestone_info,
+      mock_enqueue_task, mock_logging):
+    """A stage that hits a network error is tried again on the next run."""
+    mock_create_origin_trial.side_effect = lambda stage: (
+        str(stage.key.integer_id()), None)
+    mock_get_chromium_milestone_info.side_effect = (
+        requests.exceptions.ConnectionError())
+
+    self.handler.get_template_data()
+
+    stage_1 = Stage.get_by_id(100, use_cache=False)
+    self.assertEqual('100', stage_1.origin_trial_id)
+    self.assertEqual(
+        core_enums.OT_READY_FOR_CREATION, stage_1.ot_setup_status)
+    mock_enqueue_task.assert_not_called()
+
   def test_create_trials__automation_not_active(self):
     """Cron job doesn't run when automated creation is not turned on."""
     settings.AUTOMATED_OT_CREATION = False
@@ -862,6 +1007,83 @@ class BackfillGateDatesTest(testing_config.CustomTestCase):
         v4.set_on)
 
 
+class BackfillGateLatencyRecordsTest(testing_config.CustomTestCase):
+
+  def setUp(self):
+    self.handler = maintenance_scripts.BackfillGateLatencyRecords()
+    self.gate_1 = Gate(
+        feature_id=1, stage_id=11, gate_type=1, state=Vote.APPROVED,
+        requested_on=datetime(2023, 6, 7, 12, 30),  # Wed
+        responded_on=datetime(2023, 6, 9, 12, 30))  # Fri
+    self.gate_1.put()
+    self.gate_2 = Gate(
+        feature_id=1, stage_id=11, gate_type=2, state=Gate.PREPARING)
+    self.gate_2.put()
+
+  def tearDown(self):
+    for kind in [
+        Gate, GateLatencyRecord, FeatureGateLatencies, DailyReviewLatency]:
+      for entity in kind.query():
+        entity.key.delete()
+
+  def test_get_template_data(self):
+    """Every gate gets a record and responses are aggregated by day."""
+    actual = self.handler.get_template_data()
+    self.assertEqual(
+        '2 GateLatencyRecord entities written.\n'
+        '1 DailyReviewLatency entities written.', actual)
+
+    record_1 = GateLatencyRecord.get_by_id(self.gate_1.key.integer_id())
+    self.assertEqual(2, record_1.latency_days)
+    self.assertCountEqual(
+        [(1, 2), (2, GateLatencyRecord.NOT_STARTED)],
+        [(r.gate_type, r.latency_days)
+         for r in FeatureGateLatencies.get_records([1])])
+    aggregate = DailyReviewLatency.make_key(date(2023, 6, 9), 1).get()
+    self.assertEqual(1, aggregate.num_responses)
+    self.assertEqual(2, aggregate.total_latency_days)
+
+    # Running it again does not double-count responses.
+    self.handler.get_template_data()
+    aggregate = DailyReviewLatency.make_key(date(2023, 6, 9), 1).get()
+    self.assertEqual(1, aggregate.num_responses)
+
+
+class RekeyFeatureLinksTest(testing_config.CustomTestCase):
+
+  def setUp(self):
+    self.handler = maintenance_scripts.RekeyFeatureLinks()
+    self.legacy = FeatureLinks(
+        url='https://example.com/legacy', type='web', feature_ids=[1])
+    self.legacy.put()
+    self.current = FeatureLinks(
+        key=FeatureLinks.make_key('https://example.com/current'),
+        url='https://example.com/current', type='web', feature_ids=[2])
+    self.current.put()
+
+  def tearDown(self):
+    for kind in [FeatureLinks, FeatureLinksSummary, BatchJobCheckpoint]:
+      for entity in kind.query():
+        entity.key.delete()
+
+  def test_get_template_data(self):
+    """Only links with numeric ids are moved."""
+    actual = self.handler.get_template_data()
+
+    self.assertEqual('1 FeatureLinks entities rekeyed.', actual)
+    self.assertIsNone(self.legacy.key.get())
+    self.assertEqual(
+        [1], FeatureLinks.make_key(self.legacy.url).get().feature_ids)
+    self.assertIsNotNone(self.current.key.get())
+
+  def test_get_template_data__dry_run(self):
+    """A dry run only counts the links to move."""
+    actual = self.handler.get_template_data(dry_run=True)
+
+    self.assertEqual('Dry run: 1 FeatureLinks entities rekeyed.', actual)
+    self.assertIsNotNone(self.legacy.key.get())
+
+
 class FetchWebdxFeatureIdTest(testing_config.CustomTestCase):
 
    def setUp(self):
@@ -1291,3 +1513,45 @@ class GenerateReviewActivityFileTest(testing_config.CustomTestCase):
       ],
     ]
     self.assertEqual(expected_rows, csv_rows)
+
+  def test_get_template_data__appends_parts(self):
+    """Each run writes only the new rows as one more part."""
+    temp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(temp_dir.cleanup)
+    file_store = blob_storage.LocalFileStore(temp_dir.name)
+    export = review_activity_export.ReviewActivityExport(file_store)
+    manifest = export.load_manifest()
+    export.append_part(manifest, [], datetime(2020, 1, 5))
+
+    with mock.patch(
+        'internals.review_activity_export.get_file_store',
+        return_value=file_store):
+      result = self.handler.get_template_data()
+      self.assertEqual(
+          '4 new rows added to the review activity export.', result)
+      result = self.handler.get_template_data()
+      self.assertEqual(
+          '0 new rows added to the review activity export.', result)
+
+    manifest = export.load_manifest()
+    self.assertEqual([4], [p['rows'] for p in manifest['parts']])
+    self.assertEqual(
+        '2020-01-05T00:00:00', manifest['parts'][0]['start'])
+
+
+class LogHttpMetricsTest(testing_config.CustomTestCase):
+
+  def setUp(self):
+    self.handler = maintenance_scripts.LogHttpMetrics()
+
+  @mock.patch('framework.http_client.get_metrics')
+  def test_get_template_data(self, mock_get_metrics):
+    """The metrics of each host are logged and returned."""
+    mock_get_metrics.return_value = {
+        'example.com': {'requests': 2, 'errors': 1}}
+
+    actual = self.handler.get_template_data()
+
+    self.assertEqual(
+        'HTTP metrics for 1 hosts logged.\n'
+        "example.com: {'requests': 2, 'errors': 1}", actual)
@@ -261,13 +261,15 @@ def make_feature_changes_email(
 
   # There will always be at least one component.
   for component_name in fe.blink_components:
-    component = BlinkComponent.get_by_name(component_name)
-    if not component:
+    component_key = BlinkComponent.get_key_by_name(component_name)
+    if not component_key:
       logging.warning('Blink component "%s" not found.'
                       'Not sending email to subscribers' % component_name)
       continue
-    owner_emails: list[str] = [owner.email for owner in component.owners]
-    subscriber_emails: list[str] = [sub.email for sub in component.subscribers]
+    owner_emails: list[str] = [
+        owner.email for owner in BlinkComponent.fetch_owners(component_key)]
+    subscriber_emails: list[str] = [
+        sub.email for sub in BlinkComponent.fetch_subscribers(component_key)]
     accumulate_reasons(
         addr_reasons, owner_emails,
         'You are an owner of this feature\'s component')
@@ -19,6 +19,7 @@ from datetime import datetime, date
 from typing import Any
 
 from framework import cloud_tasks_helpers
+from framework import http_client
 from framework import origin_trials_client
 from internals.core_models import Stage
 
@@ -338,7 +339,7 @@ def fetch_release(url, retry=5, timeout=2):
   if retry == 0:
     raise ValueError(f'Exceeded retry limit for {url}')
   try:
-    response = requests.get(url)
+    response = http_client.get(url, retries=0)
     if response.status_code != 200:
       time.sleep(timeout)
       return fetch_release(url, retry - 1, timeout * 2)
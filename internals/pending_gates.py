@@ -0,0 +1,194 @@
+# Copyright 2025 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License")
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A maintained index of the gates that are waiting for review.
+
+Each gate type has one PendingGateIndex entity that lists its pending gates
+along with the other gates on the same stage, because the reviewer
+dashboard shows those too.  The index is updated when a gate's state or
+assignees change, mirrored in Redis, and rebuilt from the Gate entities
+by a cron job to repair any drift.
+
+Every write to an index is a transaction that reads it first, so a rebuild
+and a concurrent update of one gate cannot overwrite each other.  Each
+write also increments the index version, and Redis only accepts a newer
+version, so a reader that loaded an older index cannot cache it.
+"""
+
+import collections
+import logging
+from typing import Any, Iterable
+
+from google.cloud import ndb  # type: ignore
+
+from framework import rediscache
+from internals.review_models import Gate, PendingGateIndex
+
+
+CACHE_KEY = 'PendingGateIndex'
+
+IndexEntries = dict[str, dict[str, Any]]
+
+
+def _cache_key(gate_type: int) -> str:
+  return f'{CACHE_KEY}|{gate_type}'
+
+
+def make_entry(gate: Gate, stage_gate_ids: list[int]) -> dict[str, Any]:
+  """Return the index entry for a pending gate."""
+  return {
+      'feature_id': gate.feature_id,
+      'stage_id': gate.stage_id,
+      'state': gate.state,
+      'assignee_emails': list(gate.assignee_emails),
+      'stage_gate_ids': sorted(stage_gate_ids),
+      }
+
+
+def _build_entries(pending: list[Gate]) -> dict[int, IndexEntries]:
+  """Return index entries for the given pending gates, by gate type."""
+  stage_ids = sorted({gate.stage_id for gate in pending})
+  stage_gate_ids: dict[int, list[int]] = collections.defaultdict(list)
+  if stage_ids:
+    for gate in Gate.query(Gate.stage_id.IN(stage_ids)).fetch():
+      stage_gate_ids[gate.stage_id].append(gate.key.integer_id())
+
+  entries_by_type: dict[int, IndexEntries] = collections.defaultdict(dict)
+  for gate in pending:
+    entries_by_type[gate.gate_type][str(gate.key.integer_id())] = make_entry(
+        gate, stage_gate_ids[gate.stage_id])
+  return entries_by_type
+
+
+def _cache_index(gate_type: int, index: PendingGateIndex) -> None:
+  """Mirror the index in Redis, unless a newer version is there."""
+  rediscache.set_if_newer(
+      _cache_key(gate_type), index.gates or {}, index.version or 0)
+
+
+@ndb.transactional()
+def _set_entry(
+    gate_type: int, gate_id: int,
+    entry: dict[str, Any] | None) -> PendingGateIndex | None:
+  """Store or remove one gate's entry.  Return the index if it changed."""
+  key = ndb.Key(PendingGateIndex, gate_type)
+  index = key.get()
+  if index is None:
+    # The index for this type has not been built yet.  It will include
+    # this gate when it is built.
+    return None
+  entries = index.gates or {}
+  if entries.get(str(gate_id)) == entry:
+    return None
+  if entry is None:
+    del entries[str(gate_id)]
+  else:
+    entries[str(gate_id)] = entry
+  index.gates = entries
+  index.version = (index.version or 0) + 1
+  index.put()
+  return index
+
+
+def update_gate(gate: Gate) -> None:
+  """Add, update, or remove the gate in the index for its gate type."""
+  entry = None
+  if gate.state in Gate.PENDING_STATES:
+    stage_gate_keys = Gate.query(
+        Gate.stage_id == gate.stage_id).fetch(keys_only=True)
+    entry = make_entry(gate, [k.integer_id() for k in stage_gate_keys])
+  index = _set_entry(gate.gate_type, gate.key.integer_id(), entry)
+  if index:
+    _cache_index(gate.gate_type, index)
+
+
+def update_stage(stage_id: int) -> None:
+  """Refresh the entries of pending gates after gates are added to a stage."""
+  for gate in Gate.query(Gate.stage_id == stage_id).fetch():
+    if gate.state in Gate.PENDING_STATES:
+      update_gate(gate)
+
+
+@ndb.transactional()
+def _rebuild_index(gate_type: int) -> PendingGateIndex:
+  key = ndb.Key(PendingGateIndex, gate_type)
+  # If _set_entry() changes the index after this read, the transaction is
+  # retried with a fresh query.
+  old_index = key.get()
+  pending: list[Gate] = Gate.query(
+      Gate.gate_type == gate_type,
+      Gate.state.IN(Gate.PENDING_STATES)).fetch()
+  index = PendingGateIndex(
+      key=key, gates=_build_entries(pending)[gate_type],
+      version=(old_index.version or 0) + 1 if old_index else 1)
+  index.put()
+  return index
+
+
+def rebuild_gate_type(gate_type: int) -> IndexEntries:
+  """Build and store the index for one gate type from the Gate entities."""
+  index = _rebuild_index(gate_type)
+  _cache_index(gate_type, index)
+  return index.gates
+
+
+def rebuild_all(gate_types: Iterable[int]) -> int:
+  """Rebuild the index of every given gate type.  Return the gate count."""
+  pending_types = {
+      gate.gate_type for gate in Gate.query(
+          Gate.state.IN(Gate.PENDING_STATES))}
+  # Also clear any gate types that no longer have pending gates.
+  all_gate_types = set(gate_types) | pending_types | {
+      key.integer_id() for key in PendingGateIndex.query().fetch(
+          keys_only=True)}
+  count = 0
+  for gate_type in sorted(all_gate_types):
+    count += len(rebuild_gate_type(gate_type))
+  return count
+
+
+def get_index_entries(gate_types: Iterable[int]) -> IndexEntries:
+  """Return the index entries of all pending gates of the given types."""
+  gate_types = sorted(gate_types)
+  cached = rediscache.get_multi([_cache_key(gt) for gt in gate_types]) or {}
+  entries: IndexEntries = {}
+  missing_types: list[int] = []
+  for gate_type in gate_types:
+    cached_version_and_entries = cached.get(_cache_key(gate_type))
+    if cached_version_and_entries is None:
+      missing_types.append(gate_type)
+    else:
+      entries.update(cached_version_and_entries[1])
+
+  if missing_types:
+    indexes = ndb.get_multi(
+        [ndb.Key(PendingGateIndex, gt) for gt in missing_types])
+    for gate_type, index in zip(missing_types, indexes):
+      if index is None:
+        logging.info('Building pending gate index for %r', gate_type)
+        entries.update(rebuild_gate_type(gate_type))
+      else:
+        _cache_index(gate_type, index)
+        entries.update(index.gates or {})
+  return entries
+
+
+def get_gates_on_pending_stages(gate_types: Iterable[int]) -> list[Gate]:
+  """Return every gate on a stage with a pending gate of the given types."""
+  gate_ids: set[int] = set()
+  for entry in get_index_entries(gate_types).values():
+    gate_ids.update(entry['stage_gate_ids'])
+  gates = ndb.get_multi(
+      [ndb.Key(Gate, gate_id) for gate_id in sorted(gate_ids)])
+  return [gate for gate in gates if gate is not None]
@@ -0,0 +1,174 @@
+# Copyright 2025 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License")
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import testing_config  # Must be imported before the module under test.
+
+from framework import rediscache
+from internals import core_enums
+from internals import pending_gates
+from internals.review_models import Gate, PendingGateIndex, Vote
+
+
+API_SHIP = core_enums.GATE_API_SHIP
+PRIVACY_SHIP = core_enums.GATE_PRIVACY_SHIP
+SECURITY_SHIP = core_enums.GATE_SECURITY_SHIP
+
+
+def query_gates_on_pending_stages(gate_types):
+  """The queries that the index replaces, used to check the index."""
+  projections = Gate.query(
+      Gate.state.IN(Gate.PENDING_STATES),
+      Gate.gate_type.IN(sorted(gate_types))).fetch(projection=['stage_id'])
+  stage_ids = {proj.stage_id for proj in projections}
+  if not stage_ids:
+    return []
+  return Gate.query(Gate.stage_id.IN(sorted(stage_ids))).fetch()
+
+
+class PendingGatesTest(testing_config.CustomTestCase):
+
+  def setUp(self):
+    self.gates = {}
+    # Each stage gets one gate of each type, in the given states.
+    seed_data = {
+        11: [(API_SHIP, Vote.REVIEW_REQUESTED), (PRIVACY_SHIP, Vote.APPROVED),
+             (SECURITY_SHIP, Gate.PREPARING)],
+        12: [(API_SHIP, Vote.APPROVED), (PRIVACY_SHIP, Vote.NEEDS_WORK),
+             (SECURITY_SHIP, Vote.REVIEW_STARTED)],
+        13: [(API_SHIP, Gate.PREPARING), (PRIVACY_SHIP, Vote.NA),
+             (SECURITY_SHIP, Vote.DENIED)],
+        14: [(API_SHIP, Vote.INTERNAL_REVIEW)],
+        }
+    for stage_id, gate_specs in seed_data.items():
+      for gate_type, state in gate_specs:
+        gate = Gate(
+            feature_id=stage_id * 10, stage_id=stage_id,
+            gate_type=gate_type, state=state,
+            assignee_emails=['reviewer@example.com'])
+        gate.put()
+        self.gates[(stage_id, gate_type)] = gate
+
+  def tearDown(self):
+    for kind in [Gate, PendingGateIndex]:
+      for entity in kind.query():
+        entity.key.delete()
+    rediscache.delete_keys_with_prefix(pending_gates.CACHE_KEY)
+
+  def assert_index_matches_queries(self, gate_types):
+    expected = query_gates_on_pending_stages(gate_types)
+    actual = pending_gates.get_gates_on_pending_stages(gate_types)
+    self.assertCountEqual(
+        [g.key.integer_id() for g in expected],
+        [g.key.integer_id() for g in actual])
+
+  def test_rebuild_all(self):
+    """The rebuilt index gives the same gates as the queries."""
+    actual = pending_gates.rebuild_all([API_SHIP])
+
+    self.assertEqual(4, actual)
+    self.assert_index_matches_queries([API_SHIP])
+    self.assert_index_matches_queries([PRIVACY_SHIP])
+    self.assert_index_matches_queries([API_SHIP, PRIVACY_SHIP, SECURITY_SHIP])
+    index = PendingGateIndex.get_by_id(API_SHIP)
+    gate_id = self.gates[(11, API_SHIP)].key.integer_id()
+    self.assertEqual(
+        ['reviewer@example.com'], index.gates[str(gate_id)]['assignee_emails'])
+
+  def test_get_gates_on_pending_stages__builds_missing_index(self):
+    """An index that was never built is built on first use."""
+    self.assert_index_matches_queries([SECURITY_SHIP])
+    self.assertIsNotNone(PendingGateIndex.get_by_id(SECURITY_SHIP))
+
+  def test_update_gate__state_changes(self):
+    """Gates are added and removed as their state changes."""
+    pending_gates.rebuild_all([API_SHIP, PRIVACY_SHIP, SECURITY_SHIP])
+    # Warm the Redis mirror so that we check that it is invalidated.
+    pending_gates.get_gates_on_pending_stages([API_SHIP])
+
+    newly_pending = self.gates[(13, API_SHIP)]
+    newly_pending.state = Vote.REVIEW_REQUESTED
+    newly_pending.put()
+    pending_gates.update_gate(newly_pending)
+    resolved = self.gates[(14, API_SHIP)]
+    resolved.state = Vote.APPROVED
+    resolved.put()
+    pending_gates.update_gate(resolved)
+
+    self.assert_index_matches_queries([API_SHIP])
+    index = PendingGateIndex.get_by_id(API_SHIP)
+    self.assertIn(str(newly_pending.key.integer_id()), index.gates)
+    self.assertNotIn(str(resolved.key.integer_id()), index.gates)
+
+  def test_update_gate__assignees_change(self):
+    """Changing the assignees of a pending gate updates its entry."""
+    pending_gates.rebuild_all([API_SHIP])
+    gate = self.gates[(11, API_SHIP)]
+    gate.assignee_emails = ['other@example.com']
+    gate.put()
+
+    pending_gates.update_gate(gate)
+
+    entries = pending_gates.get_index_entries([API_SHIP])
+    self.assertEqual(
+        ['other@example.com'],
+        entries[str(gate.key.integer_id())]['assignee_emails'])
+
+  def test_get_index_entries__stale_copy_not_cached(self):
+    """A reader that loaded an older index cannot replace a newer one."""
+    pending_gates.rebuild_all([API_SHIP])
+    stale_index = PendingGateIndex.get_by_id(API_SHIP)
+    gate = self.gates[(11, API_SHIP)]
+    gate.assignee_emails = ['other@example.com']
+    gate.put()
+    pending_gates.update_gate(gate)
+    self.assertEqual(
+        stale_index.version + 1,
+        PendingGateIndex.get_by_id(API_SHIP, use_cache=False).version)
+
+    pending_gates._cache_index(API_SHIP, stale_index)
+
+    entries = pending_gates.get_index_entries([API_SHIP])
+    self.assertEqual(
+        ['other@example.com'],
+        entries[str(gate.key.integer_id())]['assignee_emails'])
+
+  def test_rebuild_gate_type__increments_version(self):
+    """Each rebuild writes a newer version, which replaces the cached one."""
+    pending_gates.rebuild_gate_type(API_SHIP)
+    first_version = PendingGateIndex.get_by_id(
+        API_SHIP, use_cache=False).version
+    resolved = self.gates[(14, API_SHIP)]
+    resolved.state = Vote.APPROVED
+    resolved.put()
+
+    pending_gates.rebuild_gate_type(API_SHIP)
+
+    self.assertEqual(
+        first_version + 1,
+        PendingGateIndex.get_by_id(API_SHIP, use_cache=False).version)
+    self.assertNotIn(
+        str(resolved.key.integer_id()),
+        pending_gates.get_index_entries([API_SHIP]))
+
+  def test_update_stage(self):
+    """New gates on a stage with a pending gate are shown to reviewers."""
+    pending_gates.rebuild_all([API_SHIP])
+    new_gate = Gate(
+        feature_id=140, stage_id=14, gate_type=PRIVACY_SHIP,
+        state=Gate.PREPARING)
+    new_gate.put()
+
+    pending_gates.update_stage(14)
+
+    self.assert_index_matches_queries([API_SHIP])
@@ -23,6 +23,7 @@ from google.cloud import ndb  # type: ignore
 from flask import render_template
 
 from framework import basehandlers
+from framework import http_client
 from internals import approval_defs
 from internals.core_models import FeatureEntry, MilestoneSet
 from internals.review_models import Gate
@@ -47,7 +48,7 @@ EMAIL_SUBJECT_PREFIX = 'Action requested'
 def get_current_milestone_info(anchor_channel: str):
   """Return a dict of info about the next milestone reaching anchor_channel."""
   try:
-    resp = requests.get(f'{CHROME_RELEASE_SCHEDULE_URL}?mstone={anchor_channel}')
+    resp = http_client.get(f'{CHROME_RELEASE_SCHEDULE_URL}?mstone={anchor_channel}')
   except requests.RequestException as e:
     raise e
   mstone_info = json.loads(resp.text)
@@ -352,14 +353,25 @@ class SLOOverdueHandler(basehandlers.FlaskHandler):
     (newly_overdue_initial_response, long_overdue_initial_response,
      newly_overdue_resolve, long_overdue_resolve, relevant_features) = (
         self.get_overdue_gates_and_features())
+    # Look up the review team for each gate type once, rather than per gate.
+    all_overdue_gates = (
+        newly_overdue_initial_response + long_overdue_initial_response +
+        newly_overdue_resolve + long_overdue_resolve)
+    prefetched_approvers = {
+        gate_type: approval_defs.get_approvers(gate_type)
+        for gate_type in set(g.gate_type for g in all_overdue_gates)}
     newly_initial_email_tasks = self.build_gate_email_tasks(
-        newly_overdue_initial_response, relevant_features, False, True)
+        newly_overdue_initial_response, relevant_features, False, True,
+        prefetched_approvers=prefetched_approvers)
     long_initial_email_tasks = self.build_gate_email_tasks(
-        long_overdue_initial_response, relevant_features, True, True)
+        long_overdue_initial_response, relevant_features, True, True,
+        prefetched_approvers=prefetched_approvers)
     newly_resolve_email_tasks = self.build_gate_email_tasks(
-        newly_overdue_resolve, relevant_features, False, False)
+        newly_overdue_resolve, relevant_features, False, False,
+        prefetched_approvers=prefetched_approvers)
     long_resolve_email_tasks = self.build_gate_email_tasks(
-        long_overdue_resolve, relevant_features, True, False)
+        long_overdue_resolve, relevant_features, True, False,
+        prefetched_approvers=prefetched_approvers)
     email_tasks = (newly_initial_email_tasks + long_initial_email_tasks +
                    newly_resolve_email_tasks + long_resolve_email_tasks)
     notifier.send_emails(email_tasks)
@@ -410,9 +422,14 @@ class SLOOverdueHandler(basehandlers.FlaskHandler):
         long_overdue_resolve.append(g)
         relevant_feature_ids.add(g.feature_id)
 
+    # Load all relevant features in a single batch RPC.
+    sorted_feature_ids = sorted(relevant_feature_ids)
+    features: list[FeatureEntry | None] = ndb.get_multi(
+        [ndb.Key('FeatureEntry', fe_id) for fe_id in sorted_feature_ids])
     relevant_features = {
-        fe_id: FeatureEntry.get_by_id(fe_id)
-        for fe_id in relevant_feature_ids}
+        fe_id: fe
+        for fe_id, fe in zip(sorted_feature_ids, features)
+        if fe is not None}
     return (newly_overdue_initial_response, long_overdue_initial_response,
             newly_overdue_resolve, long_overdue_resolve, relevant_features)
 
@@ -421,20 +438,25 @@ class SLOOverdueHandler(basehandlers.FlaskHandler):
       gates_to_notify: list[Gate],
       relevant_features: dict[int, FeatureEntry],
       is_escalated: bool,
-      is_initial_response: bool
+      is_initial_response: bool,
+      prefetched_approvers: dict[int, list[str]] | None = None
   ) -> list[dict[str, Any]]:
     email_tasks: list[dict[str, Any]] = []
+    if is_initial_response:
+      needed_action = 'an initial response'
+    else:
+      needed_action = 'a resolution'
     for gate in gates_to_notify:
       gate_id = gate.key.integer_id()
       appr_def = approval_defs.APPROVAL_FIELDS_BY_ID[gate.gate_type]
-      fe = relevant_features[gate.feature_id]
+      fe = relevant_features.get(gate.feature_id)
+      if fe is None:
+        logging.warning(
+            'Skipping gate %r because feature %r was not found',
+            gate_id, gate.feature_id)
+        continue
       feature_id = fe.key.integer_id()
       gate_url = settings.SITE_URL + f'feature/{feature_id}?gate={gate_id}'
-      if is_initial_response:
-        needed_action = 'an initial response'
-      else:
-        needed_action = 'a resolution'
-
       body_data = {
           'feature': fe,
           'appr_def': appr_def,
@@ -449,7 +471,8 @@ class SLOOverdueHandler(basehandlers.FlaskHandler):
           subject = subject.replace(EMAIL_SUBJECT_PREFIX, 'Escalation request')
         else:
           subject = f'ESCALATED: {subject}'
-      recipients = self.choose_reviewers(gate, is_escalated)
+      recipients = self.choose_reviewers(
+          gate, is_escalated, prefetched_approvers=prefetched_approvers)
       for recipient in recipients:
         email_tasks.append({
             'to': recipient,
@@ -459,12 +482,18 @@ class SLOOverdueHandler(basehandlers.FlaskHandler):
         })
     return email_tasks
 
-  def choose_reviewers(self, gate: Gate, is_escalated: bool) -> list[str]:
+  def choose_reviewers(
+      self, gate: Gate, is_escalated: bool,
+      prefetched_approvers: dict[int, list[str]] | None = None
+  ) -> list[str]:
     """Decide who to notify that a review is overdue."""
     if not is_escalated and gate.assignee_emails:
       return gate.assignee_emails
 
-    review_team = approval_defs.get_approvers(gate.gate_type)
+    if prefetched_approvers and gate.gate_type in prefetched_approvers:
+      review_team = prefetched_approvers[gate.gate_type]
+    else:
+      review_team = approval_defs.get_approvers(gate.gate_type)
     assignees = gate.assignee_emails or []
     return sorted(set(assignees + review_team))
 
@@ -326,7 +326,7 @@ class FeatureAccuracyHandlerTest(testing_config.CustomTestCase):
     self.owner_user_pref_2.key.delete()
 
 
-  @mock.patch('requests.get')
+  @mock.patch('framework.http_client.get')
   def test_determine_features_to_notify__no_features(self, mock_get):
     mock_return = MockResponse(
         text=('{"mstones":[{"mstone": "40", '
@@ -336,7 +336,7 @@ class FeatureAccuracyHandlerTest(testing_config.CustomTestCase):
     expected = {'message': '0 email(s) sent or logged.'}
     self.assertEqual(result, expected)
 
-  @mock.patch('requests.get')
+  @mock.patch('framework.http_client.get')
   def test_determine_features_to_notify__valid_features(self, mock_get):
     mock_return = MockResponse(
         text=('{"mstones":[{"mstone": "100", '
@@ -351,7 +351,7 @@ class FeatureAccuracyHandlerTest(testing_config.CustomTestCase):
     expected = {'message': expected_message}
     self.assertEqual(result, expected)
 
-  @mock.patch('requests.get')
+  @mock.patch('framework.http_client.get')
   def test_determine_features_to_notify__multiple_owners(self, mock_get):
     mock_return = MockResponse(
         text=('{"mstones":[{"mstone": "148", '
@@ -367,7 +367,7 @@ class FeatureAccuracyHandlerTest(testing_config.CustomTestCase):
     expected = {'message': expected_message}
     self.assertEqual(result, expected)
 
-  @mock.patch('requests.get')
+  @mock.patch('framework.http_client.get')
   def test_determine_features_to_notify__escalated(self, mock_get):
     self.feature_1.outstanding_notifications = 1
     self.feature_2.outstanding_notifications = 2
@@ -391,7 +391,7 @@ class FeatureAccuracyHandlerTest(testing_config.CustomTestCase):
     self.assertEqual(self.feature_1.outstanding_notifications, 1)
     self.assertEqual(self.feature_2.outstanding_notifications, 3)
 
-  @mock.patch('requests.get')
+  @mock.patch('framework.http_client.get')
   def test_determine_features_to_notify__escalated_not_outstanding(
       self, mock_get):
     self.feature_1.outstanding_notifications = 2
@@ -745,3 +745,44 @@ class SLOOverdueHandlerTest(testing_config.CustomTestCase):
     # TESTDATA.make_golden(task['html'], 'test_build_gate_email_tasks__resolution_overdue.html')
     self.assert_equal_ignoring_ids(
       TESTDATA['test_build_gate_email_tasks__resolution_overdue.html'], task['html'])
+
+  @mock.patch('internals.slo.now_utc')
+  def test_get_overdue_gates_and_features__batched(self, mock_now_utc):
+    """Relevant features are loaded together and keyed by feature ID."""
+    self.gate_1.state = Vote.REVIEW_REQUESTED
+    self.gate_1.requested_on = self.request_date
+    self.gate_1.put()
+    mock_now_utc.return_value = self.day_10
+
+    (newly_initial, long_initial, newly_resolve, long_resolve,
+     relevant_features) = self.handler.get_overdue_gates_and_features()
+
+    self.assertEqual([self.gate_1.key], [g.key for g in newly_initial])
+    self.assertEqual([], long_initial)
+    self.assertEqual([], newly_resolve)
+    self.assertEqual([], long_resolve)
+    fe_id = self.feature_1.key.integer_id()
+    self.assertEqual([fe_id], list(relevant_features.keys()))
+    self.assertEqual('feature one', relevant_features[fe_id].name)
+
+  def test_build_gate_email_tasks__missing_feature(self):
+    """A gate whose feature no longer exists is skipped."""
+    with test_app.app_context():
+      actual = self.handler.build_gate_email_tasks(
+        [self.gate_1], {}, True, True)
+
+    self.assertEqual([], actual)
+
+  @mock.patch('internals.approval_defs.get_approvers')
+  def test_choose_reviewers__prefetched(self, mock_get_approvers):
+    """Prefetched approvers are used without looking them up again."""
+    self.gate_1.assignee_emails = ['a_assignee@example.com']
+    prefetched = {
+        core_enums.GATE_ENTERPRISE_SHIP: ['reviewer@example.com']}
+
+    actual = self.handler.choose_reviewers(
+        self.gate_1, True, prefetched_approvers=prefetched)
+
+    self.assertEqual(
+        ['a_assignee@example.com', 'reviewer@example.com'], actual)
+    mock_get_approvers.assert_not_called()
@@ -0,0 +1,220 @@
+# Copyright 2025 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License")
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Append-only export of review activity as a set of CSV part files.
+
+Each daily run writes one gzipped CSV part containing only the new rows,
+and then updates a small JSON manifest that lists every part in order.
+Readers should consult the manifest rather than listing the files,
+because the manifest is only updated after a part is completely written.
+A periodic compaction merges small parts into larger ones.
+
+The single CSV file that was exported before the split is kept as the
+first part and is never merged or deleted, so readers of that file still
+find it.  It stops growing, and newer rows are only in the listed parts.
+"""
+
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime
+from typing import Any, Iterator
+
+from internals import blob_storage
+import settings
+
+
+COLUMNS = [
+    'launch_id',
+    'reviewer_name',
+    'event_type',
+    'date',
+    'status',
+    'assignee',
+    'author',
+    'content',
+    'source',
+    ]
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
+PART_DATE_FORMAT = '%Y%m%dT%H%M%S'
+EXPORT_PREFIX = 'review-activity/'
+MANIFEST_NAME = EXPORT_PREFIX + 'manifest.json'
+# Files written before the export was split into parts.
+LEGACY_CSV_NAME = 'chromestatus-review-activity.csv'
+LEGACY_TIMESTAMP_NAME = 'review-activity-last-timestamp.txt'
+# Compaction merges consecutive parts until they reach this many rows.
+COMPACT_TARGET_ROWS = 100 * 1000
+# If no previous run exists, export everything since this time.
+EPOCH = datetime(2000, 1, 1)
+
+
+def get_file_store() -> blob_storage.FileStore:
+  """Return the store selected by settings.REVIEW_ACTIVITY_EXPORT_BACKEND."""
+  backend = settings.REVIEW_ACTIVITY_EXPORT_BACKEND
+  if backend == 'gcs':
+    return blob_storage.GCSFileStore(settings.FILES_BUCKET)
+  if backend == 'local':
+    return blob_storage.LocalFileStore(
+        settings.REVIEW_ACTIVITY_EXPORT_DIR or
+        os.path.join(tempfile.gettempdir(), 'chromestatus-files'))
+  raise ValueError('Unknown export backend %r' % backend)
+
+
+def encode_part(rows: list[list[str]]) -> bytes:
+  """Return a gzipped CSV with a header row followed by the given rows."""
+  csv_io = io.StringIO()
+  writer = csv.writer(csv_io, lineterminator='\n')
+  writer.writerow(COLUMNS)
+  writer.writerows(rows)
+  return gzip.compress(csv_io.getvalue().encode('utf-8'))
+
+
+def decode_part(data: bytes, compressed: bool = True) -> list[list[str]]:
+  """Return the rows of a part file, without its header row."""
+  if compressed:
+    data = gzip.decompress(data)
+  rows = list(csv.reader(io.StringIO(data.decode('utf-8'))))
+  return rows[1:]
+
+
+class ReviewActivityExport:
+  """Reads and writes the manifest and part files in a FileStore."""
+
+  def __init__(self, file_store: blob_storage.FileStore):
+    self.file_store = file_store
+
+  def load_manifest(self) -> dict[str, Any]:
+    """Return the manifest, creating one from the legacy files if needed."""
+    data = self.file_store.read(MANIFEST_NAME)
+    if data is not None:
+      return json.loads(data)
+
+    manifest: dict[str, Any] = {
+        'columns': COLUMNS,
+        'last_timestamp': EPOCH.strftime(DATE_FORMAT),
+        'parts': [],
+        }
+    # Carry on from where the single-file export stopped.
+    legacy_timestamp = self.file_store.read(LEGACY_TIMESTAMP_NAME)
+    if legacy_timestamp:
+      manifest['last_timestamp'] = legacy_timestamp.decode('utf-8').strip()
+      if self.file_store.read(LEGACY_CSV_NAME) is not None:
+        manifest['parts'].append({
+            'name': LEGACY_CSV_NAME,
+            'compressed': False,
+            'start': EPOCH.strftime(DATE_FORMAT),
+            'end': manifest['last_timestamp'],
+            'rows': None,
+            })
+    return manifest
+
+  def save_manifest(self, manifest: dict[str, Any]) -> None:
+    self.file_store.write(
+        MANIFEST_NAME, json.dumps(manifest, indent=2).encode('utf-8'),
+        'application/json')
+
+  def get_last_timestamp(self, manifest: dict[str, Any]) -> datetime:
+    """Return the end of the time range covered by the last run."""
+    return datetime.strptime(manifest['last_timestamp'], DATE_FORMAT)
+
+  def append_part(
+      self, manifest: dict[str, Any], rows: list[list[str]],
+      end: datetime) -> None:
+    """Write the rows for the run that ended at end as a new part."""
+    start = manifest['last_timestamp']
+    if rows:
+      name = '%spart-%s.csv.gz' % (
+          EXPORT_PREFIX, end.strftime(PART_DATE_FORMAT))
+      self.file_store.write(name, encode_part(rows), 'application/gzip')
+      manifest['parts'].append({
+          'name': name,
+          'compressed': True,
+          'start': start,
+          'end': end.strftime(DATE_FORMAT),
+          'rows': len(rows),
+          })
+    manifest['last_timestamp'] = end.strftime(DATE_FORMAT)
+    self.save_manifest(manifest)
+
+  def read_part(self, part: dict[str, Any]) -> list[list[str]]:
+    data = self.file_store.read(part['name'])
+    if data is None:
+      logging.warning('Missing review activity part %r', part['name'])
+      return []
+    return decode_part(data, compressed=part.get('compressed', True))
+
+  def iter_rows(self, manifest: dict[str, Any]) -> Iterator[list[str]]:
+    """Yield every exported row in order."""
+    for part in manifest['parts']:
+      yield from self.read_part(part)
+
+  def compact(
+      self, manifest: dict[str, Any],
+      target_rows: int = COMPACT_TARGET_ROWS) -> int:
+    """Merge runs of small parts into larger ones.  Return parts removed."""
+    groups: list[list[dict[str, Any]]] = []
+    group_rows = 0
+    for part in manifest['parts']:
+      if part['name'] == LEGACY_CSV_NAME:
+        # Readers of the legacy file still need it, so it is left alone.
+        groups.append([part])
+        group_rows = target_rows
+        continue
+      part_rows = part['rows']
+      # A part that is already big enough is left alone, so it is not read.
+      if (not groups or part_rows >= target_rows or
+          group_rows >= target_rows or
+          group_rows + part_rows > target_rows):
+        groups.append([])
+        group_rows = 0
+      groups[-1].append(part)
+      group_rows += part_rows
+
+    new_parts: list[dict[str, Any]] = []
+    obsolete_names: list[str] = []
+    for group in groups:
+      if len(group) == 1:
+        new_parts.append(group[0])
+        continue
+      rows: list[list[str]] = []
+      for part in group:
+        rows.extend(self.read_part(part))
+      name = '%spart-%s-%s.csv.gz' % (
+          EXPORT_PREFIX,
+          _to_part_date(group[0]['start']), _to_part_date(group[-1]['end']))
+      self.file_store.write(name, encode_part(rows), 'application/gzip')
+      new_parts.append({
+          'name': name,
+          'compressed': True,
+          'start': group[0]['start'],
+          'end': group[-1]['end'],
+          'rows': len(rows),
+          })
+      obsolete_names.extend(part['name'] for part in group)
+
+    removed = len(manifest['parts']) - len(new_parts)
+    manifest['parts'] = new_parts
+    # Only delete old parts after the manifest no longer refers to them.
+    self.save_manifest(manifest)
+    for name in obsolete_names:
+      self.file_store.delete(name)
+    return removed
+
+
+def _to_part_date(timestamp: str) -> str:
+  return datetime.strptime(timestamp, DATE_FORMAT).strftime(PART_DATE_FORMAT)
@@ -0,0 +1,167 @@
+# Copyright 2025 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License")
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import testing_config  # Must be imported before the module under test.
+
+import os
+import tempfile
+from datetime import datetime
+from unittest import mock
+
+from internals import blob_storage
+from internals import review_activity_export as rae
+
+
+def make_rows(count, label):
+  return [[f'{label}{i}', 'API Owners', 'comment', '2020-01-01T00:00:00',
+           '', '', 'user@example.com', 'a "quoted", comment', 'chromestatus']
+          for i in range(count)]
+
+
+class ReviewActivityExportTest(testing_config.CustomTestCase):
+
+  def setUp(self):
+    self.temp_dir = tempfile.TemporaryDirectory()
+    self.file_store = blob_storage.LocalFileStore(self.temp_dir.name)
+    self.export = rae.ReviewActivityExport(self.file_store)
+
+  def tearDown(self):
+    self.temp_dir.cleanup()
+
+  def test_load_manifest__new(self):
+    """With no previous export, we start from the beginning."""
+    manifest = self.export.load_manifest()
+    self.assertEqual([], manifest['parts'])
+    self.assertEqual(rae.EPOCH, self.export.get_last_timestamp(manifest))
+
+  def test_load_manifest__legacy(self):
+    """The single-file export becomes the first part."""
+    self.file_store.write(
+        rae.LEGACY_TIMESTAMP_NAME, b'2024-05-01T08:00:00', 'text/plain')
+    self.file_store.write(
+        rae.LEGACY_CSV_NAME,
+        b'launch_id,reviewer_name\nold1,API Owners\n', 'text/csv')
+
+    manifest = self.export.load_manifest()
+
+    self.assertEqual(
+        datetime(2024, 5, 1, 8), self.export.get_last_timestamp(manifest))
+    self.assertEqual(1, len(manifest['parts']))
+    self.assertEqual(
+        [['old1', 'API Owners']], list(self.export.iter_rows(manifest)))
+
+  def test_append_part(self):
+    """Each run only writes its own rows, plus the manifest."""
+    manifest = self.export.load_manifest()
+    self.export.append_part(manifest, make_rows(2, 'a'), datetime(2024, 1, 1))
+    manifest = self.export.load_manifest()
+    with mock.patch.object(
+        self.file_store, 'write', wraps=self.file_store.write) as mock_write:
+      self.export.append_part(
+          manifest, make_rows(3, 'b'), datetime(2024, 1, 2))
+
+    written = [c.args[0] for c in mock_write.call_args_list]
+    self.assertEqual(
+        ['review-activity/part-20240102T000000.csv.gz', rae.MANIFEST_NAME],
+        written)
+    manifest = self.export.load_manifest()
+    self.assertEqual([2, 3], [p['rows'] for p in manifest['parts']])
+    self.assertEqual(
+        '2024-01-01T00:00:00', manifest['parts'][1]['start'])
+    self.assertEqual(
+        datetime(2024, 1, 2), self.export.get_last_timestamp(manifest))
+    self.assertEqual(
+        make_rows(2, 'a') + make_rows(3, 'b'),
+        list(self.export.iter_rows(manifest)))
+
+  def test_append_part__no_rows(self):
+    """When nothing happened, only the timestamp moves forward."""
+    manifest = self.export.load_manifest()
+    self.export.append_part(manifest, [], datetime(2024, 1, 1))
+
+    manifest = self.export.load_manifest()
+    self.assertEqual([], manifest['parts'])
+    self.assertEqual(
+        datetime(2024, 1, 1), self.export.get_last_timestamp(manifest))
+
+  def test_compact(self):
+    """Small parts are merged and the old files are deleted."""
+    manifest = self.export.load_manifest()
+    for day in range(1, 6):
+      self.export.append_part(
+          manifest, make_rows(2, f'd{day}-'), datetime(2024, 1, day))
+    expected_rows = list(self.export.iter_rows(manifest))
+    old_names = [p['name'] for p in manifest['parts']]
+
+    removed = self.export.compact(manifest, target_rows=6)
+
+    self.assertEqual(3, removed)
+    manifest = self.export.load_manifest()
+    self.assertEqual([6, 4], [p['rows'] for p in manifest['parts']])
+    self.assertEqual(expected_rows, list(self.export.iter_rows(manifest)))
+    for name in old_names:
+      self.assertFalse(
+          os.path.exists(os.path.join(self.temp_dir.name, name)))
+
+  def test_compact__nothing_to_do(self):
+    """Compacting a single part changes nothing."""
+    manifest = self.export.load_manifest()
+    self.export.append_part(manifest, make_rows(2, 'a'), datetime(2024, 1, 1))
+    self.assertEqual(0, self.export.compact(manifest))
+    self.assertEqual(1, len(self.export.load_manifest()['parts']))
+
+  def test_compact__keeps_legacy_part(self):
+    """The legacy file is not read, merged, or deleted."""
+    self.file_store.write(
+        rae.LEGACY_TIMESTAMP_NAME, b'2024-05-01T08:00:00', 'text/plain')
+    self.file_store.write(
+        rae.LEGACY_CSV_NAME,
+        b'launch_id,reviewer_name\nold1,API Owners\nold2,API Owners\n',
+        'text/csv')
+    manifest = self.export.load_manifest()
+    self.export.append_part(manifest, make_rows(1, 'a'), datetime(2024, 6, 1))
+    self.export.append_part(manifest, make_rows(1, 'b'), datetime(2024, 6, 2))
+
+    with mock.patch.object(
+        self.export, 'read_part', wraps=self.export.read_part) as mock_read:
+      removed = self.export.compact(manifest)
+
+    self.assertEqual(1, removed)
+    read_names = [c.args[0]['name'] for c in mock_read.call_args_list]
+    self.assertNotIn(rae.LEGACY_CSV_NAME, read_names)
+    self.assertIsNotNone(self.file_store.read(rae.LEGACY_CSV_NAME))
+    manifest = self.export.load_manifest()
+    self.assertEqual(
+        [rae.LEGACY_CSV_NAME], [p['name'] for p in manifest['parts'][:1]])
+    self.assertEqual([None, 2], [p['rows'] for p in manifest['parts']])
+
+  def test_compact__skips_big_parts(self):
+    """Parts at the target size are not read or merged."""
+    manifest = self.export.load_manifest()
+    for day, count in [(1, 6), (2, 2), (3, 2), (4, 6)]:
+      self.export.append_part(
+          manifest, make_rows(count, f'd{day}-'), datetime(2024, 1, day))
+    big_names = [manifest['parts'][0]['name'], manifest['parts'][3]['name']]
+
+    with mock.patch.object(
+        self.export, 'read_part', wraps=self.export.read_part) as mock_read:
+      removed = self.export.compact(manifest, target_rows=6)
+
+    self.assertEqual(1, removed)
+    read_names = [c.args[0]['name'] for c in mock_read.call_args_list]
+    self.assertEqual(2, len(read_names))
+    for name in big_names:
+      self.assertNotIn(name, read_names)
+    manifest = self.export.load_manifest()
+    self.assertEqual([6, 4, 6], [p['rows'] for p in manifest['parts']])
@@ -19,7 +19,7 @@ import collections
 
 import datetime
 import logging
-from typing import Optional
+from typing import Iterable, Iterator, Optional
 from google.cloud import ndb  # type: ignore
 
 
@@ -149,6 +149,11 @@ class Vote(ndb.Model):
     logging.info('found %r Votes', len(votes))
     return votes
 
+  @classmethod
+  def make_key(cls, gate_id: int, set_by: str) -> ndb.Key:
+    """Return the key of the vote by the given user on the given gate."""
+    return ndb.Key(cls, f'{gate_id}|{set_by}')
+
   @classmethod
   def is_valid_state(cls, new_state: int) -> bool:
     """Return true if new_state is valid."""
@@ -215,6 +220,148 @@ class Gate(ndb.Model):
     return gates_dict
 
 
+class PendingGateIndex(ndb.Model):
+  """Gates of one gate type that are waiting for review.
+
+  Keyed by gate type and maintained by pending_gates.py so that reviewer
+  dashboards do not need to query Gate entities.
+  """
+  # Maps str(gate_id) to a dict with the gate's feature_id, stage_id,
+  # state, assignee_emails, and stage_gate_ids, which lists the IDs of
+  # every gate on the same stage.
+  gates = ndb.JsonProperty()
+  updated = ndb.DateTimeProperty(auto_now=True)
+  # Incremented on every write, so that a stale copy is never cached.
+  version = ndb.IntegerProperty(default=0)
+
+
+class GateVoteSummary(ndb.Model):
+  """Summary of the current votes on one gate, keyed by the gate's ID.
+
+  This is kept apart from the Gate so that a put() of a Gate that was read
+  before a vote cannot undo the vote's change to the summary.  It is only
+  written in the same transaction as a vote, or when approval_defs
+  recomputes it from the Vote entities.
+  """
+  # Number of votes in each state, keyed by str(state).
+  vote_counts = ndb.JsonProperty()
+  # Voters whose current vote can set the gate state, mapped to
+  # [state, set_on in ISO format].
+  state_changing_votes = ndb.JsonProperty()
+  updated = ndb.DateTimeProperty(auto_now=True)
+
+  @classmethod
+  def make_key(cls, gate_id: int) -> ndb.Key:
+    return ndb.Key(cls, gate_id)
+
+
+class GateLatencyRecord(ndb.Model):
+  """Precomputed review latency of one gate, keyed by the gate's ID."""
+  # The feature team has not yet requested this review.
+  NOT_STARTED = -1
+  # The feature team is still waiting for an initial response.
+  PENDING = -2
+
+  feature_id = ndb.IntegerProperty(required=True)
+  gate_type = ndb.IntegerProperty(required=True)
+  requested_on = ndb.DateTimeProperty()
+  responded_on = ndb.DateTimeProperty()
+  # Weekdays from request to initial response, or NOT_STARTED or PENDING.
+  latency_days = ndb.IntegerProperty(required=True)
+  updated = ndb.DateTimeProperty(auto_now=True)
+
+  @classmethod
+  def make_not_started(cls, gate: Gate) -> GateLatencyRecord:
+    """Return the record for a new gate, which must have a key."""
+    return cls(
+        id=gate.key.integer_id(), feature_id=gate.feature_id,
+        gate_type=gate.gate_type, latency_days=cls.NOT_STARTED)
+
+  @classmethod
+  def get_requested_in_range(
+      cls, start: datetime.datetime,
+      end: datetime.datetime | None=None) -> list[GateLatencyRecord]:
+    """Return records of reviews requested in the given range, oldest first."""
+    query: ndb.Query = cls.query(cls.requested_on >= start)
+    if end is not None:
+      query = query.filter(cls.requested_on < end)
+    query = query.order(cls.requested_on)
+    return query.fetch(None)
+
+  @classmethod
+  @ndb.transactional()
+  def put_records(
+      cls, records: list[GateLatencyRecord],
+      entities: Iterable[ndb.Model] = ()) -> None:
+    """Write records, the per-feature copies of them, and other entities.
+
+    This joins the caller's transaction, if there is one.
+    """
+    records_by_fid: dict[int, list[GateLatencyRecord]] = (
+        collections.defaultdict(list))
+    for record in records:
+      records_by_fid[record.feature_id].append(record)
+    feature_ids = list(records_by_fid)
+    groups = ndb.get_multi(
+        [FeatureGateLatencies.make_key(fid) for fid in feature_ids])
+    for i, fid in enumerate(feature_ids):
+      group = groups[i] or FeatureGateLatencies(
+          key=FeatureGateLatencies.make_key(fid), records=[])
+      new_ids = {r.key.integer_id() for r in records_by_fid[fid]}
+      group.records = [
+          r for r in group.records if r.key.integer_id() not in new_ids]
+      group.records.extend(records_by_fid[fid])
+      groups[i] = group
+    ndb.put_multi([*entities, *records, *groups])
+
+
+class FeatureGateLatencies(ndb.Model):
+  """Copies of the GateLatencyRecords of one feature, keyed by feature ID.
+
+  The review latency report loads these with one lookup for the features
+  that had a review requested in its date range.  They are written by
+  GateLatencyRecord.put_records().
+  """
+  records = ndb.LocalStructuredProperty(
+      GateLatencyRecord, repeated=True, keep_keys=True)
+  updated = ndb.DateTimeProperty(auto_now=True)
+
+  @classmethod
+  def make_key(cls, feature_id: int) -> ndb.Key:
+    return ndb.Key(cls, feature_id)
+
+  @classmethod
+  def get_records(cls, feature_ids: list[int]) -> list[GateLatencyRecord]:
+    """Return the records of all gates on the given features."""
+    groups = ndb.get_multi([cls.make_key(fid) for fid in feature_ids])
+    return [record for group in groups if group for record in group.records]
+
+
+class DailyReviewLatency(ndb.Model):
+  """Rolling totals of initial response latency per day and gate type."""
+  day = ndb.DateProperty(required=True)
+  gate_type = ndb.IntegerProperty(required=True)
+  num_responses = ndb.IntegerProperty(default=0)
+  total_latency_days = ndb.IntegerProperty(default=0)
+
+  @classmethod
+  def make_key(cls, day: datetime.date, gate_type: int) -> ndb.Key:
+    """Return the key of the aggregate for the given day and gate type."""
+    return ndb.Key(cls, f'{day.isoformat()}|{gate_type}')
+
+  @classmethod
+  def get_range(
+      cls, start: datetime.date, end: datetime.date,
+      gate_type: Optional[int]=None) -> list[DailyReviewLatency]:
+    """Return the daily aggregates in [start, end), oldest first."""
+    query: ndb.Query = cls.query(cls.day >= start, cls.day < end)
+    query = query.order(cls.day)
+    aggregates: list[DailyReviewLatency] = query.fetch(None)
+    if gate_type is not None:
+      aggregates = [a for a in aggregates if a.gate_type == gate_type]
+    return aggregates
+
+
 class Amendment(ndb.Model):
   """Activity log entries can record changes to fields."""
   field_name = ndb.StringProperty()  # from QUERIABLE_FIELDS
@@ -222,6 +369,10 @@ class Amendment(ndb.Model):
   new_value = ndb.TextProperty()
 
 
+# Number of activities fetched in each datastore request when paging.
+ACTIVITY_PAGE_SIZE = 100
+
+
 class Activity(ndb.Model):
   """An activity log entry (comment + amendments) on a gate or feature."""
   feature_id = ndb.IntegerProperty(required=True)
@@ -245,3 +396,48 @@ class Activity(ndb.Model):
     if comments_only:
       return [act for act in acts if act.content]
     return acts
+
+  @classmethod
+  def get_activities_page(
+      cls, feature_id: Optional[int], gate_id: Optional[int]=None,
+      since: Optional[datetime.datetime]=None,
+      until: Optional[datetime.datetime]=None,
+      limit: int=ACTIVITY_PAGE_SIZE,
+      cursor: Optional[str]=None) -> tuple[list[Activity], Optional[str]]:
+    """Return one page of activities, oldest first, and the next cursor.
+
+    A feature_id of None selects activities on all features.  The
+    returned cursor is None when there are no more pages.  An invalid
+    cursor raises ndb.exceptions.BadValueError.
+    """
+    query = Activity.query().order(Activity.created)
+    if feature_id is not None:
+      query = query.filter(Activity.feature_id == feature_id)
+    if gate_id:
+      query = query.filter(Activity.gate_id == gate_id)
+    if since:
+      query = query.filter(Activity.created > since)
+    if until:
+      query = query.filter(Activity.created <= until)
+    start_cursor = ndb.Cursor(urlsafe=cursor) if cursor else None
+    acts, next_cursor, more = query.fetch_page(
+        limit, start_cursor=start_cursor)
+    if not more or not next_cursor:
+      return acts, None
+    return acts, next_cursor.urlsafe().decode()
+
+  @classmethod
+  def iter_activities(
+      cls, feature_id: Optional[int], gate_id: Optional[int]=None,
+      since: Optional[datetime.datetime]=None,
+      until: Optional[datetime.datetime]=None,
+      page_size: int=ACTIVITY_PAGE_SIZE) -> Iterator[Activity]:
+    """Yield activities oldest first, fetching one page at a time."""
+    cursor = None
+    while True:
+      acts, cursor = cls.get_activities_page(
+          feature_id, gate_id=gate_id, since=since, until=until,
+          limit=page_size, cursor=cursor)
+      yield from acts
+      if not cursor:
+        return
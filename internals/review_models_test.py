@@ -91,6 +91,40 @@ class ActivityTest(testing_config.CustomTestCase):
         self.feature_1_id, 3, comments_only=True)
     self.assertEqual([], actual_3)
 
+  def test_get_activities_page(self):
+    """We can fetch activities one page at a time."""
+    page_1, cursor = Activity.get_activities_page(self.feature_1_id, limit=2)
+    self.assertEqual(
+        ['some text', 'some other text'], [c.content for c in page_1])
+    self.assertIsNotNone(cursor)
+
+    page_2, cursor = Activity.get_activities_page(
+        self.feature_1_id, limit=2, cursor=cursor)
+    self.assertEqual(['random'], [c.content for c in page_2])
+    self.assertIsNone(cursor)
+
+  def test_iter_activities(self):
+    """Iterating over small pages gives the same result as a full fetch."""
+    actual = list(Activity.iter_activities(self.feature_1_id, page_size=1))
+    self.assertEqual(
+        [c.key for c in Activity.get_activities(self.feature_1_id)],
+        [c.key for c in actual])
+
+    actual_gate = list(Activity.iter_activities(self.feature_1_id, gate_id=2))
+    self.assertEqual(['some other text'], [c.content for c in actual_gate])
+
+  def test_iter_activities__all_features_in_range(self):
+    """Without a feature_id, activities on every feature are included."""
+    act_2_1 = Activity(
+        feature_id=self.feature_2_id, author='two@example.com',
+        content='feature b text')
+    act_2_1.put()
+
+    actual = list(Activity.iter_activities(
+        None, since=self.act_1_2.created, until=act_2_1.created))
+    self.assertEqual(
+        ['random', 'feature b text'], [c.content for c in actual])
+
 
 class GateTest(testing_config.CustomTestCase):
   # TODO(jrobbins): Add tests for get_feature_gates.
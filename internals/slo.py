@@ -15,14 +15,21 @@
 import datetime
 import logging
 import pytz
+from dataclasses import dataclass
+from google.cloud import ndb  # type: ignore
 
 from framework import permissions
 from framework.users import User
 from internals.core_models import FeatureEntry
-from internals.review_models import Gate, Vote
+from internals.review_models import (
+    DailyReviewLatency, Gate, GateLatencyRecord, Vote)
 
 PACIFIC_TZ = pytz.timezone('US/Pacific')
 MAX_DAYS = 30
+# This means that the feature team has not yet requested this review.
+NOT_STARTED_LATENCY = GateLatencyRecord.NOT_STARTED
+# This means that the feature team is still waiting for an initial response.
+PENDING_LATENCY = GateLatencyRecord.PENDING
 
 
 def is_weekday(d: datetime.datetime) -> bool:
@@ -63,22 +70,52 @@ def remaining_days(requested_on: datetime.datetime, slo_limit: int) -> int:
   return slo_limit - weekdays_between(requested_on, now_utc())
 
 
+@dataclass
+class SLOChanges:
+  """What apply_vote() changed on a gate."""
+  changed: bool = False
+  latency_changed: bool = False
+  got_initial_response: bool = False
+
+
 def record_vote(gate: Gate, votes: list[Vote], old_gate_state: int) -> bool:
   """Record a Gate SLO response time if needed.  Return True if changed."""
+  changes = apply_vote(gate, votes, old_gate_state)
+  record_vote_changes(gate, changes)
+  return changes.changed
+
+
+def record_vote_changes(gate: Gate, changes: SLOChanges) -> None:
+  """Update the latency records that depend on the gate's SLO dates."""
+  if changes.latency_changed:
+    update_latency_record(gate)
+  if changes.got_initial_response:
+    record_daily_latency(gate)
+
+
+def apply_vote(
+    gate: Gate, votes: list[Vote], old_gate_state: int) -> SLOChanges:
+  """Set the gate's SLO dates for the votes, without writing anything.
+
+  This can run in the transaction that writes the vote and the gate.  The
+  caller should pass the result to record_vote_changes() afterwards.
+  """
   if not votes:
-    return False
+    return SLOChanges()
   latest_vote = sorted(votes, key=lambda v: v.set_on)[-1]
   latest_state = latest_vote.state
 
   if latest_state == Vote.NO_RESPONSE:
-    return False  # NO_RESPONSE never changes SLO state.
+    return SLOChanges()  # NO_RESPONSE never changes SLO state.
 
   changed = False
+  latency_changed = False
+  got_initial_response = False
   if latest_state in Vote.REQUESTING_STATES:
     if gate.requested_on is None:
       logging.info('SLO: Someone requested a new review')
       gate.requested_on = latest_vote.set_on
-      changed = True
+      changed = latency_changed = True
 
   if latest_state in Vote.RESPONSE_STATES:
     if gate.responded_on is None:
@@ -87,7 +124,7 @@ def record_vote(gate: Gate, votes: list[Vote], old_gate_state: int) -> bool:
       if gate.requested_on is None:
         logging.info('SLO: Reviewer is the person initiating the review')
         gate.requested_on = latest_vote.set_on
-      changed = True
+      changed = latency_changed = got_initial_response = True
 
   sent_back_for_rework = (
       old_gate_state != Vote.NEEDS_WORK and
@@ -124,7 +161,7 @@ def record_vote(gate: Gate, votes: list[Vote], old_gate_state: int) -> bool:
       gate.resolved_on = latest_vote.set_on
       changed = True
 
-  return changed
+  return SLOChanges(changed, latency_changed, got_initial_response)
 
 
 def record_comment(
@@ -140,6 +177,8 @@ def record_comment(
     if is_approver:
       logging.info('SLO: Got reviewer comment as initial response')
       gate.responded_on = now_utc()
+      update_latency_record(gate)
+      record_daily_latency(gate)
       return True
 
   return False
@@ -149,3 +188,50 @@ def get_active_gates() -> list[Gate]:
   """Return a list of gates with active reviews."""
   active_gates = Gate.query(Gate.state.IN(Gate.PENDING_STATES)).fetch()
   return active_gates
+
+
+def calc_latency(gate: Gate) -> int:
+  """Return the number of weekdays that the review was pending."""
+  if not gate.requested_on:
+    return NOT_STARTED_LATENCY
+  if not gate.responded_on:
+    return PENDING_LATENCY
+  return weekdays_between(gate.requested_on, gate.responded_on)
+
+
+def make_latency_record(gate: Gate) -> GateLatencyRecord:
+  """Return a GateLatencyRecord that reflects the gate's SLO dates."""
+  return GateLatencyRecord(
+      id=gate.key.integer_id(),
+      feature_id=gate.feature_id,
+      gate_type=gate.gate_type,
+      requested_on=gate.requested_on,
+      responded_on=gate.responded_on,
+      latency_days=calc_latency(gate))
+
+
+def update_latency_record(gate: Gate) -> None:
+  """Store the precomputed latency of the given gate."""
+  if gate.key is None:
+    return  # The gate has never been stored, so there is nothing to index.
+  GateLatencyRecord.put_records([make_latency_record(gate)])
+
+
+@ndb.transactional()
+def _increment_daily_latency(
+    day: datetime.date, gate_type: int, latency_days: int) -> None:
+  """Add one response to the aggregate for the given day and gate type."""
+  key = DailyReviewLatency.make_key(day, gate_type)
+  aggregate = key.get() or DailyReviewLatency(
+      key=key, day=day, gate_type=gate_type)
+  aggregate.num_responses += 1
+  aggregate.total_latency_days += latency_days
+  aggregate.put()
+
+
+def record_daily_latency(gate: Gate) -> None:
+  """Count the gate's initial response in the rolling daily aggregate."""
+  if gate.key is None or not gate.requested_on or not gate.responded_on:
+    return
+  _increment_daily_latency(
+      gate.responded_on.date(), gate.gate_type, calc_latency(gate))
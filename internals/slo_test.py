@@ -21,7 +21,8 @@ from framework import permissions
 from framework.users import User
 from internals import approval_defs
 from internals.core_models import FeatureEntry
-from internals.review_models import Gate, Vote
+from internals.review_models import (
+    DailyReviewLatency, FeatureGateLatencies, Gate, GateLatencyRecord, Vote)
 from internals import slo
 
 
@@ -345,3 +346,66 @@ class SLOReportingTests(testing_config.CustomTestCase):
     # gate_2 was approved so it is no longer active.
     # gate_3 was requested later, but it is still active.
     self.assertEqual([self.gate_1, self.gate_3], actual)
+
+
+class SLOLatencyRecordTests(testing_config.CustomTestCase):
+
+  def setUp(self):
+    self.gate_1 = Gate(feature_id=1, stage_id=2, gate_type=34, state=4)
+    self.gate_1.requested_on = datetime.datetime(2023, 6, 7, 12, 30, 0)  # Wed
+    self.gate_1.put()
+    self.gate_2 = Gate(feature_id=1, stage_id=2, gate_type=54, state=0)
+    self.gate_2.put()
+
+  def tearDown(self):
+    for kind in [
+        Gate, GateLatencyRecord, FeatureGateLatencies, DailyReviewLatency]:
+      for entity in kind.query():
+        entity.key.delete()
+
+  def test_calc_latency(self):
+    """Latency is a weekday count or a sentinel value."""
+    self.assertEqual(slo.PENDING_LATENCY, slo.calc_latency(self.gate_1))
+    self.assertEqual(slo.NOT_STARTED_LATENCY, slo.calc_latency(self.gate_2))
+    self.gate_1.responded_on = datetime.datetime(2023, 6, 9, 12, 30, 0)  # Fri
+    self.assertEqual(2, slo.calc_latency(self.gate_1))
+
+  def test_update_latency_record__unsaved(self):
+    """A gate that was never stored is not indexed."""
+    gate = Gate(feature_id=1, stage_id=2, gate_type=34, state=4)
+    slo.update_latency_record(gate)
+    self.assertEqual([], GateLatencyRecord.query().fetch())
+
+  def test_update_latency_record(self):
+    """Only the gate's own record is written, and copied for its feature."""
+    GateLatencyRecord.put_records(
+        [GateLatencyRecord.make_not_started(self.gate_2)])
+    self.gate_1.responded_on = datetime.datetime(2023, 6, 9, 12, 30, 0)  # Fri
+    slo.update_latency_record(self.gate_1)
+
+    record_1 = GateLatencyRecord.get_by_id(self.gate_1.key.integer_id())
+    self.assertEqual(2, record_1.latency_days)
+    self.assertEqual(self.gate_1.responded_on, record_1.responded_on)
+    self.assertEqual(
+        [(34, 2), (54, slo.NOT_STARTED_LATENCY)],
+        sorted((r.gate_type, r.latency_days)
+               for r in FeatureGateLatencies.get_records([1])))
+
+  def test_record_daily_latency(self):
+    """Initial responses are added to the aggregate for their day."""
+    self.gate_1.responded_on = datetime.datetime(2023, 6, 9, 12, 30, 0)  # Fri
+    slo.record_daily_latency(self.gate_1)
+    slo.record_daily_latency(self.gate_1)
+
+    aggregates = DailyReviewLatency.get_range(
+        datetime.date(2023, 6, 1), datetime.date(2023, 7, 1))
+    self.assertEqual(1, len(aggregates))
+    self.assertEqual(datetime.date(2023, 6, 9), aggregates[0].day)
+    self.assertEqual(34, aggregates[0].gate_type)
+    self.assertEqual(2, aggregates[0].num_responses)
+    self.assertEqual(4, aggregates[0].total_latency_days)
+
+  def test_record_daily_latency__no_response(self):
+    """Gates without a response are not counted."""
+    slo.record_daily_latency(self.gate_1)
+    self.assertEqual([], DailyReviewLatency.query().fetch())
@@ -28,13 +28,19 @@ from internals.core_enums import (
     STAGE_TYPES_ORIGIN_TRIAL,
     STAGE_TYPES_EXTEND_ORIGIN_TRIAL,
     STAGE_TYPES_SHIPPING,
+    STAGE_BLINK_SHIPPING,
+    STAGE_PSA_SHIPPING,
+    STAGE_FAST_SHIPPING,
+    STAGE_DEP_SHIPPING,
+    STAGE_ENT_ROLLOUT,
+    STAGES_AND_GATES_BY_FEATURE_TYPE,
     GATE_API_SHIP,
     GATE_API_EXTEND_ORIGIN_TRIAL,
     GATE_API_ORIGIN_TRIAL,
     GATE_API_PROTOTYPE)
 from internals.core_models import FeatureEntry, MilestoneSet, Stage
 from internals import fetchchannels
-from internals.review_models import Gate
+from internals.review_models import Gate, GateLatencyRecord
 
 
 # Type return value of get_stage_info_for_templates()
@@ -48,20 +54,81 @@ class StageTemplateInfo(TypedDict):
   should_render_intents: bool
 
 def create_feature_stage(feature_id: int, feature_type: int, stage_type: int) -> Stage:
-  # Create the stage.
+  """Create a stage, and its gate if it needs one, in a single commit."""
   stage = Stage(feature_id=feature_id, stage_type=stage_type)
-  stage.put()
 
   # If we should create a gate and this is a stage that requires a gate,
   # create it.
   gate_type = get_gate_for_stage(feature_type, stage_type)
-  if gate_type is not None:
-    gate = Gate(feature_id=feature_id, stage_id=stage.key.id(), gate_type=gate_type,
-        state=Gate.PREPARING)
-    gate.put()
+  if gate_type is None:
+    stage.put()
+    return stage
+
+  # Reserve the stage and gate IDs so that the gate can refer to its stage
+  # and the latency record can refer to the gate before they are written.
+  stage.key = Stage.allocate_ids(1)[0]
+  gate = Gate(key=Gate.allocate_ids(1)[0], feature_id=feature_id,
+      stage_id=stage.key.integer_id(), gate_type=gate_type,
+      state=Gate.PREPARING)
+  GateLatencyRecord.put_records(
+      [GateLatencyRecord.make_not_started(gate)], [stage, gate])
 
   return stage
 
+
+def make_feature_stages_and_gates(
+    feature_id: int, feature_type: int) -> tuple[list[Stage], list[Gate]]:
+  """Return unsaved default Stage and Gate entities for a new feature.
+
+  Stage and Gate IDs are reserved up front so that each gate can refer to
+  its stage and all of the entities can be written together.
+  """
+  # Don't create a trial extension stage pre-emptively.
+  stages_gates = [
+      (stage_type, gate_types) for stage_type, gate_types
+      in STAGES_AND_GATES_BY_FEATURE_TYPE[feature_type]
+      if stage_type != STAGE_TYPES_EXTEND_ORIGIN_TRIAL[feature_type]]
+  stage_keys = Stage.allocate_ids(len(stages_gates))
+  num_gates = sum(len(gate_types) for _, gate_types in stages_gates)
+  gate_keys = iter(Gate.allocate_ids(num_gates) if num_gates else [])
+
+  stages: list[Stage] = []
+  gates: list[Gate] = []
+  for stage_key, (stage_type, gate_types) in zip(stage_keys, stages_gates):
+    stages.append(
+        Stage(key=stage_key, feature_id=feature_id, stage_type=stage_type))
+    # Stages can have zero or more gates.
+    for gate_type in gate_types:
+      gates.append(Gate(key=next(gate_keys), feature_id=feature_id,
+                        stage_id=stage_key.integer_id(),
+                        gate_type=gate_type, state=Gate.PREPARING))
+  return stages, gates
+
+
+def write_new_feature(
+    feature: FeatureEntry) -> tuple[list[Stage], list[Gate]]:
+  """Write a new feature along with its default stages and gates.
+
+  The feature ID is reserved first so that the FeatureEntry and every Stage
+  and Gate can be written in one put_multi inside one transaction.
+  """
+  if feature.key is None:
+    feature.key = FeatureEntry.allocate_ids(1)[0]
+  stages, gates = make_feature_stages_and_gates(
+      feature.key.integer_id(), feature.feature_type)
+  records = [GateLatencyRecord.make_not_started(g) for g in gates]
+  GateLatencyRecord.put_records(records, [feature, *stages, *gates])
+  return stages, gates
+
+
+def write_stages_and_gates_for_feature(
+    feature_id: int, feature_type: int) -> None:
+  """Write the default stages and gates for an already saved feature."""
+  stages, gates = make_feature_stages_and_gates(feature_id, feature_type)
+  records = [GateLatencyRecord.make_not_started(g) for g in gates]
+  GateLatencyRecord.put_records(records, [*stages, *gates])
+
+
 def get_gate_for_stage(feature_type, s_type) -> int | None:
   # Update type-specific fields.
   if s_type == STAGE_TYPES_DEV_TRIAL[feature_type]: # pragma: no cover
@@ -273,3 +340,47 @@ def get_all_shipping_stages_with_milestones(
            stage.milestones.ios_first or
            stage.milestones.webview_first))]
   return shipping_stages_with_milestones
+
+
+# Stage types whose milestones determine when a feature first shipped.
+FIRST_SHIP_STAGE_TYPES = [
+    STAGE_BLINK_SHIPPING, STAGE_PSA_SHIPPING,
+    STAGE_FAST_SHIPPING, STAGE_DEP_SHIPPING, STAGE_ENT_ROLLOUT]
+
+
+def find_first_ship_milestone(stages: list[Stage]) -> int|None:
+  """Find the earliest desktop or android milestone of active ship stages."""
+  m_list: list[int] = []
+  for stage in stages:
+    if (stage.archived or stage.milestones is None or
+        stage.stage_type not in FIRST_SHIP_STAGE_TYPES):
+      continue
+    m_list.append(stage.milestones.desktop_first)
+    m_list.append(stage.milestones.android_first)
+  m_list = [m for m in m_list if m]
+  if m_list:
+    return min(m_list)
+  return None
+
+
+def update_first_ship_milestone(
+    feature: FeatureEntry, updated_stages: list[Stage] | None = None) -> bool:
+  """Set feature.first_ship_milestone in RAM.  Return True if changed.
+
+  Stages in updated_stages take precedence over the stored copies, so this
+  can be called before those stages' writes are visible to queries.
+  """
+  feature_id = feature.key.integer_id()
+  stored_stages: list[Stage] = Stage.query(
+      Stage.feature_id == feature_id,
+      Stage.stage_type.IN(FIRST_SHIP_STAGE_TYPES)).fetch()
+  stages_by_id = {s.key.integer_id(): s for s in stored_stages}
+  for us in updated_stages or []:
+    if us.feature_id == feature_id:
+      stages_by_id[us.key.integer_id()] = us
+
+  milestone = find_first_ship_milestone(list(stages_by_id.values()))
+  if milestone == feature.first_ship_milestone:
+    return False
+  feature.first_ship_milestone = milestone
+  return True
@@ -17,6 +17,8 @@ import testing_config  # Must be imported before the module under test.
 from internals import core_enums
 from internals import stage_helpers
 from internals.core_models import FeatureEntry, Stage, MilestoneSet
+from internals.review_models import (
+    FeatureGateLatencies, Gate, GateLatencyRecord)
 
 
 class StageHelpersTest(testing_config.CustomTestCase):
@@ -36,9 +38,10 @@ class StageHelpersTest(testing_config.CustomTestCase):
       stage.put()
 
   def tearDown(self):
-    self.feature_entry_1.key.delete()
-    for stage in Stage.query().fetch():
-      stage.key.delete()
+    for kind in [
+        FeatureEntry, Stage, Gate, GateLatencyRecord, FeatureGateLatencies]:
+      for entity in kind.query().fetch():
+        entity.key.delete()
 
   def test_get_feature_stages(self):
     """A dictionary with stages relevant to the feature should be present."""
@@ -82,6 +85,48 @@ class StageHelpersTest(testing_config.CustomTestCase):
       expected_stage_types.remove(stage_type)
 
 
+  def test_create_feature_stage__gate_refers_to_stage(self):
+    """The stage's gate points at the reserved stage ID."""
+    stage = stage_helpers.create_feature_stage(
+        self.feature_id, self.feature_type,
+        core_enums.STAGE_FAST_ORIGIN_TRIAL)
+
+    gates = Gate.query(Gate.stage_id == stage.key.integer_id()).fetch()
+    self.assertEqual(1, len(gates))
+    self.assertEqual(core_enums.GATE_API_ORIGIN_TRIAL, gates[0].gate_type)
+    self.assertEqual(Gate.PREPARING, gates[0].state)
+    record = GateLatencyRecord.get_by_id(gates[0].key.integer_id())
+    self.assertEqual(GateLatencyRecord.NOT_STARTED, record.latency_days)
+
+  def test_write_new_feature(self):
+    """The feature, its stages, and its gates are all written."""
+    feature = FeatureEntry(
+        name='fe two', summary='summary', category=1,
+        feature_type=core_enums.FEATURE_TYPE_INCUBATE_ID)
+
+    stages, gates = stage_helpers.write_new_feature(feature)
+
+    feature_id = feature.key.integer_id()
+    self.assertIsNotNone(FeatureEntry.get_by_id(feature_id))
+    expected_stage_types = [
+        stage_type for stage_type, _ in
+        core_enums.STAGES_AND_GATES_BY_FEATURE_TYPE[
+            core_enums.FEATURE_TYPE_INCUBATE_ID]
+        if stage_type != core_enums.STAGE_BLINK_EXTEND_ORIGIN_TRIAL]
+    saved_stages = Stage.query(Stage.feature_id == feature_id).fetch()
+    self.assertCountEqual(
+        expected_stage_types, [s.stage_type for s in saved_stages])
+    saved_gates = Gate.query(Gate.feature_id == feature_id).fetch()
+    self.assertEqual(len(gates), len(saved_gates))
+    stage_ids = {s.key.integer_id() for s in stages}
+    for gate in saved_gates:
+      self.assertIn(gate.stage_id, stage_ids)
+    # The review latency report lists reviews that have not been started.
+    records = FeatureGateLatencies.get_records([feature_id])
+    self.assertCountEqual(
+        [g.key.integer_id() for g in gates],
+        [r.key.integer_id() for r in records])
+
 class StageHelpers_Milestones_Test(testing_config.CustomTestCase):
 
   def setUp(self):
@@ -133,3 +178,38 @@ class StageHelpers_Milestones_Test(testing_config.CustomTestCase):
     actual = stage_helpers.find_earliest_milestone(
         [self.stage_2_1, self.stage_2_2, self.stage_2_3])
     self.assertEqual(120, actual)
+
+  def test_find_first_ship_milestone__ignores_other_stages(self):
+    """Only active shipping stages determine the first ship milestone."""
+    ship = Stage(
+        feature_id=22222, stage_type=core_enums.STAGE_BLINK_SHIPPING,
+        milestones=MilestoneSet(desktop_first=125, ios_first=110))
+    archived = Stage(
+        feature_id=22222, stage_type=core_enums.STAGE_BLINK_SHIPPING,
+        milestones=MilestoneSet(desktop_first=118), archived=True)
+    ot = Stage(
+        feature_id=22222, stage_type=core_enums.STAGE_BLINK_ORIGIN_TRIAL,
+        milestones=MilestoneSet(desktop_first=115))
+    actual = stage_helpers.find_first_ship_milestone([ship, archived, ot])
+    self.assertEqual(125, actual)
+    self.assertIsNone(stage_helpers.find_first_ship_milestone([ot]))
+
+  def test_update_first_ship_milestone(self):
+    """The feature field reflects stored and updated shipping stages."""
+    fe = FeatureEntry(
+        id=22222, name='fe', summary='sum', category=1,
+        first_ship_milestone=None)
+    fe.put()
+    stored = Stage(
+        feature_id=22222, stage_type=core_enums.STAGE_BLINK_SHIPPING,
+        milestones=MilestoneSet(desktop_first=125))
+    stored.put()
+
+    self.assertTrue(stage_helpers.update_first_ship_milestone(fe))
+    self.assertEqual(125, fe.first_ship_milestone)
+    self.assertFalse(stage_helpers.update_first_ship_milestone(fe))
+
+    stored.milestones.android_first = 123
+    self.assertTrue(stage_helpers.update_first_ship_milestone(fe, [stored]))
+    self.assertEqual(123, fe.first_ship_milestone)
+    fe.key.delete()
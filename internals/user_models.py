@@ -17,7 +17,9 @@
 from __future__ import annotations
 
 import logging
-from typing import Optional
+import threading
+from typing import Iterable, Optional
+import uuid
 
 from google.cloud import ndb  # type: ignore
 
@@ -196,21 +198,54 @@ class FeatureOwner(ndb.Model):
         component_id, remove_as_owner=True)
 
 
+BLINK_COMPONENT_IDS_CACHE_KEY = 'BlinkComponent|ids_by_name'
+# Changed whenever components are added or removed.  Each instance keeps
+# the name lookup in memory for as long as this version stays the same.
+BLINK_COMPONENT_IDS_VERSION_KEY = 'BlinkComponent|ids_version'
+
+_component_ids_lock = threading.Lock()
+_component_ids_by_name: dict[str, int] | None = None
+_component_ids_version: str | None = None
+
+
+def find_new_component_names(
+    component_names: Iterable[str],
+    existing_names: Iterable[str]) -> list[str]:
+  """Return the component names that are not already stored, in order."""
+  return sorted(set(component_names) - set(existing_names))
+
+
 class BlinkComponent(ndb.Model):
 
   name = ndb.StringProperty(required=True, default=settings.DEFAULT_COMPONENT)
   created = ndb.DateTimeProperty(auto_now_add=True)
   updated = ndb.DateTimeProperty(auto_now=True)
 
+  def _post_put_hook(self, future):
+    BlinkComponent.clear_name_cache()
+
+  @classmethod
+  def _post_delete_hook(cls, key, future):
+    cls.clear_name_cache()
+
   @property
   def subscribers(self):
-    q = FeatureOwner.query(FeatureOwner.blink_components == self.key)
-    q = q.order(FeatureOwner.name)
-    return q.fetch(None)
+    return self.fetch_subscribers(self.key)
 
   @property
   def owners(self):
-    q = FeatureOwner.query(FeatureOwner.primary_blink_components == self.key)
+    return self.fetch_owners(self.key)
+
+  @staticmethod
+  def fetch_subscribers(component_key: ndb.Key) -> list[FeatureOwner]:
+    q = FeatureOwner.query(FeatureOwner.blink_components == component_key)
+    q = q.order(FeatureOwner.name)
+    return q.fetch(None)
+
+  @staticmethod
+  def fetch_owners(component_key: ndb.Key) -> list[FeatureOwner]:
+    q = FeatureOwner.query(
+        FeatureOwner.primary_blink_components == component_key)
     q = q.order(FeatureOwner.name)
     return q.fetch(None)
 
@@ -232,23 +267,71 @@ class BlinkComponent(ndb.Model):
     return components
 
   @classmethod
-  def update_db(self):
-    """Updates the db with new Blink components from the json endpoint"""
-    new_components = self.fetch_all_components(update_cache=True)
-    existing_comps = self.query().fetch(None)
-    for name in new_components:
-      if not len([x.name for x in existing_comps if x.name == name]):
-        logging.info('Adding new BlinkComponent: ' + name)
-        c = BlinkComponent(name=name)
-        c.put()
+  def update_db(cls) -> int:
+    """Store any new Blink components.  Return the number added."""
+    new_components = cls.fetch_all_components(update_cache=True)
+    existing_names = [
+        c.name for c in cls.query().fetch(None, projection=[cls.name])]
+    names_to_add = find_new_component_names(new_components, existing_names)
+    for name in names_to_add:
+      logging.info('Adding new BlinkComponent: ' + name)
+    ndb.put_multi([BlinkComponent(name=name) for name in names_to_add])
+    cls.clear_name_cache()
+    return len(names_to_add)
 
   @classmethod
-  def get_by_name(self, component_name: str) -> Optional[BlinkComponent]:
-    """Fetch blink component with given name."""
-    q = self.query()
-    q = q.filter(self.name == component_name)
-    component = q.fetch(1)
-    if not component:
+  def clear_name_cache(cls) -> None:
+    """Make every instance rebuild the name lookup on its next use."""
+    global _component_ids_by_name
+    with _component_ids_lock:
+      _component_ids_by_name = None
+    rediscache.set(BLINK_COMPONENT_IDS_VERSION_KEY, uuid.uuid4().hex)
+
+  @classmethod
+  def _get_ids_by_name(cls) -> dict[str, int]:
+    """Return the ID of each component by name.
+
+    The lookup in memory is reused while the version in Redis is unchanged.
+    Otherwise it is read from Redis, but only if it was built for the
+    current version, so a lookup that was built from a query that raced
+    with a change is never reused.
+    """
+    global _component_ids_by_name, _component_ids_version
+    with _component_ids_lock:
+      version = rediscache.get(BLINK_COMPONENT_IDS_VERSION_KEY)
+      if version is None:
+        version = uuid.uuid4().hex
+        rediscache.set(BLINK_COMPONENT_IDS_VERSION_KEY, version)
+      if (_component_ids_by_name is not None and
+          _component_ids_version == version):
+        return _component_ids_by_name
+
+      cached = rediscache.get(BLINK_COMPONENT_IDS_CACHE_KEY)
+      if cached is not None and cached[0] == version:
+        ids_by_name = cached[1]
+      else:
+        ids_by_name = {}
+        for c in cls.query().fetch(None, projection=[cls.name]):
+          # If there are duplicates, use the first one like a query would.
+          ids_by_name.setdefault(c.name, c.key.integer_id())
+        rediscache.set(BLINK_COMPONENT_IDS_CACHE_KEY, (version, ids_by_name))
+      _component_ids_by_name = ids_by_name
+      _component_ids_version = version
+      return _component_ids_by_name
+
+  @classmethod
+  def get_key_by_name(cls, component_name: str) -> Optional[ndb.Key]:
+    """Return the key of the blink component with the given name."""
+    component_id = cls._get_ids_by_name().get(component_name)
+    if component_id is None:
       logging.error('%s is an unknown BlinkComponent.' % (component_name))
       return None
-    return component[0]
+    return ndb.Key(cls, component_id)
+
+  @classmethod
+  def get_by_name(cls, component_name: str) -> Optional[BlinkComponent]:
+    """Fetch blink component with given name."""
+    component_key = cls.get_key_by_name(component_name)
+    if component_key is None:
+      return None
+    return component_key.get()
@@ -15,6 +15,7 @@
 import testing_config  # Must be imported before the module under test.
 
 from unittest import mock
+from framework import rediscache
 from framework import users
 
 from internals import user_models
@@ -109,3 +110,105 @@ class UserPrefTest(testing_config.CustomTestCase):
     user_prefs = user_models.UserPref.get_prefs_for_emails(emails)
     self.assertEqual(100, len(user_prefs))
     self.assertEqual('user_0@example.com', user_prefs[0].email)
+
+
+class BlinkComponentTest(testing_config.CustomTestCase):
+
+  def setUp(self):
+    self.component_1 = user_models.BlinkComponent(name='Blink>CSS')
+    self.component_1.put()
+    self.component_2 = user_models.BlinkComponent(name='Blink>DOM')
+    self.component_2.put()
+    self.owner = user_models.FeatureOwner(
+        name='owner', email='owner@example.com',
+        blink_components=[self.component_1.key],
+        primary_blink_components=[self.component_1.key])
+    self.owner.put()
+
+  def tearDown(self):
+    for kind in [user_models.BlinkComponent, user_models.FeatureOwner]:
+      for entity in kind.query():
+        entity.key.delete()
+
+  def test_find_new_component_names(self):
+    """Only names that are not stored are returned."""
+    self.assertEqual(
+        ['Blink>A', 'Blink>B'],
+        user_models.find_new_component_names(
+            ['Blink>B', 'Blink>CSS', 'Blink>A', 'Blink>B'], ['Blink>CSS']))
+
+  def test_get_by_name(self):
+    """We can look up a component by name."""
+    actual = user_models.BlinkComponent.get_by_name('Blink>DOM')
+    self.assertEqual(self.component_2.key, actual.key)
+    self.assertIsNone(user_models.BlinkComponent.get_by_name('Blink>Nope'))
+
+  def test_get_key_by_name__cached(self):
+    """After the first lookup, names are found without any datastore RPCs."""
+    user_models.BlinkComponent.get_key_by_name('Blink>CSS')
+    with mock.patch.object(
+        user_models.BlinkComponent, 'query') as mock_query:
+      actual = user_models.BlinkComponent.get_key_by_name('Blink>DOM')
+    self.assertEqual(self.component_2.key, actual)
+    mock_query.assert_not_called()
+
+  def test_get_key_by_name__invalidated_on_put(self):
+    """A newly stored component can be found right away."""
+    user_models.BlinkComponent.get_key_by_name('Blink>CSS')
+    component_3 = user_models.BlinkComponent(name='Blink>HTML')
+    component_3.put()
+    self.assertEqual(
+        component_3.key,
+        user_models.BlinkComponent.get_key_by_name('Blink>HTML'))
+
+  def test_get_key_by_name__invalidated_elsewhere(self):
+    """A component added by another instance is found once it says so."""
+    user_models.BlinkComponent.get_key_by_name('Blink>CSS')
+    component_3 = user_models.BlinkComponent(name='Blink>HTML')
+    with mock.patch.object(user_models.BlinkComponent, 'clear_name_cache'):
+      component_3.put()
+    self.assertIsNone(user_models.BlinkComponent.get_key_by_name('Blink>HTML'))
+
+    rediscache.set(user_models.BLINK_COMPONENT_IDS_VERSION_KEY, 'elsewhere')
+
+    self.assertEqual(
+        component_3.key,
+        user_models.BlinkComponent.get_key_by_name('Blink>HTML'))
+
+  def test_get_key_by_name__stale_redis_copy(self):
+    """A lookup stored in Redis for an older version is not used."""
+    user_models.BlinkComponent.clear_name_cache()
+    rediscache.set(
+        user_models.BLINK_COMPONENT_IDS_CACHE_KEY,
+        ('older version', {'Blink>CSS': 999}))
+
+    self.assertEqual(
+        self.component_1.key,
+        user_models.BlinkComponent.get_key_by_name('Blink>CSS'))
+
+  def test_fetch_owners_and_subscribers(self):
+    """Owners and subscribers can be fetched using only the key."""
+    self.assertEqual(
+        ['owner@example.com'],
+        [o.email for o in user_models.BlinkComponent.fetch_owners(
+            self.component_1.key)])
+    self.assertEqual(
+        ['owner@example.com'],
+        [o.email for o in self.component_1.subscribers])
+    self.assertEqual([], self.component_2.owners)
+
+  @mock.patch('hack_components.HACK_BLINK_COMPONENTS',
+              ['Blink>CSS', 'Blink>HTML', 'Blink>JavaScript'])
+  def test_update_db(self):
+    """Only missing components are added, and lookups see them."""
+    user_models.BlinkComponent.get_key_by_name('Blink>CSS')
+
+    actual = user_models.BlinkComponent.update_db()
+
+    self.assertEqual(2, actual)
+    names = [c.name for c in user_models.BlinkComponent.query()]
+    self.assertCountEqual(
+        ['Blink>CSS', 'Blink>DOM', 'Blink>HTML', 'Blink>JavaScript'], names)
+    self.assertIsNotNone(
+        user_models.BlinkComponent.get_key_by_name('Blink>JavaScript'))
+    self.assertEqual(0, user_models.BlinkComponent.update_db())
@@ -49,6 +49,7 @@ from api import (
 )
 from framework import basehandlers, csp, sendemail
 from internals import (
+  attachments,
   data_backup,
   detect_intent,
   feature_links,
@@ -309,6 +310,14 @@ internals_routes: list[Route] = [
   Route('/cron/fetch_webdx_feature_ids', maintenance_scripts.FetchWebdxFeatureId),
   Route('/cron/generate_review_activities',
         maintenance_scripts.GenerateReviewActivityFile),
+  Route('/cron/compact_review_activities',
+        maintenance_scripts.CompactReviewActivityFiles),
+  Route('/cron/update_milestone_schedules',
+        maintenance_scripts.UpdateMilestoneSchedules),
+  Route('/cron/rebuild_pending_gate_index',
+        maintenance_scripts.RebuildPendingGateIndex),
+  Route('/cron/delete_unused_blobs', attachments.DeleteUnusedBlobsHandler),
+  Route('/cron/log_http_metrics', maintenance_scripts.LogHttpMetrics),
 
   Route('/admin/find_stop_words', search_fulltext.FindStopWords),
 
@@ -318,6 +327,7 @@ internals_routes: list[Route] = [
   Route('/tasks/email-assigned', notifier.ReviewAssignmentHandler),
   Route('/tasks/email-comments', notifier.FeatureCommentHandler),
   Route('/tasks/update-feature-links', feature_links.FeatureLinksUpdateHandler),
+  Route('/tasks/generate-thumbnails', attachments.GenerateThumbnailsHandler),
   Route('/tasks/email-ot-activated', notifier.OTActivatedHandler),
   Route('/tasks/email-ot-creation-processed',
         notifier.OTCreationProcessedHandler),
@@ -354,10 +364,18 @@ internals_routes: list[Route] = [
         maintenance_scripts.MigrateGeckoViews),
   Route('/scripts/backfill_responded_on',
         maintenance_scripts.BackfillRespondedOn),
+  Route('/scripts/backfill_gate_latency_records',
+        maintenance_scripts.BackfillGateLatencyRecords),
   Route('/scripts/backfill_stage_created',
         maintenance_scripts.BackfillStageCreated),
   Route('/scripts/backfill_feature_links',
         maintenance_scripts.BackfillFeatureLinks),
+  Route('/scripts/rebuild_feature_links_summary',
+        maintenance_scripts.RebuildFeatureLinksSummary),
+  Route('/scripts/rekey_feature_links',
+        maintenance_scripts.RekeyFeatureLinks),
+  Route('/scripts/rotate_xsrf_secret',
+        maintenance_scripts.RotateXsrfSecret),
   Route('/scripts/backfill_enterprise_impact',
         maintenance_scripts.BackfillFeatureEnterpriseImpact),
   Route('/scripts/delete_empty_extension_stages',
@@ -366,6 +384,8 @@ internals_routes: list[Route] = [
         maintenance_scripts.BackfillShippingYear),
   Route('/scripts/backfill_gate_dates',
         maintenance_scripts.BackfillGateDates),
+  Route('/scripts/backfill_first_ship_milestone',
+        maintenance_scripts.BackfillFirstShipMilestone),
   Route('/scripts/send_ot_creation_email/<int:stage_id>',
         maintenance_scripts.SendManualOTCreatedEmail),
   Route('/scripts/send_ot_activation_email/<int:stage_id>',
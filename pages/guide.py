@@ -26,9 +26,8 @@ from framework import basehandlers
 from framework import permissions
 from internals import core_enums, notifier_helpers
 from internals import stage_helpers
-from internals.core_models import FeatureEntry, MilestoneSet, Stage
+from internals.core_models import FeatureEntry, MilestoneSet
 from internals.data_types import CHANGED_FIELDS_LIST_TYPE
-from internals.review_models import Gate
 from internals import processes
 from internals import search_fulltext
 from internals import feature_links
@@ -97,12 +96,11 @@ class FeatureCreateHandler(basehandlers.FlaskHandler):
         web_feature=web_feature)
     if shipping_year:
       feature_entry.shipping_year = shipping_year
-    key: ndb.Key = feature_entry.put()
+    # Write the FeatureEntry and each of its Stage and Gate entities.
+    stage_helpers.write_new_feature(feature_entry)
+    key: ndb.Key = feature_entry.key
     search_fulltext.index_feature(feature_entry)
 
-    # Write each Stage and Gate entity for the given feature.
-    self.write_gates_and_stages_for_feature(key.integer_id(), feature_type)
-
     notifier_helpers.notify_subscribers_and_save_amendments(
         feature_entry, [], is_update=False)
 
@@ -116,21 +114,7 @@ class FeatureCreateHandler(basehandlers.FlaskHandler):
   def write_gates_and_stages_for_feature(
       self, feature_id: int, feature_type: int) -> None:
     """Write each Stage and Gate entity for the given feature."""
-    # Obtain a list of stages and gates for the given feature type.
-    stages_gates = core_enums.STAGES_AND_GATES_BY_FEATURE_TYPE[feature_type]
-
-    for stage_type, gate_types in stages_gates:
-      # Don't create a trial extension stage pre-emptively.
-      if stage_type == core_enums.STAGE_TYPES_EXTEND_ORIGIN_TRIAL[feature_type]:
-        continue
-
-      stage = Stage(feature_id=feature_id, stage_type=stage_type)
-      stage.put()
-      # Stages can have zero or more gates.
-      for gate_type in gate_types:
-        gate = Gate(feature_id=feature_id, stage_id=stage.key.integer_id(),
-                    gate_type=gate_type, state=Gate.PREPARING)
-        gate.put()
+    stage_helpers.write_stages_and_gates_for_feature(feature_id, feature_type)
 
 
 class EnterpriseFeatureCreateHandler(FeatureCreateHandler):
@@ -177,12 +161,11 @@ class EnterpriseFeatureCreateHandler(FeatureCreateHandler):
         confidential=self.form.get('confidential') == 'on',
         enterprise_product_category=int(self.form.get('enterprise_product_category', '0')),
         tag_review_status=core_enums.REVIEW_NA)
-    key: ndb.Key = feature_entry.put()
+    # Write the FeatureEntry and each of its Stage and Gate entities.
+    stage_helpers.write_new_feature(feature_entry)
+    key: ndb.Key = feature_entry.key
     search_fulltext.index_feature(feature_entry)
 
-    # Write each Stage and Gate entity for the given feature.
-    self.write_gates_and_stages_for_feature(key.integer_id(), feature_type)
-
     # Remove all feature-related cache.
     rediscache.delete_keys_with_prefix(FeatureEntry.DEFAULT_CACHE_KEY)
 
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+#
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compares the time used to find new Blink components during a sync with
+the old nested list scan and with the set difference used by
+BlinkComponent.update_db.
+
+Synthetic component names are generated so that about one in ten of the
+fetched components is not yet stored.
+
+Usage: python scripts/benchmark_blink_components.py [--sizes 1000 3000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path = [os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+            ] + sys.path
+
+from internals.user_models import find_new_component_names
+
+
+def make_names(size: int) -> tuple[list[str], list[str]]:
+  """Return (fetched names, stored names) with 10% of fetched ones new."""
+  fetched = [f'Blink>Area{i // 50}>Component{i}' for i in range(size)]
+  stored = [name for i, name in enumerate(fetched) if i % 10 != 0]
+  return fetched, stored
+
+
+def nested_scan(fetched: list[str], stored: list[str]) -> list[str]:
+  """The previous approach: scan the stored list for each fetched name."""
+  return [name for name in fetched
+          if not len([x for x in stored if x == name])]
+
+
+def set_difference(fetched: list[str], stored: list[str]) -> list[str]:
+  return find_new_component_names(fetched, stored)
+
+
+def measure(func, fetched: list[str], stored: list[str], runs: int) -> float:
+  """Return the best time in seconds."""
+  best = float('inf')
+  for _ in range(runs):
+    start = time.perf_counter()
+    func(fetched, stored)
+    best = min(best, time.perf_counter() - start)
+  return best
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--sizes', type=int, nargs='+',
+                      default=[1000, 2000, 4000],
+                      help='Numbers of components to test')
+  parser.add_argument('--runs', type=int, default=3,
+                      help='Number of timed runs for each case')
+  args = parser.parse_args()
+
+  print(f'{"size":>6} {"method":>10} {"best ms":>10} {"new":>6}')
+  for size in args.sizes:
+    fetched, stored = make_names(size)
+    for name, func in [('nested', nested_scan),
+                       ('set', set_difference)]:
+      seconds = measure(func, fetched, stored, args.runs)
+      num_new = len(func(fetched, stored))
+      print(f'{size:>6} {name:>10} {seconds * 1000:>10.2f} {num_new:>6}')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,354 @@
+#!/usr/bin/env python
+#
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measures the latency, datastore RPC count, and response size of the most
+used endpoints by calling the Flask app in-process on seeded data.
+
+Features, stages, gates, votes and usage metrics are generated with a
+fixed random seed and written to the datastore emulator, so start it with
+`npm run start-emulator` first.  The emulator is cleared before seeding so
+that leftover entities do not skew the results.  With --no-reset, it must
+already be empty.  Results can be saved as a JSON baseline, and a later run that
+compares against it exits with status 1 if an endpoint's p95 latency grew
+by more than the tolerance or if it made more datastore RPCs.
+
+Usage: python scripts/benchmark_endpoints.py [--features 200] [--runs 20]
+           [--no-reset] [--save baseline.json] [--compare baseline.json]
+"""
+
+import argparse
+import collections
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable
+
+import requests
+from google.cloud import ndb  # type: ignore
+
+sys.path = [os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+            ] + sys.path
+
+# pylint: disable=wrong-import-position
+# ruff: noqa: E402
+# This sets up the same emulator, Redis and Cloud Tasks fakes as the tests.
+import testing_config
+from framework import datastore_profiler
+from framework import rediscache
+from framework import xsrf
+from internals import approval_defs
+from internals.core_enums import (
+    FEATURE_CATEGORIES, STAGES_AND_GATES_BY_FEATURE_TYPE)
+from internals.core_models import FeatureEntry, MilestoneSet, Stage
+from internals.metrics_models import FeatureObserver, FeatureObserverHistogram
+from internals.review_models import Gate, GateVoteSummary, Vote
+from internals.user_models import AppUser
+from main import app
+
+ADMIN_EMAIL = 'benchmark-admin@example.com'
+VOTER_EMAILS = [f'reviewer{i}@example.com' for i in range(5)]
+VOTE_STATES = [Vote.REVIEW_REQUESTED, Vote.REVIEW_STARTED, Vote.NEEDS_WORK,
+               Vote.APPROVED]
+API_BASE = '/api/v0'
+
+
+def put_in_batches(entities: list[ndb.Model], batch_size: int = 500) -> None:
+  for i in range(0, len(entities), batch_size):
+    ndb.put_multi(entities[i:i + batch_size])
+
+
+def seed_data(
+    num_features: int, num_buckets: int, num_days: int,
+    seed: int) -> dict[str, Any]:
+  """Write generated entities and return IDs that the requests will use."""
+  rand = random.Random(seed)
+  features = []
+  for i in range(num_features):
+    features.append(FeatureEntry(
+        name=f'Benchmark feature {i}',
+        summary=f'Summary of benchmark feature {i}. ' * rand.randint(1, 20),
+        category=rand.choice(list(FEATURE_CATEGORIES)),
+        feature_type=rand.choice(list(STAGES_AND_GATES_BY_FEATURE_TYPE)),
+        owner_emails=[f'owner{rand.randrange(20)}@example.com'],
+        creator_email=ADMIN_EMAIL,
+        blink_components=['Blink']))
+  put_in_batches(features)
+
+  stages = []
+  for fe in features:
+    for stage_type, _ in STAGES_AND_GATES_BY_FEATURE_TYPE[fe.feature_type]:
+      desktop_first = rand.randint(100, 140)
+      stages.append(Stage(
+          feature_id=fe.key.integer_id(), stage_type=stage_type,
+          milestones=MilestoneSet(
+              desktop_first=desktop_first,
+              android_first=desktop_first + rand.randint(0, 2))))
+  put_in_batches(stages)
+
+  gates = []
+  fe_by_id = {fe.key.integer_id(): fe for fe in features}
+  for stage in stages:
+    fe = fe_by_id[stage.feature_id]
+    gate_types = dict(STAGES_AND_GATES_BY_FEATURE_TYPE[fe.feature_type])
+    for gate_type in gate_types[stage.stage_type]:
+      gates.append(Gate(
+          feature_id=stage.feature_id, stage_id=stage.key.integer_id(),
+          gate_type=gate_type, state=Gate.PREPARING))
+  put_in_batches(gates)
+  # New gates have no legacy votes to migrate.
+  put_in_batches([
+      GateVoteSummary(
+          key=GateVoteSummary.make_key(g.key.integer_id()),
+          vote_counts={}, state_changing_votes={})
+      for g in gates])
+
+  # About a quarter of gates get votes, which makes some of them pending.
+  for gate in gates:
+    if rand.random() < 0.25:
+      for voter in rand.sample(VOTER_EMAILS, rand.randint(1, 3)):
+        approval_defs.set_vote(
+            gate.feature_id, None, rand.choice(VOTE_STATES), voter,
+            gate_id=gate.key.integer_id())
+
+  histograms = []
+  datapoints = []
+  first_day = date(2024, 1, 1)
+  for bucket_id in range(1, num_buckets + 1):
+    property_name = f'BenchmarkFeature{bucket_id}'
+    histograms.append(FeatureObserverHistogram(
+        bucket_id=bucket_id, property_name=property_name))
+    for day in range(num_days):
+      datapoints.append(FeatureObserver(
+          bucket_id=bucket_id, property_name=property_name,
+          date=first_day + timedelta(days=day),
+          day_percentage=rand.random() / 100,
+          rolling_percentage=rand.random() / 100))
+  put_in_batches(histograms + datapoints)
+
+  AppUser(email=ADMIN_EMAIL, is_admin=True).put()
+  return {
+      'feature_ids': [fe.key.integer_id() for fe in features],
+      'bucket_ids': list(range(1, num_buckets + 1)),
+      'xsrf_token': xsrf.generate_token(ADMIN_EMAIL),
+      'num_stages': len(stages),
+      'num_gates': len(gates),
+      'num_datapoints': len(datapoints),
+      }
+
+
+def make_endpoints(
+    seeded: dict[str, Any], rand: random.Random
+    ) -> list[tuple[str, str, Callable[[], str], Callable[[], Any]]]:
+  """Return (name, method, make_path, make_body) for each endpoint."""
+  feature_ids = seeded['feature_ids']
+  bucket_ids = seeded['bucket_ids']
+  no_body: Callable[[], Any] = lambda: None
+
+  def make_patch_body() -> dict[str, Any]:
+    return {
+        'feature_changes': {
+            'id': rand.choice(feature_ids),
+            'summary': f'Updated summary {rand.random()}',
+            },
+        'stages': [],
+        }
+
+  return [
+      ('search_default', 'GET',
+       lambda: f'{API_BASE}/features?q=&num=100', no_body),
+      ('search_owner', 'GET',
+       lambda: (f'{API_BASE}/features?q=owner=owner{rand.randrange(20)}'
+                '@example.com'), no_body),
+      ('search_milestone', 'GET',
+       lambda: (f'{API_BASE}/features?q=browsers.chrome.desktop>='
+                f'{rand.randint(100, 140)}'), no_body),
+      ('feature_detail', 'GET',
+       lambda: f'{API_BASE}/features/{rand.choice(feature_ids)}', no_body),
+      ('features_json', 'GET', lambda: '/features.json', no_body),
+      ('feature_timeline', 'GET',
+       lambda: ('/data/timeline/featurepopularity?bucket_id='
+                f'{rand.choice(bucket_ids)}'), no_body),
+      ('pending_gates', 'GET', lambda: f'{API_BASE}/gates/pending', no_body),
+      # This changes a feature, so it runs last.
+      ('feature_patch', 'PATCH', lambda: f'{API_BASE}/features',
+       make_patch_body),
+      ]
+
+
+def percentile(samples: list[float], pct: float) -> float:
+  """Return the nearest-rank percentile of the samples."""
+  ordered = sorted(samples)
+  index = max(0, int(round(pct / 100 * len(ordered))) - 1)
+  return ordered[min(index, len(ordered) - 1)]
+
+
+def measure_endpoint(
+    client, method: str, make_path: Callable[[], str],
+    make_body: Callable[[], Any], xsrf_token: str, runs: int,
+    cold: bool) -> dict[str, Any]:
+  """Request the endpoint repeatedly and return its metrics."""
+  latencies: list[float] = []
+  rpc_counts: list[int] = []
+  rpcs_by_name: collections.Counter = collections.Counter()
+  sizes: list[int] = []
+  statuses: set[int] = set()
+  # The first request warms up imports and in-process caches.
+  for run in range(runs + 1):
+    if cold:
+      rediscache.flushall()
+    path = make_path()
+    body = make_body()
+    with datastore_profiler.profile() as prof:
+      start = time.perf_counter()
+      response = client.open(
+          path, method=method, json=body,
+          headers={'X-Xsrf-Token': xsrf_token})
+      elapsed = time.perf_counter() - start
+    if run == 0:
+      continue
+    latencies.append(elapsed * 1000)
+    rpc_counts.append(prof.count())
+    rpcs_by_name.update(prof.names)
+    sizes.append(len(response.get_data()))
+    statuses.add(response.status_code)
+
+  return {
+      'p50_ms': round(percentile(latencies, 50), 2),
+      'p95_ms': round(percentile(latencies, 95), 2),
+      'rpcs': int(percentile(rpc_counts, 50)),
+      'max_rpcs': max(rpc_counts),
+      'rpcs_by_name': {
+          name: round(count / runs, 1)
+          for name, count in sorted(rpcs_by_name.items())},
+      'bytes': int(percentile(sizes, 50)),
+      'statuses': sorted(statuses),
+      }
+
+
+def compare(
+    baseline: dict[str, Any], results: dict[str, Any],
+    tolerance: float) -> list[str]:
+  """Return a description of each regression since the baseline."""
+  regressions = []
+  for name, current in results['endpoints'].items():
+    previous = baseline['endpoints'].get(name)
+    if not previous:
+      continue
+    if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+      regressions.append(
+          f'{name}: p95 {previous["p95_ms"]} ms -> {current["p95_ms"]} ms')
+    if current['rpcs'] > previous['rpcs']:
+      regressions.append(
+          f'{name}: RPCs {previous["rpcs"]} -> {current["rpcs"]}')
+  return regressions
+
+
+def print_results(
+    results: dict[str, Any], baseline: dict[str, Any] | None) -> None:
+  print(f'{"endpoint":>18} {"p50 ms":>9} {"p95 ms":>9} {"RPCs":>6} '
+        f'{"bytes":>9} {"base p95":>9} {"base RPCs":>10}')
+  for name, m in results['endpoints'].items():
+    previous = (baseline or {}).get('endpoints', {}).get(name, {})
+    print(f'{name:>18} {m["p50_ms"]:>9.2f} {m["p95_ms"]:>9.2f} '
+          f'{m["rpcs"]:>6} {m["bytes"]:>9} '
+          f'{previous.get("p95_ms", "-"):>9} {previous.get("rpcs", "-"):>10}')
+    if m['statuses'] != [200]:
+      print(f'{"":>18} HTTP statuses: {m["statuses"]}')
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--features', type=int, default=200,
+                      help='Number of features to seed')
+  parser.add_argument('--buckets', type=int, default=20,
+                      help='Number of usage metric buckets to seed')
+  parser.add_argument('--days', type=int, default=180,
+                      help='Number of days of metrics for each bucket')
+  parser.add_argument('--runs', type=int, default=20,
+                      help='Number of timed requests for each endpoint')
+  parser.add_argument('--seed', type=int, default=1,
+                      help='Random seed for the data and requests')
+  parser.add_argument('--cold', action='store_true',
+                      help='Clear Redis before every request')
+  parser.add_argument('--no-reset', dest='reset', action='store_false',
+                      help='Do not clear the datastore emulator, and refuse '
+                      'to seed it if it has any features')
+  parser.add_argument('--save', help='Write the results to this JSON file')
+  parser.add_argument('--compare',
+                      help='Compare the results to this JSON baseline')
+  parser.add_argument('--tolerance', type=float, default=0.25,
+                      help='Allowed fractional increase in p95 latency')
+  args = parser.parse_args()
+
+  if args.reset:
+    emulator = os.environ['DATASTORE_EMULATOR_HOST']
+    requests.post(f'http://{emulator}/reset', timeout=30).raise_for_status()
+  rediscache.flushall()
+
+  with ndb.Client().context():
+    if not args.reset and FeatureEntry.query().fetch(1, keys_only=True):
+      sys.exit('The datastore emulator already has features.  Run without '
+               '--no-reset to clear it first.')
+    start = time.perf_counter()
+    seeded = seed_data(args.features, args.buckets, args.days, args.seed)
+    print(f'Seeded {args.features} features, {seeded["num_stages"]} stages, '
+          f'{seeded["num_gates"]} gates and {seeded["num_datapoints"]} '
+          f'datapoints in {time.perf_counter() - start:.1f} s')
+
+  testing_config.sign_in(ADMIN_EMAIL, 123567890)
+  client = app.test_client()
+  rand = random.Random(args.seed)
+  results: dict[str, Any] = {
+      'created': datetime.now().isoformat(),
+      'options': {
+          'features': args.features, 'buckets': args.buckets,
+          'days': args.days, 'runs': args.runs, 'seed': args.seed,
+          'cold': args.cold,
+          },
+      'endpoints': {},
+      }
+  for name, method, make_path, make_body in make_endpoints(seeded, rand):
+    results['endpoints'][name] = measure_endpoint(
+        client, method, make_path, make_body, seeded['xsrf_token'],
+        args.runs, args.cold)
+
+  baseline = None
+  if args.compare:
+    with open(args.compare) as f:
+      baseline = json.load(f)
+    if baseline['options'] != results['options']:
+      print(f'Warning: baseline options were {baseline["options"]}')
+  print_results(results, baseline)
+
+  if args.save:
+    with open(args.save, 'w') as f:
+      json.dump(results, f, indent=2)
+      f.write('\n')
+
+  if baseline:
+    regressions = compare(baseline, results, args.tolerance)
+    for regression in regressions:
+      print('Regression: ' + regression)
+    if regressions:
+      sys.exit(1)
+
+
+if __name__ == '__main__':
+  main()
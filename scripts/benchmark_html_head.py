@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+#
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compares the time and peak memory used to extract the title and description
+from large spec pages with the old whole-document regexes and with the
+streaming head parser used by link_helpers.
+
+The saved spec page in internals/testdata/link_helpers_test is padded with
+body content to simulate multi-megabyte pages like the HTML standard.
+
+Usage: python scripts/benchmark_html_head.py [--sizes 1 5 10] [--runs 5]
+"""
+
+import argparse
+import html
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+sys.path = [os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+            ] + sys.path
+
+from internals.link_helpers import CHUNK_SIZE, parse_html_head
+
+SPEC_PAGE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+    'internals', 'testdata', 'link_helpers_test', 'css_spec_page.html')
+FILLER = b'<p>Efficiently rendering a website relies on the user agent.</p>\n'
+
+
+def make_page(size_mb: int) -> bytes:
+  with open(SPEC_PAGE_PATH, 'rb') as f:
+    page = f.read()
+  head, body = page.split(b'<body', 1)
+  num_fillers = size_mb * 1024 * 1024 // len(FILLER)
+  return head + b'<body' + FILLER * num_fillers + body
+
+
+def iter_chunks(page: bytes):
+  for i in range(0, len(page), CHUNK_SIZE):
+    yield page[i:i + CHUNK_SIZE]
+
+
+def buffered_parse(page: bytes) -> dict:
+  """The previous approach: buffer everything, then run regexes on it."""
+  html_str = html.unescape(b''.join(iter_chunks(page)).decode('utf-8'))
+  title = re.search(r'<title>(.*?)</title>', html_str)
+  title_og = re.search(
+      r'<meta property="og:title"\s+content="(.*?)"', html_str)
+  description = re.search(
+      r'<meta name="description"\s+content="(.*?)"', html_str)
+  description_og = re.search(
+      r'<meta property="og:description"\s+content="(.*?)"', html_str)
+  return {
+      'title': title_og.group(1) if title_og else (
+          title.group(1) if title else None),
+      'description': description_og.group(1) if description_og else (
+          description.group(1) if description else None),
+  }
+
+
+def streaming_parse(page: bytes) -> dict:
+  information, _ = parse_html_head(iter_chunks(page))
+  return information
+
+
+def measure(func, page: bytes, runs: int) -> tuple[float, int]:
+  """Return the best time in seconds and the peak allocation in bytes."""
+  best = float('inf')
+  for _ in range(runs):
+    start = time.perf_counter()
+    func(page)
+    best = min(best, time.perf_counter() - start)
+  tracemalloc.start()
+  func(page)
+  _, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  return best, peak
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--sizes', type=int, nargs='+', default=[1, 5, 10],
+                      help='Page sizes to test, in megabytes')
+  parser.add_argument('--runs', type=int, default=5,
+                      help='Number of timed runs for each case')
+  args = parser.parse_args()
+
+  print(f'{"size":>6} {"parser":>10} {"best ms":>10} {"peak KiB":>10}')
+  for size_mb in args.sizes:
+    page = make_page(size_mb)
+    for name, func in [('buffered', buffered_parse),
+                       ('streaming', streaming_parse)]:
+      seconds, peak = measure(func, page, args.runs)
+      print(f'{size_mb:>4}MB {name:>10} {seconds * 1000:>10.2f} '
+            f'{peak / 1024:>10.0f}')
+
+
+if __name__ == '__main__':
+  main()
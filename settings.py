@@ -82,9 +82,23 @@ REVIEW_COMMENT_MAILING_LIST = 'jrobbins-test@googlegroups.com'
 # Truncate some log lines to stay under limits of Google Cloud Logging.
 MAX_LOG_LINE = 200 * 1000
 
+# Record the datastore RPCs of each request and log a summary of them.
+# This adds overhead to every request, so it is off in production.
+PROFILE_DATASTORE_RPCS = DEV_MODE or UNIT_TEST_MODE
+
 # Largest individual attachment / screenshot that the user can POST.
 MAX_ATTACHMENT_SIZE = 1 * 1024 * 1024
 
+# Where attachment content is stored: 'datastore', 'gcs', or 'local'.
+# Content is addressed by its SHA-256 digest, so identical uploads are
+# only stored once.
+ATTACHMENT_BLOB_BACKEND = 'datastore'
+# Bucket used when ATTACHMENT_BLOB_BACKEND is 'gcs'.
+ATTACHMENT_BLOB_BUCKET: str|None = None
+# Directory used when ATTACHMENT_BLOB_BACKEND is 'local'.  Defaults to a
+# directory under the system temp dir.
+ATTACHMENT_BLOB_DIR: str|None = None
+
 # Largest overall POST to any handler.
 MAX_REQUEST_CONTENT_LENGTH = 16 * 1024 * 1024
 
@@ -105,6 +119,12 @@ API_WEBSTATUS_DEV_URL = 'https://api.webstatus.dev'
 # Bucket used for scheduled file uploads.
 FILES_BUCKET = 'cr-status-staging'
 
+# Where the review activity export is written: 'gcs' uses FILES_BUCKET and
+# 'local' uses REVIEW_ACTIVITY_EXPORT_DIR or a directory under the system
+# temp dir.
+REVIEW_ACTIVITY_EXPORT_BACKEND = 'gcs'
+REVIEW_ACTIVITY_EXPORT_DIR: str|None = None
+
 if UNIT_TEST_MODE:
   APP_TITLE = 'Local testing'
   SITE_URL = 'http://127.0.0.1:7777/'